@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Benchmark: in-process AWK engine vs the gawk and mawk binaries.
+
+Runs a few typical field-processing programs over generated files of
+increasing size. The engine path (compile from cache, read, run) is timed
+against each awk binary found on PATH, executed through BinaryExecutor.
+
+Usage:
+    python benchmarks/bench_awk_engine.py [--calls N] [--sizes KB,KB,...]
+"""
+
+# Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
+
+import argparse
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from sed_awk_mcp.platform.awk_engine import compile_program  # noqa: E402
+from sed_awk_mcp.platform.config import PlatformConfig  # noqa: E402
+from sed_awk_mcp.platform.executor import BinaryExecutor  # noqa: E402
+
+# (label, program, field separator)
+PROGRAMS = [
+    ('print fields', '{print $1, $3}', None),
+    ('sum column', '{sum += $2} END {print sum}', ','),
+    ('filter rows', 'NR > 1 && $4 == "x" {print $2}', ','),
+]
+
+
+def make_content(size_kb: int, separator: str) -> bytes:
+    """Build roughly size_kb of four-column records."""
+    lines = []
+    total = 0
+    i = 0
+    while total < size_kb * 1024:
+        line = separator.join([f"id{i}", str(i % 997), f"name{i % 13}", "xy"[i % 2]]) + "\n"
+        lines.append(line)
+        total += len(line)
+        i += 1
+    return "".join(lines).encode()
+
+
+def bench_engine(target: Path, program: str, fs, calls: int) -> list:
+    """Time `calls` in-process runs and return per-call latencies in ms."""
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        compile_program(program, fs).run_file(target)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def bench_binary(executor: BinaryExecutor, awk: str, target: Path, program: str, fs,
+                 calls: int) -> list:
+    """Time `calls` awk binary runs and return per-call latencies in ms."""
+    args = [awk] + (['-F', fs] if fs else []) + [program, str(target)]
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        result = executor.execute(args)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert result.success, result.stderr
+    return samples
+
+
+def report(label: str, samples: list) -> None:
+    samples = sorted(samples)
+    p95 = samples[max(int(len(samples) * 0.95) - 1, 0)]
+    print(
+        f"{label:<34} {statistics.median(samples):>10.3f} "
+        f"{p95:>10.3f} {statistics.mean(samples):>10.3f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=20)
+    parser.add_argument('--sizes', default='1,100,1024,10240',
+                        help='comma-separated input sizes in KB')
+    opts = parser.parse_args()
+
+    executor = BinaryExecutor(PlatformConfig())
+    binaries = [name for name in ('gawk', 'mawk') if shutil.which(name)]
+    if not binaries:
+        binaries = ['awk']
+
+    with tempfile.TemporaryDirectory() as workdir:
+        target = Path(workdir) / "input.txt"
+
+        print(f"calls={opts.calls} binaries={','.join(binaries)}")
+        print(f"{'size / program / path':<34} {'median ms':>10} {'p95 ms':>10} {'mean ms':>10}")
+        for size_kb in (int(s) for s in opts.sizes.split(',')):
+            for label, program, fs in PROGRAMS:
+                assert compile_program(program, fs) is not None, program
+                target.write_bytes(make_content(size_kb, fs or ' '))
+                calls = max(3, opts.calls if size_kb <= 1024 else opts.calls // 4)
+
+                runs = [('engine', lambda: bench_engine(target, program, fs, calls))]
+                for awk in binaries:
+                    runs.append((awk, lambda awk=awk: bench_binary(
+                        executor, awk, target, program, fs, calls)))
+                for path, run in runs:
+                    run()  # warm-up pass populates caches
+                    report(f"{size_kb}KB {label} [{path}]", run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Benchmark: in-process unified diff engine vs the diff binary.
+
+Compares two files that differ by a few scattered edits, as produced by a
+typical sed preview, at increasing file sizes. The engine path (read both
+files, compare, format) is timed against `diff -u` executed through
+BinaryExecutor, and the outputs are checked to be identical.
+
+Usage:
+    python benchmarks/bench_diff_engine.py [--calls N] [--sizes KB,KB,...] [--edits N]
+"""
+
+# Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from sed_awk_mcp.platform.config import PlatformConfig  # noqa: E402
+from sed_awk_mcp.platform.diff_engine import diff_files  # noqa: E402
+from sed_awk_mcp.platform.executor import BinaryExecutor  # noqa: E402
+
+
+def make_pair(size_kb: int, edits: int, rng: random.Random) -> tuple:
+    """Build roughly size_kb of text and a copy with `edits` line edits."""
+    lines = []
+    total = 0
+    while total < size_kb * 1024:
+        line = f"{len(lines)} the quick brown fox jumps over the lazy dog\n"
+        lines.append(line)
+        total += len(line)
+    edited = list(lines)
+    for _ in range(edits):
+        pos = rng.randrange(len(edited))
+        edited[pos] = edited[pos].replace("fox", "cat")
+    return "".join(lines).encode(), "".join(edited).encode()
+
+
+def bench_engine(old: Path, new: Path, calls: int) -> list:
+    """Time `calls` in-process diffs and return per-call latencies in ms."""
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        diff_files(old, new, max_size=None)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def bench_binary(executor: BinaryExecutor, old: Path, new: Path, calls: int) -> list:
+    """Time `calls` diff -u executions and return per-call latencies in ms."""
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        result = executor.execute(['diff', '-u', str(old), str(new)])
+        samples.append((time.perf_counter() - start) * 1000)
+        assert result.returncode in (0, 1), result.stderr
+    return samples
+
+
+def report(label: str, samples: list) -> None:
+    samples = sorted(samples)
+    p95 = samples[max(int(len(samples) * 0.95) - 1, 0)]
+    print(
+        f"{label:<34} {statistics.median(samples):>10.3f} "
+        f"{p95:>10.3f} {statistics.mean(samples):>10.3f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=50)
+    parser.add_argument('--sizes', default='1,16,64,256,1024',
+                        help='comma-separated file sizes in KB')
+    parser.add_argument('--edits', type=int, default=5)
+    opts = parser.parse_args()
+
+    executor = BinaryExecutor(PlatformConfig())
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        old = Path(workdir) / "old.txt"
+        new = Path(workdir) / "new.txt"
+
+        print(f"calls={opts.calls} edits={opts.edits}")
+        print(f"{'size / path':<34} {'median ms':>10} {'p95 ms':>10} {'mean ms':>10}")
+        for size_kb in (int(s) for s in opts.sizes.split(',')):
+            old_data, new_data = make_pair(size_kb, opts.edits, rng)
+            old.write_bytes(old_data)
+            new.write_bytes(new_data)
+
+            expected = executor.execute(['diff', '-u', str(old), str(new)]).stdout_bytes
+            assert diff_files(old, new, max_size=None) == expected, "engine output differs from diff -u"
+
+            calls = max(5, opts.calls if size_kb <= 256 else opts.calls // 5)
+            for label, run in (
+                ('engine', lambda: bench_engine(old, new, calls)),
+                ('binary', lambda: bench_binary(executor, old, new, calls)),
+            ):
+                run()  # warm-up pass populates caches
+                report(f"{size_kb}KB [{label}]", run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Microbenchmark: in-process sed engine vs the sed binary for s/// edits.
+
+Times a complete in-place substitution on a small file: the engine path
+(compile from cache, mmap, substitute, atomic rewrite) against `sed -i`
+through BinaryExecutor.
+
+Usage:
+    python benchmarks/bench_sed_engine.py [--calls N] [--lines N]
+"""
+
+# Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from sed_awk_mcp.platform.config import PlatformConfig  # noqa: E402
+from sed_awk_mcp.platform.executor import BinaryExecutor  # noqa: E402
+from sed_awk_mcp.platform.sed_engine import compile_script  # noqa: E402
+from sed_awk_mcp.tools.sed_tool import _write_atomic  # noqa: E402
+
+SCRIPTS = ['s/quick/slow/', 's/o/0/g', '2,$s/[[:digit:]]\\+/N/g']
+
+
+def bench_engine(target: Path, script: str, calls: int) -> list:
+    """Time `calls` in-process edits and return per-call latencies in ms."""
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        data, _ = compile_script(script).apply_file(target)
+        _write_atomic(target, data)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def bench_binary(executor: BinaryExecutor, target: Path, script: str, calls: int) -> list:
+    """Time `calls` sed -i executions and return per-call latencies in ms."""
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        result = executor.execute(['sed', '-i', script, str(target)])
+        samples.append((time.perf_counter() - start) * 1000)
+        assert result.success, result.stderr
+    return samples
+
+
+def report(label: str, samples: list) -> None:
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(
+        f"{label:<34} {statistics.median(samples):>10.3f} "
+        f"{p95:>10.3f} {statistics.mean(samples):>10.3f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=300)
+    parser.add_argument('--lines', type=int, default=100)
+    opts = parser.parse_args()
+
+    executor = BinaryExecutor(PlatformConfig())
+    content = "".join(
+        f"{i} the quick brown fox jumps over the lazy dog\n" for i in range(opts.lines)
+    )
+
+    with tempfile.TemporaryDirectory() as workdir:
+        target = Path(workdir) / "input.txt"
+
+        print(f"calls={opts.calls} lines={opts.lines}")
+        print(f"{'script / path':<34} {'median ms':>10} {'p95 ms':>10} {'mean ms':>10}")
+        for script in SCRIPTS:
+            assert compile_script(script) is not None, script
+            for label, run in (
+                ('engine', lambda: bench_engine(target, script, opts.calls)),
+                ('binary', lambda: bench_binary(executor, target, script, opts.calls)),
+            ):
+                target.write_text(content)
+                run()  # warm-up pass populates caches
+                target.write_text(content)
+                report(f"{script} [{label}]", run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Microbenchmark: per-call spawn latency of BinaryExecutor backends.
+
+Compares the legacy fork + preexec_fn path against the posix_spawn backends
+(prlimit(2) on the child pid, and the prlimit(1) exec shim). Fork cost grows
+with the parent's resident set, so the benchmark can inflate the server's RSS
+with --ballast-mb to mimic a long-running process.
+
+Usage:
+    python benchmarks/bench_spawn.py [--calls N] [--ballast-mb MB]
+"""
+
+# Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from sed_awk_mcp.platform.config import PlatformConfig  # noqa: E402
+from sed_awk_mcp.platform.executor import BinaryExecutor  # noqa: E402
+
+
+def bench_backend(executor: BinaryExecutor, target: str, calls: int) -> list:
+    """Time `calls` sed executions and return per-call latencies in ms."""
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        result = executor.execute(['sed', 's/a/b/', target])
+        samples.append((time.perf_counter() - start) * 1000)
+        assert result.success, result.stderr
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=300)
+    parser.add_argument('--ballast-mb', type=int, default=200,
+                        help='Resident memory to allocate in the parent first')
+    opts = parser.parse_args()
+    
+    # Touch every page so the ballast is actually resident
+    ballast = bytearray(opts.ballast_mb * 1024 * 1024)
+    for i in range(0, len(ballast), 4096):
+        ballast[i] = 1
+    
+    config = PlatformConfig()
+    backends = [BinaryExecutor.SPAWN_PREEXEC, BinaryExecutor.SPAWN_POSIX]
+    if config.prlimit_path:
+        backends.append(BinaryExecutor.SPAWN_PRLIMIT_SHIM)
+    
+    with tempfile.NamedTemporaryFile('w', suffix='.txt') as tmp:
+        tmp.write("a line of text\n" * 10)
+        tmp.flush()
+        
+        print(f"calls={opts.calls} ballast={opts.ballast_mb}MB")
+        print(f"{'backend':<12} {'median ms':>10} {'p95 ms':>10} {'mean ms':>10}")
+        for name in backends:
+            executor = BinaryExecutor(config, spawn_backend=name)
+            bench_backend(executor, tmp.name, 10)  # warm-up
+            samples = sorted(bench_backend(executor, tmp.name, opts.calls))
+            p95 = samples[int(len(samples) * 0.95) - 1]
+            print(
+                f"{name:<12} {statistics.median(samples):>10.3f} "
+                f"{p95:>10.3f} {statistics.mean(samples):>10.3f}"
+            )
+    
+    del ballast
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1398 @@
+"""In-process AWK engine for simple field-processing programs.
+
+This module compiles a common subset of AWK into Python closures so that
+typical ``awk_transform`` programs (field printing, filters, running sums)
+run without spawning the awk binary. Compiled programs are cached.
+
+The subset is deliberately conservative: anything outside it, and any
+construct whose behaviour differs between awk implementations (gawk, mawk,
+BWK awk), is reported as unsupported so callers can fall back to the awk
+binary, which remains the reference implementation.
+
+Supported:
+    - BEGIN/END blocks, expression and regex patterns, pattern-only items
+    - print, printf, if/else, next, exit, expression statements
+    - Fields ($0, $n, $expr), NR, NF, FNR, FS (in BEGIN), OFS, ORS
+    - Scalar variables, assignment operators, ++/--
+    - Arithmetic, concatenation, comparison, ~ and !~, &&, ||, !, ?:
+    - length, substr, index, tolower, toupper, int, sqrt, exp, log, sprintf
+
+Text is handled as bytes (decoded as Latin-1) so input is reproduced
+byte for byte; character-sensitive operations on non-ASCII text fall back.
+"""
+
+import functools
+import math
+import operator
+import re
+from pathlib import Path
+from typing import Callable, FrozenSet, List, Optional, Tuple, Union
+
+from .sed_engine import UnsupportedSedError, translate_regex
+
+# Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
+
+# Largest string the engine will build before deferring to the awk binary
+MAX_STRING_LENGTH = 64 * 1024 * 1024
+
+# Integers are printed with %d only inside the range every awk agrees on
+_INT_PRINT_LIMIT = 2147483647.0
+
+_BUILTINS = frozenset({
+    'length', 'substr', 'index', 'tolower', 'toupper', 'int',
+    'sqrt', 'exp', 'log', 'sprintf',
+})
+
+_KEYWORDS = frozenset({
+    'BEGIN', 'END', 'if', 'else', 'print', 'printf', 'next', 'exit',
+    # Recognised only to be rejected
+    'while', 'for', 'do', 'break', 'continue', 'delete', 'in', 'getline',
+    'function', 'func', 'return', 'nextfile',
+})
+
+# Built-in variables outside the subset (POSIX, gawk and mawk extensions)
+_UNSUPPORTED_VARS = frozenset({
+    'RS', 'FILENAME', 'SUBSEP', 'CONVFMT', 'OFMT', 'RSTART', 'RLENGTH',
+    'ENVIRON', 'ARGC', 'ARGV', 'IGNORECASE', 'PROCINFO', 'RT', 'FPAT',
+    'FIELDWIDTHS', 'BINMODE', 'LINT', 'TEXTDOMAIN', 'ERRNO', 'ARGIND',
+    'SYMTAB', 'FUNCTAB',
+})
+
+_STRING_ESCAPES = {
+    '"': '"', '\\': '\\', '/': '/', 'n': '\n', 't': '\t', 'r': '\r',
+    'a': '\a', 'b': '\b', 'f': '\f', 'v': '\v',
+}
+
+_REGEX_CONTROL_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'f': '\f', 'v': '\v', 'a': '\a'}
+
+_TOKEN_RE = re.compile(r'''
+    (?P<ws>[ \t]+|\\\n|\#[^\n]*)
+  | (?P<newline>\n)
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<string>")
+  | (?P<op>\*\*=?|\+\+|--|&&|\|\||==|!=|<=|>=|!~|>>|[-+*/%^]=|[-+*/%^!<>=~?:,;(){}\[\]$|])
+''', re.VERBOSE)
+
+# Tokens after which '/' is division rather than the start of a regex
+_OPERAND_END = frozenset({'number', 'string', 'ere', 'name', 'builtin', ')', ']', '$', '++', '--'})
+
+# Tokens that can start the right operand of a concatenation
+_CONCAT_START = frozenset({'number', 'string', 'name', 'builtin', '$', '('})
+
+_NUM = 'num'          # always a float
+_STR = 'str'          # always a str
+_STRNUM = 'strnum'    # input text (plain str) or _MISSING
+_ANY = 'any'          # float, str, _StrNum or an uninitialized sentinel
+
+
+class UnsupportedAwkError(Exception):
+    """Raised when a program or its input is outside the engine's subset.
+
+    Callers should fall back to the awk binary when they see this error.
+
+    Attributes:
+        message: Human-readable reason
+    """
+
+    def __init__(self, message: str) -> None:
+        """Initialize UnsupportedAwkError.
+
+        Args:
+            message: Human-readable reason
+        """
+        super().__init__(message)
+        self.message = message
+
+
+class _Uninitialized:
+    """Sentinel for values that are both "" and 0."""
+
+    __slots__ = ('name',)
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __repr__(self) -> str:
+        return self.name
+
+
+# Uninitialized variable: compares numerically against numbers in every awk
+_UNINIT = _Uninitialized('<uninitialized>')
+# Field beyond NF: gawk compares it as a number, mawk as a string
+_MISSING = _Uninitialized('<missing field>')
+
+
+class _StrNum(str):
+    """Input-derived string stored in a variable (POSIX "strnum")."""
+
+    __slots__ = ()
+
+
+class _Next(Exception):
+    """Control flow for the 'next' statement."""
+
+
+class _Exit(Exception):
+    """Control flow for the 'exit' statement."""
+
+    def __init__(self, code: Optional[int]) -> None:
+        super().__init__(code)
+        self.code = code
+
+
+def _unsupported(message: str) -> UnsupportedAwkError:
+    return UnsupportedAwkError(message)
+
+
+# --- Value conversions ---------------------------------------------------
+
+_NUM_PREFIX = re.compile(r'[ \t\n\r\f\v]*([+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)')
+_NONPORTABLE_NUMBER = re.compile(r'[ \t\n\r\f\v]*[+-]?(?:0[xX]|inf|nan)', re.IGNORECASE)
+
+
+def _str_to_num(s: str) -> float:
+    """Convert a string to a number using its leading numeric prefix."""
+    if s.isascii() and '_' not in s:
+        try:
+            value = float(s)
+        except ValueError:
+            pass
+        else:
+            if math.isfinite(value):
+                return value
+    if _NONPORTABLE_NUMBER.match(s):
+        # mawk uses strtod (hex, inf, nan); gawk and POSIX awk do not
+        raise _unsupported(f"non-portable numeric string {s[:20]!r}")
+    match = _NUM_PREFIX.match(s)
+    return float(match.group(1)) if match else 0.0
+
+
+def _looks_numeric(s: str) -> bool:
+    """Check whether input text is a numeric string (POSIX strnum)."""
+    if s.isascii() and '_' not in s:
+        try:
+            value = float(s)
+        except ValueError:
+            pass
+        else:
+            if math.isfinite(value):
+                return True
+    if _NONPORTABLE_NUMBER.match(s):
+        raise _unsupported(f"non-portable numeric string {s[:20]!r}")
+    return False
+
+
+def _num_to_str(value: float) -> str:
+    """Format a number the way awk does for output and concatenation."""
+    if value.is_integer():
+        if -_INT_PRINT_LIMIT <= value <= _INT_PRINT_LIMIT:
+            if value == 0 and math.copysign(1.0, value) < 0:
+                raise _unsupported("negative zero formats differently across awks")
+            return '%d' % value
+        raise _unsupported("large integer formats differently across awks")
+    if not math.isfinite(value):
+        raise _unsupported("non-finite number")
+    return '%.6g' % value
+
+
+def _to_str(value) -> str:
+    if isinstance(value, str):
+        return value
+    if type(value) is float:
+        return _num_to_str(value)
+    return ''
+
+
+def _to_num(value) -> float:
+    if type(value) is float:
+        return value
+    if isinstance(value, str):
+        return _str_to_num(value)
+    return 0.0
+
+
+def _strnum_is_numeric(value) -> bool:
+    if value is _MISSING:
+        raise _unsupported("comparison with a nonexistent field")
+    return _looks_numeric(value)
+
+
+def _any_is_numeric(value) -> bool:
+    kind = type(value)
+    if kind is float:
+        return True
+    if kind is _StrNum:
+        return _looks_numeric(value)
+    if value is _UNINIT:
+        return True
+    if value is _MISSING:
+        raise _unsupported("comparison with a nonexistent field")
+    return False
+
+
+def _strnum_truth(value) -> bool:
+    if value is _MISSING:
+        return False
+    if _looks_numeric(value):
+        return _str_to_num(value) != 0
+    return value != ''
+
+
+def _any_truth(value) -> bool:
+    kind = type(value)
+    if kind is float:
+        return value != 0
+    if kind is _StrNum:
+        return _strnum_truth(value)
+    if kind is str:
+        return value != ''
+    return False
+
+
+def _require_ascii(s: str, what: str) -> None:
+    if not s.isascii():
+        raise _unsupported(f"{what} on non-ASCII text depends on the awk implementation")
+
+
+def _check_length(s: str) -> str:
+    if len(s) > MAX_STRING_LENGTH:
+        raise _unsupported("string exceeds in-process size limit")
+    return s
+
+
+# --- Regular expressions -------------------------------------------------
+
+def _translate_awk_regex(text: str) -> Tuple[re.Pattern, bool]:
+    """Translate an awk ERE to a compiled Python pattern.
+
+    Args:
+        text: Regex source (literal body or dynamic regex string)
+
+    Returns:
+        Tuple of (compiled pattern, needs_ascii_subject)
+
+    Raises:
+        UnsupportedAwkError: For constructs that differ between awks
+    """
+    out: List[str] = []
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c == '\\':
+            if i + 1 >= len(text):
+                raise _unsupported("trailing backslash in regex")
+            e = text[i + 1]
+            i += 2
+            if e in '/"':
+                out.append(e)
+            elif e in _REGEX_CONTROL_ESCAPES:
+                out.append(_REGEX_CONTROL_ESCAPES[e])
+            elif e.isalnum() or e in '<>`\'':
+                raise _unsupported(f"regex escape \\{e} differs between awks")
+            else:
+                out.append('\\' + e)
+            continue
+        if c == '{':
+            # Interval expressions are literal text in mawk 1.3.x
+            raise _unsupported("regex interval expressions differ between awks")
+        out.append(c)
+        i += 1
+
+    try:
+        translation = translate_regex(''.join(out), extended=True)
+        compiled = re.compile(translation.pattern)
+    except UnsupportedSedError as e:
+        raise _unsupported(f"regex not supported: {e.message}")
+    except re.error as e:
+        raise _unsupported(f"regex does not compile: {e}")
+    return compiled, not translation.byte_safe or translation.ascii_input
+
+
+def _make_matcher(text: str) -> Callable[[str], bool]:
+    """Build a search function with awk semantics for a regex source."""
+    compiled, needs_ascii = _translate_awk_regex(text)
+    search = compiled.search
+
+    def matches(subject: str) -> bool:
+        if '\n' in subject:
+            raise _unsupported("regex match on text containing a newline")
+        if needs_ascii and not subject.isascii():
+            raise _unsupported("regex on non-ASCII text depends on the awk implementation")
+        return search(subject) is not None
+
+    return matches
+
+
+@functools.lru_cache(maxsize=128)
+def _dynamic_matcher(text: str) -> Callable[[str], bool]:
+    return _make_matcher(text)
+
+
+# --- Field splitting -----------------------------------------------------
+
+_DEFAULT_FIELD = re.compile(r'[^ \t\n]+')
+
+
+@functools.lru_cache(maxsize=32)
+def _make_splitter(fs: str) -> Callable[[str], List[str]]:
+    """Build a record splitter for a field separator value."""
+    if fs == ' ':
+        return _DEFAULT_FIELD.findall
+    if len(fs) == 1 and fs != '\\':
+        def split_char(record: str) -> List[str]:
+            return record.split(fs) if record else []
+        return split_char
+    if not fs:
+        raise _unsupported("empty field separator")
+
+    compiled, needs_ascii = _translate_awk_regex(fs)
+    finditer = compiled.finditer
+
+    def split_regex(record: str) -> List[str]:
+        if not record:
+            return []
+        if needs_ascii and not record.isascii():
+            raise _unsupported("field separator regex on non-ASCII text")
+        fields = []
+        last = 0
+        for m in finditer(record):
+            start, end = m.span()
+            if start == end:
+                raise _unsupported("field separator matches the empty string")
+            fields.append(record[last:start])
+            last = end
+        fields.append(record[last:])
+        return fields
+
+    return split_regex
+
+
+# --- Formatting ----------------------------------------------------------
+
+_FORMAT_SPEC = re.compile(r'%([-+ #0]*)(\d*)(?:\.(\d*))?([a-zA-Z%])')
+
+
+@functools.lru_cache(maxsize=128)
+def _parse_format(fmt: str) -> List[Union[str, Tuple[str, str]]]:
+    """Split a printf format into literal text and (spec, conversion) pairs."""
+    parts: List[Union[str, Tuple[str, str]]] = []
+    pos = 0
+    while True:
+        start = fmt.find('%', pos)
+        if start == -1:
+            if pos < len(fmt):
+                parts.append(fmt[pos:])
+            return parts
+        if start > pos:
+            parts.append(fmt[pos:start])
+        m = _FORMAT_SPEC.match(fmt, start)
+        if not m:
+            raise _unsupported("unsupported printf format")
+        flags, width, precision, conv = m.groups()
+        if conv == '%':
+            parts.append('%')
+        else:
+            if conv not in 'diouxXeEfFgGcs':
+                raise _unsupported(f"unsupported printf conversion %{conv}")
+            if (width and int(width) > 4096) or (precision and int(precision) > 4096):
+                raise _unsupported("printf width too large")
+            spec = '%' + flags + width + ('.' + precision if precision is not None else '')
+            parts.append((spec, conv))
+        pos = m.end()
+
+
+def _format(fmt: str, args: list) -> str:
+    """Format values like awk's printf/sprintf."""
+    out = []
+    arg_index = 0
+    for part in _parse_format(fmt):
+        if isinstance(part, str):
+            out.append(part)
+            continue
+        spec, conv = part
+        if arg_index >= len(args):
+            raise _unsupported("printf has fewer arguments than conversions")
+        value = args[arg_index]
+        arg_index += 1
+
+        if conv in 'diouxX':
+            number = _to_num(value)
+            if not math.isfinite(number) or abs(number) > _INT_PRINT_LIMIT:
+                raise _unsupported("printf integer out of portable range")
+            integer = int(number)
+            if conv in 'ouxX' and integer < 0:
+                raise _unsupported("printf unsigned conversion of a negative number")
+            out.append((spec + ('d' if conv in 'iu' else conv)) % integer)
+        elif conv in 'eEfFgG':
+            number = _to_num(value)
+            if not math.isfinite(number):
+                raise _unsupported("non-finite number")
+            out.append((spec + conv) % number)
+        elif conv == 'c':
+            if type(value) is float or (type(value) is _StrNum and _looks_numeric(value)):
+                code = int(_to_num(value))
+                if not 0 <= code < 128:
+                    raise _unsupported("printf %c outside ASCII")
+                char = chr(code)
+            else:
+                text = _to_str(value)
+                if not text or not text[0].isascii():
+                    raise _unsupported("printf %c of empty or non-ASCII string")
+                char = text[0]
+            out.append((spec + 's') % char)
+        else:
+            text = _to_str(value)
+            if spec != '%' and not text.isascii():
+                raise _unsupported("printf width on non-ASCII text")
+            out.append((spec + 's') % text)
+    return _check_length(''.join(out))
+
+
+# --- Runtime -------------------------------------------------------------
+
+class _Runtime:
+    """Mutable execution state for one run of a compiled program."""
+
+    __slots__ = (
+        'record', 'fields', 'nr', 'vars', 'out', 'out_size', 'max_output',
+        'fs', 'ofs', 'ors', 'splitter'
+    )
+
+    def __init__(self, var_count: int, fs: str, max_output: Optional[int]) -> None:
+        self.record = ''
+        self.fields: Optional[List[str]] = []
+        self.nr = 0
+        self.vars = [_UNINIT] * var_count
+        self.out: List[str] = []
+        self.out_size = 0
+        self.max_output = max_output
+        self.fs = fs
+        self.ofs = ' '
+        self.ors = '\n'
+        self.splitter = _make_splitter(fs)
+
+    def get_fields(self) -> List[str]:
+        fields = self.fields
+        if fields is None:
+            fields = self.fields = self.splitter(self.record)
+        return fields
+
+    def emit(self, text: str) -> None:
+        self.out.append(text)
+        self.out_size += len(text)
+        if self.max_output is not None and self.out_size > self.max_output:
+            raise _unsupported("output exceeds in-process limit")
+
+
+class _Expr:
+    """A compiled expression: evaluation closure, static kind, lvalue info."""
+
+    __slots__ = ('fn', 'kind', 'lvalue')
+
+    def __init__(self, fn: Callable, kind: str, lvalue: Optional[Tuple] = None) -> None:
+        self.fn = fn
+        self.kind = kind
+        self.lvalue = lvalue
+
+
+def _num_fn(expr: _Expr) -> Callable:
+    """Closure returning the expression's numeric value."""
+    fn = expr.fn
+    if expr.kind == _NUM:
+        return fn
+    return lambda rt: _to_num(fn(rt))
+
+
+def _str_fn(expr: _Expr) -> Callable:
+    """Closure returning the expression's string value."""
+    fn = expr.fn
+    if expr.kind == _STR:
+        return fn
+    return lambda rt: _to_str(fn(rt))
+
+
+def _any_fn(expr: _Expr) -> Callable:
+    """Closure returning a self-describing value suitable for storage."""
+    fn = expr.fn
+    if expr.kind != _STRNUM:
+        return fn
+
+    def wrap(rt):
+        value = fn(rt)
+        return value if value is _MISSING else _StrNum(value)
+    return wrap
+
+
+def _bool_fn(expr: _Expr) -> Callable:
+    """Closure returning the expression's truth value."""
+    fn = expr.fn
+    if expr.kind == _NUM:
+        return lambda rt: fn(rt) != 0
+    if expr.kind == _STR:
+        return lambda rt: fn(rt) != ''
+    if expr.kind == _STRNUM:
+        return lambda rt: _strnum_truth(fn(rt))
+    return lambda rt: _any_truth(fn(rt))
+
+
+# --- Lexer ---------------------------------------------------------------
+
+def _read_string(src: str, i: int) -> Tuple[str, int]:
+    """Read a string literal body starting after the opening quote."""
+    out = []
+    while True:
+        if i >= len(src) or src[i] == '\n':
+            raise _unsupported("unterminated string")
+        c = src[i]
+        if c == '"':
+            return ''.join(out), i + 1
+        if c == '\\':
+            if i + 1 >= len(src):
+                raise _unsupported("unterminated string")
+            e = src[i + 1]
+            if e in _STRING_ESCAPES:
+                out.append(_STRING_ESCAPES[e])
+                i += 2
+            elif e in '01234567':
+                m = re.match(r'[0-7]{1,3}', src[i + 1:])
+                code = int(m.group(0), 8)
+                if code == 0 or code > 255:
+                    raise _unsupported("octal escape out of range")
+                out.append(chr(code))
+                i += 1 + len(m.group(0))
+            else:
+                raise _unsupported(f"string escape \\{e} differs between awks")
+            continue
+        out.append(c)
+        i += 1
+
+
+def _read_regex(src: str, i: int) -> Tuple[str, int]:
+    """Read a regex literal body starting after the opening slash."""
+    start = i
+    while True:
+        if i >= len(src) or src[i] == '\n':
+            raise _unsupported("unterminated regex")
+        c = src[i]
+        if c == '\\' and i + 1 < len(src):
+            i += 2
+            continue
+        if c == '/':
+            return src[start:i], i + 1
+        i += 1
+
+
+def _tokenize(src: str) -> List[Tuple[str, str]]:
+    """Split program text into (type, value) tokens."""
+    tokens: List[Tuple[str, str]] = []
+    i = 0
+    while i < len(src):
+        prev = tokens[-1][0] if tokens else None
+        if src[i] == '/' and prev not in _OPERAND_END:
+            body, i = _read_regex(src, i + 1)
+            tokens.append(('ere', body))
+            continue
+        m = _TOKEN_RE.match(src, i)
+        if not m:
+            raise _unsupported(f"unexpected character {src[i]!r}")
+        kind = m.lastgroup
+        text = m.group(kind)
+        i = m.end()
+        if kind == 'ws':
+            continue
+        if kind == 'string':
+            value, i = _read_string(src, i)
+            tokens.append(('string', value))
+        elif kind == 'number':
+            if re.match(r'[xX]', src[i:i + 1]) or text.startswith('0x'):
+                raise _unsupported("hexadecimal constant")
+            tokens.append(('number', text))
+        elif kind == 'name':
+            if text in _KEYWORDS:
+                tokens.append((text, text))
+            elif text in _BUILTINS:
+                tokens.append(('builtin', text))
+            else:
+                tokens.append(('name', text))
+        elif kind == 'newline':
+            tokens.append(('newline', text))
+        else:
+            tokens.append((text, text))
+    tokens.append(('eof', ''))
+    return tokens
+
+
+# --- Parser / compiler ---------------------------------------------------
+
+_COMPARE_OPS = {
+    '<': operator.lt, '<=': operator.le, '>': operator.gt,
+    '>=': operator.ge, '==': operator.eq, '!=': operator.ne,
+}
+
+_ASSIGN_OPS = frozenset({'=', '+=', '-=', '*=', '/=', '%=', '^='})
+
+
+def _divide(a: float, b: float) -> float:
+    if b == 0:
+        raise _unsupported("division by zero")
+    return a / b
+
+
+def _modulo(a: float, b: float) -> float:
+    if b == 0:
+        raise _unsupported("division by zero in %")
+    return math.fmod(a, b)
+
+
+def _power(a: float, b: float) -> float:
+    try:
+        result = a ** b
+    except (OverflowError, ZeroDivisionError):
+        raise _unsupported("arithmetic overflow")
+    if isinstance(result, complex):
+        raise _unsupported("complex result")
+    return float(result)
+
+
+_ARITH_OPS = {
+    '+': operator.add, '-': operator.sub, '*': operator.mul,
+    '/': _divide, '%': _modulo, '^': _power,
+}
+
+
+class _Compiler:
+    """Recursive-descent parser that emits closures directly."""
+
+    def __init__(self, src: str) -> None:
+        self.tokens = _tokenize(src)
+        self.pos = 0
+        self.var_slots: dict = {}
+        self.section = None
+
+    # Token helpers
+
+    def peek(self, offset: int = 0) -> str:
+        return self.tokens[self.pos + offset][0]
+
+    def advance(self) -> Tuple[str, str]:
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def expect(self, kind: str) -> Tuple[str, str]:
+        if self.peek() != kind:
+            raise _unsupported(f"syntax: expected {kind!r}, found {self.tokens[self.pos][1]!r}")
+        return self.advance()
+
+    def skip_newlines(self) -> None:
+        while self.peek() == 'newline':
+            self.pos += 1
+
+    def skip_terminators(self) -> None:
+        while self.peek() in ('newline', ';'):
+            self.pos += 1
+
+    # Program structure
+
+    def program(self):
+        begin, main, end = [], [], []
+        self.skip_terminators()
+        while self.peek() != 'eof':
+            if self.peek() == 'BEGIN':
+                self.advance()
+                self.section = 'BEGIN'
+                begin.append(self.block())
+            elif self.peek() == 'END':
+                self.advance()
+                self.section = 'END'
+                end.append(self.block())
+            elif self.peek() == '{':
+                self.section = 'main'
+                main.append((None, self.block()))
+            else:
+                self.section = 'main'
+                pattern = _bool_fn(self.expr())
+                if self.peek() == ',':
+                    raise _unsupported("range patterns")
+                action = self.block() if self.peek() == '{' else self.print_record()
+                main.append((pattern, action))
+            self.skip_terminators()
+        return begin, main, end
+
+    @staticmethod
+    def print_record() -> Callable:
+        def action(rt):
+            rt.emit(rt.record + rt.ors)
+        return action
+
+    def block(self) -> Callable:
+        self.expect('{')
+        statements = []
+        self.skip_terminators()
+        while self.peek() != '}':
+            statements.append(self.statement())
+            if self.peek() not in ('}', ';', 'newline'):
+                raise _unsupported("syntax: missing statement separator")
+            self.skip_terminators()
+        self.advance()
+
+        if len(statements) == 1:
+            return statements[0]
+
+        def run_block(rt):
+            for stmt in statements:
+                stmt(rt)
+        return run_block
+
+    def simple_or_block(self) -> Callable:
+        self.skip_newlines()
+        if self.peek() == '{':
+            return self.block()
+        if self.peek() == ';':
+            self.advance()
+            return lambda rt: None
+        return self.statement()
+
+    def statement(self) -> Callable:
+        kind = self.peek()
+        if kind == '{':
+            return self.block()
+        if kind == 'if':
+            return self.if_statement()
+        if kind == 'print':
+            self.advance()
+            return self.print_statement()
+        if kind == 'printf':
+            self.advance()
+            return self.printf_statement()
+        if kind == 'next':
+            self.advance()
+            if self.section != 'main':
+                raise _unsupported("next outside main rules")
+
+            def do_next(rt):
+                raise _Next()
+            return do_next
+        if kind == 'exit':
+            self.advance()
+            code = None
+            if self.peek() not in ('}', ';', 'newline', 'eof'):
+                code = _num_fn(self.expr())
+
+            def do_exit(rt):
+                raise _Exit(int(code(rt)) if code else None)
+            return do_exit
+        if kind in _KEYWORDS:
+            raise _unsupported(f"statement '{kind}'")
+        expr = self.expr().fn
+        return lambda rt: expr(rt) and None
+
+    def if_statement(self) -> Callable:
+        self.advance()
+        self.expect('(')
+        cond = _bool_fn(self.expr())
+        self.expect(')')
+        then = self.simple_or_block()
+        otherwise = None
+        save = self.pos
+        self.skip_terminators()
+        if self.peek() == 'else':
+            self.advance()
+            otherwise = self.simple_or_block()
+        else:
+            self.pos = save
+
+        if otherwise is None:
+            def run_if(rt):
+                if cond(rt):
+                    then(rt)
+        else:
+            def run_if(rt):
+                if cond(rt):
+                    then(rt)
+                else:
+                    otherwise(rt)
+        return run_if
+
+    def output_args(self) -> List[_Expr]:
+        """Parse print/printf arguments, with or without parentheses."""
+        if self.peek() in ('}', ';', 'newline', 'eof'):
+            return []
+        if self.peek() == '(':
+            save = self.pos
+            self.advance()
+            args = self.expr_list()
+            if self.peek() == ')':
+                self.advance()
+                if self.peek() in ('}', ';', 'newline', 'eof'):
+                    return args
+            self.pos = save
+        args = self.expr_list(no_gt=True)
+        if self.peek() in ('>', '>>', '|'):
+            raise _unsupported("output redirection")
+        return args
+
+    def expr_list(self, no_gt: bool = False) -> List[_Expr]:
+        args = [self.expr(no_gt)]
+        while self.peek() == ',':
+            self.advance()
+            self.skip_newlines()
+            args.append(self.expr(no_gt))
+        return args
+
+    def print_statement(self) -> Callable:
+        args = [_str_fn(a) for a in self.output_args()]
+        if not args:
+            return self.print_record()
+        if len(args) == 1:
+            only = args[0]
+
+            def print_one(rt):
+                rt.emit(only(rt) + rt.ors)
+            return print_one
+
+        def print_many(rt):
+            rt.emit(rt.ofs.join([a(rt) for a in args]) + rt.ors)
+        return print_many
+
+    def printf_statement(self) -> Callable:
+        args = self.output_args()
+        if not args:
+            raise _unsupported("printf without format")
+        fmt = _str_fn(args[0])
+        values = [_any_fn(a) for a in args[1:]]
+
+        def do_printf(rt):
+            rt.emit(_format(fmt(rt), [v(rt) for v in values]))
+        return do_printf
+
+    # Expressions, lowest precedence first
+
+    def expr(self, no_gt: bool = False) -> _Expr:
+        left = self.ternary(no_gt)
+        if self.peek() in _ASSIGN_OPS:
+            op = self.advance()[0]
+            self.skip_newlines()
+            right = self.expr(no_gt)
+            return self.assignment(left, op, right)
+        return left
+
+    def ternary(self, no_gt: bool) -> _Expr:
+        cond = self.logical_or(no_gt)
+        if self.peek() != '?':
+            return cond
+        self.advance()
+        self.skip_newlines()
+        first = self.ternary(no_gt)
+        self.skip_newlines()
+        self.expect(':')
+        self.skip_newlines()
+        second = self.ternary(no_gt)
+        test = _bool_fn(cond)
+        if first.kind == second.kind and first.kind != _STRNUM:
+            a, b, kind = first.fn, second.fn, first.kind
+        else:
+            a, b, kind = _any_fn(first), _any_fn(second), _ANY
+        return _Expr(lambda rt: a(rt) if test(rt) else b(rt), kind)
+
+    def logical_or(self, no_gt: bool) -> _Expr:
+        left = self.logical_and(no_gt)
+        while self.peek() == '||':
+            self.advance()
+            self.skip_newlines()
+            a, b = _bool_fn(left), _bool_fn(self.logical_and(no_gt))
+            left = _Expr(lambda rt, a=a, b=b: 1.0 if a(rt) or b(rt) else 0.0, _NUM)
+        return left
+
+    def logical_and(self, no_gt: bool) -> _Expr:
+        left = self.match(no_gt)
+        while self.peek() == '&&':
+            self.advance()
+            self.skip_newlines()
+            a, b = _bool_fn(left), _bool_fn(self.match(no_gt))
+            left = _Expr(lambda rt, a=a, b=b: 1.0 if a(rt) and b(rt) else 0.0, _NUM)
+        return left
+
+    def match(self, no_gt: bool) -> _Expr:
+        left = self.comparison(no_gt)
+        while self.peek() in ('~', '!~'):
+            negate = self.advance()[0] == '!~'
+            subject = _str_fn(left)
+            if self.peek() == 'ere':
+                matcher = _make_matcher(self.advance()[1])
+                pattern = None
+            else:
+                pattern = _str_fn(self.comparison(no_gt))
+                matcher = None
+
+            def run_match(rt, subject=subject, matcher=matcher, pattern=pattern, negate=negate):
+                test = matcher or _dynamic_matcher(pattern(rt))
+                return 1.0 if test(subject(rt)) != negate else 0.0
+            left = _Expr(run_match, _NUM)
+        return left
+
+    def comparison(self, no_gt: bool) -> _Expr:
+        left = self.concatenation(no_gt)
+        op = self.peek()
+        if no_gt and op == '>=':
+            raise _unsupported("'>=' in unparenthesized print arguments")
+        if op not in _COMPARE_OPS or (no_gt and op == '>'):
+            return left
+        self.advance()
+        right = self.concatenation(no_gt)
+        return self.compare(_COMPARE_OPS[op], left, right)
+
+    @staticmethod
+    def compare(op: Callable, left: _Expr, right: _Expr) -> _Expr:
+        if left.kind == _STR or right.kind == _STR:
+            a, b = _str_fn(left), _str_fn(right)
+            return _Expr(lambda rt: 1.0 if op(a(rt), b(rt)) else 0.0, _NUM)
+        if left.kind == _NUM and right.kind == _NUM:
+            a, b = left.fn, right.fn
+            return _Expr(lambda rt: 1.0 if op(a(rt), b(rt)) else 0.0, _NUM)
+
+        numeric_tests = {_NUM: None, _STRNUM: _strnum_is_numeric, _ANY: _any_is_numeric}
+        a, b = left.fn, right.fn
+        test_a, test_b = numeric_tests[left.kind], numeric_tests[right.kind]
+
+        def run_compare(rt):
+            x, y = a(rt), b(rt)
+            if (test_a is None or test_a(x)) and (test_b is None or test_b(y)):
+                return 1.0 if op(_to_num(x), _to_num(y)) else 0.0
+            return 1.0 if op(_to_str(x), _to_str(y)) else 0.0
+        return _Expr(run_compare, _NUM)
+
+    def concatenation(self, no_gt: bool) -> _Expr:
+        left = self.additive()
+        while self.peek() in _CONCAT_START:
+            right = self.additive()
+            a, b = _str_fn(left), _str_fn(right)
+            left = _Expr(lambda rt, a=a, b=b: _check_length(a(rt) + b(rt)), _STR)
+        return left
+
+    def additive(self) -> _Expr:
+        left = self.multiplicative()
+        while self.peek() in ('+', '-'):
+            op = _ARITH_OPS[self.advance()[0]]
+            left = self.arithmetic(op, left, self.multiplicative())
+        return left
+
+    def multiplicative(self) -> _Expr:
+        left = self.unary()
+        while self.peek() in ('*', '/', '%'):
+            op = _ARITH_OPS[self.advance()[0]]
+            left = self.arithmetic(op, left, self.unary())
+        return left
+
+    @staticmethod
+    def arithmetic(op: Callable, left: _Expr, right: _Expr) -> _Expr:
+        a, b = _num_fn(left), _num_fn(right)
+        return _Expr(lambda rt: op(a(rt), b(rt)), _NUM)
+
+    def unary(self) -> _Expr:
+        kind = self.peek()
+        if kind == '!':
+            self.advance()
+            test = _bool_fn(self.unary())
+            return _Expr(lambda rt: 0.0 if test(rt) else 1.0, _NUM)
+        if kind == '-':
+            self.advance()
+            value = _num_fn(self.unary())
+            return _Expr(lambda rt: -value(rt), _NUM)
+        if kind == '+':
+            self.advance()
+            return _Expr(_num_fn(self.unary()), _NUM)
+        return self.power()
+
+    def power(self) -> _Expr:
+        base = self.postfix()
+        if self.peek() == '^':
+            self.advance()
+            exponent = self.unary()
+            return self.arithmetic(_power, base, exponent)
+        if self.peek() in ('**', '**='):
+            raise _unsupported("'**' operator")
+        return base
+
+    def postfix(self) -> _Expr:
+        if self.peek() in ('++', '--'):
+            delta = 1.0 if self.advance()[0] == '++' else -1.0
+            target = self.postfix()
+            return self.increment(target, delta, prefix=True)
+        operand = self.primary()
+        if operand.lvalue and self.peek() in ('++', '--'):
+            delta = 1.0 if self.advance()[0] == '++' else -1.0
+            return self.increment(operand, delta, prefix=False)
+        return operand
+
+    def primary(self) -> _Expr:
+        kind, value = self.advance()
+
+        if kind == 'number':
+            number = float(value)
+            return _Expr(lambda rt: number, _NUM)
+        if kind == 'string':
+            return _Expr(lambda rt: value, _STR)
+        if kind == 'ere':
+            matcher = _make_matcher(value)
+            return _Expr(lambda rt: 1.0 if matcher(rt.record) else 0.0, _NUM)
+        if kind == '(':
+            inner = self.expr()
+            self.expect(')')
+            return _Expr(inner.fn, inner.kind)
+        if kind == '$':
+            return self.field()
+        if kind == 'name':
+            return self.variable(value)
+        if kind == 'builtin':
+            return self.builtin(value)
+        if kind in _KEYWORDS:
+            raise _unsupported(f"keyword '{kind}'")
+        raise _unsupported(f"syntax: unexpected {value!r}")
+
+    def field(self) -> _Expr:
+        if self.peek() in ('++', '--', '-'):
+            raise _unsupported("field reference form")
+        index_expr = self.primary()
+
+        if index_expr.kind == _NUM and self.tokens[self.pos - 1][0] == 'number':
+            index = index_expr.fn(None)
+            if not index.is_integer() or index < 0:
+                raise _unsupported("invalid field index")
+            index = int(index)
+            if index == 0:
+                return _Expr(lambda rt: rt.record, _STRNUM, ('field',))
+
+            def get_const_field(rt):
+                fields = rt.get_fields()
+                return fields[index - 1] if index <= len(fields) else _MISSING
+            return _Expr(get_const_field, _STRNUM, ('field',))
+
+        index_fn = _num_fn(index_expr)
+
+        def get_field(rt):
+            number = index_fn(rt)
+            if number < 0 or not number.is_integer():
+                raise _unsupported("invalid field index")
+            if number == 0:
+                return rt.record
+            fields = rt.get_fields()
+            return fields[int(number) - 1] if number <= len(fields) else _MISSING
+        return _Expr(get_field, _STRNUM, ('field',))
+
+    def variable(self, name: str) -> _Expr:
+        if self.peek() in ('[', '('):
+            raise _unsupported("arrays and user functions")
+        if name == 'NR' or name == 'FNR':
+            return _Expr(lambda rt: float(rt.nr), _NUM, ('special', name))
+        if name == 'NF':
+            return _Expr(lambda rt: float(len(rt.get_fields())), _NUM, ('special', name))
+        if name in ('FS', 'OFS', 'ORS'):
+            attr = name.lower()
+            return _Expr(lambda rt: getattr(rt, attr), _STR, ('special', name))
+        if name in _UNSUPPORTED_VARS:
+            raise _unsupported(f"special variable {name}")
+
+        slot = self.var_slots.setdefault(name, len(self.var_slots))
+        return _Expr(lambda rt: rt.vars[slot], _ANY, ('var', slot))
+
+    def assignment(self, target: _Expr, op: str, value: _Expr) -> _Expr:
+        if not target.lvalue:
+            raise _unsupported("assignment to non-lvalue")
+        kind = target.lvalue[0]
+
+        if op == '=':
+            new_value = _any_fn(value)
+            result_kind = value.kind if value.kind != _STRNUM else _ANY
+        else:
+            arith = _ARITH_OPS[op[0]]
+            current, operand = _num_fn(target), _num_fn(value)
+            new_value = lambda rt: arith(current(rt), operand(rt))  # noqa: E731
+            result_kind = _NUM
+
+        if kind == 'var':
+            slot = target.lvalue[1]
+
+            def assign_var(rt):
+                result = rt.vars[slot] = new_value(rt)
+                return result
+            return _Expr(assign_var, result_kind)
+
+        if kind == 'special' and target.lvalue[1] in ('OFS', 'ORS', 'FS'):
+            name = target.lvalue[1]
+            if name == 'FS' and self.section != 'BEGIN':
+                raise _unsupported("FS assignment outside BEGIN")
+            attr = name.lower()
+            text = _str_fn(_Expr(new_value, result_kind))
+
+            def assign_special(rt):
+                result = text(rt)
+                setattr(rt, attr, result)
+                if attr == 'fs':
+                    rt.splitter = _make_splitter(result)
+                return result
+            return _Expr(assign_special, _STR)
+
+        raise _unsupported(f"assignment to {target.lvalue[-1] if kind == 'special' else 'field'}")
+
+    def increment(self, target: _Expr, delta: float, prefix: bool) -> _Expr:
+        if not target.lvalue or target.lvalue[0] != 'var':
+            raise _unsupported("increment of a field or special variable")
+        slot = target.lvalue[1]
+
+        def run_increment(rt):
+            old = _to_num(rt.vars[slot])
+            rt.vars[slot] = old + delta
+            return old + delta if prefix else old
+        return _Expr(run_increment, _NUM)
+
+    def builtin(self, name: str) -> _Expr:
+        if name == 'length' and self.peek() != '(':
+            def length_record(rt):
+                _require_ascii(rt.record, "length")
+                return float(len(rt.record))
+            return _Expr(length_record, _NUM)
+
+        self.expect('(')
+        args: List[_Expr] = []
+        if self.peek() != ')':
+            args = self.expr_list()
+        self.expect(')')
+
+        def arity(low: int, high: int) -> None:
+            if not low <= len(args) <= high:
+                raise _unsupported(f"{name}() argument count")
+
+        if name == 'length':
+            arity(0, 1)
+            text = _str_fn(args[0]) if args else (lambda rt: rt.record)
+
+            def length(rt):
+                value = text(rt)
+                _require_ascii(value, "length")
+                return float(len(value))
+            return _Expr(length, _NUM)
+
+        if name == 'substr':
+            arity(2, 3)
+            text, start = _str_fn(args[0]), _num_fn(args[1])
+            count = _num_fn(args[2]) if len(args) == 3 else None
+
+            def substr(rt):
+                value = text(rt)
+                _require_ascii(value, "substr")
+                m = start(rt)
+                n = count(rt) if count else None
+                if not m.is_integer() or m < 1 or (n is not None and (not n.is_integer() or n < 0)):
+                    raise _unsupported("substr with non-integral or out-of-range arguments")
+                begin = int(m) - 1
+                return value[begin:] if n is None else value[begin:begin + int(n)]
+            return _Expr(substr, _STR)
+
+        if name == 'index':
+            arity(2, 2)
+            haystack, needle = _str_fn(args[0]), _str_fn(args[1])
+
+            def index(rt):
+                h, n = haystack(rt), needle(rt)
+                _require_ascii(h, "index")
+                _require_ascii(n, "index")
+                if not n:
+                    raise _unsupported("index() with an empty target")
+                return float(h.find(n) + 1)
+            return _Expr(index, _NUM)
+
+        if name in ('tolower', 'toupper'):
+            arity(1, 1)
+            text = _str_fn(args[0])
+            convert = str.lower if name == 'tolower' else str.upper
+
+            def change_case(rt):
+                value = text(rt)
+                _require_ascii(value, name)
+                return convert(value)
+            return _Expr(change_case, _STR)
+
+        if name == 'int':
+            arity(1, 1)
+            number = _num_fn(args[0])
+            return _Expr(lambda rt: float(math.trunc(number(rt))), _NUM)
+
+        if name in ('sqrt', 'exp', 'log'):
+            arity(1, 1)
+            number = _num_fn(args[0])
+            func = getattr(math, name)
+
+            def maths(rt):
+                try:
+                    return func(number(rt))
+                except (ValueError, OverflowError):
+                    raise _unsupported(f"{name}() domain error")
+            return _Expr(maths, _NUM)
+
+        # sprintf
+        if not args:
+            raise _unsupported("sprintf() without format")
+        fmt = _str_fn(args[0])
+        values = [_any_fn(a) for a in args[1:]]
+        return _Expr(lambda rt: _format(fmt(rt), [v(rt) for v in values]), _STR)
+
+
+class AwkProgram:
+    """A compiled awk program that runs in-process.
+
+    Instances are immutable and safe to share between threads; each run
+    uses its own runtime state.
+    """
+
+    __slots__ = ('program', 'field_separator', '_begin', '_main', '_end', '_var_count', '_fs')
+
+    def __init__(self, program: str, field_separator: Optional[str] = None) -> None:
+        """Compile an awk program.
+
+        Args:
+            program: AWK program text
+            field_separator: Value of awk's -F option, if any
+
+        Raises:
+            UnsupportedAwkError: If the program is outside the supported subset
+        """
+        self.program = program
+        self.field_separator = field_separator
+
+        # Work on the Latin-1 view of the UTF-8 text so literals line up with input bytes
+        source = program.encode('utf-8', 'surrogateescape').decode('latin-1')
+        try:
+            compiler = _Compiler(source)
+            self._begin, self._main, self._end = compiler.program()
+        except RecursionError:
+            raise _unsupported("program nesting too deep")
+        self._var_count = len(compiler.var_slots)
+        self._fs = self._resolve_field_separator(field_separator)
+
+    @staticmethod
+    def _resolve_field_separator(option: Optional[str]) -> str:
+        """Resolve the -F option to an FS value, processing escapes like awk."""
+        if not option:
+            return ' '
+        if option == 't':
+            raise _unsupported("-Ft means tab in some awks")
+        text = option.encode('utf-8', 'surrogateescape').decode('latin-1')
+        value, _ = _read_string(text.replace('"', '\\"') + '"', 0)
+        _make_splitter(value)
+        return value
+
+    def run(self, data: bytes, max_output: Optional[int] = None) -> bytes:
+        """Run the program over input data.
+
+        Args:
+            data: Input file content
+            max_output: Output size at which to give up (None for no limit)
+
+        Returns:
+            Program output as bytes
+
+        Raises:
+            UnsupportedAwkError: If the run needs the awk binary
+        """
+        rt = _Runtime(self._var_count, self._fs, max_output)
+        code = None
+        try:
+            exited = False
+            try:
+                for action in self._begin:
+                    action(rt)
+            except _Exit as e:
+                exited, code = True, e.code
+
+            if not exited and (self._main or self._end):
+                try:
+                    self._run_main(rt, data)
+                except _Exit as e:
+                    code = e.code
+
+            # END actions run after 'exit' in BEGIN or main rules too
+            try:
+                for action in self._end:
+                    action(rt)
+            except _Exit as e:
+                if e.code is not None:
+                    code = e.code
+        except RecursionError:
+            raise _unsupported("expression nesting too deep")
+
+        if code:
+            raise _unsupported(f"program exits with status {code}")
+        return ''.join(rt.out).encode('latin-1')
+
+    def _run_main(self, rt: _Runtime, data: bytes) -> None:
+        """Run the main rules once per input record."""
+        text = data.decode('latin-1')
+        records = text.split('\n')
+        if text.endswith('\n') or not text:
+            records.pop()
+
+        main = self._main
+        for record in records:
+            rt.nr += 1
+            rt.record = record
+            rt.fields = None
+            try:
+                for pattern, action in main:
+                    if pattern is None or pattern(rt):
+                        action(rt)
+            except _Next:
+                pass
+
+    def run_file(self, path: Union[str, Path], max_output: Optional[int] = None) -> bytes:
+        """Run the program over a file's content.
+
+        Args:
+            path: Input file
+            max_output: Output size at which to give up (None for no limit)
+
+        Returns:
+            Program output as bytes
+
+        Raises:
+            UnsupportedAwkError: If the run needs the awk binary
+            OSError: If the file cannot be read
+        """
+        return self.run(Path(path).read_bytes(), max_output)
+
+
+def special_patterns(program: str) -> Optional[FrozenSet[str]]:
+    """Report which of the BEGIN and END patterns a program uses.
+
+    Unlike a text search, this skips the words in strings and regex
+    literals ('/^END$/').
+
+    Args:
+        program: AWK program text
+
+    Returns:
+        Subset of {'BEGIN', 'END'}, or None if the program cannot be tokenized
+    """
+    try:
+        tokens = _tokenize(program)
+    except UnsupportedAwkError:
+        return None
+    return frozenset(kind for kind, _ in tokens if kind in ('BEGIN', 'END'))
+
+
+@functools.lru_cache(maxsize=128)
+def compile_program(program: str, field_separator: Optional[str] = None) -> Optional[AwkProgram]:
+    """Compile an awk program for in-process execution, with LRU caching.
+
+    Args:
+        program: AWK program text
+        field_separator: Value of awk's -F option, if any
+
+    Returns:
+        Compiled AwkProgram, or None if the program needs the awk binary
+    """
+    try:
+        return AwkProgram(program, field_separator)
+    except UnsupportedAwkError:
+        return None
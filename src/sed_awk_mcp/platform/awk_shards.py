@@ -0,0 +1,309 @@
+"""Sharded awk runs: line-aligned input ranges and combiners for their outputs.
+
+awk_transform's parallel mode splits its inputs, taken as one stream, into
+byte ranges that end at line boundaries, runs one awk process per range
+with the range piped to its standard input, and merges the outputs with a
+declared combiner:
+
+- concat: outputs in input order, for map-only programs (BEGIN and END
+  output appears once per shard)
+- count: number of output lines, for filter and map programs without
+  BEGIN or END (their output would add lines per shard)
+- sum, min, max: numeric fields combined position by position, for
+  END-only aggregations such as 'END {print "total", s}'
+- sum_by_key: 'key value' lines summed per key, for grouped aggregations
+  such as '{s[$1] += $2} END {for (k in s) print k, s[k]}'
+"""
+
+import errno
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .fileops import copy_range
+
+# Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
+
+logger = logging.getLogger(__name__)
+
+COMBINERS = ('concat', 'count', 'sum', 'min', 'max', 'sum_by_key')
+
+# Bytes read at a time while looking for the end of a line at a shard boundary
+SCAN_BYTES = 64 * 1024
+
+# Numbers as awk prints them; integers are combined exactly
+_INTEGER = re.compile(rb'[-+]?\d+')
+_NUMBER = re.compile(rb'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+
+# 'key value' line: the value is the last field, the key everything before it
+_KEYED = re.compile(rb'(.*?)([ \t]+)([^ \t]+)[ \t]*')
+
+# Largest magnitude printed as an integer, as awk does for integral values
+_MAX_INTEGRAL = 1e16
+
+
+class CombineError(Exception):
+    """Raised when shard outputs do not have the shape the combiner needs.
+    
+    Attributes:
+        message: Human-readable reason
+    """
+    
+    def __init__(self, message: str) -> None:
+        """Initialize CombineError.
+        
+        Args:
+            message: Human-readable reason
+        """
+        super().__init__(message)
+        self.message = message
+
+
+class Shard:
+    """One byte range of the input stream, fed to one awk process.
+    
+    Attributes:
+        segments: (input index, start, end, newline) tuples in stream
+            order; newline is set when a line break must follow the segment
+            because its input ends without one and another input follows
+    """
+    
+    __slots__ = ('segments',)
+    
+    def __init__(self, segments: List[Tuple[int, int, int, bool]]) -> None:
+        self.segments = segments
+    
+    @property
+    def size(self) -> int:
+        """Bytes of input in the shard."""
+        return sum(end - start for _, start, end, _ in self.segments)
+    
+    def __repr__(self) -> str:
+        return f"Shard(segments={self.segments})"
+
+
+def _next_line_start(fd: int, offset: int, size: int) -> int:
+    """Offset of the first line start at or after offset.
+    
+    Args:
+        fd: Open file descriptor of the input
+        offset: Offset in the file, above zero
+        size: Size of the file in bytes
+    
+    Returns:
+        Offset just past the newline ending the line that holds byte
+        offset - 1, or size if that line is the last
+    """
+    position = offset - 1
+    while position < size:
+        block = os.pread(fd, min(SCAN_BYTES, size - position), position)
+        if not block:
+            break
+        newline = block.find(b'\n')
+        if newline >= 0:
+            return position + newline + 1
+        position += len(block)
+    return size
+
+
+def plan_shards(paths: Sequence[Path], sizes: Sequence[int], count: int) -> List[Shard]:
+    """Split inputs, taken as one stream, into at most count line-aligned shards.
+    
+    Cut points are spread evenly over the stream and moved forward to the
+    next line start, so no line is split between shards; shards that would
+    be empty are dropped.
+    
+    Args:
+        paths: Input files in stream order
+        sizes: Size of each input in bytes
+        count: Number of shards wanted
+    
+    Returns:
+        Shards in stream order; a single empty shard for empty input
+    """
+    total = sum(sizes)
+    starts = [0]
+    for size in sizes:
+        starts.append(starts[-1] + size)
+    
+    # Inputs other than the last that do not end with a newline
+    unterminated = set()
+    cuts = {0, total}
+    for index, (path, size) in enumerate(zip(paths, sizes)):
+        if size == 0:
+            continue
+        with open(path, 'rb') as f:
+            if index < len(paths) - 1 and os.pread(f.fileno(), 1, size - 1) != b'\n':
+                unterminated.add(index)
+            # Cut points that fall inside this input
+            for k in range(1, count):
+                target = total * k // count
+                if starts[index] < target < starts[index + 1]:
+                    local = _next_line_start(f.fileno(), target - starts[index], size)
+                    cuts.add(starts[index] + local)
+    
+    bounds = sorted(cuts)
+    shards = []
+    for low, high in zip(bounds, bounds[1:]):
+        segments = []
+        for index, size in enumerate(sizes):
+            start = max(low, starts[index]) - starts[index]
+            end = min(high, starts[index + 1]) - starts[index]
+            if start < end:
+                segments.append((index, start, end, end == size and index in unterminated))
+        shards.append(Shard(segments))
+    return shards or [Shard([])]
+
+
+def feed_shard(paths: Sequence[Path], shard: Shard, write_fd: int) -> None:
+    """Write a shard's bytes to a pipe, then close it.
+    
+    A reader that stops early (awk's exit statement) ends the copy without
+    an error. The call returns only once the reader has taken the whole
+    shard, so each feeder needs a thread of its own.
+    
+    Args:
+        paths: Input files the shard's segments refer to
+        shard: Shard to write
+        write_fd: Write end of the pipe; closed on return
+    
+    Raises:
+        OSError: If an input cannot be read or ends before its segment
+    """
+    try:
+        for index, start, end, newline in shard.segments:
+            with open(paths[index], 'rb') as f:
+                copy_range(f.fileno(), write_fd, start, end - start)
+            if newline:
+                os.write(write_fd, b'\n')
+    except OSError as e:
+        if e.errno != errno.EPIPE:
+            raise
+        logger.debug("awk shard reader closed its input early")
+    finally:
+        os.close(write_fd)
+
+
+def _parse_number(field: bytes) -> Optional[float]:
+    """Value of a numeric field, or None; integers stay int for exact sums."""
+    if _INTEGER.fullmatch(field):
+        return int(field)
+    if _NUMBER.fullmatch(field):
+        return float(field)
+    return None
+
+
+def _format_number(value: float) -> bytes:
+    """Render a combined value the way awk prints numbers (OFMT %.6g)."""
+    if isinstance(value, int):
+        return b'%d' % value
+    if value.is_integer() and abs(value) < _MAX_INTEGRAL:
+        return b'%d' % int(value)
+    return b'%.6g' % value
+
+
+def _combine_fields(outputs: List[bytes], reduce: Callable[[list], float]) -> bytes:
+    """Combine aligned shard outputs field by field.
+    
+    Shards that printed nothing are left out. In the others, numeric
+    fields at the same line and position are reduced; other fields must
+    be the same in every shard. A blank line in one shard (an unset
+    variable printed by a shard without matching records) yields to the
+    corresponding line of the others, and so does a line that holds only
+    the leading labels of the others ('total ' beside 'total 4950'): the
+    missing numbers are left out of the reduction.
+    """
+    tables = [output.splitlines() for output in outputs if output]
+    if not tables:
+        return b''
+    if len({len(lines) for lines in tables}) > 1:
+        raise CombineError(
+            "Shard outputs have different numbers of lines: "
+            + ", ".join(str(len(lines)) for lines in tables)
+        )
+    
+    combined = []
+    for number, rows in enumerate(zip(*tables), 1):
+        rows = [row.split() for row in rows]
+        rows = [row for row in rows if row]
+        if not rows:
+            combined.append(b'')
+            continue
+        widest = max(rows, key=len)
+        for row in rows:
+            if len(row) < len(widest) and (
+                row != widest[:len(row)] or any(_parse_number(f) is not None for f in row)
+            ):
+                raise CombineError(
+                    f"Line {number} has different numbers of fields across shards"
+                )
+        
+        fields = []
+        for position in range(1, len(widest) + 1):
+            values = [row[position - 1] for row in rows if len(row) >= position]
+            numbers = [_parse_number(value) for value in values]
+            if all(n is not None for n in numbers):
+                fields.append(_format_number(reduce(numbers)))
+            elif len(set(values)) == 1:
+                fields.append(values[0])
+            else:
+                raise CombineError(
+                    f"Field {position} of line {number} is neither numeric nor the same "
+                    f"in every shard"
+                )
+        combined.append(b' '.join(fields))
+    return b'\n'.join(combined) + b'\n'
+
+
+def _sum_by_key(outputs: List[bytes]) -> bytes:
+    """Sum 'key value' lines per key, keys in order of first appearance."""
+    totals: Dict[bytes, float] = {}
+    separators: Dict[bytes, bytes] = {}
+    for output in outputs:
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            match = _KEYED.fullmatch(line)
+            value = _parse_number(match.group(3)) if match else None
+            if value is None:
+                raise CombineError(
+                    f"sum_by_key needs 'key value' lines with a numeric value; got {line[:80]!r}"
+                )
+            key = match.group(1)
+            totals[key] = totals.get(key, 0) + value
+            separators.setdefault(key, match.group(2))
+    return b''.join(
+        key + separators[key] + _format_number(total) + b'\n' for key, total in totals.items()
+    )
+
+
+def combine(combiner: str, outputs: List[bytes]) -> bytes:
+    """Merge the outputs of the shards of one run.
+    
+    Args:
+        combiner: One of COMBINERS
+        outputs: Output of each shard, in stream order
+    
+    Returns:
+        Combined output
+    
+    Raises:
+        ValueError: If the combiner is unknown
+        CombineError: If the outputs do not have the shape the combiner needs
+    """
+    if combiner == 'concat':
+        return b''.join(outputs)
+    if combiner == 'count':
+        lines = sum(o.count(b'\n') + (1 if o and not o.endswith(b'\n') else 0) for o in outputs)
+        return b'%d\n' % lines
+    if combiner == 'sum':
+        return _combine_fields(outputs, sum)
+    if combiner == 'min':
+        return _combine_fields(outputs, min)
+    if combiner == 'max':
+        return _combine_fields(outputs, max)
+    if combiner == 'sum_by_key':
+        return _sum_by_key(outputs)
+    raise ValueError(f"Unknown combiner {combiner!r}; use one of {', '.join(COMBINERS)}")
@@ -0,0 +1,508 @@
+"""Content-addressed, deduplicated store for the backups taken before edits.
+
+Instead of a .bak copy beside every edited file, the editing tools store the
+file's content once under its BLAKE2b digest, compressed with zlib, in a
+private directory. A catalog records each backup (file path, digest, mode,
+time); backups of identical content share one object, which is deleted when
+its last backup is. Garbage collection drops backups older than max_age and,
+oldest first, backups beyond max_bytes of stored objects.
+
+A file whose identity (device, inode, size, mtime) is unchanged since its
+last backup is not read again: the new backup refers to the same object.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+
+from .config import read_env, state_directory
+from .fileops import sibling_temp
+from .preview_store import FileIdentity
+
+# Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
+
+logger = logging.getLogger(__name__)
+
+# Bytes read, hashed and compressed at a time
+CHUNK_BYTES = 1024 * 1024
+
+# Size of the BLAKE2b digests that name the objects
+DIGEST_BYTES = 20
+
+CATALOG_NAME = 'catalog.json'
+OBJECT_SUFFIX = '.z'
+
+
+class BackupRecord:
+    """One backup of one file.
+    
+    Attributes:
+        id: Backup identifier
+        path: Canonical path of the backed-up file
+        digest: Hex BLAKE2b digest of the content, naming its object
+        size: Size of the content in bytes
+        mode: Permission bits of the file
+        created: time.time() at which the backup was taken
+        identity: Identity of the file when it was backed up
+    """
+    
+    __slots__ = ('id', 'path', 'digest', 'size', 'mode', 'created', 'identity')
+    
+    def __init__(
+        self,
+        backup_id: str,
+        path: str,
+        digest: str,
+        size: int,
+        mode: int,
+        created: float,
+        identity: FileIdentity
+    ) -> None:
+        self.id = backup_id
+        self.path = path
+        self.digest = digest
+        self.size = size
+        self.mode = mode
+        self.created = created
+        self.identity = identity
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "path": self.path,
+            "digest": self.digest,
+            "size": self.size,
+            "mode": self.mode,
+            "created": self.created,
+            "identity": list(self.identity),
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "BackupRecord":
+        return cls(
+            data["id"], data["path"], data["digest"], int(data["size"]), int(data["mode"]),
+            float(data["created"]), tuple(data["identity"])
+        )
+
+
+class BackupStore:
+    """Thread-safe, bounded, content-addressed store of file backups.
+    
+    The catalog is loaded on first use, when objects no backup refers to
+    (left by an interrupted backup) are deleted. An unreadable catalog is
+    moved with the objects into an unreadable-<time> subdirectory instead,
+    so no backup is lost to garbage collection.
+    
+    Attributes:
+        directory: Store directory
+        max_bytes: Total size of stored (compressed) objects kept by
+            garbage collection
+        max_age: Seconds after which a backup is deleted
+        level: zlib compression level (0-9)
+        racy_window: Seconds after a modification within which a file's
+            identity does not prove it unchanged
+    """
+    
+    DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+    DEFAULT_MAX_AGE = 7 * 24 * 3600.0
+    DEFAULT_LEVEL = 1
+    DEFAULT_RACY_WINDOW = 1.0
+    
+    # Environment variables read by from_env()
+    ENV_DIRECTORY = "SED_AWK_BACKUP_DIR"
+    ENV_MAX_BYTES = "SED_AWK_BACKUP_MAX_BYTES"
+    ENV_MAX_AGE = "SED_AWK_BACKUP_MAX_AGE"
+    ENV_LEVEL = "SED_AWK_BACKUP_COMPRESSION"
+    
+    def __init__(
+        self,
+        directory: Optional[Union[str, Path]] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age: float = DEFAULT_MAX_AGE,
+        level: int = DEFAULT_LEVEL,
+        racy_window: float = DEFAULT_RACY_WINDOW
+    ) -> None:
+        """Initialize BackupStore.
+        
+        Args:
+            directory: Store directory, created on first use (default:
+                $XDG_STATE_HOME/sed-awk-mcp/backups)
+            max_bytes: Stored bytes kept by garbage collection (default: 1GB)
+            max_age: Seconds a backup is kept (default: 7 days)
+            level: zlib compression level, 0-9 (default: 1)
+            racy_window: Seconds after a modification during which a file is
+                read again even if its identity is unchanged (default: 1.0)
+        
+        Raises:
+            ValueError: If a limit is out of range
+        """
+        if max_bytes < 0 or max_age <= 0 or racy_window < 0:
+            raise ValueError("Backup store limits must be >= 0 (max_age > 0)")
+        if not 0 <= level <= 9:
+            raise ValueError(f"Compression level must be 0-9, got {level}")
+        
+        self.directory = Path(directory) if directory is not None else state_directory('backups')
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.level = level
+        self.racy_window = racy_window
+        
+        self.deduplicated = 0
+        self.collected = 0
+        
+        self._records: Dict[str, BackupRecord] = {}
+        self._refcounts: Dict[str, int] = {}
+        self._object_sizes: Dict[str, int] = {}
+        self._loaded = False
+        self._lock = threading.RLock()
+        
+        logger.debug(
+            "BackupStore initialized: directory=%s max_bytes=%d max_age=%.0fs level=%d",
+            self.directory, max_bytes, max_age, level
+        )
+    
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None) -> "BackupStore":
+        """Create a store from environment variables.
+        
+        Reads SED_AWK_BACKUP_DIR, SED_AWK_BACKUP_MAX_BYTES,
+        SED_AWK_BACKUP_MAX_AGE and SED_AWK_BACKUP_COMPRESSION. Unset variables
+        keep their defaults.
+        
+        Args:
+            environ: Environment mapping (default: os.environ)
+        
+        Returns:
+            Configured BackupStore
+        
+        Raises:
+            ValueError: If a variable is not a valid value
+        """
+        environ = os.environ if environ is None else environ
+        
+        return cls(
+            directory=read_env(environ, cls.ENV_DIRECTORY, None, Path),
+            max_bytes=read_env(environ, cls.ENV_MAX_BYTES, cls.DEFAULT_MAX_BYTES, int),
+            max_age=read_env(environ, cls.ENV_MAX_AGE, cls.DEFAULT_MAX_AGE, float),
+            level=read_env(environ, cls.ENV_LEVEL, cls.DEFAULT_LEVEL, int)
+        )
+    
+    @property
+    def objects_dir(self) -> Path:
+        return self.directory / 'objects'
+    
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._records)
+    
+    def stats(self) -> Dict[str, int]:
+        """Return occupancy and counters."""
+        with self._lock:
+            self._ensure_loaded()
+            return {
+                "backups": len(self._records),
+                "objects": len(self._object_sizes),
+                "bytes": sum(self._object_sizes.values()),
+                "deduplicated": self.deduplicated,
+                "collected": self.collected,
+            }
+    
+    def backup(self, path: Union[str, os.PathLike]) -> Tuple[BackupRecord, bool]:
+        """Back up a file's current content (blocking).
+        
+        Args:
+            path: Canonical path of the file
+        
+        Returns:
+            Tuple of (new backup record, whether its content was already
+            stored)
+        
+        Raises:
+            OSError: If the file cannot be read or the object not written
+        """
+        path = os.fspath(path)
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            identity = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+            digest = self._known_digest(path, identity)
+            if digest is None:
+                digest, tmp, stored_size = self._write_object(f)
+            else:
+                tmp, stored_size = None, 0
+        
+        with self._lock:
+            self._ensure_loaded()
+            deduplicated = digest in self._refcounts
+            if tmp is not None:
+                if deduplicated or digest in self._object_sizes:
+                    tmp.unlink(missing_ok=True)
+                else:
+                    target = self._object_path(digest)
+                    target.parent.mkdir(exist_ok=True)
+                    os.replace(tmp, target)
+                    self._object_sizes[digest] = stored_size
+            elif not deduplicated:
+                # The object of the last backup was collected meanwhile
+                return self.backup(path)
+            if deduplicated:
+                self.deduplicated += 1
+            
+            record = BackupRecord(
+                self._new_id(), path, digest, identity[2], st.st_mode & 0o7777,
+                time.time(), identity
+            )
+            self._records[record.id] = record
+            self._refcounts[digest] = self._refcounts.get(digest, 0) + 1
+            self._collect(keep=record.id)
+            self._save()
+        
+        logger.debug(
+            "BackupStore: backed up %s as %s (%s)",
+            path, record.id, "deduplicated" if deduplicated else f"{stored_size} bytes stored"
+        )
+        return record, deduplicated
+    
+    def find(self, backup_id: str) -> Optional[BackupRecord]:
+        """Return the backup with the given id, or None."""
+        with self._lock:
+            self._ensure_loaded()
+            return self._records.get(backup_id)
+    
+    def list(self, path: Optional[Union[str, os.PathLike]] = None) -> List[BackupRecord]:
+        """Return the backups of one file, or of all files, newest first."""
+        with self._lock:
+            self._ensure_loaded()
+            records = list(self._records.values())
+        if path is not None:
+            path = os.fspath(path)
+            records = [r for r in records if r.path == path]
+        return sorted(records, key=lambda r: r.created, reverse=True)
+    
+    def latest(self, path: Union[str, os.PathLike]) -> Optional[BackupRecord]:
+        """Return the newest backup of a file, or None."""
+        records = self.list(path)
+        return records[0] if records else None
+    
+    def restore(self, record: BackupRecord, target: Optional[Union[str, os.PathLike]] = None) -> None:
+        """Write a backup's content over its file, atomically (blocking).
+        
+        The content is checked against its digest before the file is
+        replaced; the file gets the backed-up permission bits.
+        
+        Args:
+            record: Backup to restore
+            target: File to write (default: the backed-up file)
+        
+        Raises:
+            OSError: If the object is missing or corrupt, or the file
+                cannot be written
+        """
+        target = Path(target if target is not None else record.path)
+        fd, staged = sibling_temp(target)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                digest = hashlib.blake2b(digest_size=DIGEST_BYTES)
+                for chunk in self._read_object(record.digest):
+                    digest.update(chunk)
+                    out.write(chunk)
+            if digest.hexdigest() != record.digest:
+                raise OSError(f"Backup {record.id} is corrupt (digest mismatch)")
+            os.chmod(staged, record.mode)
+            os.replace(staged, target)
+        except BaseException:
+            staged.unlink(missing_ok=True)
+            raise
+        logger.debug("BackupStore: restored %s from %s", target, record.id)
+    
+    def read(self, record: BackupRecord) -> bytes:
+        """Return a backup's content (blocking)."""
+        return b''.join(self._read_object(record.digest))
+    
+    def remove(self, backup_id: str) -> bool:
+        """Delete a backup; its object goes with its last backup."""
+        with self._lock:
+            self._ensure_loaded()
+            if backup_id not in self._records:
+                return False
+            self._drop(backup_id)
+            self._save()
+            return True
+    
+    def collect(self) -> int:
+        """Apply the age and size limits now (blocking).
+        
+        Returns:
+            Number of backups deleted
+        """
+        with self._lock:
+            self._ensure_loaded()
+            removed = self._collect()
+            if removed:
+                self._save()
+            return removed
+    
+    def _known_digest(self, path: str, identity: FileIdentity) -> Optional[str]:
+        """Digest of the last backup of an unchanged file, if still trusted."""
+        with self._lock:
+            self._ensure_loaded()
+            for record in self._records.values():
+                if (
+                    record.path == path
+                    and record.identity == identity
+                    and record.created - identity[3] / 1e9 >= self.racy_window
+                    and record.digest in self._object_sizes
+                ):
+                    return record.digest
+        return None
+    
+    def _write_object(self, f) -> Tuple[str, Path, int]:
+        """Hash and compress a file into a temporary object in one pass."""
+        self.objects_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        digest = hashlib.blake2b(digest_size=DIGEST_BYTES)
+        compressor = zlib.compressobj(self.level)
+        tmp = self.objects_dir / f".{secrets.token_hex(8)}.tmp"
+        try:
+            with open(tmp, 'wb') as out:
+                for chunk in iter(lambda: f.read(CHUNK_BYTES), b''):
+                    digest.update(chunk)
+                    out.write(compressor.compress(chunk))
+                out.write(compressor.flush())
+                stored_size = out.tell()
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        return digest.hexdigest(), tmp, stored_size
+    
+    def _read_object(self, digest: str):
+        """Yield the decompressed content of an object in chunks."""
+        decompressor = zlib.decompressobj()
+        try:
+            with open(self._object_path(digest), 'rb') as f:
+                for chunk in iter(lambda: f.read(CHUNK_BYTES), b''):
+                    data = decompressor.decompress(chunk)
+                    if data:
+                        yield data
+            tail = decompressor.flush()
+        except zlib.error as e:
+            raise OSError(f"Backup object {digest} is corrupt: {e}") from None
+        if tail:
+            yield tail
+    
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / f"{digest[2:]}{OBJECT_SUFFIX}"
+    
+    def _new_id(self) -> str:
+        while True:
+            backup_id = secrets.token_hex(4)
+            if backup_id not in self._records:
+                return backup_id
+    
+    def _drop(self, backup_id: str) -> None:
+        """Delete a backup and an object no other backup uses (lock held)."""
+        record = self._records.pop(backup_id)
+        remaining = self._refcounts[record.digest] - 1
+        if remaining:
+            self._refcounts[record.digest] = remaining
+            return
+        del self._refcounts[record.digest]
+        self._object_sizes.pop(record.digest, None)
+        try:
+            self._object_path(record.digest).unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning("BackupStore: cannot delete object %s: %s", record.digest, e)
+    
+    def _collect(self, keep: Optional[str] = None) -> int:
+        """Drop expired backups, then the oldest beyond max_bytes (lock held)."""
+        cutoff = time.time() - self.max_age
+        by_age = sorted(self._records.values(), key=lambda r: r.created)
+        removed = 0
+        for record in by_age:
+            if record.id != keep and record.created < cutoff:
+                self._drop(record.id)
+                removed += 1
+        total = sum(self._object_sizes.values())
+        for record in by_age:
+            if total <= self.max_bytes:
+                break
+            if record.id == keep or record.id not in self._records:
+                continue
+            self._drop(record.id)
+            removed += 1
+            total = sum(self._object_sizes.values())
+        if removed:
+            self.collected += removed
+            logger.info("BackupStore: garbage collection deleted %d backups", removed)
+        return removed
+    
+    def _ensure_loaded(self) -> None:
+        """Load the catalog and delete unreferenced objects (lock held).
+        
+        An unreadable catalog is set aside together with the objects, which
+        are then no longer known to be unreferenced, and the store starts
+        empty.
+        
+        Raises:
+            OSError: If an unreadable catalog cannot be set aside
+        """
+        if self._loaded:
+            return
+        catalog = self.directory / CATALOG_NAME
+        try:
+            entries = json.loads(catalog.read_text(encoding='utf-8'))
+            records = [BackupRecord.from_dict(entry) for entry in entries]
+        except FileNotFoundError:
+            records = []
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error("BackupStore: cannot read catalog %s: %s", catalog, e)
+            self._set_aside()
+            records = []
+        self._loaded = True
+        
+        if self.objects_dir.is_dir():
+            for obj in self.objects_dir.glob('*/*'):
+                digest = obj.parent.name + obj.name[:-len(OBJECT_SUFFIX)]
+                if obj.name.endswith(OBJECT_SUFFIX):
+                    self._object_sizes[digest] = obj.stat().st_size
+            for tmp in self.objects_dir.glob('.*.tmp'):
+                tmp.unlink(missing_ok=True)
+        
+        for record in records:
+            if record.digest not in self._object_sizes:
+                logger.warning("BackupStore: object of backup %s is missing", record.id)
+                continue
+            self._records[record.id] = record
+            self._refcounts[record.digest] = self._refcounts.get(record.digest, 0) + 1
+        for digest in [d for d in self._object_sizes if d not in self._refcounts]:
+            del self._object_sizes[digest]
+            self._object_path(digest).unlink(missing_ok=True)
+    
+    def _set_aside(self) -> None:
+        """Move an unreadable catalog and its objects out of the way (lock held)."""
+        stamp = time.strftime('%Y%m%dT%H%M%S')
+        aside = self.directory / f"unreadable-{stamp}-{secrets.token_hex(2)}"
+        aside.mkdir(mode=0o700)
+        os.replace(self.directory / CATALOG_NAME, aside / CATALOG_NAME)
+        if self.objects_dir.is_dir():
+            os.replace(self.objects_dir, aside / self.objects_dir.name)
+        logger.error(
+            "BackupStore: catalog and objects moved to %s; backups start afresh", aside
+        )
+    
+    def _save(self) -> None:
+        """Replace the catalog file atomically and durably (lock held)."""
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        catalog = self.directory / CATALOG_NAME
+        tmp = catalog.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump([record.to_dict() for record in self._records.values()], f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, catalog)
@@ -5,9 +5,11 @@ normalization for cross-platform execution of sed, awk, and diff commands.
 """
 
 import logging
+import os
 import shutil
 import subprocess
-from typing import List, Dict, Optional
+from pathlib import Path
+from typing import Any, Callable, List, Dict, Mapping, Optional
 
 # Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
 
@@ -39,6 +41,7 @@ class PlatformConfig:
     
     This class provides cross-platform support by:
     - Locating required binaries (sed, awk, diff) in PATH
+    - Locating optional helpers (prlimit) in PATH
     - Detecting GNU vs BSD variants of tools
     - Normalizing command arguments for platform differences
     - Caching binary paths for performance
@@ -60,9 +63,13 @@ class PlatformConfig:
         self.diff_path = self._locate_binary('diff')
         self.is_gnu_sed = self._detect_gnu_sed()
         
+        # Optional: util-linux prlimit, used as an exec shim for resource limits
+        self.prlimit_path = shutil.which('prlimit')
+        
         logger.debug(
-            "PlatformConfig initialized: sed=%s awk=%s diff=%s gnu_sed=%s",
-            self.sed_path, self.awk_path, self.diff_path, self.is_gnu_sed
+            "PlatformConfig initialized: sed=%s awk=%s diff=%s gnu_sed=%s prlimit=%s",
+            self.sed_path, self.awk_path, self.diff_path, self.is_gnu_sed,
+            self.prlimit_path
         )
     
     def normalize_sed_args(self, args: List[str]) -> List[str]:
@@ -210,4 +217,48 @@ class PlatformConfig:
                 str(e)
             )
             # Assume BSD if detection fails
-            return False
\ No newline at end of file
+            return False
+
+
+def state_directory(name: str) -> Path:
+    """Return a directory for server state ($XDG_STATE_HOME/sed-awk-mcp/<name>).
+    
+    Args:
+        name: Subdirectory name, such as 'backups'
+    
+    Returns:
+        Path of the directory; it is not created
+    """
+    state_home = os.environ.get('XDG_STATE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.local', 'state'
+    )
+    return Path(state_home) / 'sed-awk-mcp' / name
+
+
+def read_env(
+    environ: Mapping[str, str],
+    name: str,
+    default: Any,
+    convert: Callable[[str], Any]
+) -> Any:
+    """Read one setting from an environment mapping.
+    
+    Args:
+        environ: Environment mapping, such as os.environ
+        name: Variable name
+        default: Value for an unset or blank variable
+        convert: Conversion of the stripped value, such as int or Path
+    
+    Returns:
+        Converted value, or default
+    
+    Raises:
+        ValueError: If convert rejects the value
+    """
+    value = environ.get(name, '').strip()
+    if not value:
+        return default
+    try:
+        return convert(value)
+    except ValueError:
+        raise ValueError(f"Invalid value for {name}: {value!r}") from None
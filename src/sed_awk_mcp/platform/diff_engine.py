@@ -0,0 +1,897 @@
+"""In-process unified diff engine.
+
+This module produces ``diff -u`` output (including ``-U N`` and ``-w``)
+without spawning the diff binary. It follows the pipeline of GNU diff's
+analyze.c so that hunks come out byte for byte the same:
+
+1. Identical leading and trailing lines are set aside, keeping a context's
+   width of them for boundary shifting.
+2. Lines that match nothing in the other file are discarded up front
+   (``discard_confusing_lines``).
+3. The remaining lines are compared with Myers' O(ND) algorithm using the
+   linear-space divide-and-conquer refinement, including GNU diff's cut-off
+   for very expensive comparisons.
+4. Change boundaries are shifted to merge runs and line up with changes in
+   the other file (``shift_boundaries``) before hunks are printed.
+
+Inputs the engine does not reproduce exactly (binary data, non-ASCII file
+names) or would compare more slowly than the binary (large inputs, heavily
+edited files) raise UnsupportedDiffError so callers can fall back to the
+diff binary.
+
+For files too large to hold in memory, ``stream_line_diff`` compares two
+files line by line in a single pass. It covers edits that replace lines
+without adding or removing any, such as sed substitutions, and pairs lines
+by position instead of searching for the shortest edit script.
+"""
+
+import collections
+import functools
+import itertools
+import logging
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, Union
+
+# Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
+
+logger = logging.getLogger(__name__)
+
+# Bytes that isspace() accepts in the C locale, ignored by -w
+_WHITESPACE = b' \t\n\v\f\r'
+
+# Combined input size above which the diff binary is faster
+# (see benchmarks/bench_diff_engine.py)
+MAX_INPUT_SIZE = 32 * 1024  # 32KB
+
+# Diagonals the Myers search may explore before giving up (roughly 10ms)
+MAX_WORK = 50_000
+
+# Escapes used when quoting file names, as GNU diff's C-style quoting does
+_NAME_ESCAPES = {
+    '"': '\\"', '\\': '\\\\', '\a': '\\a', '\b': '\\b', '\f': '\\f',
+    '\n': '\\n', '\r': '\\r', '\t': '\\t', '\v': '\\v',
+}
+
+_NO_NEWLINE = b'\n\\ No newline at end of file\n'
+
+# Longest line stream_line_diff() reads; longer lines go to the diff binary
+MAX_STREAM_LINE = 1024 * 1024  # 1MB
+
+# Any nonzero entry of a discard vector
+_DISCARDABLE = re.compile(b'[^\\x00]')
+
+
+class UnsupportedDiffError(Exception):
+    """Raised when inputs are outside what the engine reproduces exactly.
+
+    Callers should fall back to the diff binary when they see this error.
+
+    Attributes:
+        message: Human-readable reason
+    """
+
+    def __init__(self, message: str) -> None:
+        """Initialize UnsupportedDiffError.
+
+        Args:
+            message: Human-readable reason
+        """
+        super().__init__(message)
+        self.message = message
+
+
+def _quote_name(name: str) -> str:
+    """Quote a file name the way diff prints it in headers."""
+    if not name.isascii():
+        # Quoting of non-ASCII names depends on diff's locale
+        raise UnsupportedDiffError("non-ASCII file name")
+    if all(c.isprintable() and c not in ' "\\' for c in name):
+        return name
+    quoted = []
+    for c in name:
+        if c in _NAME_ESCAPES:
+            quoted.append(_NAME_ESCAPES[c])
+        elif c.isprintable():
+            quoted.append(c)
+        else:
+            quoted.append('\\%03o' % ord(c))
+    return '"' + ''.join(quoted) + '"'
+
+
+def file_label(name: str, mtime_ns: int) -> bytes:
+    """Build a header label: file name, tab, modification time.
+
+    Args:
+        name: File name as it should appear in the header
+        mtime_ns: Modification time in nanoseconds since the epoch
+
+    Returns:
+        Label in diff's default ``%Y-%m-%d %H:%M:%S.%N %z`` format
+
+    Raises:
+        UnsupportedDiffError: If the name is not ASCII
+    """
+    seconds, nanoseconds = divmod(mtime_ns, 1_000_000_000)
+    tm = time.localtime(seconds)
+    stamp = (
+        time.strftime('%Y-%m-%d %H:%M:%S', tm)
+        + '.%09d ' % nanoseconds
+        + time.strftime('%z', tm)
+    )
+    return f"{_quote_name(name)}\t{stamp}".encode('ascii')
+
+
+def _split_lines(data: bytes) -> List[bytes]:
+    """Split content into lines, keeping each line's newline."""
+    lines = data.split(b'\n')
+    last = lines.pop()
+    lines = [line + b'\n' for line in lines]
+    if last:
+        lines.append(last)
+    return lines
+
+
+def _identical_ends(lines0: List[bytes], lines1: List[bytes], horizon: int) -> Tuple[int, int]:
+    """Find how many leading and trailing lines to leave out of the comparison.
+
+    Mirrors find_identical_ends() in GNU diff: the identical prefix and
+    suffix are trimmed, but ``horizon`` lines next to the differences stay
+    in the compared region so that boundary shifting can use them.
+
+    Returns:
+        Tuple of (prefix lines, suffix lines) excluded from both files
+    """
+    limit = min(len(lines0), len(lines1))
+    first = 0
+    while first < limit and lines0[first] == lines1[first]:
+        first += 1
+    prefix = max(first - horizon, 0)
+
+    # An incomplete last line in only one file disables suffix trimming
+    missing0 = bool(lines0) and not lines0[-1].endswith(b'\n')
+    missing1 = bool(lines1) and not lines1[-1].endswith(b'\n')
+    if missing0 != missing1:
+        return prefix, 0
+
+    matched = 0
+    room = limit - prefix
+    while matched < room and lines0[-1 - matched] == lines1[-1 - matched]:
+        matched += 1
+    return prefix, max(matched - horizon, 0)
+
+
+def _discard_confusing_lines(
+    equivs: List[List[int]],
+    changed: List[bytearray]
+) -> Tuple[List[List[int]], List[List[int]]]:
+    """Set aside lines that cannot be part of a match, as GNU diff does.
+
+    Lines with no equal in the other file are discarded and marked changed
+    directly. Lines with very many equals are discarded only inside runs of
+    discarded lines, where they would otherwise confuse the comparison.
+
+    Returns:
+        Tuple of (undiscarded equivalence classes, their original indexes),
+        each indexed by file
+    """
+    counts = [Counter(equivs[0]), Counter(equivs[1])]
+    discarded = []
+
+    for f in (0, 1):
+        other_counts = counts[1 - f]
+        many = 5
+        tem = (len(equivs[f]) // 64) >> 2
+        while tem > 0:
+            many *= 2
+            tem >>= 2
+        status = {}
+        for equiv in counts[f]:
+            nmatch = other_counts.get(equiv, 0)
+            status[equiv] = 1 if nmatch == 0 else 2 if nmatch > many else 0
+        discarded.append(bytearray(map(status.__getitem__, equivs[f])))
+
+    for discards in discarded:
+        end = len(discards)
+        match = _DISCARDABLE.search(discards)
+        i = match.start() if match else end
+        while i < end:
+            if discards[i] == 2:
+                discards[i] = 0
+            elif discards[i] != 0:
+                # Find the end of this run of discardable lines
+                provisional = 0
+                j = i
+                while j < end and discards[j] != 0:
+                    if discards[j] == 2:
+                        provisional += 1
+                    j += 1
+                while j > i and discards[j - 1] == 2:
+                    j -= 1
+                    discards[j] = 0
+                    provisional -= 1
+                length = j - i
+
+                if provisional * 4 > length:
+                    while j > i:
+                        j -= 1
+                        if discards[j] == 2:
+                            discards[j] = 0
+                else:
+                    minimum = 1
+                    tem = (length >> 2) >> 2
+                    while tem > 0:
+                        minimum <<= 1
+                        tem >>= 2
+                    minimum += 1
+
+                    # Cancel any subrun of MINIMUM or more provisionals
+                    j = 0
+                    consec = 0
+                    while j < length:
+                        if discards[i + j] != 2:
+                            consec = 0
+                        else:
+                            consec += 1
+                            if consec == minimum:
+                                j -= consec
+                            elif consec > minimum:
+                                discards[i + j] = 0
+                        j += 1
+
+                    # Cancel provisionals near the start of the run ...
+                    j = 0
+                    consec = 0
+                    while j < length:
+                        if j >= 8 and discards[i + j] == 1:
+                            break
+                        if discards[i + j] == 2:
+                            consec = 0
+                            discards[i + j] = 0
+                        elif discards[i + j] == 0:
+                            consec = 0
+                        else:
+                            consec += 1
+                        if consec == 3:
+                            break
+                        j += 1
+
+                    # ... and near its end
+                    i += length - 1
+                    j = 0
+                    consec = 0
+                    while j < length:
+                        if j >= 8 and discards[i - j] == 1:
+                            break
+                        if discards[i - j] == 2:
+                            consec = 0
+                            discards[i - j] = 0
+                        elif discards[i - j] == 0:
+                            consec = 0
+                        else:
+                            consec += 1
+                        if consec == 3:
+                            break
+                        j += 1
+            match = _DISCARDABLE.search(discards, i + 1)
+            i = match.start() if match else end
+
+    undiscarded: List[List[int]] = []
+    realindexes: List[List[int]] = []
+    for f in (0, 1):
+        flags = changed[f]
+        discards = discarded[f]
+        kept = [i for i, discard in enumerate(discards) if not discard]
+        for match in _DISCARDABLE.finditer(discards):
+            flags[match.start() + 1] = 1
+        undiscarded.append([equivs[f][i] for i in kept])
+        realindexes.append(kept)
+    return undiscarded, realindexes
+
+
+class _Comparison:
+    """Linear-space Myers comparison of two equivalence-class vectors."""
+
+    def __init__(self, xvec: List[int], yvec: List[int], max_work: int) -> None:
+        self.xvec = xvec
+        self.yvec = yvec
+        diags = len(xvec) + len(yvec) + 3
+        self.fdiag = [0] * diags
+        self.bdiag = [0] * diags
+        self.offset = len(yvec) + 1
+
+        # Approximate square root of the input size, bounded below by 4096
+        too_expensive = 1
+        while diags:
+            too_expensive <<= 1
+            diags >>= 2
+        self.too_expensive = max(4096, too_expensive)
+        self.work = max_work
+
+    def diag(self, xoff: int, xlim: int, yoff: int, ylim: int) -> Tuple[int, int]:
+        """Find the midpoint of the shortest edit script for a subproblem.
+
+        Returns:
+            Tuple of (x, y) at which to split the subproblem
+        """
+        xv = self.xvec
+        yv = self.yvec
+        fd = self.fdiag
+        bd = self.bdiag
+        off = self.offset
+        dmin = xoff - ylim
+        dmax = xlim - yoff
+        fmid = xoff - yoff
+        bmid = xlim - ylim
+        fmin = fmax = fmid
+        bmin = bmax = bmid
+        odd = (fmid - bmid) & 1
+        big = len(xv) + len(yv) + 1
+
+        fd[fmid + off] = xoff
+        bd[bmid + off] = xlim
+
+        c = 1
+        while True:
+            # Extend the top-down search by an edit step in each diagonal
+            if fmin > dmin:
+                fmin -= 1
+                fd[fmin - 1 + off] = -1
+            else:
+                fmin += 1
+            if fmax < dmax:
+                fmax += 1
+                fd[fmax + 1 + off] = -1
+            else:
+                fmax -= 1
+            for d in range(fmax, fmin - 1, -2):
+                tlo = fd[d - 1 + off]
+                thi = fd[d + 1 + off]
+                x = thi if tlo < thi else tlo + 1
+                y = x - d
+                while x < xlim and y < ylim and xv[x] == yv[y]:
+                    x += 1
+                    y += 1
+                fd[d + off] = x
+                if odd and bmin <= d <= bmax and bd[d + off] <= x:
+                    return x, y
+
+            # Similarly extend the bottom-up search
+            if bmin > dmin:
+                bmin -= 1
+                bd[bmin - 1 + off] = big
+            else:
+                bmin += 1
+            if bmax < dmax:
+                bmax += 1
+                bd[bmax + 1 + off] = big
+            else:
+                bmax -= 1
+            for d in range(bmax, bmin - 1, -2):
+                tlo = bd[d - 1 + off]
+                thi = bd[d + 1 + off]
+                x = tlo if tlo < thi else thi - 1
+                y = x - d
+                while xoff < x and yoff < y and xv[x - 1] == yv[y - 1]:
+                    x -= 1
+                    y -= 1
+                bd[d + off] = x
+                if not odd and fmin <= d <= fmax and x <= fd[d + off]:
+                    return x, y
+
+            self.work -= (fmax - fmin) + (bmax - bmin) + 2
+            if self.work < 0:
+                raise UnsupportedDiffError("comparison exceeds in-process work budget")
+
+            # Give up when the search has gone well beyond the call of duty
+            # and split halfway between the best results so far
+            if c >= self.too_expensive:
+                fxybest = -1
+                fxbest = 0
+                for d in range(fmax, fmin - 1, -2):
+                    x = min(fd[d + off], xlim)
+                    y = x - d
+                    if ylim < y:
+                        x = ylim + d
+                        y = ylim
+                    if fxybest < x + y:
+                        fxybest = x + y
+                        fxbest = x
+
+                bxybest = big * 2
+                bxbest = 0
+                for d in range(bmax, bmin - 1, -2):
+                    x = max(xoff, bd[d + off])
+                    y = x - d
+                    if y < yoff:
+                        x = yoff + d
+                        y = yoff
+                    if x + y < bxybest:
+                        bxybest = x + y
+                        bxbest = x
+
+                if (xlim + ylim) - bxybest < fxybest - (xoff + yoff):
+                    return fxbest, fxybest - fxbest
+                return bxbest, bxybest - bxbest
+            c += 1
+
+    def compare(self, changed0: bytearray, changed1: bytearray,
+                real0: List[int], real1: List[int]) -> None:
+        """Mark the lines that differ between the two vectors as changed."""
+        xv = self.xvec
+        yv = self.yvec
+        stack = [(0, len(xv), 0, len(yv))]
+        while stack:
+            xoff, xlim, yoff, ylim = stack.pop()
+
+            # Slide down the bottom initial diagonal and up the top one
+            while xoff < xlim and yoff < ylim and xv[xoff] == yv[yoff]:
+                xoff += 1
+                yoff += 1
+            while xoff < xlim and yoff < ylim and xv[xlim - 1] == yv[ylim - 1]:
+                xlim -= 1
+                ylim -= 1
+
+            if xoff == xlim:
+                for y in range(yoff, ylim):
+                    changed1[real1[y] + 1] = 1
+            elif yoff == ylim:
+                for x in range(xoff, xlim):
+                    changed0[real0[x] + 1] = 1
+            else:
+                xmid, ymid = self.diag(xoff, xlim, yoff, ylim)
+                stack.append((xmid, xlim, ymid, ylim))
+                stack.append((xoff, xmid, yoff, ymid))
+
+
+def _shift_boundaries(equivs: List[List[int]], changed: List[bytearray]) -> None:
+    """Slide runs of changes to merge them and align them across files.
+
+    Mirrors shift_boundaries() in GNU diff. ``changed`` vectors carry a zero
+    sentinel before the first and after the last line (index offset 1).
+    """
+    for f in (0, 1):
+        flags = changed[f]
+        other = changed[1 - f]
+        eq = equivs[f]
+        i = 0
+        j = 0
+        i_end = len(eq)
+
+        while True:
+            # Scan forwards to find the beginning of another run of changes,
+            # tracking the corresponding point in the other file
+            while i < i_end and not flags[i + 1]:
+                while other[j + 1]:
+                    j += 1
+                j += 1
+                i += 1
+            if i == i_end:
+                break
+
+            start = i
+            i += 1
+            while flags[i + 1]:
+                i += 1
+            while other[j + 1]:
+                j += 1
+
+            while True:
+                runlength = i - start
+
+                # Move the run back while the previous unchanged line
+                # matches its last line, merging with earlier runs
+                while start and eq[start - 1] == eq[i - 1]:
+                    start -= 1
+                    flags[start + 1] = 1
+                    i -= 1
+                    flags[i + 1] = 0
+                    while flags[start]:
+                        start -= 1
+                    j -= 1
+                    while other[j + 1]:
+                        j -= 1
+
+                # Last point where the run ends alongside a run in the other file
+                corresponding = i if other[j] else i_end
+
+                # Move the run forward while its first line matches the
+                # following unchanged line, merging with later runs
+                while i != i_end and eq[start] == eq[i]:
+                    flags[start + 1] = 0
+                    start += 1
+                    flags[i + 1] = 1
+                    i += 1
+                    while flags[i + 1]:
+                        i += 1
+                    j += 1
+                    while other[j + 1]:
+                        corresponding = i
+                        j += 1
+
+                if runlength == i - start:
+                    break
+
+            # Move the fully merged run back to a corresponding run, if any
+            while corresponding < i:
+                start -= 1
+                flags[start + 1] = 1
+                i -= 1
+                flags[i + 1] = 0
+                j -= 1
+                while other[j + 1]:
+                    j -= 1
+
+
+def _build_script(changed0: bytearray, changed1: bytearray,
+                  n0: int, n1: int) -> List[Tuple[int, int, int, int]]:
+    """Collect runs of changed lines as (line0, line1, deleted, inserted)."""
+    script = []
+    i0 = i1 = 0
+    while i0 < n0 or i1 < n1:
+        if changed0[i0 + 1] or changed1[i1 + 1]:
+            start0, start1 = i0, i1
+            while changed0[i0 + 1]:
+                i0 += 1
+            while changed1[i1 + 1]:
+                i1 += 1
+            script.append((start0, start1, i0 - start0, i1 - start1))
+        i0 += 1
+        i1 += 1
+    return script
+
+
+def _number_range(first: int, last: int) -> bytes:
+    """Format a hunk range the way diff -u does (0-based inclusive input)."""
+    a = first + 1
+    b = last + 1
+    if b <= a:
+        return b'%d,0' % b if b < a else b'%d' % b
+    return b'%d,%d' % (a, b - a + 1)
+
+
+def _output_line(out: List[bytes], mark: bytes, line: bytes) -> None:
+    out.append(mark)
+    if line.endswith(b'\n'):
+        out.append(line)
+    else:
+        out.append(line)
+        out.append(_NO_NEWLINE)
+
+
+def unified_diff(
+    old: bytes,
+    new: bytes,
+    old_label: bytes,
+    new_label: bytes,
+    context: int = 3,
+    ignore_whitespace: bool = False,
+    max_size: Optional[int] = MAX_INPUT_SIZE,
+    max_work: int = MAX_WORK
+) -> bytes:
+    """Compare two byte strings and format the result like ``diff -u``.
+
+    Args:
+        old: Content of the first file
+        new: Content of the second file
+        old_label: Header label of the first file (see file_label())
+        new_label: Header label of the second file
+        context: Number of context lines (``-U``)
+        ignore_whitespace: Ignore all white space when comparing (``-w``)
+        max_size: Combined input size to hand over to the binary (None for no limit)
+        max_work: Search budget after which the comparison is abandoned
+
+    Returns:
+        Unified diff, or empty bytes if there are no differences
+
+    Raises:
+        UnsupportedDiffError: If either input is binary, the inputs are
+            larger than max_size or the comparison exceeds the work budget
+    """
+    if max_size is not None and len(old) + len(new) > max_size:
+        raise UnsupportedDiffError("input exceeds in-process size limit")
+    if old == new:
+        return b''
+    if b'\0' in old or b'\0' in new:
+        raise UnsupportedDiffError("binary input")
+
+    lines0 = _split_lines(old)
+    lines1 = _split_lines(new)
+    n0 = len(lines0)
+    n1 = len(lines1)
+    prefix, suffix = _identical_ends(lines0, lines1, context)
+
+    # Assign equivalence classes to the lines in the compared region
+    classes = defaultdict(itertools.count(1).__next__)
+    equivs: List[List[int]] = []
+    for lines in (lines0, lines1):
+        region = lines[prefix:len(lines) - suffix]
+        if ignore_whitespace:
+            region = [line.translate(None, _WHITESPACE) for line in region]
+        equivs.append([classes[key] for key in region])
+
+    # Change flags with a zero sentinel at each end (index offset 1)
+    changed = [bytearray(len(equivs[0]) + 3), bytearray(len(equivs[1]) + 3)]
+    undiscarded, realindexes = _discard_confusing_lines(equivs, changed)
+    comparison = _Comparison(undiscarded[0], undiscarded[1], max_work)
+    comparison.compare(changed[0], changed[1], realindexes[0], realindexes[1])
+    _shift_boundaries(equivs, changed)
+
+    script = [
+        (line0 + prefix, line1 + prefix, deleted, inserted)
+        for line0, line1, deleted, inserted in _build_script(
+            changed[0], changed[1], len(equivs[0]), len(equivs[1]))
+    ]
+    if not script:
+        return b''
+
+    out = [b'--- ', old_label, b'\n+++ ', new_label, b'\n']
+    threshold = 2 * context + 1
+    start = 0
+    while start < len(script):
+        # Group changes separated by fewer than 2 * context + 1 lines
+        end = start
+        while (end + 1 < len(script)
+               and script[end + 1][0] - (script[end][0] + script[end][2]) < threshold):
+            end += 1
+        hunk = script[start:end + 1]
+        start = end + 1
+
+        first0 = max(hunk[0][0] - context, 0)
+        first1 = max(hunk[0][1] - context, 0)
+        last0 = min(hunk[-1][0] + hunk[-1][2] - 1 + context, n0 - 1)
+        last1 = min(hunk[-1][1] + hunk[-1][3] - 1 + context, n1 - 1)
+        out.append(b'@@ -' + _number_range(first0, last0)
+                   + b' +' + _number_range(first1, last1) + b' @@\n')
+
+        i = first0
+        j = first1
+        for line0, line1, deleted, inserted in hunk:
+            while i < line0:
+                _output_line(out, b' ', lines0[i])
+                i += 1
+                j += 1
+            for k in range(line0, line0 + deleted):
+                _output_line(out, b'-', lines0[k])
+            for k in range(line1, line1 + inserted):
+                _output_line(out, b'+', lines1[k])
+            i = line0 + deleted
+            j = line1 + inserted
+        while i <= last0:
+            _output_line(out, b' ', lines0[i])
+            i += 1
+
+    return b''.join(out)
+
+
+def diff_files(
+    path0: Union[str, Path],
+    path1: Union[str, Path],
+    context: int = 3,
+    ignore_whitespace: bool = False,
+    max_size: Optional[int] = MAX_INPUT_SIZE,
+    max_work: int = MAX_WORK
+) -> bytes:
+    """Compare two files like ``diff -u path0 path1``.
+
+    Args:
+        path0: First file; its name is used as given in the header
+        path1: Second file
+        context: Number of context lines (``-U``)
+        ignore_whitespace: Ignore all white space when comparing (``-w``)
+        max_size: Combined file size to hand over to the binary (None for no limit)
+        max_work: Search budget after which the comparison is abandoned
+
+    Returns:
+        Unified diff, or empty bytes if the files do not differ
+
+    Raises:
+        UnsupportedDiffError: If the diff binary is needed
+        OSError: If either file cannot be read
+    """
+    with open(path0, 'rb') as f0, open(path1, 'rb') as f1:
+        st0 = os.fstat(f0.fileno())
+        st1 = os.fstat(f1.fileno())
+        if max_size is not None and st0.st_size + st1.st_size > max_size:
+            raise UnsupportedDiffError("input exceeds in-process size limit")
+        labels = (
+            file_label(str(path0), st0.st_mtime_ns),
+            file_label(str(path1), st1.st_mtime_ns),
+        )
+        old = f0.read()
+        new = f1.read()
+    return unified_diff(
+        old, new, labels[0], labels[1],
+        context, ignore_whitespace, max_size, max_work
+    )
+
+
+class _StreamHunk:
+    """Hunk being built by diff_line_streams(), with lines paired by position."""
+
+    def __init__(self, first: int, before: List[bytes]) -> None:
+        self.first = first
+        self.last = first + len(before)
+        self.body: List[bytes] = []
+        self.size = 0
+        for line in before:
+            self._add(b' ', line)
+        self.removed: List[bytes] = []
+        self.added: List[bytes] = []
+        self.gap: List[bytes] = []
+
+    def _add(self, mark: bytes, line: bytes) -> None:
+        start = len(self.body)
+        _output_line(self.body, mark, line)
+        self.size += sum(map(len, self.body[start:]))
+
+    def change(self, old_line: bytes, new_line: bytes) -> None:
+        """Add a changed line, keeping unchanged lines since the last change as context."""
+        for line in self.gap:
+            self._add(b' ', line)
+        self.last += len(self.gap) + 1
+        self.gap.clear()
+        self.removed.append(old_line)
+        self.added.append(new_line)
+        self.size += len(old_line) + len(new_line) + 2
+
+    def keep(self, line: bytes) -> None:
+        """Add an unchanged line after the last change."""
+        if self.removed:
+            self._flush_changes()
+        self.gap.append(line)
+
+    def _flush_changes(self) -> None:
+        """Print the current run of changed lines: removals, then additions."""
+        self.size -= sum(map(len, self.removed)) + sum(map(len, self.added)) + 2 * len(self.added)
+        for line in self.removed:
+            self._add(b'-', line)
+        for line in self.added:
+            self._add(b'+', line)
+        self.removed.clear()
+        self.added.clear()
+
+    def render(self, context: int) -> bytes:
+        """Format the hunk with up to ``context`` trailing lines of context."""
+        self._flush_changes()
+        for line in self.gap[:context]:
+            self._add(b' ', line)
+        last = self.last + min(len(self.gap), context) - 1
+        lines = _number_range(self.first, last)
+        return b'@@ -' + lines + b' +' + lines + b' @@\n' + b''.join(self.body)
+
+
+def stream_line_diff(
+    path0: Union[str, Path],
+    path1: Union[str, Path],
+    old_label: bytes,
+    new_label: bytes,
+    context: int = 3,
+    max_output: Optional[int] = None
+) -> Tuple[bytes, bool]:
+    """Compare two files with the same number of lines like ``diff -u``.
+
+    Both files are read line by line in lockstep (see diff_line_streams()),
+    so memory use depends on the hunk sizes and max_output, not on the file
+    sizes.
+
+    Args:
+        path0: First file
+        path1: Second file
+        old_label: Header label of the first file (see file_label())
+        new_label: Header label of the second file
+        context: Number of context lines (``-U``)
+        max_output: Output size after which further hunks are dropped
+            (None for no limit); the files are still read to the end
+
+    Returns:
+        Tuple of (unified diff or empty bytes if the files do not differ,
+        whether hunks were dropped at max_output)
+
+    Raises:
+        UnsupportedDiffError: If the files differ in line count, the output
+            contains NUL bytes or a line is longer than MAX_STREAM_LINE
+        OSError: If either file cannot be read
+    """
+    with open(path0, 'rb') as f0, open(path1, 'rb') as f1:
+        return diff_line_streams(
+            iter(functools.partial(f0.readline, MAX_STREAM_LINE), b''),
+            iter(functools.partial(f1.readline, MAX_STREAM_LINE), b''),
+            old_label, new_label, context, max_output
+        )
+
+
+def diff_line_streams(
+    lines0: Iterable[bytes],
+    lines1: Iterable[bytes],
+    old_label: bytes,
+    new_label: bytes,
+    context: int = 3,
+    max_output: Optional[int] = None,
+    skipped: int = 0
+) -> Tuple[bytes, bool]:
+    """Compare two sequences of lines of equal length like ``diff -u``.
+
+    Each changed line is paired with the line at the same position in the
+    other sequence; consecutive changed lines are printed as a block of
+    removals followed by a block of additions, as diff does for them.
+
+    The sequences may be windows into larger files that are identical
+    outside them: hunk line numbers are then offset by ``skipped``, and a
+    window should include ``context`` lines on each side of its changes.
+
+    Args:
+        lines0: Lines of the first file, at most MAX_STREAM_LINE bytes each
+            (longer lines split into MAX_STREAM_LINE pieces are rejected)
+        lines1: Lines of the second file
+        old_label: Header label of the first file (see file_label())
+        new_label: Header label of the second file
+        context: Number of context lines (``-U``)
+        max_output: Output size after which further hunks are dropped
+            (None for no limit); the sequences are still read to the end
+        skipped: Number of lines preceding both sequences
+
+    Returns:
+        Tuple of (unified diff or empty bytes if the sequences do not
+        differ, whether hunks were dropped at max_output)
+
+    Raises:
+        UnsupportedDiffError: If the sequences differ in length, the output
+            contains NUL bytes or a line is MAX_STREAM_LINE bytes long
+    """
+    out = [b'--- ', old_label, b'\n+++ ', new_label, b'\n']
+    header_size = size = sum(map(len, out))
+    truncated = False
+    before: collections.deque = collections.deque(maxlen=context)
+    hunk: Optional[_StreamHunk] = None
+
+    def _fits(extra: int) -> bool:
+        return max_output is None or size + extra <= max_output
+
+    def _emit(text: bytes) -> None:
+        nonlocal size, truncated
+        if b'\0' in text:
+            raise UnsupportedDiffError("binary input")
+        if not _fits(len(text)):
+            truncated = True
+            return
+        out.append(text)
+        size += len(text)
+
+    pairs = itertools.zip_longest(lines0, lines1)
+    for index, (line0, line1) in enumerate(pairs, skipped):
+        if line0 is None or line1 is None:
+            raise UnsupportedDiffError("files differ in line count")
+        if len(line0) == MAX_STREAM_LINE or len(line1) == MAX_STREAM_LINE:
+            raise UnsupportedDiffError("line exceeds streamed diff limit")
+        if line0 == line1:
+            if hunk is None:
+                before.append(line0)
+                continue
+            hunk.keep(line0)
+            if len(hunk.gap) > 2 * context:
+                # Too far from the next change to share a hunk
+                _emit(hunk.render(context))
+                before.extend(hunk.gap[len(hunk.gap) - context:])
+                hunk = None
+            continue
+
+        if truncated:
+            continue
+        if hunk is None:
+            hunk = _StreamHunk(index - len(before), list(before))
+            before.clear()
+        hunk.change(line0, line1)
+        if not _fits(hunk.size):
+            # Stop collecting; keep reading only to check the line count
+            truncated = True
+            hunk = None
+
+    if hunk is not None:
+        _emit(hunk.render(context))
+    if size == header_size:
+        return b'', truncated
+    return b''.join(out), truncated
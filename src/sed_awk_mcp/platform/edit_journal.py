@@ -0,0 +1,547 @@
+"""Transactional multi-file edit sessions backed by a write-ahead journal.
+
+An edit session collects edits to several files and writes all of them or
+none. Each edited file is staged once, in a file beside it; later edits of
+the same file in the session are applied to the staged copy. Nothing
+touches the originals until the session is committed.
+
+Commit makes the staged files durable, keeps every original reachable
+under an "undo" hard link (no data is copied), fsyncs a single journal
+naming all files and then renames the staged files into place. Rewriting
+the journal as committed is the commit point; the undo links are dropped
+afterwards. If the server stops before the commit point, recover() puts
+the originals back from their undo links the next time it starts, so a
+session is never left half applied.
+"""
+
+import json
+import logging
+import os
+import secrets
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+
+from .config import read_env, state_directory
+from .fileops import copy_file
+from .preview_store import FileIdentity, file_identity
+
+# Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
+
+logger = logging.getLogger(__name__)
+
+# Journal states
+STATE_OPEN = 'open'
+STATE_PREPARED = 'prepared'
+STATE_COMMITTED = 'committed'
+
+JOURNAL_SUFFIX = '.journal'
+
+
+class EditSessionError(Exception):
+    """Raised when an edit session is unknown, busy or cannot be committed.
+    
+    Attributes:
+        message: Human-readable error description
+    """
+    
+    def __init__(self, message: str) -> None:
+        """Initialize EditSessionError.
+        
+        Args:
+            message: Human-readable error description
+        """
+        super().__init__(message)
+        self.message = message
+
+
+def _fsync_path(path: Union[str, Path]) -> None:
+    """Flush a file or directory to stable storage."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _link_or_copy(target: Path, undo: Path) -> None:
+    """Keep a file reachable under a second name, copying only if links fail."""
+    undo.unlink(missing_ok=True)
+    try:
+        os.link(target, undo)
+    except OSError as e:
+        logger.debug("cannot hard-link %s (%s); copying it instead", target, e)
+        copy_file(target, undo)
+
+
+class StagedFile:
+    """The staged new content of one file in an edit session.
+    
+    Attributes:
+        target: Canonical path of the file to replace
+        identity: Identity of the file when it was first staged
+        staged: File beside the target holding the new content
+        operations: Sed commands of each edit applied, in order
+        substitutions: Total substitution count, or None if the sed binary
+            made any of the edits
+    """
+    
+    __slots__ = ('target', 'identity', 'staged', 'operations', 'substitutions', '_session_id')
+    
+    def __init__(
+        self,
+        target: Path,
+        identity: FileIdentity,
+        staged: Path,
+        session_id: str
+    ) -> None:
+        self.target = target
+        self.identity = identity
+        self.staged = staged
+        self.operations: List[Tuple[str, ...]] = []
+        self.substitutions: Optional[int] = 0
+        self._session_id = session_id
+    
+    @property
+    def undo(self) -> Path:
+        """Name under which the original is kept while the session commits."""
+        return self.target.parent / f".{self.target.name}.{self._session_id}.undo"
+
+
+class EditSession:
+    """Files staged by one edit session, in the order they were first edited.
+    
+    Attributes:
+        id: Session identifier
+        created: time.monotonic() at which the session began
+        files: Staged files keyed by canonical target path
+    """
+    
+    __slots__ = ('id', 'created', 'files', '_busy')
+    
+    def __init__(self, session_id: str) -> None:
+        self.id = session_id
+        self.created = time.monotonic()
+        self.files: Dict[str, StagedFile] = {}
+        self._busy = False
+    
+    @property
+    def staged_bytes(self) -> int:
+        """Total size of the staged content."""
+        total = 0
+        for entry in self.files.values():
+            try:
+                total += entry.staged.stat().st_size
+            except OSError:
+                pass
+        return total
+
+
+class EditJournal:
+    """Open edit sessions and the journal that makes their commits atomic.
+    
+    Sessions live in memory; the journal directory holds one file per
+    session with staged files, so that staged files and interrupted commits
+    are cleaned up by recover() after a restart. At most one call may use a
+    session at a time (see checkout()).
+    
+    Attributes:
+        directory: Directory holding the journal files
+        max_sessions: Maximum number of open sessions
+        ttl: Seconds after which an open session is rolled back
+    """
+    
+    DEFAULT_MAX_SESSIONS = 16
+    DEFAULT_TTL = 3600.0
+    
+    # Environment variables read by from_env()
+    ENV_DIRECTORY = "SED_AWK_JOURNAL_DIR"
+    ENV_MAX_SESSIONS = "SED_AWK_MAX_EDIT_SESSIONS"
+    ENV_TTL = "SED_AWK_EDIT_SESSION_TTL"
+    
+    def __init__(
+        self,
+        directory: Optional[Union[str, Path]] = None,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        ttl: float = DEFAULT_TTL
+    ) -> None:
+        """Initialize EditJournal.
+        
+        Args:
+            directory: Journal directory, created on first use (default:
+                $XDG_STATE_HOME/sed-awk-mcp/journal)
+            max_sessions: Maximum number of open sessions (default: 16)
+            ttl: Seconds after which an open session expires (default: 3600)
+        
+        Raises:
+            ValueError: If a limit is not positive
+        """
+        if max_sessions < 1 or ttl <= 0:
+            raise ValueError("Edit session limits must be > 0")
+        
+        self.directory = Path(directory) if directory is not None else state_directory('journal')
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        
+        self.commits = 0
+        self.rollbacks = 0
+        self.expirations = 0
+        
+        self._sessions: Dict[str, EditSession] = {}
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None) -> "EditJournal":
+        """Create a journal from environment variables.
+        
+        Reads SED_AWK_JOURNAL_DIR, SED_AWK_MAX_EDIT_SESSIONS and
+        SED_AWK_EDIT_SESSION_TTL. Unset variables keep their defaults.
+        
+        Args:
+            environ: Environment mapping (default: os.environ)
+        
+        Returns:
+            Configured EditJournal
+        
+        Raises:
+            ValueError: If a variable is not a valid value
+        """
+        environ = os.environ if environ is None else environ
+        
+        return cls(
+            directory=read_env(environ, cls.ENV_DIRECTORY, None, Path),
+            max_sessions=read_env(environ, cls.ENV_MAX_SESSIONS, cls.DEFAULT_MAX_SESSIONS, int),
+            ttl=read_env(environ, cls.ENV_TTL, cls.DEFAULT_TTL, float)
+        )
+    
+    def __len__(self) -> int:
+        return len(self._sessions)
+    
+    def stats(self) -> Dict[str, int]:
+        """Return session counters and current occupancy."""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "commits": self.commits,
+                "rollbacks": self.rollbacks,
+                "expirations": self.expirations,
+            }
+    
+    def begin(self) -> EditSession:
+        """Open a new session (blocking: expired sessions are rolled back).
+        
+        Returns:
+            The new session
+        
+        Raises:
+            EditSessionError: If max_sessions sessions are open
+        """
+        self._expire()
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                raise EditSessionError(
+                    f"{len(self._sessions)} edit sessions are open; "
+                    "commit or roll back one before beginning another"
+                )
+            session = EditSession(secrets.token_hex(8))
+            self._sessions[session.id] = session
+        logger.debug("EditJournal: began session %s", session.id)
+        return session
+    
+    def checkout(self, session_id: str) -> EditSession:
+        """Claim an open session for one call; release() must follow.
+        
+        Args:
+            session_id: Identifier returned by begin()
+        
+        Returns:
+            The session
+        
+        Raises:
+            EditSessionError: If the session is unknown, expired or in use
+        """
+        self._expire()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                raise EditSessionError(f"Unknown or expired edit session: {session_id}")
+            if session._busy:
+                raise EditSessionError(f"Edit session {session_id} is in use by another call")
+            session._busy = True
+            return session
+    
+    def release(self, session: EditSession) -> None:
+        """Return a session claimed by checkout()."""
+        with self._lock:
+            session._busy = False
+    
+    def record(
+        self,
+        session: EditSession,
+        target: Path,
+        identity: FileIdentity,
+        staged: Path,
+        sed_commands: Tuple[str, ...],
+        substitutions: Optional[int]
+    ) -> StagedFile:
+        """Record the new staged content of a file (blocking).
+        
+        A file staged before in the session has its previous staged copy
+        removed; its identity stays the one recorded first.
+        
+        Args:
+            session: Session claimed by checkout()
+            target: Canonical path of the edited file
+            identity: file_identity() of the target before the session's
+                first edit of it
+            staged: File beside the target holding the new content; the
+                session owns it afterwards
+            sed_commands: Sed commands of the edit
+            substitutions: Substitution count, or None if not known
+        
+        Returns:
+            The file's entry in the session
+        """
+        key = str(target)
+        entry = session.files.get(key)
+        if entry is None:
+            entry = StagedFile(target, identity, staged, session.id)
+            session.files[key] = entry
+        else:
+            if entry.staged != staged:
+                entry.staged.unlink(missing_ok=True)
+            entry.staged = staged
+        entry.operations.append(tuple(sed_commands))
+        if entry.substitutions is not None and substitutions is not None:
+            entry.substitutions += substitutions
+        else:
+            entry.substitutions = None
+        
+        # Not synced: the journal only needs to outlive the server to let
+        # recover() remove staged files of sessions that never committed
+        self._write_journal(session.id, STATE_OPEN, session.files.values(), sync=False)
+        return entry
+    
+    def commit(self, session: EditSession) -> List[StagedFile]:
+        """Replace every staged file's target, all or none (blocking).
+        
+        The session ends whether or not the commit succeeds.
+        
+        Args:
+            session: Session claimed by checkout()
+        
+        Returns:
+            The committed entries, in the order the files were first staged
+        
+        Raises:
+            EditSessionError: If a target changed since it was staged; no
+                file is modified
+            OSError: If the commit fails; files already replaced are restored
+        """
+        entries = list(session.files.values())
+        keep_journal = False
+        try:
+            if not entries:
+                return []
+            stale = [str(e.target) for e in entries if not self._unchanged(e)]
+            if stale:
+                raise EditSessionError(
+                    "Files changed since they were staged; session rolled back: "
+                    + ", ".join(stale)
+                )
+            
+            # The staged data and the undo links must be on disk before the
+            # journal that refers to them
+            directories = sorted({str(e.target.parent) for e in entries})
+            try:
+                for entry in entries:
+                    shutil.copymode(entry.target, entry.staged)
+                    _fsync_path(entry.staged)
+                for entry in entries:
+                    _link_or_copy(entry.target, entry.undo)
+                for directory in directories:
+                    _fsync_path(directory)
+                self._write_journal(session.id, STATE_PREPARED, entries, sync=True)
+                
+                for entry in entries:
+                    os.replace(entry.staged, entry.target)
+                for directory in directories:
+                    _fsync_path(directory)
+                self._write_journal(session.id, STATE_COMMITTED, entries, sync=True)
+            except BaseException:
+                logger.error("EditJournal: commit of session %s failed; restoring", session.id)
+                if _roll_back(self._records(entries)):
+                    self._remove_journal(session.id)
+                else:
+                    # Keep the journal so that recover() retries at the next start
+                    keep_journal = True
+                raise
+            
+            _roll_forward(self._records(entries))
+            self._remove_journal(session.id)
+            with self._lock:
+                self.commits += 1
+            logger.info("EditJournal: committed session %s (%d files)", session.id, len(entries))
+            return entries
+        finally:
+            self._end(session, keep_journal)
+    
+    def rollback(self, session: EditSession) -> int:
+        """Discard a session's staged files without touching any target (blocking).
+        
+        Args:
+            session: Session claimed by checkout()
+        
+        Returns:
+            Number of staged files discarded
+        """
+        count = len(session.files)
+        self._end(session)
+        with self._lock:
+            self.rollbacks += 1
+        logger.debug("EditJournal: rolled back session %s (%d files)", session.id, count)
+        return count
+    
+    def recover(self) -> List[Tuple[str, str]]:
+        """Finish or undo sessions left in the journal by a stopped server (blocking).
+        
+        Interrupted commits that reached the commit point are completed;
+        earlier ones are undone by putting the originals back. Staged files
+        of sessions that never committed are removed.
+        
+        Returns:
+            (session id, journal state) of each recovered session
+        """
+        recovered = []
+        try:
+            journals = sorted(self.directory.glob(f"*{JOURNAL_SUFFIX}"))
+        except OSError:
+            return recovered
+        
+        for journal in journals:
+            session_id = journal.name[:-len(JOURNAL_SUFFIX)]
+            with self._lock:
+                if session_id in self._sessions:
+                    continue
+            try:
+                record = json.loads(journal.read_text(encoding='utf-8'))
+                state = record['state']
+                files = record['files']
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning("EditJournal: cannot read journal %s: %s", journal, e)
+                continue
+            
+            if state == STATE_COMMITTED:
+                _roll_forward(files)
+            elif state == STATE_PREPARED:
+                if not _roll_back(files):
+                    continue
+            else:
+                for item in files:
+                    Path(item['staged']).unlink(missing_ok=True)
+            self._remove_journal(session_id)
+            logger.warning(
+                "EditJournal: recovered session %s from state %r (%d files)",
+                session_id, state, len(files)
+            )
+            recovered.append((session_id, state))
+        return recovered
+    
+    @staticmethod
+    def _unchanged(entry: StagedFile) -> bool:
+        """Check that a target still has the identity it had when staged."""
+        try:
+            return file_identity(entry.target) == entry.identity
+        except OSError:
+            return False
+    
+    @staticmethod
+    def _records(entries) -> List[Dict[str, Any]]:
+        """Journal records of staged files."""
+        return [
+            {"target": str(e.target), "staged": str(e.staged), "undo": str(e.undo)}
+            for e in entries
+        ]
+    
+    def _journal_path(self, session_id: str) -> Path:
+        return self.directory / f"{session_id}{JOURNAL_SUFFIX}"
+    
+    def _write_journal(self, session_id: str, state: str, entries, sync: bool) -> None:
+        """Replace a session's journal file, optionally flushing it to disk."""
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        path = self._journal_path(session_id)
+        tmp = path.with_suffix('.tmp')
+        data = json.dumps({"session": session_id, "state": state, "files": self._records(entries)})
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(data)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+        if sync:
+            _fsync_path(self.directory)
+    
+    def _remove_journal(self, session_id: str) -> None:
+        self._journal_path(session_id).unlink(missing_ok=True)
+    
+    def _end(self, session: EditSession, keep_journal: bool = False) -> None:
+        """Forget a session and remove whatever it still has staged."""
+        with self._lock:
+            self._sessions.pop(session.id, None)
+        for entry in session.files.values():
+            try:
+                entry.staged.unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning("EditJournal: cannot remove staged file %s: %s", entry.staged, e)
+        if not keep_journal:
+            self._remove_journal(session.id)
+    
+    def _expire(self) -> None:
+        """Roll back open sessions older than the TTL that no call is using."""
+        cutoff = time.monotonic() - self.ttl
+        with self._lock:
+            expired = [
+                s for s in self._sessions.values() if s.created <= cutoff and not s._busy
+            ]
+            for session in expired:
+                session._busy = True
+        for session in expired:
+            self._end(session)
+            with self._lock:
+                self.expirations += 1
+            logger.info("EditJournal: session %s expired; staged files discarded", session.id)
+
+
+def _roll_back(files: List[Dict[str, Any]]) -> bool:
+    """Put originals back from their undo links and drop staged files.
+    
+    Renaming an undo link over a target that is still the same file (its
+    staged content was never renamed into place) changes nothing, so the
+    link is removed afterwards in every case.
+    
+    Returns:
+        True if every original is back in place
+    """
+    restored = True
+    for item in files:
+        undo = Path(item['undo'])
+        try:
+            if undo.exists():
+                os.replace(undo, item['target'])
+                undo.unlink(missing_ok=True)
+            Path(item['staged']).unlink(missing_ok=True)
+        except OSError as e:
+            logger.error("EditJournal: cannot restore %s from %s: %s", item['target'], undo, e)
+            restored = False
+    return restored
+
+
+def _roll_forward(files: List[Dict[str, Any]]) -> None:
+    """Drop the undo links of a committed session."""
+    for item in files:
+        try:
+            Path(item['undo']).unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning("EditJournal: cannot remove %s: %s", item['undo'], e)
@@ -4,14 +4,23 @@ This module provides secure subprocess execution with timeout enforcement,
 resource limits, and structured result handling for sed, awk, and diff commands.
 """
 
+import asyncio
+import collections
+import contextlib
+import functools
 import logging
+import math
+import os
+import selectors
+import signal
 import subprocess
 import sys
+import threading
 import time
-from dataclasses import dataclass
-from typing import List, Optional
+from typing import Any, AsyncIterator, Deque, Dict, List, Mapping, Optional, Tuple, Union
 
-from .config import PlatformConfig
+from .config import PlatformConfig, read_env
+from .limits import LimitsConfig
 
 # Import resource module only if available (Linux/Unix)
 try:
@@ -24,23 +33,198 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Pipe read size for incremental output capture
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class ResourceUsage:
+    """Resource usage of one finished child, as reported by wait4(2).
+    
+    Attributes:
+        spawn_time: Seconds spent creating the child process
+        user_time: User-mode CPU time in seconds
+        system_time: Kernel-mode CPU time in seconds
+        max_rss_kb: Peak resident set size in KiB. Linux folds the address
+            space the child had before exec into this figure, so for children
+            spawned by vfork/posix_spawn it is never below the server's own
+            RSS at spawn time.
+        major_faults: Page faults that required I/O
+        minor_faults: Page faults served without I/O
+        voluntary_switches: Context switches while blocked (I/O, full pipes)
+        involuntary_switches: Context switches due to preemption
+    """
+    
+    __slots__ = (
+        'spawn_time', 'user_time', 'system_time', 'max_rss_kb', 'major_faults',
+        'minor_faults', 'voluntary_switches', 'involuntary_switches'
+    )
+    
+    def __init__(
+        self,
+        spawn_time: float,
+        user_time: float,
+        system_time: float,
+        max_rss_kb: int,
+        major_faults: int,
+        minor_faults: int,
+        voluntary_switches: int,
+        involuntary_switches: int
+    ) -> None:
+        """Initialize ResourceUsage (see class attributes)."""
+        self.spawn_time = spawn_time
+        self.user_time = user_time
+        self.system_time = system_time
+        self.max_rss_kb = max_rss_kb
+        self.major_faults = major_faults
+        self.minor_faults = minor_faults
+        self.voluntary_switches = voluntary_switches
+        self.involuntary_switches = involuntary_switches
+    
+    @classmethod
+    def from_rusage(cls, rusage: Any, spawn_time: float) -> "ResourceUsage":
+        """Build from a struct_rusage returned by os.wait4().
+        
+        Args:
+            rusage: resource.struct_rusage of the reaped child
+            spawn_time: Seconds spent creating the child
+            
+        Returns:
+            ResourceUsage instance
+        """
+        # ru_maxrss is in bytes on macOS and in KiB elsewhere
+        max_rss = rusage.ru_maxrss // 1024 if sys.platform == 'darwin' else rusage.ru_maxrss
+        return cls(
+            spawn_time=spawn_time,
+            user_time=rusage.ru_utime,
+            system_time=rusage.ru_stime,
+            max_rss_kb=max_rss,
+            major_faults=rusage.ru_majflt,
+            minor_faults=rusage.ru_minflt,
+            voluntary_switches=rusage.ru_nvcsw,
+            involuntary_switches=rusage.ru_nivcsw
+        )
+    
+    @classmethod
+    def combined(cls, usages: List["ResourceUsage"]) -> "ResourceUsage":
+        """Total usage of several children: times and counts add, peak RSS is the largest.
+        
+        Args:
+            usages: Usage of each child
+        
+        Returns:
+            ResourceUsage instance
+        """
+        return cls(
+            spawn_time=sum(u.spawn_time for u in usages),
+            user_time=sum(u.user_time for u in usages),
+            system_time=sum(u.system_time for u in usages),
+            max_rss_kb=max(u.max_rss_kb for u in usages),
+            major_faults=sum(u.major_faults for u in usages),
+            minor_faults=sum(u.minor_faults for u in usages),
+            voluntary_switches=sum(u.voluntary_switches for u in usages),
+            involuntary_switches=sum(u.involuntary_switches for u in usages)
+        )
+    
+    @property
+    def cpu_time(self) -> float:
+        """Total CPU time (user + system) in seconds."""
+        return self.user_time + self.system_time
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the usage as a dict suitable for audit details."""
+        return {
+            "spawn_ms": round(self.spawn_time * 1000, 3),
+            "user_ms": round(self.user_time * 1000, 3),
+            "system_ms": round(self.system_time * 1000, 3),
+            "max_rss_kb": self.max_rss_kb,
+            "major_faults": self.major_faults,
+            "minor_faults": self.minor_faults,
+            "voluntary_switches": self.voluntary_switches,
+            "involuntary_switches": self.involuntary_switches,
+        }
+    
+    def __repr__(self) -> str:
+        return (
+            f"ResourceUsage(spawn={self.spawn_time:.6f}, user={self.user_time:.6f}, "
+            f"system={self.system_time:.6f}, max_rss_kb={self.max_rss_kb}, "
+            f"major_faults={self.major_faults}, voluntary_switches={self.voluntary_switches}, "
+            f"involuntary_switches={self.involuntary_switches})"
+        )
+
 
-@dataclass
 class ExecutionResult:
     """Structured result from subprocess execution.
     
+    Output is kept as the raw bytes produced by the child. The str views
+    (stdout, stderr) are decoded as UTF-8 on first access, with invalid
+    sequences replaced, and cached; callers that only forward or measure
+    output should use stdout_bytes/stderr_bytes and never pay for decoding.
+    
     Attributes:
-        stdout: Standard output as string
-        stderr: Standard error as string
+        stdout_bytes: Standard output as bytes
+        stderr_bytes: Standard error as bytes
         returncode: Process exit code
         duration: Execution time in seconds
         timed_out: Whether execution exceeded timeout
+        truncated: Whether output was cut off at the output byte cap
+        usage: Resource usage of the child, or None when the result was
+            not produced by a reaped child process
     """
-    stdout: str
-    stderr: str
-    returncode: int
-    duration: float
-    timed_out: bool = False
+    
+    __slots__ = (
+        'stdout_bytes', 'stderr_bytes', 'returncode', 'duration',
+        'timed_out', 'truncated', 'usage', '_stdout', '_stderr'
+    )
+    
+    def __init__(
+        self,
+        stdout: Union[bytes, str],
+        stderr: Union[bytes, str],
+        returncode: int,
+        duration: float,
+        timed_out: bool = False,
+        truncated: bool = False,
+        usage: Optional[ResourceUsage] = None
+    ) -> None:
+        """Initialize ExecutionResult.
+        
+        Args:
+            stdout: Standard output (bytes, or already-decoded str)
+            stderr: Standard error (bytes, or already-decoded str)
+            returncode: Process exit code
+            duration: Execution time in seconds
+            timed_out: Whether execution exceeded timeout (default: False)
+            truncated: Whether output hit the byte cap (default: False)
+            usage: Resource usage of the child process (optional)
+        """
+        self._stdout: Optional[str] = None
+        self._stderr: Optional[str] = None
+        if isinstance(stdout, str):
+            self._stdout, stdout = stdout, stdout.encode('utf-8')
+        if isinstance(stderr, str):
+            self._stderr, stderr = stderr, stderr.encode('utf-8')
+        
+        self.stdout_bytes = stdout
+        self.stderr_bytes = stderr
+        self.returncode = returncode
+        self.duration = duration
+        self.timed_out = timed_out
+        self.truncated = truncated
+        self.usage = usage
+    
+    @property
+    def stdout(self) -> str:
+        """Standard output decoded as UTF-8 (decoded once, on demand)."""
+        if self._stdout is None:
+            self._stdout = self.stdout_bytes.decode('utf-8', errors='replace')
+        return self._stdout
+    
+    @property
+    def stderr(self) -> str:
+        """Standard error decoded as UTF-8 (decoded once, on demand)."""
+        if self._stderr is None:
+            self._stderr = self.stderr_bytes.decode('utf-8', errors='replace')
+        return self._stderr
     
     @property
     def success(self) -> bool:
@@ -50,6 +234,41 @@ class ExecutionResult:
             True if returncode is 0, False otherwise
         """
         return self.returncode == 0
+    
+    def usage_details(self) -> Optional[Dict[str, Any]]:
+        """Resource usage for audit details, or None if not measured."""
+        return self.usage.as_dict() if self.usage is not None else None
+    
+    def __repr__(self) -> str:
+        return (
+            f"ExecutionResult(returncode={self.returncode}, "
+            f"duration={self.duration:.3f}, timed_out={self.timed_out}, "
+            f"truncated={self.truncated}, stdout_bytes={len(self.stdout_bytes)}, "
+            f"stderr_bytes={len(self.stderr_bytes)})"
+        )
+
+
+class _CappedBuffer:
+    """Accumulates process output up to a hard byte limit."""
+    
+    __slots__ = ('data', 'limit', 'truncated')
+    
+    def __init__(self, limit: int) -> None:
+        self.data = bytearray()
+        self.limit = limit
+        self.truncated = False
+    
+    def feed(self, chunk: bytes) -> bool:
+        """Append a chunk; return False once the limit has been exceeded."""
+        if self.truncated:
+            return False
+        room = self.limit - len(self.data)
+        if len(chunk) > room:
+            self.data += chunk[:room]
+            self.truncated = True
+            return False
+        self.data += chunk
+        return True
 
 
 class TimeoutError(Exception):
@@ -92,56 +311,592 @@ class ExecutionError(Exception):
         self.binary_path = binary_path
 
 
+class ServerBusyError(Exception):
+    """Raised when an execution cannot be admitted by the scheduler.
+    
+    Attributes:
+        message: Human-readable error description
+        queue_depth: Number of executions waiting when the error was raised
+    """
+    
+    def __init__(self, message: str, queue_depth: int = 0) -> None:
+        """Initialize ServerBusyError.
+        
+        Args:
+            message: Human-readable error description
+            queue_depth: Number of executions waiting (default: 0)
+        """
+        super().__init__(message)
+        self.message = message
+        self.queue_depth = queue_depth
+
+
+class ExecutionScheduler:
+    """Admission control for concurrent binary executions.
+    
+    Bounds the number of sed/awk/diff children running at once, globally and
+    per tool. Executions beyond the limits wait in a bounded FIFO queue; when
+    the queue is full, or an execution waits longer than the queue deadline,
+    ServerBusyError is raised instead of forking another child.
+    
+    Queued executions whose tool is at its per-tool limit do not block
+    executions of other tools behind them.
+    
+    Intended for use from a single event loop thread.
+    """
+    
+    DEFAULT_MAX_QUEUE = 64
+    DEFAULT_QUEUE_TIMEOUT = 30.0
+    
+    # Environment variables read by from_env()
+    ENV_MAX_CONCURRENCY = "SED_AWK_MAX_CONCURRENCY"
+    ENV_MAX_QUEUE = "SED_AWK_MAX_QUEUE"
+    ENV_QUEUE_TIMEOUT = "SED_AWK_QUEUE_TIMEOUT"
+    TOOLS = ('sed', 'awk', 'diff')
+    
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        per_tool_limits: Optional[Mapping[str, int]] = None,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        queue_timeout: float = DEFAULT_QUEUE_TIMEOUT
+    ) -> None:
+        """Initialize ExecutionScheduler.
+        
+        Args:
+            max_concurrency: Global limit on running executions
+                (default: number of CPUs)
+            per_tool_limits: Optional per-tool limits keyed by binary name
+            max_queue: Maximum number of waiting executions (default: 64)
+            queue_timeout: Maximum seconds an execution may wait (default: 30)
+            
+        Raises:
+            ValueError: If any limit is not positive
+        """
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        self.per_tool_limits = dict(per_tool_limits or {})
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        
+        if self.max_concurrency < 1 or any(v < 1 for v in self.per_tool_limits.values()):
+            raise ValueError("Concurrency limits must be positive")
+        if self.max_queue < 0 or self.queue_timeout <= 0:
+            raise ValueError("Queue size must be >= 0 and queue timeout > 0")
+        
+        self._running = 0
+        self._running_by_tool: Dict[str, int] = collections.Counter()
+        self._waiters: Deque[Tuple[str, asyncio.Future]] = collections.deque()
+        
+        logger.debug(
+            "ExecutionScheduler initialized: max_concurrency=%d per_tool=%s "
+            "max_queue=%d queue_timeout=%.1fs",
+            self.max_concurrency, self.per_tool_limits,
+            self.max_queue, self.queue_timeout
+        )
+    
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None) -> "ExecutionScheduler":
+        """Create a scheduler from environment variables.
+        
+        Reads SED_AWK_MAX_CONCURRENCY, SED_AWK_MAX_QUEUE, SED_AWK_QUEUE_TIMEOUT
+        and per-tool limits SED_AWK_MAX_CONCURRENCY_SED/_AWK/_DIFF. Unset
+        variables keep their defaults.
+        
+        Args:
+            environ: Environment mapping (default: os.environ)
+            
+        Returns:
+            Configured ExecutionScheduler
+            
+        Raises:
+            ValueError: If a variable is not a valid number
+        """
+        environ = os.environ if environ is None else environ
+        
+        per_tool = {}
+        for tool in cls.TOOLS:
+            limit = read_env(environ, f"{cls.ENV_MAX_CONCURRENCY}_{tool.upper()}", None, int)
+            if limit is not None:
+                per_tool[tool] = limit
+        
+        return cls(
+            max_concurrency=read_env(environ, cls.ENV_MAX_CONCURRENCY, None, int),
+            per_tool_limits=per_tool,
+            max_queue=read_env(environ, cls.ENV_MAX_QUEUE, cls.DEFAULT_MAX_QUEUE, int),
+            queue_timeout=read_env(
+                environ, cls.ENV_QUEUE_TIMEOUT, cls.DEFAULT_QUEUE_TIMEOUT, float
+            )
+        )
+    
+    @property
+    def queue_depth(self) -> int:
+        """Number of executions currently waiting for a slot."""
+        return len(self._waiters)
+    
+    @property
+    def running(self) -> int:
+        """Number of executions currently holding a slot."""
+        return self._running
+    
+    @contextlib.asynccontextmanager
+    async def slot(self, tool: str) -> AsyncIterator[None]:
+        """Hold an execution slot for the duration of the context.
+        
+        Args:
+            tool: Binary name used for per-tool limits
+            
+        Raises:
+            ServerBusyError: If the queue is full or the queue deadline passes
+        """
+        await self.acquire(tool)
+        try:
+            yield
+        finally:
+            self.release(tool)
+    
+    async def acquire(self, tool: str) -> float:
+        """Wait for an execution slot.
+        
+        Args:
+            tool: Binary name used for per-tool limits
+            
+        Returns:
+            Time spent waiting in the queue, in seconds
+            
+        Raises:
+            ServerBusyError: If the queue is full or the queue deadline passes
+        """
+        # Waiters blocked only by their own per-tool limit do not hold us back
+        ahead = any(self._has_capacity(t) for t, _ in self._waiters)
+        if not ahead and self._has_capacity(tool):
+            self._admit(tool)
+            logger.debug(
+                "ExecutionScheduler admitted: tool=%s waited=0.000s queue_depth=%d running=%d",
+                tool, len(self._waiters), self._running
+            )
+            return 0.0
+        
+        if len(self._waiters) >= self.max_queue:
+            logger.warning(
+                "ExecutionScheduler rejected: tool=%s queue_depth=%d running=%d (queue full)",
+                tool, len(self._waiters), self._running
+            )
+            raise ServerBusyError(
+                f"Server busy: {len(self._waiters)} executions already queued "
+                f"(limit {self.max_queue})",
+                queue_depth=len(self._waiters)
+            )
+        
+        future = asyncio.get_running_loop().create_future()
+        entry = (tool, future)
+        self._waiters.append(entry)
+        start_time = time.monotonic()
+        
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # Admitted just as the deadline expired - keep the slot
+                pass
+            else:
+                future.cancel()
+                self._remove_waiter(entry)
+                logger.warning(
+                    "ExecutionScheduler rejected: tool=%s waited=%.3fs queue_depth=%d "
+                    "running=%d (queue deadline)",
+                    tool, time.monotonic() - start_time, len(self._waiters), self._running
+                )
+                raise ServerBusyError(
+                    f"Server busy: no execution slot available within "
+                    f"{self.queue_timeout:.1f}s",
+                    queue_depth=len(self._waiters)
+                )
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was granted; hand it back before propagating
+                self.release(tool)
+            else:
+                self._remove_waiter(entry)
+            raise
+        
+        waited = time.monotonic() - start_time
+        logger.info(
+            "ExecutionScheduler admitted: tool=%s waited=%.3fs queue_depth=%d running=%d",
+            tool, waited, len(self._waiters), self._running
+        )
+        return waited
+    
+    def release(self, tool: str) -> None:
+        """Release a slot and admit queued executions that now fit.
+        
+        Args:
+            tool: Binary name the slot was acquired for
+        """
+        self._running -= 1
+        self._running_by_tool[tool] -= 1
+        self._wake_waiters()
+    
+    def _has_capacity(self, tool: str) -> bool:
+        """Check global and per-tool capacity for one more execution."""
+        if self._running >= self.max_concurrency:
+            return False
+        limit = self.per_tool_limits.get(tool)
+        return limit is None or self._running_by_tool[tool] < limit
+    
+    def _admit(self, tool: str) -> None:
+        """Account for a newly admitted execution."""
+        self._running += 1
+        self._running_by_tool[tool] += 1
+    
+    def _wake_waiters(self) -> None:
+        """Admit waiters in FIFO order, skipping tools at their limit."""
+        for entry in list(self._waiters):
+            if self._running >= self.max_concurrency:
+                break
+            tool, future = entry
+            if future.done():
+                self._remove_waiter(entry)
+                continue
+            if self._has_capacity(tool):
+                self._remove_waiter(entry)
+                self._admit(tool)
+                future.set_result(None)
+    
+    def _remove_waiter(self, entry: Tuple[str, asyncio.Future]) -> None:
+        """Remove a waiter from the queue if still present."""
+        try:
+            self._waiters.remove(entry)
+        except ValueError:
+            pass
+
+
+class ResultCache:
+    """Bounded LRU cache of results for read-only tool invocations.
+    
+    Entries are keyed by the normalized command line together with the
+    identity of every input file - (st_dev, st_ino, st_size, st_mtime_ns) -
+    so any rewrite, replacement or truncation of an input produces a new
+    key. Writers that may preserve all four values (an in-place rewrite of
+    the same size within one timestamp tick) call invalidate() explicitly.
+    
+    The cache is bounded both by entry count and by the total size of the
+    cached output. Results of inputs modified within the last racy_window
+    seconds are not stored, since a further write in the same timestamp tick
+    would go unnoticed.
+    
+    Thread-safe; lookups run on the event loop and in worker threads.
+    """
+    
+    DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+    DEFAULT_MAX_ENTRIES = 256
+    DEFAULT_RACY_WINDOW = 1.0
+    
+    # Environment variables read by from_env()
+    ENV_MAX_BYTES = "SED_AWK_CACHE_MAX_BYTES"
+    ENV_MAX_ENTRIES = "SED_AWK_CACHE_MAX_ENTRIES"
+    
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        racy_window: float = DEFAULT_RACY_WINDOW
+    ) -> None:
+        """Initialize ResultCache.
+        
+        Args:
+            max_bytes: Maximum total size of cached output (default: 64MB)
+            max_entries: Maximum number of cached results (default: 256)
+            racy_window: Seconds after a modification during which results
+                for that input are not stored (default: 1.0)
+            
+        Raises:
+            ValueError: If any limit is negative
+        """
+        if max_bytes < 0 or max_entries < 0 or racy_window < 0:
+            raise ValueError("Cache limits must be >= 0")
+        
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.racy_window = racy_window
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        
+        # key -> (result, input paths, weight), least recently used first
+        self._entries: "collections.OrderedDict[Tuple, Tuple]" = collections.OrderedDict()
+        self._keys_by_path: Dict[str, set] = collections.defaultdict(set)
+        self._size = 0
+        self._lock = threading.Lock()
+        
+        logger.debug(
+            "ResultCache initialized: max_bytes=%d max_entries=%d racy_window=%.2fs",
+            max_bytes, max_entries, racy_window
+        )
+    
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None) -> "ResultCache":
+        """Create a cache from environment variables.
+        
+        Reads SED_AWK_CACHE_MAX_BYTES and SED_AWK_CACHE_MAX_ENTRIES; either
+        set to 0 disables caching. Unset variables keep their defaults.
+        
+        Args:
+            environ: Environment mapping (default: os.environ)
+            
+        Returns:
+            Configured ResultCache
+            
+        Raises:
+            ValueError: If a variable is not a valid integer
+        """
+        environ = os.environ if environ is None else environ
+        
+        return cls(
+            max_bytes=read_env(environ, cls.ENV_MAX_BYTES, cls.DEFAULT_MAX_BYTES, int),
+            max_entries=read_env(environ, cls.ENV_MAX_ENTRIES, cls.DEFAULT_MAX_ENTRIES, int)
+        )
+    
+    @property
+    def enabled(self) -> bool:
+        """Whether results are cached at all."""
+        return self.max_bytes > 0 and self.max_entries > 0
+    
+    @property
+    def size(self) -> int:
+        """Total size of cached output in bytes."""
+        return self._size
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and current occupancy."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
+    
+    def make_key(self, argv: List[str], inputs: List[Union[str, os.PathLike]]) -> Optional[Tuple]:
+        """Build the cache key for a command and its input files.
+        
+        Args:
+            argv: Normalized command line, or any list of strings that fully
+                determines the result for the given inputs
+            inputs: Files whose content the result depends on
+            
+        Returns:
+            Hashable key, or None if caching is disabled or an input cannot
+            be stat'ed
+        """
+        if not self.enabled:
+            return None
+        
+        identities = []
+        for path in inputs:
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+            identities.append(
+                (os.fspath(path), st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+            )
+        return (tuple(argv), tuple(identities))
+    
+    def get(self, key: Optional[Tuple]) -> Optional[ExecutionResult]:
+        """Look up a result and count the hit or miss.
+        
+        Args:
+            key: Key from make_key() (None is always a miss)
+            
+        Returns:
+            Cached ExecutionResult, or None
+        """
+        if key is None:
+            return None
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, key: Optional[Tuple], result: ExecutionResult) -> bool:
+        """Store a result if it is cacheable.
+        
+        Timed-out and truncated results are not stored, nor are results
+        whose inputs changed since the key was built or were modified within
+        the racy window.
+        
+        Args:
+            key: Key built with make_key() before the command ran
+            result: Result of the command
+            
+        Returns:
+            True if the result was stored
+        """
+        if key is None or result.timed_out or result.truncated:
+            return False
+        
+        weight = len(result.stdout_bytes) + len(result.stderr_bytes)
+        if weight > self.max_bytes:
+            return False
+        
+        argv, identities = key
+        paths = tuple(identity[0] for identity in identities)
+        racy_before = time.time_ns() - int(self.racy_window * 1_000_000_000)
+        if self.make_key(list(argv), list(paths)) != key:
+            return False
+        if any(identity[4] > racy_before for identity in identities):
+            return False
+        
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (result, paths, weight)
+            self._size += weight
+            for path in paths:
+                self._keys_by_path[path].add(key)
+            
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        
+        return True
+    
+    def invalidate(self, path: Union[str, os.PathLike]) -> int:
+        """Drop every cached result that read the given file.
+        
+        Args:
+            path: Canonical path of a file that was written
+            
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            keys = self._keys_by_path.pop(os.fspath(path), ())
+            for key in list(keys):
+                self._remove(key)
+            self.invalidations += len(keys)
+        
+        if keys:
+            logger.debug("ResultCache invalidated %d entries for %s", len(keys), path)
+        return len(keys)
+    
+    def clear(self) -> None:
+        """Drop all cached results (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_path.clear()
+            self._size = 0
+    
+    def _remove(self, key: Tuple) -> None:
+        """Remove one entry and its path index references (lock held)."""
+        _, paths, weight = self._entries.pop(key)
+        self._size -= weight
+        for path in paths:
+            keys = self._keys_by_path.get(path)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_path[path]
+
+
 class BinaryExecutor:
     """Execute binaries with security controls and resource limits.
     
     This class provides secure subprocess execution with:
     - No shell invocation (shell=False)
     - Timeout enforcement
-    - Resource limits (Linux/Unix only)
+    - Resource limits (Linux/Unix only), sized per call from a LimitsConfig
     - Structured result handling
     - Comprehensive error handling
+    - An optional ResultCache that the read-only tools consult first
     
     Thread-safe implementation suitable for concurrent use.
     """
     
-    # Class constants for resource limits
-    DEFAULT_TIMEOUT = 30
-    MEMORY_LIMIT_MB = 100
-    CPU_TIME_LIMIT = 30
+    # Class constants for resource limits; timeouts, RLIMIT_AS and RLIMIT_CPU
+    # come from the LimitsConfig passed to __init__
+    MAX_OUTPUT_BYTES = 32 * 1024 * 1024  # Cap per output stream
+    TERM_GRACE_PERIOD = 0.1  # Seconds between SIGTERM and SIGKILL at the deadline
+    
+    # Spawn backends (see _select_spawn_backend)
+    SPAWN_POSIX = 'posix_spawn'      # posix_spawn/vfork, limits via prlimit(2) on the child pid
+    SPAWN_PRLIMIT_SHIM = 'prlimit'   # posix_spawn/vfork of prlimit(1), which sets limits and execs
+    SPAWN_PREEXEC = 'preexec'        # fork + preexec_fn setrlimit (legacy, slow with large RSS)
+    SPAWN_BACKENDS = (SPAWN_POSIX, SPAWN_PRLIMIT_SHIM, SPAWN_PREEXEC)
     
-    def __init__(self, config: PlatformConfig) -> None:
+    def __init__(
+        self,
+        config: PlatformConfig,
+        scheduler: Optional[ExecutionScheduler] = None,
+        spawn_backend: str = 'auto',
+        result_cache: Optional[ResultCache] = None,
+        limits: Optional[LimitsConfig] = None
+    ) -> None:
         """Initialize BinaryExecutor.
         
         Args:
             config: Platform configuration containing binary paths
+            scheduler: Optional admission control for execute_async()
+            spawn_backend: 'auto', 'posix_spawn', 'prlimit' or 'preexec'
+            result_cache: Optional cache shared by the read-only tools
+            limits: Per-tool limits (default: built-in LimitsConfig)
             
         Checks platform capabilities for resource limiting.
+        
+        Raises:
+            ValueError: If spawn_backend is unknown or unsupported here
         """
         self.config = config
+        self.scheduler = scheduler
+        self.result_cache = result_cache
+        self.limits = limits or LimitsConfig()
         self._has_resource_limits = HAS_RESOURCE and sys.platform.startswith('linux')
+        self.spawn_backend = self._select_spawn_backend(spawn_backend)
         
         logger.debug(
-            "BinaryExecutor initialized: resource_limits=%s platform=%s",
-            self._has_resource_limits, sys.platform
+            "BinaryExecutor initialized: resource_limits=%s platform=%s spawn_backend=%s",
+            self._has_resource_limits, sys.platform, self.spawn_backend
         )
     
     def execute(
         self,
         args: List[str],
-        timeout: int = DEFAULT_TIMEOUT,
-        apply_limits: bool = True
+        timeout: Optional[float] = None,
+        apply_limits: bool = True,
+        max_output_bytes: int = MAX_OUTPUT_BYTES,
+        input_size: int = 0
     ) -> ExecutionResult:
         """Execute binary with security controls and resource limits.
         
         Executes the binary with shell=False to prevent shell injection,
         enforces timeout limits, and optionally applies resource constraints
-        on supported platforms.
+        on supported platforms. Output is read incrementally; once a stream
+        exceeds max_output_bytes the child's process group is killed and a
+        truncated result is returned. The child is reaped with wait4(2) and
+        its CPU time, peak RSS, faults and context switches are recorded in
+        result.usage.
         
         Args:
             args: Command and argument list (first element is binary name)
-            timeout: Execution timeout in seconds (default: 30)
+            timeout: Execution timeout in seconds (default: scaled from
+                the binary's limits and input_size)
             apply_limits: Whether to apply resource limits (default: True)
+            max_output_bytes: Cap per output stream in bytes (default: 32MB)
+            input_size: Bytes of input the command will process; scales
+                the default timeout, RLIMIT_AS and RLIMIT_CPU
             
         Returns:
             ExecutionResult with stdout, stderr, returncode, and duration
@@ -150,36 +905,9 @@ class BinaryExecutor:
             TimeoutError: If execution exceeds timeout
             ExecutionError: If execution fails unexpectedly
         """
-        if not args:
-            raise ExecutionError("Empty command arguments")
-        
-        # Get binary name and resolve to full path
-        binary_name = args[0]
-        if binary_name == 'sed':
-            binary_path = self.config.sed_path
-        elif binary_name == 'awk':
-            binary_path = self.config.awk_path
-        elif binary_name == 'diff':
-            binary_path = self.config.diff_path
-        else:
-            # For other commands (like 'echo', 'sleep'), use as-is
-            binary_path = binary_name
-        
-        # Build command array - binary path + arguments (excluding first arg)
-        cmd = [binary_path] + args[1:]
-        
-        # Prepare subprocess kwargs
-        kwargs = {
-            'capture_output': True,
-            'text': True,
-            'timeout': timeout,
-            'shell': False  # Critical security requirement - no shell injection
-        }
-        
-        # Apply resource limits on supported platforms
-        if apply_limits and self._has_resource_limits:
-            kwargs['preexec_fn'] = self._set_limits
-            logger.debug("BinaryExecutor applying resource limits")
+        timeout, rlimits = self._limits_for(args, timeout, input_size)
+        binary_path, cmd = self._build_command(args, apply_limits, rlimits)
+        kwargs = self._popen_kwargs(apply_limits, rlimits)
         
         # Log execution attempt
         logger.debug(
@@ -188,44 +916,17 @@ class BinaryExecutor:
         )
         
         # Execute subprocess with timing
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
         try:
-            result = subprocess.run(cmd, **kwargs)
-            duration = time.time() - start_time
-            
-            execution_result = ExecutionResult(
-                stdout=result.stdout,
-                stderr=result.stderr,
-                returncode=result.returncode,
-                duration=duration,
-                timed_out=False
+            process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                **kwargs
             )
-            
-            logger.debug(
-                "BinaryExecutor completed: binary=%s returncode=%d duration=%.3fs",
-                binary_path, result.returncode, duration
-            )
-            
-            return execution_result
-            
-        except subprocess.TimeoutExpired as e:
-            duration = time.time() - start_time
-            
-            logger.warning(
-                "BinaryExecutor timeout: binary=%s timeout=%s duration=%.3fs",
-                binary_path, timeout, duration
-            )
-            
-            return ExecutionResult(
-                stdout=e.stdout or "",
-                stderr=e.stderr or "",
-                returncode=-1,
-                duration=duration,
-                timed_out=True
-            )
-            
         except (OSError, subprocess.SubprocessError) as e:
-            duration = time.time() - start_time
+            duration = _elapsed(start_ns)
             
             logger.error(
                 "BinaryExecutor failed: binary=%s error=%s duration=%.3fs",
@@ -237,8 +938,22 @@ class BinaryExecutor:
                 binary_path=binary_path
             ) from e
         
+        spawn_time = _elapsed(start_ns)
+        stdout = _CappedBuffer(max_output_bytes)
+        stderr = _CappedBuffer(max_output_bytes)
+        
+        try:
+            self._apply_child_limits(process.pid, apply_limits, rlimits)
+            timed_out = self._communicate_capped(process, stdout, stderr, timeout)
+            
+            if timed_out:
+                self._terminate_process_group(process, stdout, stderr)
+            rusage = _reap(process)
+            
         except Exception as e:
-            duration = time.time() - start_time
+            self._kill_process_group(process)
+            _reap(process)
+            duration = _elapsed(start_ns)
             
             logger.error(
                 "BinaryExecutor unexpected error: binary=%s error=%s duration=%.3fs",
@@ -249,23 +964,517 @@ class BinaryExecutor:
                 f"Unexpected execution error: {e}",
                 binary_path=binary_path
             ) from e
+        
+        finally:
+            process.stdout.close()
+            process.stderr.close()
+        
+        return self._finish(
+            binary_path, process.returncode, stdout, stderr,
+            _elapsed(start_ns), timed_out, timeout,
+            _usage(rusage, spawn_time)
+        )
+    
+    async def execute_async(
+        self,
+        args: List[str],
+        timeout: Optional[float] = None,
+        apply_limits: bool = True,
+        max_output_bytes: int = MAX_OUTPUT_BYTES,
+        input_size: int = 0,
+        stdout_fd: Optional[int] = None,
+        stdin_fd: Optional[int] = None
+    ) -> ExecutionResult:
+        """Execute binary without blocking the event loop.
+        
+        Asynchronous counterpart of execute(). Output pipes and the child's
+        exit (via a pidfd where the platform supports it) are watched by the
+        event loop, so concurrent tool calls keep running while a long
+        sed/awk/diff job is in progress. The child is reaped with wait4(2)
+        and its resource usage recorded on the result.
+        
+        When a scheduler is configured, the call first waits for an
+        execution slot; queue time does not count against the timeout.
+        
+        Args:
+            args: Command and argument list (first element is binary name)
+            timeout: Execution timeout in seconds (default: scaled from
+                the binary's limits and input_size)
+            apply_limits: Whether to apply resource limits (default: True)
+            max_output_bytes: Cap per output stream in bytes (default: 32MB)
+            input_size: Bytes of input the command will process; scales
+                the default timeout, RLIMIT_AS and RLIMIT_CPU
+            stdout_fd: Open file descriptor the child writes its standard
+                output to directly. Output is then neither captured nor
+                capped and the result's stdout is empty; the caller keeps
+                ownership of the descriptor.
+            stdin_fd: Open file descriptor the child reads its standard
+                input from, starting at the descriptor's current offset
+                (default: /dev/null); the caller keeps ownership of it.
+            
+        Returns:
+            ExecutionResult with stdout, stderr, returncode, and duration
+            
+        Raises:
+            ServerBusyError: If the scheduler cannot admit the execution
+            ExecutionError: If execution fails unexpectedly
+        """
+        timeout, rlimits = self._limits_for(args, timeout, input_size)
+        binary_path, cmd = self._build_command(args, apply_limits, rlimits)
+        
+        if self.scheduler is not None:
+            async with self.scheduler.slot(args[0]):
+                return await self._run_async(
+                    binary_path, cmd, timeout, apply_limits, max_output_bytes, rlimits,
+                    stdout_fd, stdin_fd
+                )
+        
+        return await self._run_async(
+            binary_path, cmd, timeout, apply_limits, max_output_bytes, rlimits,
+            stdout_fd, stdin_fd
+        )
+    
+    async def _run_async(
+        self,
+        binary_path: str,
+        cmd: List[str],
+        timeout: float,
+        apply_limits: bool,
+        max_output_bytes: int,
+        rlimits: Tuple[int, int],
+        stdout_fd: Optional[int] = None,
+        stdin_fd: Optional[int] = None
+    ) -> ExecutionResult:
+        """Spawn the child and collect its output (see execute_async)."""
+        kwargs = self._popen_kwargs(apply_limits, rlimits)
+        
+        logger.debug(
+            "BinaryExecutor executing async: binary=%s args=%s timeout=%s",
+            binary_path, cmd[1:], timeout
+        )
+        
+        loop = asyncio.get_running_loop()
+        start_ns = time.perf_counter_ns()
+        try:
+            process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.DEVNULL if stdin_fd is None else stdin_fd,
+                stdout=subprocess.PIPE if stdout_fd is None else stdout_fd,
+                stderr=subprocess.PIPE,
+                **kwargs
+            )
+            self._apply_child_limits(process.pid, apply_limits, rlimits)
+        except (OSError, subprocess.SubprocessError) as e:
+            duration = _elapsed(start_ns)
+            
+            logger.error(
+                "BinaryExecutor failed: binary=%s error=%s duration=%.3fs",
+                binary_path, str(e), duration
+            )
+            
+            raise ExecutionError(
+                f"Execution failed: {e}",
+                binary_path=binary_path
+            ) from e
+        
+        spawn_time = _elapsed(start_ns)
+        stdout = _CappedBuffer(max_output_bytes)
+        stderr = _CappedBuffer(max_output_bytes)
+        
+        def _on_overflow() -> None:
+            self._kill_process_group(process)
+        
+        timed_out = False
+        try:
+            try:
+                rusage = await asyncio.wait_for(
+                    _collect_async(loop, process, stdout, stderr, _on_overflow),
+                    timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                timed_out = True
+                await self._terminate_process_group_async(loop, process, stdout, stderr)
+                rusage = await _reap_async(loop, process)
+        except asyncio.CancelledError:
+            # Caller went away - do not leave the child running or unreaped
+            if process.returncode is None:
+                self._kill_process_group(process)
+                loop.run_in_executor(None, _reap, process)
+            raise
+        finally:
+            for pipe in (process.stdout, process.stderr):
+                if pipe is not None:
+                    pipe.close()
+        
+        return self._finish(
+            binary_path, process.returncode, stdout, stderr,
+            _elapsed(start_ns), timed_out, timeout,
+            _usage(rusage, spawn_time)
+        )
+    
+    def _finish(
+        self,
+        binary_path: str,
+        returncode: int,
+        stdout: "_CappedBuffer",
+        stderr: "_CappedBuffer",
+        duration: float,
+        timed_out: bool,
+        timeout: float,
+        usage: Optional[ResourceUsage] = None
+    ) -> ExecutionResult:
+        """Build the ExecutionResult and log the outcome."""
+        truncated = stdout.truncated or stderr.truncated
+        
+        if timed_out:
+            logger.warning(
+                "BinaryExecutor timeout: binary=%s timeout=%s duration=%.3fs",
+                binary_path, timeout, duration
+            )
+            returncode = -1
+        elif truncated:
+            logger.warning(
+                "BinaryExecutor output cap reached: binary=%s limit=%d duration=%.3fs",
+                binary_path, stdout.limit, duration
+            )
+        else:
+            logger.debug(
+                "BinaryExecutor completed: binary=%s returncode=%d duration=%.3fs usage=%s",
+                binary_path, returncode, duration, usage
+            )
+        
+        return ExecutionResult(
+            stdout=bytes(stdout.data),
+            stderr=bytes(stderr.data),
+            returncode=returncode,
+            duration=duration,
+            timed_out=timed_out,
+            truncated=truncated,
+            usage=usage
+        )
+    
+    def _communicate_capped(
+        self,
+        process: subprocess.Popen,
+        stdout: "_CappedBuffer",
+        stderr: "_CappedBuffer",
+        timeout: float
+    ) -> bool:
+        """Read both pipes incrementally until EOF, the cap, or the deadline.
+        
+        Args:
+            process: Running child process with stdout/stderr pipes
+            stdout: Buffer for standard output
+            stderr: Buffer for standard error
+            timeout: Seconds until the deadline
+            
+        Returns:
+            True if the deadline passed before both pipes reached EOF
+        """
+        deadline = time.monotonic() + timeout
+        
+        with selectors.DefaultSelector() as selector:
+            selector.register(process.stdout, selectors.EVENT_READ, stdout)
+            selector.register(process.stderr, selectors.EVENT_READ, stderr)
+            
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return True
+                
+                for key, _ in selector.select(remaining):
+                    chunk = os.read(key.fd, READ_CHUNK_SIZE)
+                    if not chunk:
+                        selector.unregister(key.fileobj)
+                    elif not key.data.feed(chunk):
+                        self._kill_process_group(process)
+        
+        return False
+    
+    def _terminate_process_group(
+        self,
+        process: subprocess.Popen,
+        stdout: "_CappedBuffer",
+        stderr: "_CappedBuffer"
+    ) -> None:
+        """Stop a job that hit its deadline, salvaging output written so far.
+        
+        The group gets SIGTERM, then the pipes are drained for up to
+        TERM_GRACE_PERIOD, which ends as soon as every writer has exited.
+        Whatever remains of the group is then killed with SIGKILL. The
+        child is not reaped yet, so its pid still holds the process group id
+        and the final killpg cannot hit an unrelated group.
+        
+        Args:
+            process: Child started by subprocess.Popen
+            stdout: Buffer for standard output
+            stderr: Buffer for standard error
+        """
+        self._signal_process_group(process, signal.SIGTERM)
+        if self._communicate_capped(process, stdout, stderr, self.TERM_GRACE_PERIOD):
+            logger.warning(
+                "BinaryExecutor escalating to SIGKILL: pid=%d grace=%.3fs",
+                process.pid, self.TERM_GRACE_PERIOD
+            )
+        self._kill_process_group(process)
+    
+    async def _terminate_process_group_async(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        process: subprocess.Popen,
+        stdout: "_CappedBuffer",
+        stderr: "_CappedBuffer"
+    ) -> None:
+        """Asynchronous counterpart of _terminate_process_group()."""
+        self._signal_process_group(process, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(
+                    _drain_async(loop, pipe, buffer, lambda: None)
+                    for pipe, buffer in _open_pipes(process, stdout, stderr)
+                )),
+                timeout=self.TERM_GRACE_PERIOD
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                "BinaryExecutor escalating to SIGKILL: pid=%d grace=%.3fs",
+                process.pid, self.TERM_GRACE_PERIOD
+            )
+        self._kill_process_group(process)
+    
+    def _kill_process_group(self, process: Any) -> None:
+        """Kill the child and every process in its process group.
+        
+        Children are started in their own session, so the process group id
+        equals the child pid.
+        
+        Args:
+            process: subprocess.Popen
+        """
+        self._signal_process_group(process, signal.SIGKILL)
     
-    def _set_limits(self) -> None:
+    def _signal_process_group(self, process: Any, sig: int) -> None:
+        """Send a signal to every process in the child's process group.
+        
+        Args:
+            process: subprocess.Popen
+            sig: Signal number
+        """
+        if process.returncode is not None:
+            return
+        try:
+            os.killpg(process.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            # Group already gone (or not ours); make sure the direct child gets it
+            try:
+                process.send_signal(sig)
+            except ProcessLookupError:
+                pass
+    
+    def _limits_for(
+        self,
+        args: List[str],
+        timeout: Optional[float],
+        input_size: int
+    ) -> Tuple[float, Tuple[int, int]]:
+        """Resolve the timeout and resource limits for one execution.
+        
+        Args:
+            args: Command and argument list (first element is binary name)
+            timeout: Explicit timeout in seconds, or None to scale it
+            input_size: Bytes of input the command will process
+            
+        Returns:
+            Tuple of (timeout, (RLIMIT_AS bytes, RLIMIT_CPU seconds))
+        """
+        tool_limits = self.limits.for_tool(args[0] if args else '')
+        if timeout is None:
+            timeout = tool_limits.timeout_for(input_size)
+        rlimits = (
+            tool_limits.memory_limit_for(input_size),
+            max(tool_limits.cpu_limit_for(input_size), math.ceil(timeout))
+        )
+        return timeout, rlimits
+    
+    def _build_command(
+        self,
+        args: List[str],
+        apply_limits: bool = False,
+        rlimits: Optional[Tuple[int, int]] = None
+    ) -> Tuple[str, List[str]]:
+        """Resolve binary name and build the command array.
+        
+        With the prlimit shim backend, the command is prefixed with
+        'prlimit --as=N --cpu=N --' so limits are in place before the
+        target binary starts.
+        
+        Args:
+            args: Command and argument list (first element is binary name)
+            apply_limits: Whether resource limits will be applied
+            rlimits: (RLIMIT_AS bytes, RLIMIT_CPU seconds) for the shim
+                (default: the binary's limits for an empty input)
+            
+        Returns:
+            Tuple of (binary path, full command list)
+            
+        Raises:
+            ExecutionError: If args is empty
+        """
+        if not args:
+            raise ExecutionError("Empty command arguments")
+        
+        # Get binary name and resolve to full path
+        binary_name = args[0]
+        if binary_name == 'sed':
+            binary_path = self.config.sed_path
+        elif binary_name == 'awk':
+            binary_path = self.config.awk_path
+        elif binary_name == 'diff':
+            binary_path = self.config.diff_path
+        else:
+            # For other commands (like 'echo', 'sleep'), use as-is
+            binary_path = binary_name
+        
+        # Build command array - binary path + arguments (excluding first arg)
+        cmd = [binary_path] + args[1:]
+        
+        if (apply_limits and self._has_resource_limits
+                and self.spawn_backend == self.SPAWN_PRLIMIT_SHIM):
+            memory_bytes, cpu_seconds = rlimits or self._limits_for(args, None, 0)[1]
+            cmd = [
+                self.config.prlimit_path,
+                f'--as={memory_bytes}',
+                f'--cpu={cpu_seconds}',
+                '--'
+            ] + cmd
+        
+        return binary_path, cmd
+    
+    def _popen_kwargs(
+        self,
+        apply_limits: bool,
+        rlimits: Optional[Tuple[int, int]] = None
+    ) -> Dict[str, Any]:
+        """Build process creation kwargs shared by sync and async execution.
+        
+        Spawn backends other than 'preexec' leave preexec_fn unset so
+        CPython can use vfork (or posix_spawn) instead of fork. From Python
+        3.10, vfork is used with close_fds on, so descriptors other than the
+        stdio pipes are closed in the child as before. Python 3.9 only
+        avoids fork through posix_spawn, which it uses only with close_fds
+        off; there the child relies on descriptors being non-inheritable by
+        default (PEP 446).
+        
+        Args:
+            apply_limits: Whether to apply resource limits
+            rlimits: (RLIMIT_AS bytes, RLIMIT_CPU seconds) for preexec_fn
+                (default: the default limits for an empty input)
+            
+        Returns:
+            Keyword arguments for subprocess/asyncio process creation
+        """
+        kwargs: Dict[str, Any] = {
+            'shell': False,  # Critical security requirement - no shell injection
+            'start_new_session': True  # Own process group, killed as a unit
+        }
+        
+        if self.spawn_backend == self.SPAWN_PREEXEC:
+            # Apply resource limits on supported platforms
+            if apply_limits and self._has_resource_limits:
+                memory_bytes, cpu_seconds = rlimits or self._limits_for([], None, 0)[1]
+                kwargs['preexec_fn'] = functools.partial(
+                    self._set_limits, memory_bytes, cpu_seconds
+                )
+                logger.debug("BinaryExecutor applying resource limits")
+        elif sys.version_info < (3, 10):
+            kwargs['close_fds'] = False
+        
+        return kwargs
+    
+    def _apply_child_limits(
+        self,
+        pid: int,
+        apply_limits: bool,
+        rlimits: Tuple[int, int]
+    ) -> None:
+        """Apply resource limits to a freshly spawned child (posix_spawn backend).
+        
+        Uses prlimit(2) on the child pid from the parent, so no Python code
+        runs between fork and exec. The child has already exec'd by then:
+        until the limits land, it runs without RLIMIT_AS and RLIMIT_CPU (see
+        _select_spawn_backend).
+        
+        Args:
+            pid: Child process id
+            apply_limits: Whether resource limits were requested
+            rlimits: (RLIMIT_AS bytes, RLIMIT_CPU seconds)
+        """
+        if not (apply_limits and self._has_resource_limits
+                and self.spawn_backend == self.SPAWN_POSIX):
+            return
+        
+        memory_bytes, cpu_seconds = rlimits
+        try:
+            resource.prlimit(pid, resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+            resource.prlimit(pid, resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+        except (OSError, ValueError) as e:
+            # The child may already have exited, having run unlimited
+            logger.warning("BinaryExecutor prlimit failed: pid=%d error=%s", pid, e)
+    
+    def _select_spawn_backend(self, requested: str) -> str:
+        """Choose the process spawn backend.
+        
+        'auto' prefers the prlimit(1) exec shim on Linux: it sets the limits
+        before exec'ing the binary, like preexec_fn, while the server still
+        spawns with vfork/posix_spawn. Without the prlimit binary it falls
+        back to posix_spawn with prlimit(2) on the child pid. That leaves a
+        short window after exec in which the binary runs without limits.
+        Where prlimit(2) is unavailable, preexec_fn is used.
+        
+        Args:
+            requested: Requested backend name or 'auto'
+            
+        Returns:
+            Backend name
+            
+        Raises:
+            ValueError: If the backend is unknown or unsupported
+        """
+        has_prlimit = self._has_resource_limits and hasattr(resource, 'prlimit')
+        
+        if requested == 'auto':
+            if self._has_resource_limits and getattr(self.config, 'prlimit_path', None):
+                return self.SPAWN_PRLIMIT_SHIM
+            return self.SPAWN_POSIX if has_prlimit else self.SPAWN_PREEXEC
+        
+        if requested not in self.SPAWN_BACKENDS:
+            raise ValueError(
+                f"Unknown spawn backend '{requested}' "
+                f"(expected one of: auto, {', '.join(self.SPAWN_BACKENDS)})"
+            )
+        if requested == self.SPAWN_POSIX and not has_prlimit and self._has_resource_limits:
+            raise ValueError("posix_spawn backend requires resource.prlimit")
+        if requested == self.SPAWN_PRLIMIT_SHIM and not getattr(self.config, 'prlimit_path', None):
+            raise ValueError("prlimit spawn backend requires the prlimit binary in PATH")
+        
+        return requested
+    
+    def _set_limits(self, memory_bytes: int, cpu_seconds: int) -> None:
         """Set resource limits for subprocess (Linux/Unix only).
         
-        This function is called as preexec_fn in subprocess.run() to set
-        resource limits before the child process executes the target binary.
+        This function is called as preexec_fn by the legacy 'preexec' spawn
+        backend to set resource limits before the child process executes the
+        target binary.
         
-        Limits applied:
-        - Memory (RLIMIT_AS): 100MB virtual memory
-        - CPU time (RLIMIT_CPU): 30 seconds of CPU time
+        Args:
+            memory_bytes: Virtual memory limit (RLIMIT_AS)
+            cpu_seconds: CPU time limit (RLIMIT_CPU)
         
         Note: This method is only called on platforms where the resource
         module is available (typically Linux/Unix).
         """
         try:
             # Set memory limit (virtual memory)
-            memory_bytes = self.MEMORY_LIMIT_MB * 1024 * 1024
             resource.setrlimit(
                 resource.RLIMIT_AS,
                 (memory_bytes, memory_bytes)
@@ -274,11 +1483,174 @@ class BinaryExecutor:
             # Set CPU time limit
             resource.setrlimit(
                 resource.RLIMIT_CPU,
-                (self.CPU_TIME_LIMIT, self.CPU_TIME_LIMIT)
+                (cpu_seconds, cpu_seconds)
             )
             
         except (OSError, AttributeError) as e:
             # Log but don't fail - resource limits are best effort
             # This will be logged from the parent process context
             # since preexec_fn runs in the child process
-            pass
\ No newline at end of file
+            pass
+
+
+def _elapsed(start_ns: int) -> float:
+    """Seconds since a time.perf_counter_ns() reading."""
+    return (time.perf_counter_ns() - start_ns) / 1_000_000_000
+
+
+def _usage(rusage: Any, spawn_time: float) -> Optional[ResourceUsage]:
+    """Convert wait4 rusage to ResourceUsage (None if it was unavailable)."""
+    return ResourceUsage.from_rusage(rusage, spawn_time) if rusage is not None else None
+
+
+def _reap(process: subprocess.Popen) -> Any:
+    """Wait for a child with wait4(2) and record its exit status.
+    
+    Sets process.returncode the way Popen.wait() would, so the Popen object
+    never tries to reap the pid again.
+    
+    Args:
+        process: Child started by subprocess.Popen
+        
+    Returns:
+        resource.struct_rusage of the child, or None where wait4 is
+        unavailable or the child was already reaped
+    """
+    if process.returncode is not None or not hasattr(os, 'wait4'):
+        process.wait()
+        return None
+    try:
+        _, status, rusage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        process.wait()
+        return None
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return rusage
+
+
+async def _reap_async(loop: asyncio.AbstractEventLoop, process: subprocess.Popen) -> Any:
+    """Wait for a child to exit without blocking the event loop, then reap it.
+    
+    Exit is detected through a pidfd registered with the loop where the
+    platform supports pidfd_open(); elsewhere wait4 is polled with WNOHANG.
+    
+    Args:
+        loop: Running event loop
+        process: Child started by subprocess.Popen
+        
+    Returns:
+        resource.struct_rusage of the child, or None if unavailable
+    """
+    if process.returncode is not None or not hasattr(os, 'wait4'):
+        await loop.run_in_executor(None, process.wait)
+        return None
+    
+    try:
+        pidfd = os.pidfd_open(process.pid)
+    except (AttributeError, OSError):
+        pidfd = None
+    
+    try:
+        delay = 0.001
+        while True:
+            try:
+                pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+            except ChildProcessError:
+                await loop.run_in_executor(None, process.wait)
+                return None
+            if pid:
+                process.returncode = os.waitstatus_to_exitcode(status)
+                return rusage
+            
+            if pidfd is None:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.05)
+                continue
+            
+            exited = loop.create_future()
+            loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+            try:
+                await exited
+            finally:
+                loop.remove_reader(pidfd)
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+
+
+async def _drain_async(
+    loop: asyncio.AbstractEventLoop,
+    pipe: Any,
+    buffer: _CappedBuffer,
+    on_overflow
+) -> None:
+    """Read a child pipe into a capped buffer until EOF or overflow.
+    
+    Args:
+        loop: Running event loop
+        pipe: Child output pipe (binary file object)
+        buffer: Destination buffer
+        on_overflow: Callback invoked once when the cap is exceeded
+    """
+    fd = pipe.fileno()
+    os.set_blocking(fd, False)
+    finished = loop.create_future()
+    
+    def _on_readable() -> None:
+        try:
+            chunk = os.read(fd, READ_CHUNK_SIZE)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            loop.remove_reader(fd)
+            if not finished.done():
+                finished.set_exception(e)
+            return
+        if chunk and buffer.feed(chunk):
+            return
+        loop.remove_reader(fd)
+        if chunk:
+            on_overflow()
+        if not finished.done():
+            finished.set_result(None)
+    
+    loop.add_reader(fd, _on_readable)
+    try:
+        await finished
+    finally:
+        loop.remove_reader(fd)
+
+
+async def _collect_async(
+    loop: asyncio.AbstractEventLoop,
+    process: subprocess.Popen,
+    stdout: _CappedBuffer,
+    stderr: _CappedBuffer,
+    on_overflow
+) -> Any:
+    """Drain both pipes and reap the child (see BinaryExecutor._run_async).
+    
+    Returns:
+        resource.struct_rusage of the child, or None if unavailable
+    """
+    await asyncio.gather(*(
+        _drain_async(loop, pipe, buffer, on_overflow)
+        for pipe, buffer in _open_pipes(process, stdout, stderr)
+    ))
+    return await _reap_async(loop, process)
+
+
+def _open_pipes(
+    process: subprocess.Popen,
+    stdout: _CappedBuffer,
+    stderr: _CappedBuffer
+) -> List[Tuple[Any, _CappedBuffer]]:
+    """Pair the child's output pipes with their buffers.
+    
+    stdout is not a pipe when it was redirected to a file descriptor.
+    """
+    return [
+        (pipe, buffer)
+        for pipe, buffer in ((process.stdout, stdout), (process.stderr, stderr))
+        if pipe is not None
+    ]
@@ -0,0 +1,299 @@
+"""File replacement and backup primitives for the editing tools.
+
+This module provides atomic file replacement (sibling temporary file plus
+rename), staging files that external programs write into before they are
+renamed into place, and cheap file copies for backups: a reflink clone where the
+filesystem supports it (btrfs, XFS, bcachefs, ...), in-kernel
+copy_file_range(2) otherwise, and a streamed copy as the last resort.
+"""
+
+import errno
+import glob
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Iterable, List, Tuple, Union
+
+# fcntl is POSIX-only; reflinks are attempted only where it is available
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+# Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
+
+logger = logging.getLogger(__name__)
+
+# ioctl(2) request that shares the extents of one file with another (linux/fs.h)
+FICLONE = 0x40049409
+
+# Largest chunk requested per copy_file_range(2) call
+COPY_CHUNK_BYTES = 1 << 30
+
+# errno values meaning "not supported here", as opposed to a real I/O failure
+_UNSUPPORTED_ERRNOS = frozenset(
+    getattr(errno, name) for name in (
+        'EOPNOTSUPP', 'ENOTSUP', 'ENOTTY', 'EXDEV', 'EINVAL', 'ENOSYS', 'EBADF', 'EPERM'
+    ) if hasattr(errno, name)
+)
+
+# Copy methods reported by copy_file()
+COPY_REFLINK = 'reflink'
+COPY_FILE_RANGE = 'copy_file_range'
+COPY_STREAM = 'stream'
+
+# Chunk size for comparing staged output with its original
+COMPARE_CHUNK_BYTES = 1 << 20
+
+# Process umask, applied to newly created files staged with mkstemp (mode 0600)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def sibling_temp(target: Path) -> Tuple[int, Path]:
+    """Create an empty staging file next to target.
+    
+    The staging file lives in target's directory so that replace_with() is
+    a rename within one filesystem.
+    
+    Args:
+        target: File the staged content is meant to replace
+    
+    Returns:
+        Tuple of (open file descriptor, staging file path); the caller owns
+        both and must close the descriptor
+    """
+    fd, tmp_name = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.", suffix='.tmp')
+    return fd, Path(tmp_name)
+
+
+def replace_with(staged: Path, target: Path) -> None:
+    """Rename a staged file over target.
+    
+    An existing target's permission bits are carried over; a new target
+    gets the default mode for the process umask.
+    
+    Args:
+        staged: File created by sibling_temp()
+        target: File to replace or create
+    
+    Raises:
+        OSError: If the mode cannot be set or the rename fails
+    """
+    if target.exists():
+        shutil.copymode(target, staged)
+    else:
+        os.chmod(staged, 0o666 & ~_UMASK)
+    os.replace(staged, target)
+
+
+def files_equal(first: Path, second: Path) -> bool:
+    """Compare two files byte for byte in bounded memory.
+    
+    Args:
+        first: File to compare
+        second: File to compare
+    
+    Returns:
+        True if both files have identical content
+    """
+    if first.stat().st_size != second.stat().st_size:
+        return False
+    with open(first, 'rb') as a, open(second, 'rb') as b:
+        while True:
+            chunk = a.read(COMPARE_CHUNK_BYTES)
+            if chunk != b.read(COMPARE_CHUNK_BYTES):
+                return False
+            if not chunk:
+                return True
+
+
+def regions_equal(first_fd: int, second_fd: int, offset: int, length: int) -> bool:
+    """Compare the same byte range of two open files in bounded memory.
+    
+    Args:
+        first_fd: File descriptor to compare
+        second_fd: File descriptor to compare
+        offset: Start of the range in both files
+        length: Length of the range in bytes
+    
+    Returns:
+        True if both files hold identical bytes in the range
+    """
+    end = offset + length
+    while offset < end:
+        size = min(COMPARE_CHUNK_BYTES, end - offset)
+        chunk = os.pread(first_fd, size, offset)
+        if not chunk or chunk != os.pread(second_fd, size, offset):
+            return False
+        offset += len(chunk)
+    return True
+
+
+def copy_range(src_fd: int, dst_fd: int, offset: int, length: int) -> None:
+    """Append a byte range of one open file to another.
+    
+    Data is written at the current offset of dst_fd, which is advanced;
+    the offset of src_fd is left unchanged. copy_file_range(2) is used
+    where available, so the kernel copies (or shares) the blocks without
+    passing them through user space.
+    
+    Args:
+        src_fd: File descriptor to copy from
+        dst_fd: File descriptor to copy to
+        offset: Start of the range in the source
+        length: Length of the range in bytes
+    
+    Raises:
+        OSError: If the source ends before the range or a write fails
+    """
+    end = offset + length
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while offset < end:
+                copied = os.copy_file_range(
+                    src_fd, dst_fd, min(COPY_CHUNK_BYTES, end - offset), offset
+                )
+                if not copied:
+                    break
+                offset += copied
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+    
+    while offset < end:
+        chunk = os.pread(src_fd, min(COMPARE_CHUNK_BYTES, end - offset), offset)
+        if not chunk:
+            break
+        view = memoryview(chunk)
+        while view:
+            view = view[os.write(dst_fd, view):]
+        offset += len(chunk)
+    
+    if offset < end:
+        raise OSError(errno.EIO, f"Source ended {end - offset} bytes before the copied range")
+
+
+def write_atomic(target: Path, data: bytes) -> None:
+    """Replace a file's content via a sibling temporary file and rename.
+    
+    The file mode of the original is preserved. Readers see either the old
+    or the new content, never a partially written file.
+    
+    Args:
+        target: File to replace
+        data: New file content
+    """
+    fd, staged = sibling_temp(target)
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(data)
+        replace_with(staged, target)
+    except BaseException:
+        staged.unlink(missing_ok=True)
+        raise
+
+
+def expand_glob(pattern: str, directories: Iterable[str]) -> List[str]:
+    """Expand a glob pattern to the regular files it matches.
+    
+    A relative pattern is expanded under every directory; '**' matches
+    across directory levels.
+    
+    Args:
+        pattern: Glob pattern, absolute or relative
+        directories: Directories a relative pattern is expanded under
+    
+    Returns:
+        Sorted matching file paths, without duplicates
+    """
+    if os.path.isabs(pattern):
+        patterns = [pattern]
+    else:
+        patterns = [os.path.join(d, pattern) for d in directories]
+    matches = set()
+    for full_pattern in patterns:
+        matches.update(
+            match for match in glob.glob(full_pattern, recursive=True) if os.path.isfile(match)
+        )
+    return sorted(matches)
+
+
+def copy_file(src: Union[str, Path], dst: Union[str, Path]) -> str:
+    """Copy a file with its metadata, as cheaply as the filesystem allows.
+    
+    The copy is written to a sibling temporary file and renamed over dst,
+    so dst never holds a partial copy. Permission bits and timestamps are
+    copied as by shutil.copy2().
+    
+    Args:
+        src: File to copy
+        dst: Destination path (replaced if it exists)
+    
+    Returns:
+        Method used: 'reflink', 'copy_file_range' or 'stream'
+    
+    Raises:
+        OSError: If the file cannot be read or the copy cannot be written
+    """
+    dst = Path(dst)
+    fd, tmp_name = tempfile.mkstemp(dir=dst.parent, prefix=f".{dst.name}.", suffix='.tmp')
+    try:
+        with open(src, 'rb') as fsrc, os.fdopen(fd, 'wb') as fdst:
+            method = _copy_data(fsrc, fdst)
+        shutil.copystat(src, tmp_name)
+        os.replace(tmp_name, dst)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    
+    logger.debug("copy_file: %s -> %s via %s", src, dst, method)
+    return method
+
+
+def restore_file(backup: Union[str, Path], target: Union[str, Path]) -> None:
+    """Put a backup back in place of its original with a single rename.
+    
+    The backup is consumed: afterwards it exists only as the target.
+    
+    Args:
+        backup: Backup created by copy_file()
+        target: File to restore
+    
+    Raises:
+        OSError: If the rename fails
+    """
+    os.replace(backup, target)
+
+
+def _copy_data(fsrc, fdst) -> str:
+    """Copy all data between two open files, trying the cheapest method first."""
+    src_fd = fsrc.fileno()
+    dst_fd = fdst.fileno()
+    
+    if HAS_FCNTL:
+        try:
+            fcntl.ioctl(dst_fd, FICLONE, src_fd)
+            return COPY_REFLINK
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+    
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while os.copy_file_range(src_fd, dst_fd, COPY_CHUNK_BYTES):
+                pass
+            return COPY_FILE_RANGE
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+            # Start over: a failed call may have copied part of the data
+            os.ftruncate(dst_fd, 0)
+            os.lseek(src_fd, 0, os.SEEK_SET)
+            os.lseek(dst_fd, 0, os.SEEK_SET)
+    
+    shutil.copyfileobj(fsrc, fdst)
+    return COPY_STREAM
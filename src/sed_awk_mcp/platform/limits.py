@@ -0,0 +1,328 @@
+"""Resource limits and timeouts for tool executions.
+
+This module provides the single source of per-tool limits: input size
+admission tiers, execution timeout, address-space (RLIMIT_AS) and CPU
+(RLIMIT_CPU) limits. Limits are loaded once at startup from built-in
+defaults, an optional TOML file and environment variables, and scale with
+input size so small inputs run under tight limits while large inputs get
+room to finish.
+"""
+
+import logging
+import math
+import os
+from typing import Any, Dict, Mapping, Optional
+
+# TOML support: tomllib on Python 3.11+, the tomli backport before that
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+# Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
+
+logger = logging.getLogger(__name__)
+
+MIB = 1024 * 1024
+
+
+class ToolLimits:
+    """Limits applied to the executions of one tool.
+    
+    The timeout and the address-space limit grow linearly with the input
+    size, up to a ceiling:
+        
+        timeout(size) = min(max_timeout, timeout + timeout_per_mb * size_mb)
+        memory(size)  = min(max_memory_mb, memory_limit_mb + memory_per_mb * size_mb)
+    
+    RLIMIT_CPU is set to the scaled timeout rounded up; a single-threaded
+    child cannot use more CPU than wall time, so it only catches children
+    that outlive the deadline.
+    
+    Inputs are admitted in two tiers. Up to max_file_size they are processed
+    in memory; larger inputs up to max_stream_file_size are streamed through
+    the binaries with their output written to files, and their timeout may
+    grow up to stream_max_timeout instead of max_timeout.
+    
+    Attributes:
+        max_file_size: Largest input in bytes processed in memory
+        timeout: Timeout in seconds for an empty input
+        timeout_per_mb: Additional seconds per MiB of input
+        max_timeout: Upper bound on the scaled timeout in seconds
+        memory_limit_mb: Address-space limit in MiB for an empty input
+        memory_per_mb: Additional MiB of address space per MiB of input
+        max_memory_mb: Upper bound on the scaled address-space limit in MiB
+        max_stream_file_size: Largest input in bytes accepted for streaming;
+            0 or a value up to max_file_size disables streaming
+        stream_max_timeout: Upper bound on the scaled timeout in seconds
+            for streamed inputs
+    """
+    
+    FIELDS = {
+        'max_file_size': int,
+        'timeout': float,
+        'timeout_per_mb': float,
+        'max_timeout': float,
+        'memory_limit_mb': int,
+        'memory_per_mb': float,
+        'max_memory_mb': int,
+        'max_stream_file_size': int,
+        'stream_max_timeout': float,
+    }
+    
+    def __init__(
+        self,
+        max_file_size: int = 10 * MIB,
+        timeout: float = 10.0,
+        timeout_per_mb: float = 2.0,
+        max_timeout: float = 30.0,
+        memory_limit_mb: int = 100,
+        memory_per_mb: float = 8.0,
+        max_memory_mb: int = 1024,
+        max_stream_file_size: int = 4096 * MIB,
+        stream_max_timeout: float = 600.0
+    ) -> None:
+        """Initialize ToolLimits (see class attributes).
+        
+        Raises:
+            ValueError: If a limit is not positive or a base value exceeds
+                its ceiling
+        """
+        self.max_file_size = max_file_size
+        self.timeout = timeout
+        self.timeout_per_mb = timeout_per_mb
+        self.max_timeout = max_timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.memory_per_mb = memory_per_mb
+        self.max_memory_mb = max_memory_mb
+        self.max_stream_file_size = max_stream_file_size
+        self.stream_max_timeout = stream_max_timeout
+        
+        for name in ('max_file_size', 'timeout', 'max_timeout', 'memory_limit_mb',
+                     'max_memory_mb', 'stream_max_timeout'):
+            if getattr(self, name) <= 0:
+                raise ValueError(f"Limit '{name}' must be positive")
+        if self.timeout_per_mb < 0 or self.memory_per_mb < 0:
+            raise ValueError("Per-MiB limit increments must be >= 0")
+        if self.max_stream_file_size < 0:
+            raise ValueError("Limit 'max_stream_file_size' must be >= 0")
+        if self.timeout > self.max_timeout or self.memory_limit_mb > self.max_memory_mb:
+            raise ValueError("Base timeout and memory limit must not exceed their maximums")
+    
+    def replace(self, **changes: Any) -> "ToolLimits":
+        """Return a copy with some fields changed.
+        
+        Raises:
+            ValueError: If a field name is unknown or a value is invalid
+        """
+        unknown = set(changes) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown limit: {', '.join(sorted(unknown))}")
+        values = self.as_dict()
+        values.update(changes)
+        return ToolLimits(**values)
+    
+    @property
+    def admission_limit(self) -> int:
+        """Largest accepted input in bytes, in either tier."""
+        return max(self.max_file_size, self.max_stream_file_size)
+    
+    def streams(self, input_size: int) -> bool:
+        """Whether an input of input_size bytes is processed in streaming mode."""
+        return self.max_file_size < input_size and self.max_file_size < self.max_stream_file_size
+    
+    def timeout_for(self, input_size: int) -> float:
+        """Timeout in seconds for an input of input_size bytes."""
+        ceiling = self.max_timeout
+        if self.streams(input_size):
+            ceiling = max(ceiling, self.stream_max_timeout)
+        return min(ceiling, self.timeout + self.timeout_per_mb * input_size / MIB)
+    
+    def memory_limit_for(self, input_size: int) -> int:
+        """RLIMIT_AS in bytes for an input of input_size bytes."""
+        memory_mb = min(
+            self.max_memory_mb,
+            self.memory_limit_mb + self.memory_per_mb * input_size / MIB
+        )
+        return int(memory_mb * MIB)
+    
+    def cpu_limit_for(self, input_size: int) -> int:
+        """RLIMIT_CPU in whole seconds for an input of input_size bytes."""
+        return math.ceil(self.timeout_for(input_size))
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the limits as a dict keyed by field name."""
+        return {name: getattr(self, name) for name in self.FIELDS}
+    
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, ToolLimits) and self.as_dict() == other.as_dict()
+    
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{k}={v}" for k, v in self.as_dict().items())
+        return f"ToolLimits({fields})"
+
+
+class LimitsConfig:
+    """Per-tool limits for sed, awk and diff.
+    
+    Built-in defaults are overridden, in order, by a TOML file and by
+    environment variables. In the TOML file, top-level keys apply to every
+    tool and [sed], [awk] and [diff] tables override single tools:
+        
+        max_file_size = 20971520
+        max_stream_file_size = 10737418240
+        memory_limit_mb = 128
+        
+        [awk]
+        max_timeout = 120
+    
+    The environment uses SED_AWK_<FIELD> for every tool and
+    SED_AWK_<TOOL>_<FIELD> for one tool, e.g. SED_AWK_TIMEOUT=5 or
+    SED_AWK_AWK_MAX_MEMORY_MB=2048. SED_AWK_LIMITS_FILE names the TOML file.
+    """
+    
+    TOOLS = ('sed', 'awk', 'diff')
+    
+    # Environment variables read by load()
+    ENV_PREFIX = "SED_AWK_"
+    ENV_LIMITS_FILE = "SED_AWK_LIMITS_FILE"
+    
+    # Built-in per-tool changes to the ToolLimits defaults; awk programs do
+    # the most work per byte of input
+    BUILTIN_OVERRIDES: Dict[str, Dict[str, Any]] = {
+        'awk': {'timeout': 20.0, 'timeout_per_mb': 4.0, 'max_timeout': 60.0},
+    }
+    
+    def __init__(
+        self,
+        defaults: Optional[ToolLimits] = None,
+        per_tool: Optional[Mapping[str, ToolLimits]] = None
+    ) -> None:
+        """Initialize LimitsConfig.
+        
+        Args:
+            defaults: Limits for binaries without their own entry
+                (default: built-in defaults)
+            per_tool: Limits keyed by tool name; missing tools get the
+                built-in per-tool limits derived from defaults
+        
+        Raises:
+            ValueError: If per_tool names an unknown tool
+        """
+        self.defaults = defaults or ToolLimits()
+        per_tool = dict(per_tool or {})
+        unknown = set(per_tool) - set(self.TOOLS)
+        if unknown:
+            raise ValueError(f"Unknown tool in limits: {', '.join(sorted(unknown))}")
+        
+        self._per_tool: Dict[str, ToolLimits] = {}
+        for tool in self.TOOLS:
+            self._per_tool[tool] = per_tool.get(tool) or self.defaults.replace(
+                **self.BUILTIN_OVERRIDES.get(tool, {})
+            )
+    
+    @classmethod
+    def load(
+        cls,
+        path: Optional[str] = None,
+        environ: Optional[Mapping[str, str]] = None
+    ) -> "LimitsConfig":
+        """Load limits from built-in defaults, a TOML file and the environment.
+        
+        Args:
+            path: TOML file (default: $SED_AWK_LIMITS_FILE, if set)
+            environ: Environment mapping (default: os.environ)
+        
+        Returns:
+            Configured LimitsConfig
+        
+        Raises:
+            ValueError: If the file cannot be read or parsed, or a value is
+                unknown or invalid
+        """
+        environ = os.environ if environ is None else environ
+        path = path or environ.get(cls.ENV_LIMITS_FILE, '').strip() or None
+        
+        # Configured values per scope; None holds the all-tools settings
+        layers: Dict[Optional[str], Dict[str, Any]] = {None: {}}
+        layers.update({tool: {} for tool in cls.TOOLS})
+        sources = [cls._read_toml(path)] if path else []
+        sources.append(cls._read_env(environ))
+        for source in sources:
+            for scope, values in source.items():
+                layers[scope].update(values)
+        
+        # Configured all-tools values take precedence over built-in per-tool ones
+        defaults = ToolLimits().replace(**layers[None])
+        per_tool = {}
+        for tool in cls.TOOLS:
+            builtin = {
+                field: value for field, value in cls.BUILTIN_OVERRIDES.get(tool, {}).items()
+                if field not in layers[None]
+            }
+            per_tool[tool] = defaults.replace(**{**builtin, **layers[tool]})
+        return cls(defaults, per_tool)
+    
+    def for_tool(self, tool: str) -> ToolLimits:
+        """Limits for a binary name; other binaries get the defaults."""
+        return self._per_tool.get(tool, self.defaults)
+    
+    def describe(self) -> Dict[str, Dict[str, Any]]:
+        """Return the effective limits per tool (for startup logging)."""
+        return {tool: limits.as_dict() for tool, limits in self._per_tool.items()}
+    
+    @classmethod
+    def _read_toml(cls, path: str) -> Dict[Optional[str], Dict[str, Any]]:
+        """Parse a limits TOML file into per-scope field values."""
+        if tomllib is None:
+            raise ValueError(
+                f"Cannot read limits file {path}: TOML support requires "
+                f"Python 3.11+ or the 'tomli' package"
+            )
+        try:
+            with open(path, 'rb') as f:
+                document = tomllib.load(f)
+        except (OSError, tomllib.TOMLDecodeError) as e:
+            raise ValueError(f"Cannot read limits file {path}: {e}")
+        
+        scopes: Dict[Optional[str], Dict[str, Any]] = {None: {}}
+        for key, value in document.items():
+            if isinstance(value, dict):
+                if key not in cls.TOOLS:
+                    raise ValueError(f"Unknown tool in limits file {path}: [{key}]")
+                scopes[key] = {
+                    field: cls._convert(field, v, f"{path}: {key}.{field}")
+                    for field, v in value.items()
+                }
+            else:
+                scopes[None][key] = cls._convert(key, value, f"{path}: {key}")
+        return scopes
+    
+    @classmethod
+    def _read_env(cls, environ: Mapping[str, str]) -> Dict[Optional[str], Dict[str, Any]]:
+        """Collect SED_AWK_[<TOOL>_]<FIELD> variables into per-scope values."""
+        scopes: Dict[Optional[str], Dict[str, Any]] = {}
+        for scope in (None,) + cls.TOOLS:
+            prefix = cls.ENV_PREFIX + (f"{scope.upper()}_" if scope else '')
+            for field in ToolLimits.FIELDS:
+                name = prefix + field.upper()
+                value = environ.get(name, '').strip()
+                if value:
+                    scopes.setdefault(scope, {})[field] = cls._convert(field, value, name)
+        return scopes
+    
+    @staticmethod
+    def _convert(field: str, value: Any, source: str) -> Any:
+        """Convert a configured value to the field's type."""
+        convert = ToolLimits.FIELDS.get(field)
+        if convert is None:
+            raise ValueError(f"Unknown limit '{field}' ({source})")
+        if isinstance(value, bool):
+            raise ValueError(f"Invalid value for {source}: {value!r}")
+        try:
+            return convert(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid value for {source}: {value!r}")
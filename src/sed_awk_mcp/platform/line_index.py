@@ -0,0 +1,345 @@
+"""Line-offset index for direct access to numbered lines of large files.
+
+Tools that address lines by number (the line_range of sed_substitute and
+preview_sed, read_lines) would otherwise scan a file from its start to find
+line N. A LineIndex records how many newlines precede each fixed-size block
+of the file; any line is then found with a binary search over the blocks and
+a single block read.
+
+An index is built in one pass over a read-only memory map and kept per file
+identity by LineIndexCache for the lifetime of the server. When a file has
+grown by appends since it was indexed, only the new blocks are counted.
+"""
+
+import bisect
+import collections
+import logging
+import mmap
+import os
+import threading
+import time
+from array import array
+from typing import BinaryIO, Dict, Iterator, Mapping, Optional, Tuple
+
+from .config import read_env
+
+# Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
+
+logger = logging.getLogger(__name__)
+
+# Size of the blocks whose newlines are counted
+BLOCK_BYTES = 64 * 1024
+
+# Bytes at each end of the indexed content compared before an index is
+# extended over appended data
+CHECK_BYTES = 4096
+
+
+def _read_at(f: BinaryIO, offset: int, length: int) -> bytes:
+    """Read up to length bytes at offset without moving the file position."""
+    if length <= 0:
+        return b''
+    return os.pread(f.fileno(), length, offset)
+
+
+def iter_lines(f: BinaryIO, start: int, end: int, max_line: int) -> Iterator[bytes]:
+    """Yield the lines of a byte range of an open file.
+    
+    Lines longer than max_line bytes are yielded in max_line pieces.
+    
+    Args:
+        f: File opened in binary mode; its position is moved
+        start: Byte offset of the first line
+        end: Byte offset just past the last line
+        max_line: Largest piece of a line read at once
+    
+    Yields:
+        Lines including their newline, if any
+    """
+    f.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        line = f.readline(min(max_line, remaining))
+        if not line:
+            break
+        remaining -= len(line)
+        yield line
+
+
+class LineIndex:
+    """Newline counts per block of one file, as of one size and mtime.
+    
+    An index is not modified once built; extended() returns a new one.
+    
+    Attributes:
+        dev: Device of the indexed file
+        ino: Inode of the indexed file
+        size: Indexed size in bytes
+        mtime_ns: Modification time of the file when indexed
+        newlines: Number of newlines in the indexed content
+        indexed_at: time.time() at which the index was completed
+    """
+    
+    __slots__ = (
+        'dev', 'ino', 'size', 'mtime_ns', 'newlines', 'indexed_at',
+        '_totals', '_head', '_tail'
+    )
+    
+    def __init__(self, st: os.stat_result, totals: Optional[array] = None) -> None:
+        self.dev = st.st_dev
+        self.ino = st.st_ino
+        self.size = 0
+        self.mtime_ns = st.st_mtime_ns
+        self.newlines = 0
+        self.indexed_at = 0.0
+        # _totals[i] is the number of newlines before byte i * BLOCK_BYTES
+        self._totals = totals if totals is not None else array('Q', [0])
+        self._head = b''
+        self._tail = b''
+    
+    @classmethod
+    def build(cls, f: BinaryIO) -> "LineIndex":
+        """Index an open file from its start (blocking).
+        
+        Args:
+            f: File opened in binary mode
+        
+        Returns:
+            Index of the file's current content
+        
+        Raises:
+            OSError: If the file cannot be read
+        """
+        st = os.fstat(f.fileno())
+        index = cls(st)
+        index._scan(f, st)
+        return index
+    
+    def extended(self, f: BinaryIO) -> Optional["LineIndex"]:
+        """Index data appended to the file since this index was built (blocking).
+        
+        The file is taken to have grown by appends if it is at least as
+        large as the indexed size and the first and last CHECK_BYTES of the
+        indexed content are unchanged. Only the blocks from the last full
+        indexed block onwards are counted.
+        
+        Args:
+            f: The indexed file, opened in binary mode
+        
+        Returns:
+            Index of the file's current content, or None if the file was not
+            merely appended to and must be indexed again
+        
+        Raises:
+            OSError: If the file cannot be read
+        """
+        st = os.fstat(f.fileno())
+        if (st.st_dev, st.st_ino) != (self.dev, self.ino) or st.st_size < self.size:
+            return None
+        if _read_at(f, 0, len(self._head)) != self._head:
+            return None
+        if _read_at(f, self.size - len(self._tail), len(self._tail)) != self._tail:
+            return None
+        index = LineIndex(st, array('Q', self._totals))
+        index._scan(f, st)
+        return index
+    
+    def _scan(self, f: BinaryIO, st: os.stat_result) -> None:
+        """Count newlines from the last full indexed block to the end of the file."""
+        size = st.st_size
+        totals = self._totals
+        pos = (len(totals) - 1) * BLOCK_BYTES
+        count = totals[-1]
+        if size > pos:
+            with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                while pos + BLOCK_BYTES <= size:
+                    count += mm[pos:pos + BLOCK_BYTES].count(b'\n')
+                    totals.append(count)
+                    pos += BLOCK_BYTES
+                count += mm[pos:size].count(b'\n')
+        self.size = size
+        self.mtime_ns = st.st_mtime_ns
+        self.newlines = count
+        self._head = _read_at(f, 0, min(size, CHECK_BYTES))
+        self._tail = _read_at(f, max(0, size - CHECK_BYTES), min(size, CHECK_BYTES))
+        self.indexed_at = time.time()
+    
+    @property
+    def lines(self) -> int:
+        """Number of lines, counting a last line without a newline."""
+        if self.size and not self._tail.endswith(b'\n'):
+            return self.newlines + 1
+        return self.newlines
+    
+    def line_offset(self, f: BinaryIO, line: int) -> int:
+        """Return the byte offset at which a line starts (blocking).
+        
+        Args:
+            f: The indexed file, opened in binary mode
+            line: 1-based line number
+        
+        Returns:
+            Offset of the line's first byte, or the indexed size if the file
+            has fewer lines
+        
+        Raises:
+            OSError: If the file cannot be read
+        """
+        if line <= 1:
+            return 0
+        target = line - 1
+        if target > self.newlines:
+            return self.size
+        # The target-th newline lies in the last block preceded by fewer
+        block = bisect.bisect_left(self._totals, target) - 1
+        pos = block * BLOCK_BYTES
+        data = _read_at(f, pos, min(BLOCK_BYTES, self.size - pos))
+        rest = data.split(b'\n', target - self._totals[block])[-1]
+        return pos + len(data) - len(rest)
+    
+    def span(self, f: BinaryIO, first: int, last: Optional[int] = None) -> Tuple[int, int]:
+        """Return the byte range holding lines first to last (blocking).
+        
+        Args:
+            f: The indexed file, opened in binary mode
+            first: 1-based number of the first line
+            last: 1-based number of the last line (inclusive), or None for
+                the end of the file
+        
+        Returns:
+            Tuple of (start offset, end offset); empty if the file has fewer
+            than first lines
+        
+        Raises:
+            OSError: If the file cannot be read
+        """
+        start = self.line_offset(f, first)
+        if last is None:
+            return start, self.size
+        return start, max(start, self.line_offset(f, last + 1))
+
+
+class LineIndexCache:
+    """Bounded, thread-safe cache of line indexes keyed by file identity.
+    
+    Entries are keyed by (st_dev, st_ino) and valid while the file's size
+    and mtime match. A file that grew by appends has its index extended
+    rather than rebuilt; other changes rebuild it. An index built within racy_window seconds of the
+    file's last modification cannot prove the file unchanged by its size
+    and mtime alone, so it is rebuilt on the next lookup.
+    
+    Attributes:
+        max_entries: Maximum number of cached indexes (0 disables caching;
+            indexes are then built for each lookup)
+        racy_window: Seconds after a modification within which an index is
+            not trusted
+    """
+    
+    ENV_MAX_ENTRIES = "SED_AWK_LINE_INDEX_MAX_ENTRIES"
+    
+    DEFAULT_MAX_ENTRIES = 64
+    DEFAULT_RACY_WINDOW = 1.0
+    
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        racy_window: float = DEFAULT_RACY_WINDOW
+    ) -> None:
+        if max_entries < 0:
+            raise ValueError(f"max_entries must be >= 0, got {max_entries}")
+        self.max_entries = max_entries
+        self.racy_window = racy_window
+        self._entries: "collections.OrderedDict[Tuple[int, int], LineIndex]" = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._extensions = 0
+        self._builds = 0
+    
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None) -> "LineIndexCache":
+        """Create a cache configured from environment variables.
+        
+        Args:
+            environ: Mapping to read from (defaults to os.environ)
+        
+        Returns:
+            Configured LineIndexCache
+        
+        Raises:
+            ValueError: If a variable is set to an invalid value
+        """
+        environ = os.environ if environ is None else environ
+        
+        return cls(max_entries=read_env(environ, cls.ENV_MAX_ENTRIES, cls.DEFAULT_MAX_ENTRIES, int))
+    
+    @property
+    def enabled(self) -> bool:
+        """Whether indexes are kept between lookups."""
+        return self.max_entries > 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def stats(self) -> Dict[str, int]:
+        """Return cache counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "extensions": self._extensions,
+                "builds": self._builds,
+            }
+    
+    def index_for(self, f: BinaryIO) -> LineIndex:
+        """Return an index of an open file's current content (blocking).
+        
+        Args:
+            f: File opened in binary mode
+        
+        Returns:
+            LineIndex matching the file's current size and mtime
+        
+        Raises:
+            OSError: If the file cannot be read
+        """
+        st = os.fstat(f.fileno())
+        key = (st.st_dev, st.st_ino)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                if (
+                    cached.size == st.st_size
+                    and cached.mtime_ns == st.st_mtime_ns
+                    and cached.indexed_at - st.st_mtime_ns / 1e9 >= self.racy_window
+                ):
+                    self._hits += 1
+                    return cached
+        
+        index = None
+        if cached is not None and st.st_size > cached.size:
+            index = cached.extended(f)
+        with self._lock:
+            if index is not None:
+                self._extensions += 1
+            else:
+                self._builds += 1
+        if index is None:
+            index = LineIndex.build(f)
+        
+        if self.enabled:
+            with self._lock:
+                self._entries[key] = index
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return index
+    
+    def clear(self) -> None:
+        """Remove all cached indexes."""
+        with self._lock:
+            self._entries.clear()
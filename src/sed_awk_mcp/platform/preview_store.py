@@ -0,0 +1,443 @@
+"""Bounded store of previewed file edits for preview-then-apply.
+
+preview_sed computes the full edited content of a file to diff it. This
+module keeps that content under an opaque change token together with the
+identity of the source file, so apply_preview (or a sed_substitute with the
+same arguments) can commit it later without running sed again, provided the
+file has not changed since the preview.
+
+Small entries are held in memory; once the memory budget is used up, content
+is spilled to files in a private temporary directory. Total size, entry count
+and age are bounded, with least recently used entries evicted first.
+"""
+
+import collections
+import hashlib
+import logging
+import os
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Tuple, Union
+
+from .config import read_env
+
+# Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
+
+logger = logging.getLogger(__name__)
+
+# (st_dev, st_ino, st_size, st_mtime_ns) of a source file
+FileIdentity = Tuple[int, int, int, int]
+
+
+def file_identity(path: Union[str, os.PathLike]) -> FileIdentity:
+    """Return the identity of a file as used to detect changes.
+    
+    Args:
+        path: File to stat
+    
+    Returns:
+        Tuple of (st_dev, st_ino, st_size, st_mtime_ns)
+    
+    Raises:
+        OSError: If the file cannot be stat'ed
+    """
+    st = os.stat(path)
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _digest_file(path: Union[str, os.PathLike]) -> bytes:
+    """BLAKE2b digest of a file's content."""
+    digest = hashlib.blake2b()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+class PreviewEntry:
+    """Previewed content of one file, as held by PreviewStore.
+    
+    Attributes:
+        token: Opaque change token
+        path: Canonical path of the source file
+        identity: Identity of the source file when it was previewed
+        sed_commands: Sed commands that produced the content
+        substitutions: Substitution count, or None if sed did not report it
+        size: Size of the content in bytes
+        created: time.monotonic() at which the entry was stored
+        digest: Digest of the source content, recorded only when the file
+            was modified within the racy window and its identity alone
+            cannot prove it unchanged
+    """
+    
+    __slots__ = (
+        'token', 'path', 'identity', 'sed_commands', 'substitutions', 'size',
+        'created', 'digest', '_content', '_spill_path'
+    )
+    
+    def __init__(
+        self,
+        token: str,
+        path: str,
+        identity: FileIdentity,
+        sed_commands: Tuple[str, ...],
+        substitutions: Optional[int],
+        size: int,
+        digest: Optional[bytes] = None
+    ) -> None:
+        self.token = token
+        self.path = path
+        self.identity = identity
+        self.sed_commands = sed_commands
+        self.substitutions = substitutions
+        self.size = size
+        self.created = time.monotonic()
+        self.digest = digest
+        self._content: Optional[bytes] = None
+        self._spill_path: Optional[Path] = None
+    
+    @property
+    def spilled(self) -> bool:
+        """Whether the content is held in a spill file rather than memory."""
+        return self._spill_path is not None
+    
+    def read_content(self) -> bytes:
+        """Return the previewed content (blocking read if spilled).
+        
+        Raises:
+            OSError: If the spill file cannot be read
+        """
+        if self._spill_path is not None:
+            return self._spill_path.read_bytes()
+        return self._content
+    
+    def matches_source(self) -> bool:
+        """Check that the source file is still the one that was previewed.
+        
+        Performs blocking stat calls (and a read when a digest was recorded).
+        
+        Returns:
+            True if the file's identity, and digest if recorded, are unchanged
+        """
+        try:
+            if file_identity(self.path) != self.identity:
+                return False
+            return self.digest is None or _digest_file(self.path) == self.digest
+        except OSError:
+            return False
+
+
+class PreviewStore:
+    """Bounded, thread-safe store of previewed edits keyed by change token.
+    
+    Entries are also indexed by (path, sed commands, file identity), so a
+    repeated preview of an unchanged file returns the existing token and a
+    sed_substitute with the same commands can reuse the content.
+    
+    Content counts against max_bytes whether it is held in memory or
+    spilled; at most memory_bytes of it stays in memory. Entries older than
+    ttl seconds are dropped.
+    """
+    
+    DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+    DEFAULT_MEMORY_BYTES = 8 * 1024 * 1024
+    DEFAULT_MAX_ENTRIES = 64
+    DEFAULT_TTL = 600.0
+    DEFAULT_RACY_WINDOW = 1.0
+    
+    # Environment variables read by from_env()
+    ENV_MAX_BYTES = "SED_AWK_PREVIEW_MAX_BYTES"
+    ENV_MEMORY_BYTES = "SED_AWK_PREVIEW_MEMORY_BYTES"
+    ENV_MAX_ENTRIES = "SED_AWK_PREVIEW_MAX_ENTRIES"
+    ENV_TTL = "SED_AWK_PREVIEW_TTL"
+    
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        memory_bytes: int = DEFAULT_MEMORY_BYTES,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: float = DEFAULT_TTL,
+        racy_window: float = DEFAULT_RACY_WINDOW
+    ) -> None:
+        """Initialize PreviewStore.
+        
+        Args:
+            max_bytes: Maximum total size of stored content (default: 64MB)
+            memory_bytes: Maximum content held in memory; the rest is
+                spilled to temporary files (default: 8MB)
+            max_entries: Maximum number of stored previews (default: 64)
+            ttl: Seconds after which a preview expires (default: 600)
+            racy_window: Seconds after a modification during which a file's
+                identity is backed by a content digest (default: 1.0)
+        
+        Raises:
+            ValueError: If any limit is negative
+        """
+        if min(max_bytes, memory_bytes, max_entries, ttl, racy_window) < 0:
+            raise ValueError("Preview store limits must be >= 0")
+        
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.racy_window = racy_window
+        
+        self.evictions = 0
+        self.expirations = 0
+        
+        # token -> entry, least recently used first
+        self._entries: "collections.OrderedDict[str, PreviewEntry]" = collections.OrderedDict()
+        self._tokens_by_key: Dict[Tuple, str] = {}
+        self._size = 0
+        self._memory_size = 0
+        self._spill_dir: Optional[Path] = None
+        self._lock = threading.Lock()
+        
+        logger.debug(
+            "PreviewStore initialized: max_bytes=%d memory_bytes=%d max_entries=%d ttl=%.0fs",
+            max_bytes, memory_bytes, max_entries, ttl
+        )
+    
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None) -> "PreviewStore":
+        """Create a store from environment variables.
+        
+        Reads SED_AWK_PREVIEW_MAX_BYTES, SED_AWK_PREVIEW_MEMORY_BYTES,
+        SED_AWK_PREVIEW_MAX_ENTRIES and SED_AWK_PREVIEW_TTL; a max of 0
+        disables change tokens. Unset variables keep their defaults.
+        
+        Args:
+            environ: Environment mapping (default: os.environ)
+        
+        Returns:
+            Configured PreviewStore
+        
+        Raises:
+            ValueError: If a variable is not a valid number
+        """
+        environ = os.environ if environ is None else environ
+        
+        return cls(
+            max_bytes=read_env(environ, cls.ENV_MAX_BYTES, cls.DEFAULT_MAX_BYTES, int),
+            memory_bytes=read_env(environ, cls.ENV_MEMORY_BYTES, cls.DEFAULT_MEMORY_BYTES, int),
+            max_entries=read_env(environ, cls.ENV_MAX_ENTRIES, cls.DEFAULT_MAX_ENTRIES, int),
+            ttl=read_env(environ, cls.ENV_TTL, cls.DEFAULT_TTL, float)
+        )
+    
+    @property
+    def enabled(self) -> bool:
+        """Whether previews are stored at all."""
+        return self.max_bytes > 0 and self.max_entries > 0 and self.ttl > 0
+    
+    @property
+    def size(self) -> int:
+        """Total size of stored content in bytes."""
+        return self._size
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def stats(self) -> Dict[str, int]:
+        """Return eviction counters and current occupancy."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "memory_bytes": self._memory_size,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+    
+    def put(
+        self,
+        path: Union[str, os.PathLike],
+        identity: FileIdentity,
+        sed_commands: Tuple[str, ...],
+        content: bytes,
+        substitutions: Optional[int] = None
+    ) -> Optional[str]:
+        """Store previewed content and return its change token.
+        
+        Nothing is stored if the source file no longer has the given
+        identity, i.e. it changed while the preview was computed.
+        
+        Args:
+            path: Canonical path of the source file
+            identity: file_identity() of the source taken before it was read
+            sed_commands: Sed commands that produced the content
+            content: Edited file content
+            substitutions: Substitution count, if known
+        
+        Returns:
+            Change token, or None if the store is disabled, the content is
+            larger than max_bytes or the source changed
+        """
+        if not self.enabled or len(content) > self.max_bytes:
+            return None
+        
+        path = os.fspath(path)
+        digest = None
+        try:
+            if file_identity(path) != identity:
+                return None
+            racy_before = time.time_ns() - int(self.racy_window * 1_000_000_000)
+            if identity[3] > racy_before:
+                digest = _digest_file(path)
+        except OSError:
+            return None
+        
+        entry = PreviewEntry(
+            secrets.token_urlsafe(16), path, identity, tuple(sed_commands),
+            substitutions, len(content), digest
+        )
+        key = (path, entry.sed_commands, identity)
+        
+        with self._lock:
+            self._expire()
+            # A repeated preview replaces the content but keeps the token
+            existing = self._tokens_by_key.get(key)
+            if existing is not None:
+                self._remove(existing)
+                entry.token = existing
+            while self._entries and (
+                len(self._entries) >= self.max_entries
+                or self._size + entry.size > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            spill = self._memory_size + entry.size > self.memory_bytes
+            if not spill:
+                entry._content = content
+                self._memory_size += entry.size
+            self._entries[entry.token] = entry
+            self._tokens_by_key[key] = entry.token
+            self._size += entry.size
+            spill_dir = self._ensure_spill_dir() if spill else None
+        
+        if spill:
+            # Written outside the lock; the entry is unusable until then
+            try:
+                fd, spill_name = tempfile.mkstemp(dir=spill_dir, suffix='.preview')
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(content)
+            except OSError as e:
+                logger.warning("PreviewStore: cannot spill preview of %s: %s", path, e)
+                self.discard(entry.token)
+                return None
+            with self._lock:
+                evicted = self._entries.get(entry.token) is not entry
+                if not evicted:
+                    entry._spill_path = Path(spill_name)
+            if evicted:
+                Path(spill_name).unlink(missing_ok=True)
+                return None
+        
+        logger.debug(
+            "PreviewStore: stored %d bytes for %s (%s)",
+            entry.size, path, "spilled" if spill else "in memory"
+        )
+        return entry.token
+    
+    def find(
+        self,
+        path: Union[str, os.PathLike],
+        sed_commands: Tuple[str, ...],
+        identity: FileIdentity
+    ) -> Optional[PreviewEntry]:
+        """Look up the preview of given commands on a file in a given state.
+        
+        Args:
+            path: Canonical path of the source file
+            sed_commands: Sed commands of the preview
+            identity: Current file_identity() of the source
+        
+        Returns:
+            Stored entry, or None
+        """
+        key = (os.fspath(path), tuple(sed_commands), identity)
+        with self._lock:
+            self._expire()
+            token = self._tokens_by_key.get(key)
+            if token is None:
+                return None
+            entry = self._entries[token]
+            if entry.spilled or entry._content is not None:
+                self._entries.move_to_end(token)
+                return entry
+            return None
+    
+    def take(self, token: str) -> Optional[PreviewEntry]:
+        """Remove an entry from the store and return it.
+        
+        The caller owns the entry afterwards and must call release() on it
+        once its content has been read.
+        
+        Args:
+            token: Change token returned by put()
+        
+        Returns:
+            Entry, or None if the token is unknown, expired or evicted
+        """
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(token)
+            if entry is None or not (entry.spilled or entry._content is not None):
+                return None
+            self._unlink(token)
+            return entry
+    
+    def release(self, entry: PreviewEntry) -> None:
+        """Free the content of an entry returned by take()."""
+        if entry._spill_path is not None:
+            entry._spill_path.unlink(missing_ok=True)
+            entry._spill_path = None
+        entry._content = None
+    
+    def discard(self, token: str) -> bool:
+        """Drop an entry; returns True if it existed."""
+        with self._lock:
+            if token not in self._entries:
+                return False
+            self._remove(token)
+            return True
+    
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)."""
+        with self._lock:
+            for token in list(self._entries):
+                self._remove(token)
+    
+    def _expire(self) -> None:
+        """Drop entries older than the TTL (lock held)."""
+        cutoff = time.monotonic() - self.ttl
+        # LRU order is not age order, so every entry is checked
+        for token in [t for t, e in self._entries.items() if e.created <= cutoff]:
+            self._remove(token)
+            self.expirations += 1
+    
+    def _unlink(self, token: str) -> PreviewEntry:
+        """Remove an entry from the indexes and size accounting (lock held)."""
+        entry = self._entries.pop(token)
+        key = (entry.path, entry.sed_commands, entry.identity)
+        if self._tokens_by_key.get(key) == token:
+            del self._tokens_by_key[key]
+        self._size -= entry.size
+        if entry._content is not None:
+            self._memory_size -= entry.size
+        return entry
+    
+    def _remove(self, token: str) -> None:
+        """Remove an entry and free its content (lock held)."""
+        self.release(self._unlink(token))
+    
+    def _ensure_spill_dir(self) -> Path:
+        """Create the private spill directory on first use (lock held)."""
+        if self._spill_dir is None:
+            self._spill_dir = Path(tempfile.mkdtemp(prefix='sed_awk_preview_'))
+            weakref.finalize(self, shutil.rmtree, str(self._spill_dir), True)
+        return self._spill_dir
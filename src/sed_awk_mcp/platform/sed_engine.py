@@ -0,0 +1,1421 @@
+"""In-process sed substitution engine.
+
+This module executes the common subset of sed scripts used by the sed tools,
+``[address]s/regex/replacement/flags`` commands, without spawning the sed
+binary. POSIX basic (and extended) regular expressions are
+translated to Python ``re`` syntax and compiled once per script through an
+LRU cache; files are read through a memory map.
+
+Anything outside the supported subset is reported as unsupported so callers
+can fall back to the sed binary, which remains the reference implementation.
+
+may_match() is a literal pre-scan for any substitution, supported or not: it
+proves that a program cannot change a file when the literal text its regexes
+require does not occur in it.
+
+SedProgram.measure() is a dry run: it reports how many substitutions a
+program makes, on which lines, and how the file size changes, without
+building the new content. For programs the engine does not support,
+match_listing_commands() and parse_match_listing() obtain the same
+statistics (except the substitution count) from one sed run.
+"""
+
+import functools
+import locale
+import logging
+import mmap
+import os
+import re
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple, Union
+
+# Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
+
+logger = logging.getLogger(__name__)
+
+# Characters that have a meaning in POSIX regular expressions
+_REGEX_SPECIALS = frozenset('.[]*^$\\+?(){}|')
+
+# Bracket classes that match the same characters in every locale
+_PORTABLE_CLASSES = {
+    'digit': '0-9',
+    'xdigit': '0-9A-Fa-f',
+    'blank': ' \\t',
+}
+
+# Bracket classes whose meaning differs outside ASCII (ASCII-only translation)
+_ASCII_CLASSES = {
+    'upper': 'A-Z',
+    'lower': 'a-z',
+    'alpha': 'A-Za-z',
+    'alnum': '0-9A-Za-z',
+    'space': ' \\t\\n\\r\\f\\v',
+    'punct': re.escape('!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~'),
+    'cntrl': '\\x00-\\x1f\\x7f',
+    'print': '\\x20-\\x7e',
+    'graph': '\\x21-\\x7e',
+}
+
+# Single-character escapes shared by regex and replacement text
+_CONTROL_ESCAPES = {'t': '\t', 'f': '\f', 'v': '\v', 'r': '\r', 'a': '\a'}
+
+# Input decoded at once by a measuring pass in text mode (see SedScript.measure)
+MEASURE_CHUNK_BYTES = 1024 * 1024
+
+# A byte range of the input and the number of its first line
+Bounds = Tuple[int, int, int]
+
+
+def _count_newlines(buf, start: int, end: int) -> int:
+    """Count newlines in buf[start:end]; mmap has no count() of its own."""
+    if not isinstance(buf, mmap.mmap):
+        return buf.count(b'\n' if not isinstance(buf, str) else '\n', start, end)
+    count = 0
+    for pos in range(start, end, MEASURE_CHUNK_BYTES):
+        count += buf[pos:min(pos + MEASURE_CHUNK_BYTES, end)].count(b'\n')
+    return count
+
+
+class MatchStats:
+    """What a substitution program would change, without the new content.
+
+    Attributes:
+        substitutions: Substitutions made, or None if not known (the sed
+            binary does not report it)
+        lines: Number of lines with at least one substitution
+        line_numbers: The first of those line numbers in ascending order,
+            up to the requested cap
+        byte_delta: Change of the file size in bytes
+        complete: False if the statistics cover only the start of the file
+    """
+
+    __slots__ = ('substitutions', 'lines', 'line_numbers', 'byte_delta', 'complete')
+
+    def __init__(
+        self,
+        substitutions: Optional[int],
+        lines: int,
+        line_numbers: List[int],
+        byte_delta: int,
+        complete: bool = True
+    ) -> None:
+        self.substitutions = substitutions
+        self.lines = lines
+        self.line_numbers = line_numbers
+        self.byte_delta = byte_delta
+        self.complete = complete
+
+
+class UnsupportedSedError(Exception):
+    """Raised when a script or its input is outside the engine's subset.
+
+    Callers should fall back to the sed binary when they see this error.
+
+    Attributes:
+        message: Human-readable reason
+    """
+
+    def __init__(self, message: str) -> None:
+        """Initialize UnsupportedSedError.
+
+        Args:
+            message: Human-readable reason
+        """
+        super().__init__(message)
+        self.message = message
+
+
+def _detect_utf8_locale() -> bool:
+    """Check whether child processes (sed) would run in a UTF-8 locale."""
+    try:
+        codeset = locale.nl_langinfo(locale.CODESET)
+    except (AttributeError, ValueError):
+        codeset = locale.getpreferredencoding(False)
+    return codeset.upper().replace('-', '') == 'UTF8'
+
+
+# Decided once: sed inherits the server's environment
+LOCALE_IS_UTF8 = _detect_utf8_locale()
+
+
+class _Translation:
+    """Result of translating a POSIX regex to Python syntax."""
+
+    __slots__ = ('pattern', 'groups', 'byte_safe', 'ascii_input')
+
+    def __init__(self, pattern: str, groups: int, byte_safe: bool, ascii_input: bool) -> None:
+        self.pattern = pattern
+        self.groups = groups
+        # Matching raw UTF-8 bytes gives the same result as matching characters
+        self.byte_safe = byte_safe
+        # Translation is exact only for ASCII input in a UTF-8 locale
+        self.ascii_input = ascii_input
+
+
+def translate_regex(regex: str, extended: bool = False) -> _Translation:
+    """Translate a POSIX BRE/ERE (with GNU extensions) to Python re syntax.
+
+    The translation is meant for matching one line at a time inside a
+    MULTILINE search, so constructs that could match a newline are narrowed
+    to exclude it. Constructs whose POSIX leftmost-longest semantics differ
+    from Python's backtracking (alternation, quantified groups) are rejected.
+
+    Args:
+        regex: Regular expression text (escaped delimiters already unescaped)
+        extended: Interpret as ERE instead of BRE
+
+    Returns:
+        Translation with the Python pattern and matching properties
+
+    Raises:
+        UnsupportedSedError: If the expression uses unsupported constructs
+    """
+    out: List[str] = []
+    groups = 0
+    open_groups: List[int] = []
+    closed_groups = set()
+    byte_safe = True
+    ascii_input = False
+    at_start = True      # '*' literal / '^' anchor position (BRE)
+    last = None          # kind of the previous item: atom, group, anchor, quant
+    i = 0
+    n = len(regex)
+
+    def quantifier(text: str) -> None:
+        nonlocal last
+        if last == 'group':
+            raise UnsupportedSedError("quantified group")
+        if last != 'atom':
+            raise UnsupportedSedError(f"quantifier '{text}' without operand")
+        out.append(text)
+        last = 'quant'
+
+    def interval(j: int, closing: str) -> int:
+        end = regex.find(closing, j)
+        if end == -1:
+            raise UnsupportedSedError("unterminated interval")
+        body = regex[j:end]
+        if not re.fullmatch(r'\d*(,\d*)?', body) or body in ('', ','):
+            raise UnsupportedSedError(f"invalid interval '{body}'")
+        quantifier('{' + body + '}')
+        return end + len(closing)
+
+    while i < n:
+        c = regex[i]
+
+        if c == '\\':
+            if i + 1 >= n:
+                raise UnsupportedSedError("trailing backslash")
+            e = regex[i + 1]
+            i += 2
+
+            if not extended and e == '(':
+                groups += 1
+                open_groups.append(groups)
+                out.append('(')
+                at_start, last = True, None
+                continue
+            if not extended and e == ')':
+                if not open_groups:
+                    raise UnsupportedSedError("unmatched \\)")
+                closed_groups.add(open_groups.pop())
+                out.append(')')
+                at_start, last = False, 'group'
+                continue
+            if not extended and e == '{':
+                i = interval(i, '\\}')
+                at_start = False
+                continue
+            if not extended and e in '+?':
+                quantifier(e)
+                at_start = False
+                continue
+            if e == '|' and not extended:
+                raise UnsupportedSedError("alternation")
+            if e.isdigit() and e != '0':
+                if int(e) not in closed_groups:
+                    raise UnsupportedSedError(f"invalid back reference \\{e}")
+                out.append('\\' + e)
+            elif e in 'ws':
+                out.append('\\' + e if e == 'w' else '[^\\S\\n]')
+                byte_safe = False
+            elif e in 'WS':
+                out.append('[^\\w\\n]' if e == 'W' else '\\S')
+                byte_safe = False
+            elif e in 'bB':
+                out.append('\\' + e)
+                byte_safe = False
+                at_start = False
+                last = 'anchor'
+                continue
+            elif e == '<':
+                out.append('\\b(?=\\w)')
+                byte_safe = False
+                at_start, last = False, 'anchor'
+                continue
+            elif e == '>':
+                out.append('\\b(?<=\\w)')
+                byte_safe = False
+                at_start, last = False, 'anchor'
+                continue
+            elif e == '`':
+                out.append('^')
+                last = 'anchor'
+                continue
+            elif e == "'":
+                out.append('$')
+                at_start, last = False, 'anchor'
+                continue
+            elif e in _CONTROL_ESCAPES:
+                out.append(re.escape(_CONTROL_ESCAPES[e]))
+            elif e.isalnum() or e == '\n':
+                # \n, \cX, \dNNN, \oNNN, \xHH and unknown letter escapes
+                raise UnsupportedSedError(f"unsupported escape \\{e}")
+            else:
+                out.append(re.escape(e))
+                if ord(e) > 127:
+                    byte_safe = False
+            at_start, last = False, 'atom'
+            continue
+
+        i += 1
+
+        if c == '[':
+            i, text, safe, ascii_only = _translate_bracket(regex, i)
+            out.append(text)
+            byte_safe = byte_safe and safe
+            ascii_input = ascii_input or ascii_only
+            at_start, last = False, 'atom'
+        elif c == '.':
+            out.append('.')
+            byte_safe = False
+            at_start, last = False, 'atom'
+        elif c == '*':
+            if at_start and not extended:
+                out.append('\\*')
+                at_start, last = False, 'atom'
+            else:
+                quantifier('*')
+                at_start = False
+        elif c == '^':
+            if extended or (at_start and last != 'anchor'):
+                out.append('^')
+                last = 'anchor'
+            else:
+                out.append('\\^')
+                at_start, last = False, 'atom'
+        elif c == '$':
+            at_end = (i == n) or (not extended and regex.startswith('\\)', i))
+            if extended or at_end:
+                out.append('$')
+                at_start, last = False, 'anchor'
+            else:
+                out.append('\\$')
+                at_start, last = False, 'atom'
+        elif extended and c in '+?':
+            quantifier(c)
+            at_start = False
+        elif extended and c == '{':
+            i = interval(i, '}')
+            at_start = False
+        elif extended and c == '(':
+            groups += 1
+            open_groups.append(groups)
+            out.append('(')
+            at_start, last = True, None
+        elif extended and c == ')':
+            if not open_groups:
+                raise UnsupportedSedError("unmatched )")
+            closed_groups.add(open_groups.pop())
+            out.append(')')
+            at_start, last = False, 'group'
+        elif extended and c == '|':
+            raise UnsupportedSedError("alternation")
+        else:
+            out.append(re.escape(c))
+            if ord(c) > 127:
+                byte_safe = False
+            at_start, last = False, 'atom'
+
+    if open_groups:
+        raise UnsupportedSedError("unmatched group")
+
+    return _Translation(''.join(out), groups, byte_safe, ascii_input)
+
+
+def _translate_bracket(regex: str, i: int) -> Tuple[int, str, bool, bool]:
+    """Translate a bracket expression starting just after '['.
+
+    Args:
+        regex: Regular expression text
+        i: Index just after the opening '['
+
+    Returns:
+        Tuple of (index after ']', Python set, byte_safe, ascii_input)
+
+    Raises:
+        UnsupportedSedError: For unterminated brackets, backslashes,
+            equivalence classes and collating symbols
+    """
+    n = len(regex)
+    negate = i < n and regex[i] == '^'
+    if negate:
+        i += 1
+
+    items: List[str] = []
+    byte_safe = not negate
+    ascii_input = False
+    first = True
+
+    while True:
+        if i >= n:
+            raise UnsupportedSedError("unterminated bracket expression")
+        c = regex[i]
+
+        if c == ']' and not first:
+            i += 1
+            break
+        first = False
+
+        if c == '[' and i + 1 < n and regex[i + 1] in ':=.':
+            kind = regex[i + 1]
+            end = regex.find(kind + ']', i + 2)
+            if kind != ':' or end == -1:
+                raise UnsupportedSedError("unsupported bracket construct")
+            name = regex[i + 2:end]
+            if name in _PORTABLE_CLASSES:
+                items.append(_PORTABLE_CLASSES[name])
+            elif name in _ASCII_CLASSES:
+                items.append(_ASCII_CLASSES[name])
+                byte_safe = False
+                ascii_input = True
+            else:
+                raise UnsupportedSedError(f"unknown character class '{name}'")
+            i = end + 2
+            continue
+
+        if c == '\\':
+            raise UnsupportedSedError("backslash in bracket expression")
+
+        if ord(c) > 127:
+            byte_safe = False
+
+        # Range a-z (a '-' before the closing bracket is literal)
+        if i + 2 < n and regex[i + 1] == '-' and regex[i + 2] != ']':
+            hi = regex[i + 2]
+            if hi in ('\\', '['):
+                raise UnsupportedSedError("unsupported range end")
+            if ord(hi) < ord(c):
+                raise UnsupportedSedError("invalid range end")
+            if ord(hi) > 127:
+                byte_safe = False
+            items.append(_escape_set_char(c) + '-' + _escape_set_char(hi))
+            i += 3
+            continue
+
+        items.append(_escape_set_char(c))
+        i += 1
+
+    body = ''.join(items)
+    if negate:
+        # Pattern space never contains the line's newline
+        return i, '[^' + body + '\\n]', byte_safe, ascii_input
+    return i, '[' + body + ']', byte_safe, ascii_input
+
+
+def _escape_set_char(c: str) -> str:
+    """Escape a character for use inside a Python character set."""
+    return '\\' + c if c in '\\]^-[' else c
+
+
+def _split_command(script: str) -> Tuple[str, str, str, str]:
+    """Split '[address]s<d>regex<d>replacement<d>flags' into its parts.
+
+    Escaped delimiters become plain literals: unescaped in the regex and
+    left as a literal escape in the replacement.
+
+    Args:
+        script: Sed script text
+
+    Returns:
+        Tuple of (address, regex, replacement, flags)
+
+    Raises:
+        UnsupportedSedError: If the script is not a single s command
+    """
+    match = re.match(r'\s*((?:\d+|\$)(?:\s*,\s*(?:\d+|\$))?)?\s*s', script)
+    if not match:
+        raise UnsupportedSedError("not a substitution command")
+    address = match.group(1) or ''
+    i = match.end()
+
+    if i >= len(script):
+        raise UnsupportedSedError("missing delimiter")
+    delim = script[i]
+    if delim in ('\\', '\n') or delim.isalnum() or delim.isspace():
+        raise UnsupportedSedError(f"unsupported delimiter {delim!r}")
+    i += 1
+
+    parts: List[str] = []
+    current: List[str] = []
+    while len(parts) < 2:
+        if i >= len(script):
+            raise UnsupportedSedError("unterminated s command")
+        c = script[i]
+        if c == '\\' and i + 1 < len(script):
+            if script[i + 1] == delim:
+                if delim in _REGEX_SPECIALS or delim == '&':
+                    raise UnsupportedSedError("escaped special delimiter")
+                current.append(delim if not parts else '\\' + delim)
+            else:
+                current.append(script[i:i + 2])
+            i += 2
+        elif c == delim:
+            parts.append(''.join(current))
+            current = []
+            i += 1
+        else:
+            current.append(c)
+            i += 1
+
+    return address, parts[0], parts[1], script[i:]
+
+
+def _parse_replacement(text: str, groups: int) -> List[Union[str, int]]:
+    """Parse sed replacement text into literal strings and group numbers.
+
+    Args:
+        text: Replacement text
+        groups: Number of groups in the regex
+
+    Returns:
+        Template list; ints are group references (0 is the whole match)
+
+    Raises:
+        UnsupportedSedError: For case conversion and unsupported escapes
+    """
+    template: List[Union[str, int]] = []
+    literal: List[str] = []
+
+    def ref(num: int) -> None:
+        if num > groups:
+            raise UnsupportedSedError(f"invalid reference \\{num} on s command's RHS")
+        if literal:
+            template.append(''.join(literal))
+            literal.clear()
+        template.append(num)
+
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c == '&':
+            ref(0)
+            i += 1
+            continue
+        if c == '\\' and i + 1 < len(text):
+            e = text[i + 1]
+            i += 2
+            if e.isdigit():
+                ref(int(e))
+            elif e == 'n':
+                literal.append('\n')
+            elif e in _CONTROL_ESCAPES:
+                literal.append(_CONTROL_ESCAPES[e])
+            elif e.isalnum():
+                # \L \U \l \u \E case conversion, \cX, \dNNN, \oNNN, \xHH
+                raise UnsupportedSedError(f"unsupported replacement escape \\{e}")
+            else:
+                literal.append(e)
+            continue
+        if c == '\\':
+            raise UnsupportedSedError("trailing backslash in replacement")
+        literal.append(c)
+        i += 1
+
+    if literal:
+        template.append(''.join(literal))
+    return template
+
+
+class SedScript:
+    """A compiled single-substitution sed script.
+
+    Applies ``[address]s/regex/replacement/flags`` with sed semantics:
+    matching is line by line, the occurrence number and 'g' flag count per
+    line, and an empty match directly after a previous match is skipped.
+
+    Instances are immutable and safe to share between threads.
+    """
+
+    __slots__ = (
+        'script', 'start_line', 'end_line', 'occurrence', 'global_replace',
+        '_regex', '_template', '_bytes_mode', '_ascii_input', '_constant',
+        '_split_risk'
+    )
+
+    def __init__(self, script: str, extended: bool = False) -> None:
+        """Compile a sed script.
+
+        Args:
+            script: Sed script, e.g. '1,10s/foo/bar/g'
+            extended: Use ERE syntax (sed -E)
+
+        Raises:
+            UnsupportedSedError: If the script is outside the supported subset
+        """
+        self.script = script
+        address, regex_text, replacement_text, flags = _split_command(script)
+        self.start_line, self.end_line = self._parse_address(address)
+        self.occurrence, self.global_replace, ignore_case = self._parse_flags(flags)
+
+        # In a non-UTF-8 locale sed works on bytes: translate byte-wise
+        if not LOCALE_IS_UTF8:
+            regex_text = regex_text.encode('utf-8').decode('latin-1')
+        translation = translate_regex(regex_text, extended)
+        template = _parse_replacement(replacement_text, translation.groups)
+
+        self._bytes_mode = not LOCALE_IS_UTF8 or (translation.byte_safe and not ignore_case)
+        self._ascii_input = LOCALE_IS_UTF8 and translation.ascii_input
+
+        flags_value = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+        try:
+            if self._bytes_mode:
+                encoding = 'latin-1' if not LOCALE_IS_UTF8 else 'ascii'
+                self._regex = re.compile(translation.pattern.encode(encoding), flags_value)
+                self._template = [
+                    part.encode('utf-8') if isinstance(part, str) else part
+                    for part in template
+                ]
+            else:
+                self._regex = re.compile(translation.pattern, flags_value)
+                self._template = template
+        except (re.error, UnicodeEncodeError) as e:
+            raise UnsupportedSedError(f"regex does not compile: {e}")
+
+        # Can an empty match land inside a multibyte character? Byte patterns
+        # are probed mid-character; text patterns are assumed to
+        if not LOCALE_IS_UTF8:
+            self._split_risk = False
+        elif self._bytes_mode:
+            self._split_risk = self._regex.match(b'\xc3\xa9', 1) is not None
+        else:
+            self._split_risk = True
+
+        self._constant = (
+            self._template[0] if len(self._template) == 1
+            and not isinstance(self._template[0], int) else None
+        )
+        if not self._template:
+            self._constant = b'' if self._bytes_mode else ''
+
+    @property
+    def inserts_newline(self) -> bool:
+        """Whether the replacement can add lines to the file."""
+        return any(
+            not isinstance(part, int) and ('\n' in part if isinstance(part, str) else b'\n' in part)
+            for part in self._template
+        )
+
+    @staticmethod
+    def _parse_address(address: str) -> Tuple[Optional[int], Optional[int]]:
+        """Parse a line address into (start, end); None means open/last line.
+
+        Returns:
+            (start_line, end_line) where start None means "last line" for a
+            '$' address and (1, None) stands for no address
+        """
+        if not address:
+            return 1, None
+        parts = [p.strip() for p in address.split(',')]
+
+        def num(text: str) -> Optional[int]:
+            if text == '$':
+                return None
+            value = int(text)
+            if value == 0:
+                raise UnsupportedSedError("invalid usage of line address 0")
+            return value
+
+        start = num(parts[0])
+        if len(parts) == 1:
+            return start, start if start is not None else None
+        if start is None:
+            # '$,N' addresses only the last line
+            return None, None
+        end = num(parts[1])
+        if end is not None and end < start:
+            end = start
+        return start, end
+
+    @staticmethod
+    def _parse_flags(flags: str) -> Tuple[int, bool, bool]:
+        """Parse s command flags into (occurrence, global, ignore_case)."""
+        match = re.fullmatch(r'([gIi]*)(\d*)([gIi]*)', flags)
+        if not match:
+            raise UnsupportedSedError(f"unsupported flags '{flags}'")
+        letters = match.group(1) + match.group(3)
+        if len(set(letters)) != len(letters):
+            raise UnsupportedSedError("repeated flag")
+        occurrence = int(match.group(2)) if match.group(2) else 1
+        if occurrence == 0:
+            raise UnsupportedSedError("number option to `s' command may not be zero")
+        return occurrence, 'g' in letters, bool(set(letters) & {'i', 'I'})
+
+    def apply(self, data) -> Tuple[bytes, int]:
+        """Apply the script to file content.
+
+        Args:
+            data: File content (bytes, bytearray or mmap)
+
+        Returns:
+            Tuple of (new content, number of substitutions made)
+
+        Raises:
+            UnsupportedSedError: If the input cannot be handled in-process
+                (invalid UTF-8, or non-ASCII input for ASCII-only classes)
+        """
+        span = self._region(data)
+        if span is None:
+            return bytes(data), 0
+        start, end = span
+
+        if self._bytes_mode:
+            pieces, count = self._substitute(data, start, end, b'\n')
+            if not count:
+                return bytes(data), 0
+            return b''.join([data[:start], *pieces, data[end:]]), count
+
+        try:
+            text = bytes(data[start:end]).decode('utf-8')
+        except UnicodeDecodeError:
+            raise UnsupportedSedError("input is not valid UTF-8")
+        if self._ascii_input and not text.isascii():
+            raise UnsupportedSedError("character class needs locale support for non-ASCII input")
+
+        pieces, count = self._substitute(text, 0, len(text), '\n')
+        if not count:
+            return bytes(data), 0
+        return b''.join([data[:start], ''.join(pieces).encode('utf-8'), data[end:]]), count
+
+    def apply_file(self, path: Union[str, Path]) -> Tuple[bytes, int]:
+        """Apply the script to a file through a read-only memory map.
+
+        Args:
+            path: File to read
+
+        Returns:
+            Tuple of (new content, number of substitutions made)
+
+        Raises:
+            UnsupportedSedError: If the input cannot be handled in-process
+            OSError: If the file cannot be read
+        """
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b'', 0
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return self.apply(mm)
+
+    def measure(
+        self,
+        data,
+        mark: Callable[[int], None],
+        bounds: Optional[Bounds] = None
+    ) -> Tuple[int, int]:
+        """Count the substitutions the script makes, without making them.
+
+        Args:
+            data: File content (bytes, bytearray or mmap)
+            mark: Called once with the number of every line on which a
+                substitution is made, in ascending order
+            bounds: (start, end, first line) of a range of whole lines to
+                measure instead of the addressed lines (for scripts without
+                an address)
+
+        Returns:
+            Tuple of (number of substitutions, change in size in bytes)
+
+        Raises:
+            UnsupportedSedError: If the input cannot be handled in-process
+        """
+        if bounds is None:
+            span = self._region(data)
+            if span is None:
+                return 0, 0
+            start, end = span
+            if self.start_line is None:
+                line = _count_newlines(data, 0, start) + 1
+            else:
+                line = self.start_line
+        else:
+            start, end, line = bounds
+            if start >= end:
+                return 0, 0
+            if data[end - 1:end] == b'\n':
+                end -= 1
+
+        if self._bytes_mode:
+            return self._measure(data, start, end, b'\n', line, mark)
+
+        # Decode a chunk of whole lines at a time, so memory use does not
+        # grow with the file
+        count = delta = 0
+        pos = start
+        while True:
+            stop = data.find(b'\n', min(pos + MEASURE_CHUNK_BYTES, end), end) + 1 or end
+            try:
+                text = bytes(data[pos:stop]).decode('utf-8')
+            except UnicodeDecodeError:
+                raise UnsupportedSedError("input is not valid UTF-8")
+            if self._ascii_input and not text.isascii():
+                raise UnsupportedSedError("character class needs locale support for non-ASCII input")
+            chunk_count, chunk_delta = self._measure(text, 0, len(text), '\n', line, mark)
+            count += chunk_count
+            delta += chunk_delta
+            if stop >= end:
+                return count, delta
+            line += text.count('\n')
+            pos = stop
+
+    def _region(self, data) -> Optional[Tuple[int, int]]:
+        """Byte span of the addressed lines, excluding the final newline.
+
+        Returns:
+            (start, end) offsets, or None if no line is addressed
+        """
+        size = len(data)
+        if size == 0:
+            return None
+        content_end = size - 1 if data[size - 1:size] == b'\n' else size
+
+        if self.start_line is None:
+            # '$': last line only
+            return data.rfind(b'\n', 0, content_end) + 1, content_end
+
+        start = 0
+        for _ in range(self.start_line - 1):
+            nl = data.find(b'\n', start, content_end)
+            if nl == -1:
+                return None
+            start = nl + 1
+
+        if self.end_line is None:
+            return start, content_end
+
+        end = start
+        for _ in range(self.end_line - self.start_line + 1):
+            nl = data.find(b'\n', end, content_end)
+            if nl == -1:
+                return start, content_end
+            end = nl + 1
+        return start, end - 1
+
+    def _substitute(self, buf, pos: int, endpos: int, newline) -> Tuple[list, int]:
+        """Run the substitution over buf[pos:endpos] with per-line counting.
+
+        Returns:
+            Tuple of (output pieces covering buf[pos:endpos], substitutions)
+        """
+        pieces = []
+        count = 0
+        last = pos
+        prev_end = -1
+        line_end = -1        # index of the newline ending the current line
+        occurrence = 0
+        target = self.occurrence
+        global_replace = self.global_replace
+        constant = self._constant
+        template = self._template
+        split_risk = self._split_risk
+        text_mode = isinstance(buf, str)
+        high = '\x80' if text_mode else 0x80
+        empty = '' if text_mode else b''
+
+        for m in self._regex.finditer(buf, pos, endpos):
+            s, e = m.span()
+            if s == e and split_risk and s < endpos and buf[s] >= high:
+                # After an empty match glibc steps into a multibyte character
+                # per byte or per character depending on the pattern
+                raise UnsupportedSedError("empty match before multibyte character")
+            if s == e and s == prev_end:
+                # sed never matches empty right after the previous match
+                continue
+            prev_end = e
+
+            if s > line_end:
+                # First match on a new line
+                occurrence = 0
+                line_end = buf.find(newline, s, endpos)
+                if line_end == -1:
+                    line_end = endpos
+            occurrence += 1
+
+            if occurrence < target or (occurrence > target and not global_replace):
+                continue
+
+            pieces.append(buf[last:s])
+            if constant is not None:
+                pieces.append(constant)
+            else:
+                pieces.append(empty.join(
+                    part if not isinstance(part, int) else (m.group(part) or empty)
+                    for part in template
+                ))
+            last = e
+            count += 1
+
+        pieces.append(buf[last:endpos])
+        return pieces, count
+
+    def _measure(
+        self,
+        buf,
+        pos: int,
+        endpos: int,
+        newline,
+        line: int,
+        mark: Callable[[int], None]
+    ) -> Tuple[int, int]:
+        """Count the substitutions _substitute() would make in buf[pos:endpos].
+
+        Args:
+            buf: Bytes-like buffer or text, as for _substitute()
+            pos: Offset of the first line
+            endpos: End of the measured content
+            newline: Line separator of the same type as buf
+            line: Number of the line starting at pos
+            mark: Called with the number of each line with a substitution
+
+        Returns:
+            Tuple of (number of substitutions, change in size in bytes)
+        """
+        count = 0
+        delta = 0
+        prev_end = -1
+        line_end = -1        # index of the newline ending the current line
+        scanned = pos        # newlines before this offset are counted in line
+        marked = False
+        occurrence = 0
+        target = self.occurrence
+        global_replace = self.global_replace
+        constant = self._constant
+        template = self._template
+        split_risk = self._split_risk
+        text_mode = isinstance(buf, str)
+        high = '\x80' if text_mode else 0x80
+        empty = '' if text_mode else b''
+
+        def size(value) -> int:
+            return len(value.encode('utf-8')) if text_mode else len(value)
+
+        constant_size = size(constant) if constant is not None else 0
+
+        for m in self._regex.finditer(buf, pos, endpos):
+            s, e = m.span()
+            if s == e and split_risk and s < endpos and buf[s] >= high:
+                raise UnsupportedSedError("empty match before multibyte character")
+            if s == e and s == prev_end:
+                continue
+            prev_end = e
+
+            if s > line_end:
+                occurrence = 0
+                line += _count_newlines(buf, scanned, s)
+                scanned = s
+                marked = False
+                line_end = buf.find(newline, s, endpos)
+                if line_end == -1:
+                    line_end = endpos
+            occurrence += 1
+
+            if occurrence < target or (occurrence > target and not global_replace):
+                continue
+
+            if constant is not None:
+                delta += constant_size - size(buf[s:e])
+            else:
+                delta += size(empty.join(
+                    part if not isinstance(part, int) else (m.group(part) or empty)
+                    for part in template
+                )) - size(buf[s:e])
+            count += 1
+            if not marked:
+                marked = True
+                mark(line)
+
+        return count, delta
+
+
+@functools.lru_cache(maxsize=256)
+def compile_script(script: str, extended: bool = False) -> Optional[SedScript]:
+    """Compile a sed script for in-process execution, with LRU caching.
+
+    Args:
+        script: Sed script, e.g. 's/foo/bar/g' or '5,$s/a/b/'
+        extended: Use ERE syntax (sed -E)
+
+    Returns:
+        Compiled SedScript, or None if the script needs the sed binary
+    """
+    try:
+        return SedScript(script, extended)
+    except UnsupportedSedError as e:
+        logger.debug("sed_engine: falling back to sed binary for %r: %s", script[:100], e.message)
+        return None
+
+
+class SedProgram:
+    """A sequence of compiled substitutions applied like one sed invocation.
+
+    sed runs every command on a line before moving to the next, so for
+    substitutions the result equals applying the scripts one after another
+    to the whole file, as long as every line stays one line. A later
+    command would see a newline inserted by an earlier replacement inside
+    its pattern space (where '^', '$' and line addresses differ), so
+    compile_program() refuses commands following such a replacement.
+
+    Instances are immutable and safe to share between threads.
+    """
+
+    __slots__ = ('scripts',)
+
+    def __init__(self, scripts: Tuple[SedScript, ...]) -> None:
+        """Initialize SedProgram.
+
+        Args:
+            scripts: Compiled scripts in program order
+        """
+        self.scripts = scripts
+
+    def apply(self, data) -> Tuple[bytes, int]:
+        """Apply the program to file content.
+
+        Args:
+            data: File content (bytes, bytearray or mmap)
+
+        Returns:
+            Tuple of (new content, total number of substitutions made)
+
+        Raises:
+            UnsupportedSedError: If the input cannot be handled in-process
+        """
+        total = 0
+        for script in self.scripts:
+            data, count = script.apply(data)
+            total += count
+        return bytes(data), total
+
+    def measure(self, data, max_lines: int, bounds: Optional[Bounds] = None) -> MatchStats:
+        """Measure what the program would change, without building the content.
+
+        A single script is measured in one pass over data, in bounded
+        memory. Later scripts see the output of earlier ones, so for several
+        scripts each but the last is also applied, in memory.
+
+        Args:
+            data: File content (bytes, bytearray or mmap)
+            max_lines: Most line numbers to report
+            bounds: (start, end, first line) of a range of whole lines to
+                measure instead of the addressed lines, for scripts without
+                an address; with several scripts it must cover all of data
+
+        Returns:
+            MatchStats of the program
+
+        Raises:
+            UnsupportedSedError: If the input cannot be handled in-process
+        """
+        if len(self.scripts) == 1:
+            numbers: List[int] = []
+            lines = 0
+
+            def count_line(number: int) -> None:
+                nonlocal lines
+                lines += 1
+                if len(numbers) < max_lines:
+                    numbers.append(number)
+
+            count, delta = self.scripts[0].measure(data, count_line, bounds)
+            return MatchStats(count, lines, numbers, delta)
+
+        # Commands keep every line a line (see compile_program()), so line
+        # numbers agree between the steps; collect them in a line map
+        first = bounds[2] if bounds is not None else 1
+        hit = bytearray(_count_newlines(data, 0, len(data)) + 1)
+
+        def mark(number: int) -> None:
+            hit[number - first] = 1
+
+        total = delta = 0
+        for i, script in enumerate(self.scripts):
+            count, size_change = script.measure(data, mark, bounds)
+            total += count
+            delta += size_change
+            if count and i + 1 < len(self.scripts):
+                data = script.apply(data)[0]
+                if bounds is not None:
+                    bounds = (0, len(data), first)
+
+        numbers = []
+        index = hit.find(1)
+        while index != -1 and len(numbers) < max_lines:
+            numbers.append(index + first)
+            index = hit.find(1, index + 1)
+        return MatchStats(total, hit.count(1), numbers, delta)
+
+    def apply_file(self, path: Union[str, Path]) -> Tuple[bytes, int]:
+        """Apply the program to a file through a read-only memory map.
+
+        Args:
+            path: File to read
+
+        Returns:
+            Tuple of (new content, total number of substitutions made)
+
+        Raises:
+            UnsupportedSedError: If the input cannot be handled in-process
+            OSError: If the file cannot be read
+        """
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b'', 0
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return self.apply(mm)
+
+
+def compile_program(scripts: Tuple[str, ...], extended: bool = False) -> Optional[SedProgram]:
+    """Compile a multi-command sed program for in-process execution.
+
+    Args:
+        scripts: Sed scripts in program order, one command each
+        extended: Use ERE syntax (sed -E)
+
+    Returns:
+        Compiled SedProgram, or None if any script needs the sed binary
+    """
+    compiled = []
+    for text in scripts:
+        if compiled and compiled[-1].inserts_newline:
+            logger.debug("sed_engine: command after a newline insertion: %r", text[:100])
+            return None
+        script = compile_script(text, extended)
+        if script is None:
+            return None
+        compiled.append(script)
+    return SedProgram(tuple(compiled))
+
+
+def _skip_bracket(regex: str, i: int) -> int:
+    """Return the index after a bracket expression starting just after '['.
+
+    Raises:
+        UnsupportedSedError: If the bracket expression is unterminated
+    """
+    n = len(regex)
+    if i < n and regex[i] == '^':
+        i += 1
+    if i < n and regex[i] == ']':
+        i += 1
+    while i < n:
+        if regex[i] == '[' and i + 1 < n and regex[i + 1] in ':=.':
+            end = regex.find(regex[i + 1] + ']', i + 2)
+            if end == -1:
+                break
+            i = end + 2
+        elif regex[i] == ']':
+            return i + 1
+        else:
+            i += 1
+    raise UnsupportedSedError("unterminated bracket expression")
+
+
+def _literal_runs(regex: str, extended: bool) -> List[str]:
+    """Split a regex into the runs of literal text every match contains.
+
+    The analysis is conservative: groups, brackets, classes and anchors end
+    a run, and an optional atom ('*', '?', '{0,n}') is dropped from it. A
+    quantifier with a zero minimum that follows another quantifier (GNU sed
+    accepts 'a\\{2\\}*') makes the atom optional after all, so it is dropped
+    from its run too.
+
+    Args:
+        regex: Regular expression text (escaped delimiters already unescaped)
+        extended: Interpret as ERE instead of BRE
+
+    Returns:
+        Literal runs; empty if no literal text is mandatory
+
+    Raises:
+        UnsupportedSedError: For alternation, which makes every run optional,
+            for escapes that take an argument (\\cX, \\dNNN, \\oNNN, \\xHH),
+            and for malformed expressions
+    """
+    runs: List[str] = []
+    run: List[str] = []
+    depth = 0
+    literal = False      # whether the previous atom is the last char of run
+    quantified = -1      # end of a quantifier that kept its atom in runs[-1]
+    i = 0
+    n = len(regex)
+
+    def end_run() -> None:
+        if run:
+            runs.append(''.join(run))
+            run.clear()
+
+    def quantify(start: int, end: int, minimum: int) -> None:
+        nonlocal literal, quantified
+        stacked = start == quantified
+        if stacked and minimum == 0:
+            # Optional quantifier on a quantified atom: the atom ending
+            # runs[-1] is no longer mandatory
+            head = runs.pop()[:-1]
+            if head:
+                runs.append(head)
+        elif literal and minimum == 0:
+            run.pop()
+        kept = minimum > 0 and (literal or stacked)
+        end_run()
+        quantified = end if kept else -1
+        literal = False
+
+    def interval(start: int, j: int, closing: str) -> int:
+        end = regex.find(closing, j)
+        match = re.fullmatch(r'(\d*)(,\d*)?', regex[j:end]) if end != -1 else None
+        if match is None:
+            raise UnsupportedSedError("invalid interval")
+        quantify(start, end + len(closing), int(match.group(1) or 0))
+        return end + len(closing)
+
+    while i < n:
+        c = regex[i]
+        if c == '\\':
+            if i + 1 >= n:
+                raise UnsupportedSedError("trailing backslash")
+            e = regex[i + 1]
+            i += 2
+            if e == '|' or (extended and e == '\n'):
+                raise UnsupportedSedError("alternation")
+            if not extended and e in '()':
+                depth += 1 if e == '(' else -1
+                end_run()
+                literal = False
+            elif not extended and e == '{':
+                i = interval(i - 2, i, '\\}')
+            elif not extended and e in '+?':
+                quantify(i - 2, i, 1 if e == '+' else 0)
+            elif e in 'cdox':
+                # The character they produce is not known without decoding
+                # their argument, which must not be read as literal text
+                raise UnsupportedSedError("escape with an argument")
+            elif e in _CONTROL_ESCAPES or not e.isalnum():
+                if depth:
+                    end_run()
+                    literal = False
+                else:
+                    run.append(_CONTROL_ESCAPES.get(e, e))
+                    literal = True
+            else:
+                # Back references, word/space classes, anchors, \n, \xHH, ...
+                end_run()
+                literal = False
+            continue
+
+        i += 1
+        if extended and c == '|':
+            raise UnsupportedSedError("alternation")
+        if c == '*':
+            quantify(i - 1, i, 0)
+        elif extended and c in '+?':
+            quantify(i - 1, i, 1 if c == '+' else 0)
+        elif extended and c == '{':
+            i = interval(i - 1, i, '}')
+        elif extended and c in '()':
+            depth += 1 if c == '(' else -1
+            end_run()
+            literal = False
+        elif c == '[':
+            i = _skip_bracket(regex, i)
+            end_run()
+            literal = False
+        elif c in '.^$' or depth:
+            end_run()
+            literal = False
+        else:
+            run.append(c)
+            literal = True
+
+    end_run()
+    return runs
+
+
+@functools.lru_cache(maxsize=256)
+def required_literal(script: str, extended: bool = False) -> Optional[Tuple[bytes, bool]]:
+    """Find literal text that any match of an s command must contain.
+
+    Works on every substitution the sed binary accepts, including those the
+    in-process engine cannot execute, since only the literal parts of the
+    regex are inspected.
+
+    Args:
+        script: Sed script, e.g. '1,10s/foo.*bar/x/g'
+        extended: Use ERE syntax (sed -E)
+
+    Returns:
+        Tuple of (longest mandatory literal as UTF-8, ignore_case), or None
+        if the script is not an s command or has no usable literal
+    """
+    try:
+        _, regex_text, _, flags = _split_command(script)
+        runs = _literal_runs(regex_text, extended)
+    except UnsupportedSedError:
+        return None
+
+    ignore_case = 'I' in flags or 'i' in flags
+    candidates = runs
+    if ignore_case:
+        # Searched as ASCII-only case-insensitive bytes; in a UTF-8 locale
+        # 'k', 's' and 'i' also match non-ASCII letters (KELVIN SIGN, ...)
+        candidates = [run for run in runs if run.isascii()]
+        if LOCALE_IS_UTF8:
+            candidates = [part for run in candidates for part in re.split('[kKsSiI]', run)]
+    candidates = [run for run in candidates if run]
+    if not candidates:
+        return None
+    return max(candidates, key=len).encode('utf-8'), ignore_case
+
+
+def may_match(
+    path: Union[str, Path],
+    scripts: Tuple[str, ...],
+    extended: bool = False,
+    start: int = 0,
+    end: Optional[int] = None
+) -> bool:
+    """Pre-scan a file for the literal text the substitutions require.
+
+    If no command's literal occurs in the file, no command can match: the
+    first command leaves the file unchanged, so neither can any later one.
+    The file is searched through a read-only memory map, without running
+    the regular expressions.
+
+    Args:
+        path: File to scan
+        scripts: Sed scripts in program order, one command each
+        extended: Use ERE syntax (sed -E)
+        start: Offset of the first byte the commands apply to
+        end: Offset just past the last byte the commands apply to (None
+            for the end of the file)
+
+    Returns:
+        False only if the program certainly changes nothing; True if some
+        command may match or the scripts cannot be analysed
+
+    Raises:
+        OSError: If the file cannot be read
+    """
+    literals = []
+    for script in scripts:
+        literal = required_literal(script, extended)
+        if literal is None:
+            return True
+        literals.append(literal)
+
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        end = size if end is None else min(end, size)
+        if start >= end:
+            return False
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for text, ignore_case in literals:
+                if ignore_case:
+                    if re.compile(re.escape(text), re.IGNORECASE).search(mm, start, end):
+                        return True
+                elif mm.find(text, start, end) != -1:
+                    return True
+    return False
+
+
+def match_listing_commands(gnu: bool) -> Tuple[str, ...]:
+    """Sed commands that list the lines a program changes, for a dry run.
+
+    Run with ``sed -n``, with the program's commands between the first
+    command returned and the rest, sed prints for each line on which a
+    substitution was made its number, the new pattern space and the
+    original line, the latter two with ``l``. parse_match_listing() turns
+    the output into MatchStats; unchanged lines produce no output.
+
+    Args:
+        gnu: Whether the sed binary is GNU sed (``l 0`` disables line
+            wrapping; BSD sed wraps, which the parser undoes)
+
+    Returns:
+        Tuple of (command to put before the program, commands to put after it)
+    """
+    listing = 'l 0' if gnu else 'l'
+    return ('h',) + ('t changed', 'b', ':changed', '=', listing, 'x', listing)
+
+
+def _listed_size(output: bytes, pos: int) -> Tuple[int, int]:
+    """Size of the text an ``l`` listing starting at pos stands for.
+
+    Returns:
+        Tuple of (size in bytes, offset after the listing's newline)
+
+    Raises:
+        ValueError: If the listing is cut off
+    """
+    size = 0
+    end = len(output)
+    while pos < end:
+        c = output[pos]
+        if c == 0x5c:  # backslash
+            following = output[pos + 1:pos + 2]
+            if not following:
+                break
+            if following == b'\n':
+                # Line wrapped by BSD sed
+                pos += 2
+                continue
+            pos += 4 if following.isdigit() else 2
+            size += 1
+        elif c == 0x0a:
+            # The listing ends with '$' and a newline
+            return size - 1, pos + 1
+        else:
+            size += 1
+            pos += 1
+    raise ValueError("listing is cut off")
+
+
+def parse_match_listing(output: bytes, max_lines: int, complete: bool = True) -> MatchStats:
+    """Build MatchStats from the output of match_listing_commands().
+
+    Args:
+        output: Standard output of sed
+        max_lines: Most line numbers to report
+        complete: Whether sed's output was complete; a cut-off final record
+            is then ignored and the statistics are marked incomplete
+
+    Returns:
+        MatchStats without a substitution count
+    """
+    lines = 0
+    numbers: List[int] = []
+    delta = 0
+    pos = 0
+    while pos < len(output):
+        try:
+            newline = output.index(b'\n', pos)
+            number = int(output[pos:newline])
+            new_size, pos = _listed_size(output, newline + 1)
+            old_size, pos = _listed_size(output, pos)
+        except ValueError:
+            if complete:
+                raise
+            break
+        lines += 1
+        if len(numbers) < max_lines:
+            numbers.append(number)
+        delta += new_size - old_size
+    return MatchStats(None, lines, numbers, delta, complete)
@@ -0,0 +1,758 @@
+"""Per-file version history kept as reverse patches with periodic keyframes.
+
+Every edit records the content the file had before it. Most versions are
+stored as a reverse patch: a zero-context unified diff from the edit's result
+back to its input, produced by the in-process diff engine. A few are stored
+in full, compressed with zlib, as keyframes:
+
+- the first version of a file, and the first after the file was changed
+  outside the tools (its content is not the result of the previous edit)
+- every ``keyframe_interval``-th version
+- versions whose diff is unavailable (binary data, too costly to compute)
+  or larger than half the file, and the version after them
+
+A staging file (a streamed edit) is diffed only between the identical
+leading and trailing lines, which are found by comparing blocks of bytes.
+
+An earlier version is rebuilt in a single streaming pass. Starting from the
+nearest keyframe, patches are applied forwards (a reverse patch inverted);
+starting from a later keyframe or the current file, reverse patches are
+applied as they are. Each patch is a generator over the output of the
+previous one that passes unchanged runs of lines through as whole chunks,
+so memory use depends on the patches, not on the file size.
+The result is checked against the version's digest before it is used.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+
+from .config import read_env, state_directory
+from .diff_engine import MAX_STREAM_LINE, UnsupportedDiffError, diff_line_streams, unified_diff
+from .fileops import sibling_temp
+
+# Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
+
+logger = logging.getLogger(__name__)
+
+# Bytes read, hashed and compressed at a time
+CHUNK_BYTES = 1024 * 1024
+
+# Size of the BLAKE2b digests of versions
+DIGEST_BYTES = 20
+
+# Search budget for reverse patches; beyond it a keyframe is cheaper
+PATCH_MAX_WORK = 1_000_000
+
+# Combined size of the differing middles of two files compared in memory;
+# larger middles are compared line by line
+MAX_DIFF_MIDDLE = 16 * 1024 * 1024  # 16MB
+
+CHAIN_NAME = 'versions.json'
+
+_HUNK_HEADER = re.compile(rb'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+_HUNK_LINE = re.compile(rb'(?m)^@@ -(\d+)((?:,\d+)?) \+(\d+)((?:,\d+)?) @@')
+
+# A hunk as (old start, old lines, new start, new lines), starts 0-based
+Hunk = Tuple[int, List[bytes], int, List[bytes]]
+
+
+class HistoryError(Exception):
+    """Raised when a version is unknown or cannot be rebuilt.
+    
+    Attributes:
+        message: Human-readable error description
+    """
+    
+    def __init__(self, message: str) -> None:
+        """Initialize HistoryError.
+        
+        Args:
+            message: Human-readable error description
+        """
+        super().__init__(message)
+        self.message = message
+
+
+class Version:
+    """Content of a file before one edit.
+    
+    Attributes:
+        number: Version number, increasing per file from 1
+        created: time.time() at which the edit was recorded
+        size: Size of the content in bytes
+        digest: Hex BLAKE2b digest of the content
+        result_digest: Digest of the content the edit wrote
+        keyframe: Whether the content is stored in full
+        patch: Whether a reverse patch from the result is stored
+        operation: Description of the edit
+    """
+    
+    def __init__(
+        self,
+        number: int,
+        created: float,
+        size: int,
+        digest: str,
+        result_digest: str,
+        keyframe: bool,
+        patch: bool,
+        operation: str
+    ) -> None:
+        self.number = number
+        self.created = created
+        self.size = size
+        self.digest = digest
+        self.result_digest = result_digest
+        self.keyframe = keyframe
+        self.patch = patch
+        self.operation = operation
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'number': self.number, 'created': self.created, 'size': self.size,
+            'digest': self.digest, 'result_digest': self.result_digest,
+            'keyframe': self.keyframe, 'patch': self.patch, 'operation': self.operation,
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "Version":
+        return cls(
+            int(data['number']), float(data['created']), int(data['size']),
+            data['digest'], data['result_digest'], bool(data['keyframe']),
+            bool(data['patch']), str(data['operation'])
+        )
+
+
+def _digest_file(path: Union[str, Path]) -> Tuple[str, int]:
+    """Return (hex digest, size) of a file."""
+    digest = hashlib.blake2b(digest_size=DIGEST_BYTES)
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_BYTES), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _file_chunks(path: Union[str, Path]) -> Iterator[bytes]:
+    """Content of a file in chunks."""
+    with open(path, 'rb') as f:
+        yield from iter(lambda: f.read(CHUNK_BYTES), b'')
+
+
+def _common_length(first: bytes, second: bytes, from_end: bool = False) -> int:
+    """Length of the common prefix (or suffix) of two byte strings."""
+    a, b = memoryview(first), memoryview(second)
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        same = a[len(a) - mid:] == b[len(b) - mid:] if from_end else a[:mid] == b[:mid]
+        if same:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_ends(first: Union[str, Path], second: Union[str, Path]) -> Tuple[int, int, int]:
+    """Find the identical leading and trailing lines of two files.
+    
+    Returns:
+        Tuple of (bytes of identical leading lines, their number, bytes of
+        identical trailing lines); the two ends do not overlap
+    """
+    with open(first, 'rb') as f0, open(second, 'rb') as f1:
+        size0 = os.fstat(f0.fileno()).st_size
+        size1 = os.fstat(f1.fileno()).st_size
+        offset = prefix = lines = 0
+        while True:
+            a = f0.read(CHUNK_BYTES)
+            b = f1.read(CHUNK_BYTES)
+            common = len(a) if a == b else _common_length(a, b)
+            end = a.rfind(b'\n', 0, common) + 1
+            if end:
+                prefix = offset + end
+                lines += a.count(b'\n', 0, end)
+            if common < len(a) or len(a) != len(b) or not a:
+                break
+            offset += len(a)
+        
+        limit = min(size0, size1) - prefix
+        suffix = 0
+        while suffix < limit:
+            n = min(CHUNK_BYTES, limit - suffix)
+            f0.seek(size0 - suffix - n)
+            f1.seek(size1 - suffix - n)
+            a = f0.read(n)
+            b = f1.read(n)
+            common = n if a == b else _common_length(a, b, from_end=True)
+            suffix += common
+            if common < n:
+                break
+        if suffix and not (_at_line_start(f0, size0 - suffix) and _at_line_start(f1, size1 - suffix)):
+            # Start the trailing part after its first newline
+            f0.seek(size0 - suffix)
+            head = f0.read(min(suffix, MAX_STREAM_LINE))
+            start = head.find(b'\n') + 1
+            suffix = suffix - start if start else 0
+    return prefix, lines, suffix
+
+
+def _at_line_start(f, offset: int) -> bool:
+    """Whether an offset of an open file is the start of a line."""
+    if offset == 0:
+        return True
+    f.seek(offset - 1)
+    return f.read(1) == b'\n'
+
+
+def _range_lines(path: Union[str, Path], start: int, end: int) -> Iterator[bytes]:
+    """Lines of a file between two line-aligned offsets."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            line = f.readline(min(remaining, MAX_STREAM_LINE))
+            if not line:
+                return
+            remaining -= len(line)
+            yield line
+
+
+def _shift_hunks(diff: bytes, lines: int) -> bytes:
+    """Move the hunks of a diff down by a number of lines."""
+    if not lines:
+        return diff
+    return _HUNK_LINE.sub(
+        lambda m: b'@@ -%d%s +%d%s @@' % (
+            int(m.group(1)) + lines, m.group(2), int(m.group(3)) + lines, m.group(4)
+        ),
+        diff
+    )
+
+
+def _hunk_start(start: int, count: int) -> int:
+    """0-based index of a hunk range printed as ``start,count``."""
+    return start if count == 0 else start - 1
+
+
+def parse_patch(diff: bytes) -> List[Hunk]:
+    """Parse a unified diff into hunks.
+    
+    Args:
+        diff: Output of the diff engine (any context width)
+    
+    Returns:
+        Hunks in file order
+    
+    Raises:
+        HistoryError: If the diff is malformed
+    """
+    hunks: List[Hunk] = []
+    f = io.BytesIO(diff)
+    line = f.readline()
+    while line and not line.startswith(b'@@'):
+        line = f.readline()
+    while line:
+        match = _HUNK_HEADER.match(line)
+        if match is None:
+            raise HistoryError(f"Malformed patch line: {line[:80]!r}")
+        old_count = int(match.group(2) or 1)
+        new_count = int(match.group(4) or 1)
+        old_lines: List[bytes] = []
+        new_lines: List[bytes] = []
+        while len(old_lines) < old_count or len(new_lines) < new_count:
+            line = f.readline()
+            mark, text = line[:1], line[1:]
+            if mark == b'-' or mark == b' ':
+                old_lines.append(text)
+            if mark == b'+' or mark == b' ':
+                new_lines.append(text)
+            if mark not in (b'-', b'+', b' '):
+                raise HistoryError(f"Malformed patch line: {line[:80]!r}")
+            line = f.readline()
+            if line.startswith(b'\\'):
+                # "\ No newline at end of file" applies to the line before
+                if mark != b'+':
+                    old_lines[-1] = old_lines[-1][:-1]
+                if mark != b'-':
+                    new_lines[-1] = new_lines[-1][:-1]
+                line = f.readline()
+            f.seek(-len(line), io.SEEK_CUR)
+        hunks.append((
+            _hunk_start(int(match.group(1)), old_count), old_lines,
+            _hunk_start(int(match.group(3)), new_count), new_lines
+        ))
+        line = f.readline()
+    return hunks
+
+
+class _LineCursor:
+    """Reads single lines, or runs of lines, from a stream of chunks."""
+    
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self._chunks = iter(chunks)
+        self._buf = b''
+        self._pos = 0
+        self.line = 0
+    
+    def _more(self) -> bool:
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+    
+    def copy_to(self, line: int) -> Iterator[bytes]:
+        """Yield the content up to the start of a line, in chunks."""
+        while self.line < line:
+            buf, pos = self._buf, self._pos
+            need = line - self.line
+            if buf.count(b'\n', pos) >= need:
+                end = pos
+                for _ in range(need):
+                    end = buf.index(b'\n', end) + 1
+                self._pos = end
+                self.line = line
+                yield buf[pos:end]
+                return
+            end = buf.rfind(b'\n', pos) + 1
+            if end:
+                self.line += buf.count(b'\n', pos, end)
+                self._pos = end
+                yield buf[pos:end]
+            if not self._more():
+                if self._pos < len(self._buf):
+                    # Last line, without a newline
+                    self.line += 1
+                    yield self._buf[self._pos:]
+                    self._pos = len(self._buf)
+                if self.line < line:
+                    raise HistoryError("Patch does not apply: content ends early")
+    
+    def read_line(self) -> Optional[bytes]:
+        """Return the next line, or None at the end."""
+        while True:
+            end = self._buf.find(b'\n', self._pos)
+            if end < 0 and not self._more():
+                end = len(self._buf) - 1
+                if self._pos > end:
+                    return None
+            if end >= 0:
+                line = self._buf[self._pos:end + 1]
+                self._pos = end + 1
+                self.line += 1
+                return line
+    
+    def rest(self) -> Iterator[bytes]:
+        """Yield everything not read yet."""
+        if self._pos < len(self._buf):
+            yield self._buf[self._pos:]
+        self._buf = b''
+        self._pos = 0
+        yield from self._chunks
+
+
+def apply_patch(chunks: Iterable[bytes], hunks: List[Hunk], inverse: bool = False) -> Iterator[bytes]:
+    """Apply hunks to a stream of content, yielding the patched content.
+    
+    Unchanged runs of lines are passed on as slices of the input chunks,
+    so the cost of a patch grows with the number of chunks and hunks
+    rather than the number of lines.
+    
+    Args:
+        chunks: Old side of the patch (new side if inverse), in chunks of
+            any size
+        hunks: Parsed patch
+        inverse: Apply the patch backwards, from its new side to its old
+    
+    Raises:
+        HistoryError: If the content does not match the patch
+    """
+    cursor = _LineCursor(chunks)
+    for old_start, old_lines, new_start, new_lines in hunks:
+        start, expected, replacement = (
+            (new_start, new_lines, old_lines) if inverse else (old_start, old_lines, new_lines)
+        )
+        yield from cursor.copy_to(start)
+        for want in expected:
+            if cursor.read_line() != want:
+                raise HistoryError(f"Patch does not apply at line {cursor.line}")
+        if replacement:
+            yield b''.join(replacement)
+    yield from cursor.rest()
+
+
+class VersionHistory:
+    """Thread-safe store of the version chains of edited files.
+    
+    Attributes:
+        directory: History directory, one subdirectory per file
+        max_versions: Versions kept per file (0 disables the history); the
+            oldest are deleted a keyframe group at a time
+        keyframe_interval: Versions between keyframes
+        level: zlib compression level (0-9)
+    """
+    
+    DEFAULT_MAX_VERSIONS = 100
+    DEFAULT_KEYFRAME_INTERVAL = 16
+    DEFAULT_LEVEL = 1
+    
+    # Environment variables read by from_env()
+    ENV_DIRECTORY = "SED_AWK_HISTORY_DIR"
+    ENV_MAX_VERSIONS = "SED_AWK_HISTORY_MAX_VERSIONS"
+    ENV_KEYFRAME_INTERVAL = "SED_AWK_HISTORY_KEYFRAME_INTERVAL"
+    
+    def __init__(
+        self,
+        directory: Optional[Union[str, Path]] = None,
+        max_versions: int = DEFAULT_MAX_VERSIONS,
+        keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+        level: int = DEFAULT_LEVEL
+    ) -> None:
+        """Initialize VersionHistory.
+        
+        Args:
+            directory: History directory (default:
+                $XDG_STATE_HOME/sed-awk-mcp/history)
+            max_versions: Versions kept per file (0 disables the history)
+            keyframe_interval: Versions between keyframes
+            level: zlib compression level (0-9)
+        
+        Raises:
+            ValueError: If a limit is out of range
+        """
+        if max_versions < 0 or keyframe_interval < 1:
+            raise ValueError("max_versions must be >= 0 and keyframe_interval >= 1")
+        if not 0 <= level <= 9:
+            raise ValueError(f"Compression level must be 0-9, got {level}")
+        self.directory = Path(directory) if directory is not None else state_directory('history')
+        self.max_versions = max_versions
+        self.keyframe_interval = keyframe_interval
+        self.level = level
+        self._chains: Dict[str, List[Version]] = {}
+        self._file_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        
+        self.recorded = 0
+        self.keyframes = 0
+        self.rebuilt = 0
+    
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None) -> "VersionHistory":
+        """Create a history from environment variables.
+        
+        Reads SED_AWK_HISTORY_DIR, SED_AWK_HISTORY_MAX_VERSIONS and
+        SED_AWK_HISTORY_KEYFRAME_INTERVAL. Unset variables keep their
+        defaults.
+        
+        Args:
+            environ: Environment mapping (default: os.environ)
+        
+        Returns:
+            Configured VersionHistory
+        
+        Raises:
+            ValueError: If a variable is not a valid value
+        """
+        environ = os.environ if environ is None else environ
+        
+        return cls(
+            directory=read_env(environ, cls.ENV_DIRECTORY, None, Path),
+            max_versions=read_env(environ, cls.ENV_MAX_VERSIONS, cls.DEFAULT_MAX_VERSIONS, int),
+            keyframe_interval=read_env(
+                environ, cls.ENV_KEYFRAME_INTERVAL, cls.DEFAULT_KEYFRAME_INTERVAL, int
+            )
+        )
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_versions > 0
+    
+    def stats(self) -> Dict[str, int]:
+        """Return counters since startup."""
+        return {
+            "recorded": self.recorded,
+            "keyframes": self.keyframes,
+            "rebuilt": self.rebuilt,
+        }
+    
+    def versions(self, path: Union[str, os.PathLike]) -> List[Version]:
+        """Return the recorded versions of a file, oldest first."""
+        path = os.fspath(path)
+        with self._file_lock(path):
+            return list(self._chain(path))
+    
+    def record(
+        self,
+        path: Union[str, os.PathLike],
+        new_content: Union[bytes, Path],
+        operation: str
+    ) -> Version:
+        """Record a file's current content before an edit replaces it (blocking).
+        
+        Args:
+            path: Canonical path of the file, still holding its old content
+            new_content: Content the edit is about to write, as bytes or a
+                staging file
+            operation: Description of the edit
+        
+        Returns:
+            The new version
+        
+        Raises:
+            OSError: If the file cannot be read or the version not written
+        """
+        path = os.fspath(path)
+        with self._file_lock(path):
+            chain = self._chain(path)
+            digest, size = _digest_file(path)
+            if isinstance(new_content, Path):
+                result_digest, _ = _digest_file(new_content)
+            else:
+                result_digest = hashlib.blake2b(new_content, digest_size=DIGEST_BYTES).hexdigest()
+            
+            previous = chain[-1] if chain else None
+            number = previous.number + 1 if previous else 1
+            patch = self._reverse_patch(path, new_content, size)
+            keyframe = (
+                patch is None
+                or previous is None
+                or previous.result_digest != digest
+                or not previous.patch
+                or number - self._last_keyframe(chain) >= self.keyframe_interval
+            )
+            
+            folder = self._folder(path)
+            folder.mkdir(mode=0o700, parents=True, exist_ok=True)
+            if patch is not None:
+                (folder / f"{number}.patch.z").write_bytes(zlib.compress(patch, self.level))
+            if keyframe:
+                self._write_keyframe(path, folder / f"{number}.full.z")
+                self.keyframes += 1
+            
+            version = Version(
+                number, time.time(), size, digest, result_digest,
+                keyframe, patch is not None, operation[:200]
+            )
+            chain.append(version)
+            self._prune(path, chain)
+            self._save(path, chain)
+            self.recorded += 1
+        
+        logger.debug(
+            "VersionHistory: recorded %s version %d (%s)",
+            path, number, "keyframe" if keyframe else f"{len(patch)} byte patch"
+        )
+        return version
+    
+    def discard(self, path: Union[str, os.PathLike], version: Version) -> None:
+        """Forget a version recorded for an edit that was not written."""
+        path = os.fspath(path)
+        with self._file_lock(path):
+            chain = self._chain(path)
+            if chain and chain[-1].number == version.number:
+                chain.pop()
+                self._delete_files(path, [version])
+                self._save(path, chain)
+    
+    def stage_version(
+        self,
+        path: Union[str, os.PathLike],
+        number: int,
+        target: Union[str, os.PathLike]
+    ) -> Tuple[Path, Version]:
+        """Rebuild a version into a staging file next to target (blocking).
+        
+        Args:
+            path: Canonical path of the file whose version to rebuild
+            number: Version number
+            target: File the rebuilt content is meant to replace
+        
+        Returns:
+            Tuple of (staging file, owned by the caller; the version)
+        
+        Raises:
+            HistoryError: If the version is unknown or cannot be rebuilt
+            OSError: If a file cannot be read or the staging file written
+        """
+        path = os.fspath(path)
+        with self._file_lock(path):
+            chain = list(self._chain(path))
+        position = next((i for i, v in enumerate(chain) if v.number == number), None)
+        if position is None:
+            raise HistoryError(f"No version {number} of {path}")
+        version = chain[position]
+        
+        fd, staged = sibling_temp(Path(target))
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                digest = hashlib.blake2b(digest_size=DIGEST_BYTES)
+                for chunk in self._rebuild(path, chain, position):
+                    digest.update(chunk)
+                    out.write(chunk)
+            if digest.hexdigest() != version.digest:
+                raise HistoryError(f"Version {number} of {path} is corrupt (digest mismatch)")
+        except BaseException:
+            staged.unlink(missing_ok=True)
+            raise
+        self.rebuilt += 1
+        return staged, version
+    
+    def _rebuild(self, path: str, chain: List[Version], position: int) -> Iterator[bytes]:
+        """Content of chain[position], from the starting point needing fewest patches."""
+        folder = self._folder(path)
+        start = max(i for i in range(position + 1) if chain[i].keyframe)
+        later = next((i for i in range(position + 1, len(chain)) if chain[i].keyframe), None)
+        steps = position - start
+        
+        # Backwards from a later keyframe or the current file, provided the
+        # content there is the result of the edit before it
+        if later is not None:
+            if later - position < steps and chain[later].digest == chain[later - 1].result_digest:
+                chunks = self._read_keyframe(folder / f"{chain[later].number}.full.z")
+                return self._patched(folder, chunks, chain[position:later][::-1], inverse=False)
+        elif len(chain) - position < steps and _digest_file(path)[0] == chain[-1].result_digest:
+            return self._patched(folder, _file_chunks(path), chain[position:][::-1], inverse=False)
+        
+        # Forwards from the keyframe at or before the version
+        chunks = self._read_keyframe(folder / f"{chain[start].number}.full.z")
+        return self._patched(folder, chunks, chain[start:position], inverse=True)
+    
+    def _patched(
+        self,
+        folder: Path,
+        chunks: Iterator[bytes],
+        versions: List[Version],
+        inverse: bool
+    ) -> Iterator[bytes]:
+        """Chain the reverse patches of versions, in order, over content."""
+        for version in versions:
+            patch = zlib.decompress((folder / f"{version.number}.patch.z").read_bytes())
+            chunks = apply_patch(chunks, parse_patch(patch), inverse)
+        return chunks
+    
+    def _reverse_patch(self, path: str, new_content: Union[bytes, Path], size: int) -> Optional[bytes]:
+        """Zero-context diff from the new content back to the file, or None.
+        
+        A staging file is compared only between the identical leading and
+        trailing lines, found by comparing blocks of bytes.
+        """
+        limit = max(size // 2, 4096)
+        try:
+            if not isinstance(new_content, Path):
+                with open(path, 'rb') as f:
+                    old = f.read()
+                diff = unified_diff(
+                    new_content, old, b'new', b'old', context=0,
+                    max_size=None, max_work=PATCH_MAX_WORK
+                )
+                return diff if len(diff) <= limit else None
+            
+            prefix, lines, suffix = _common_ends(new_content, path)
+            new_end = new_content.stat().st_size - suffix
+            old_end = size - suffix
+            if new_end - prefix + old_end - prefix <= MAX_DIFF_MIDDLE:
+                with open(new_content, 'rb') as f0, open(path, 'rb') as f1:
+                    f0.seek(prefix)
+                    f1.seek(prefix)
+                    diff = unified_diff(
+                        f0.read(new_end - prefix), f1.read(old_end - prefix), b'new', b'old',
+                        context=0, max_size=None, max_work=PATCH_MAX_WORK
+                    )
+                diff = _shift_hunks(diff, lines)
+                return diff if len(diff) <= limit else None
+            diff, truncated = diff_line_streams(
+                _range_lines(new_content, prefix, new_end), _range_lines(path, prefix, old_end),
+                b'new', b'old', context=0, max_output=limit, skipped=lines
+            )
+            return None if truncated else diff
+        except UnsupportedDiffError as e:
+            logger.debug("VersionHistory: no patch for %s: %s", path, e)
+            return None
+    
+    def _write_keyframe(self, path: str, keyframe: Path) -> None:
+        compressor = zlib.compressobj(self.level)
+        tmp = keyframe.with_suffix('.tmp')
+        with open(path, 'rb') as f, open(tmp, 'wb') as out:
+            for chunk in iter(lambda: f.read(CHUNK_BYTES), b''):
+                out.write(compressor.compress(chunk))
+            out.write(compressor.flush())
+        os.replace(tmp, keyframe)
+    
+    def _read_keyframe(self, keyframe: Path) -> Iterator[bytes]:
+        decompressor = zlib.decompressobj()
+        try:
+            with open(keyframe, 'rb') as f:
+                for chunk in iter(lambda: f.read(CHUNK_BYTES), b''):
+                    data = decompressor.decompress(chunk)
+                    if data:
+                        yield data
+            tail = decompressor.flush()
+        except zlib.error as e:
+            raise HistoryError(f"Keyframe {keyframe.name} is corrupt: {e}") from None
+        if tail:
+            yield tail
+    
+    def _last_keyframe(self, chain: List[Version]) -> int:
+        return next((v.number for v in reversed(chain) if v.keyframe), 0)
+    
+    def _prune(self, path: str, chain: List[Version]) -> None:
+        """Delete the oldest keyframe groups beyond max_versions."""
+        while len(chain) > self.max_versions:
+            end = next((i for i in range(1, len(chain)) if chain[i].keyframe), None)
+            if end is None:
+                break
+            self._delete_files(path, chain[:end])
+            del chain[:end]
+    
+    def _delete_files(self, path: str, versions: List[Version]) -> None:
+        folder = self._folder(path)
+        for version in versions:
+            for name in (f"{version.number}.patch.z", f"{version.number}.full.z"):
+                (folder / name).unlink(missing_ok=True)
+    
+    def _folder(self, path: str) -> Path:
+        key = hashlib.blake2b(path.encode('utf-8', 'surrogateescape'), digest_size=16).hexdigest()
+        return self.directory / key
+    
+    def _file_lock(self, path: str) -> threading.Lock:
+        with self._lock:
+            return self._file_locks.setdefault(path, threading.Lock())
+    
+    def _chain(self, path: str) -> List[Version]:
+        """Versions of a file, loaded on first use (file lock held)."""
+        chain = self._chains.get(path)
+        if chain is not None:
+            return chain
+        chain_file = self._folder(path) / CHAIN_NAME
+        try:
+            data = json.loads(chain_file.read_text(encoding='utf-8'))
+            chain = [Version.from_dict(entry) for entry in data['versions']]
+        except FileNotFoundError:
+            chain = []
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error("VersionHistory: cannot read %s: %s", chain_file, e)
+            chain = []
+        self._chains[path] = chain
+        return chain
+    
+    def _save(self, path: str, chain: List[Version]) -> None:
+        """Replace a file's chain atomically (file lock held)."""
+        folder = self._folder(path)
+        folder.mkdir(mode=0o700, parents=True, exist_ok=True)
+        chain_file = folder / CHAIN_NAME
+        tmp = chain_file.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'path': path, 'versions': [v.to_dict() for v in chain]}, f)
+        os.replace(tmp, chain_file)
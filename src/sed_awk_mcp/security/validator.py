@@ -188,8 +188,9 @@ class SecurityValidator:
     def validate_sed_program(self, program: str) -> None:
         """Validate multi-line sed program.
         
-        Validates each line of a sed program for forbidden commands and
-        metacharacters. Provides line-specific error reporting.
+        Validates each line of a sed program with the same checks as
+        validate_sed_pattern (length, forbidden commands, metacharacters and
+        complexity). Provides line-specific error reporting.
         
         Args:
             program: Sed program with multiple commands
@@ -205,8 +206,10 @@ class SecurityValidator:
                 line = line.strip()
                 if line:  # Skip empty lines
                     try:
+                        self._check_length(line, self.MAX_PATTERN_LENGTH, "Pattern")
                         self._check_sed_pattern_structure(line)
                         self._check_metacharacters(line)
+                        self._check_complexity(line)
                     except ValidationError as e:
                         raise ValidationError(
                             f"Line {line_num}: {e.message}",
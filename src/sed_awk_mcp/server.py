@@ -16,10 +16,16 @@ from .security.validator import SecurityValidator
 from .security.path_validator import PathValidator, SecurityError
 from .security.audit import AuditLogger
 from .platform.config import PlatformConfig, BinaryNotFoundError
-from .platform.executor import BinaryExecutor
+from .platform.executor import BinaryExecutor, ExecutionScheduler, ResultCache
+from .platform.limits import LimitsConfig
+from .platform.backup_store import BackupStore
+from .platform.edit_journal import EditJournal
+from .platform.line_index import LineIndexCache
+from .platform.preview_store import PreviewStore
+from .platform.version_history import VersionHistory
 
 # Import all tool modules to register their @mcp.tool decorators
-from .tools import sed_tool, awk_tool, diff_tool, list_tool
+from .tools import sed_tool, awk_tool, diff_tool, list_tool, read_tool, backup_tool, history_tool
 
 # Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
 
@@ -163,7 +169,56 @@ def initialize_components(allowed_dirs: List[str]) -> None:
         
         # Initialize execution component
         logger.debug("Initializing binary executor...")
-        binary_executor = BinaryExecutor(platform_config)
+        scheduler = ExecutionScheduler.from_env()
+        result_cache = ResultCache.from_env()
+        limits = LimitsConfig.load()
+        binary_executor = BinaryExecutor(
+            platform_config, scheduler, result_cache=result_cache, limits=limits
+        )
+        logger.info(
+            "Execution limits: max_concurrency=%d per_tool=%s max_queue=%d queue_timeout=%.1fs",
+            scheduler.max_concurrency, scheduler.per_tool_limits,
+            scheduler.max_queue, scheduler.queue_timeout
+        )
+        logger.info(
+            "Result cache: max_bytes=%d max_entries=%d",
+            result_cache.max_bytes, result_cache.max_entries
+        )
+        for tool, tool_limits in limits.describe().items():
+            logger.info("Resource limits for %s: %s", tool, tool_limits)
+        preview_store = PreviewStore.from_env()
+        logger.info(
+            "Preview store: max_bytes=%d memory_bytes=%d max_entries=%d ttl=%.0fs",
+            preview_store.max_bytes, preview_store.memory_bytes,
+            preview_store.max_entries, preview_store.ttl
+        )
+        line_indexes = LineIndexCache.from_env()
+        logger.info("Line index cache: max_entries=%d", line_indexes.max_entries)
+        backup_store = BackupStore.from_env()
+        logger.info(
+            "Backup store: directory=%s max_bytes=%d max_age=%.0fs compression=%d",
+            backup_store.directory, backup_store.max_bytes, backup_store.max_age,
+            backup_store.level
+        )
+        version_history = VersionHistory.from_env()
+        logger.info(
+            "Version history: directory=%s max_versions=%d keyframe_interval=%d",
+            version_history.directory, version_history.max_versions,
+            version_history.keyframe_interval
+        )
+        edit_journal = EditJournal.from_env()
+        logger.info(
+            "Edit sessions: journal=%s max_sessions=%d ttl=%.0fs",
+            edit_journal.directory, edit_journal.max_sessions, edit_journal.ttl
+        )
+        # Finish or undo commits interrupted by a previous shutdown
+        for session_id, state in edit_journal.recover():
+            audit_logger.log_execution(
+                tool="server",
+                operation="recover edit session",
+                success=True,
+                details={"session": session_id, "state": state}
+            )
         
         # Inject components into tool modules
         logger.debug("Injecting components into tool modules...")
@@ -173,7 +228,12 @@ def initialize_components(allowed_dirs: List[str]) -> None:
             security_validator,
             audit_logger,
             platform_config,
-            binary_executor
+            binary_executor,
+            preview_store,
+            line_indexes,
+            edit_journal,
+            backup_store,
+            version_history
         )
         
         awk_tool.initialize_components(
@@ -196,6 +256,27 @@ def initialize_components(allowed_dirs: List[str]) -> None:
             audit_logger
         )
         
+        read_tool.initialize_components(
+            allowed_dirs,
+            audit_logger,
+            binary_executor,
+            line_indexes
+        )
+        
+        backup_tool.initialize_components(
+            allowed_dirs,
+            audit_logger,
+            binary_executor,
+            backup_store
+        )
+        
+        history_tool.initialize_components(
+            allowed_dirs,
+            audit_logger,
+            binary_executor,
+            version_history
+        )
+        
         logger.info("Component initialization completed successfully")
         
     except BinaryNotFoundError as e:
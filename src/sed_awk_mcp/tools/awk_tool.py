@@ -1,26 +1,66 @@
 """AWK tool for MCP server - text transformation and field extraction.
 
 This module implements the awk_transform tool with comprehensive security
-validation, field separator support, and optional output file handling.
+validation, field separator support, multi-file input, sharded parallel
+runs, and optional output file handling.
+
+Helpers that read or stat files block; the async tools call them through
+asyncio.to_thread() so the event loop keeps serving other requests.
 """
 
+import asyncio
 import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Tuple, Union
 
 from ..mcp_instance import mcp
 from ..security.validator import SecurityValidator, ValidationError
 from ..security.path_validator import PathValidator, SecurityError
 from ..security.audit import AuditLogger
 from ..platform.config import PlatformConfig, BinaryNotFoundError
-from ..platform.executor import BinaryExecutor, TimeoutError, ExecutionError
+from ..platform.executor import (
+    BinaryExecutor, ExecutionResult, ResourceUsage, TimeoutError, ExecutionError
+)
+from ..platform.awk_engine import UnsupportedAwkError, compile_program, special_patterns
+from ..platform.awk_shards import COMBINERS, Shard, combine, feed_shard, plan_shards
+from ..platform.fileops import copy_range, expand_glob, replace_with, sibling_temp
 
 # Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
 
 logger = logging.getLogger(__name__)
 
-# Resource limits
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+# Inputs up to this size run in-process; beyond it the awk binary's faster
+# per-record processing outweighs its spawn cost (see benchmarks/bench_awk_engine.py)
+IN_PROCESS_MAX_SIZE = 8 * 1024  # 8KB
+
+# Programs whose output depends on more than the input file are never cached
+_NON_DETERMINISTIC = re.compile(r'\b(?:s?rand|systime|strftime)\b')
+
+# String literals, and BEGIN/END outside them: the count combiner's check
+# for programs the awk engine cannot tokenize
+_STRING_LITERAL = re.compile(r'"(?:[^"\\]|\\.)*"')
+_SPECIAL_PATTERN = re.compile(r'\b(?:BEGIN|END)\b')
+
+# Most input files one call may name or match
+MAX_INPUT_FILES = 10000
+
+# ARG_MAX assumed when the system does not report it
+DEFAULT_ARG_MAX = 128 * 1024
+
+# argv cost of one argument beyond its bytes: the terminating NUL and the
+# pointer to it
+ARG_OVERHEAD = 1 + 8
+
+# Most shards one parallel run may use
+MAX_SHARDS = 64
+
+# Smallest shard the default shard count creates; below it a process costs
+# more than it saves
+MIN_SHARD_SIZE = 1024 * 1024  # 1MB
 
 
 class ResourceError(Exception):
@@ -67,24 +107,409 @@ def initialize_components(
     )
 
 
+def _collect_inputs(file_path: Union[str, List[str]], file_glob: Optional[str]) -> List[str]:
+    """Collect the input paths of an awk run.
+    
+    Explicit paths are kept in order and as given, so a file may be named
+    twice (the two-pass 'NR == FNR' idiom). Glob matches not named
+    explicitly follow, sorted.
+    
+    Args:
+        file_path: Input path or list of input paths
+        file_glob: Glob pattern for additional inputs, expanded under every
+            allowed directory when relative
+    
+    Returns:
+        Input paths in the order awk reads them
+    """
+    inputs = [file_path] if isinstance(file_path, str) else list(file_path or [])
+    if file_glob:
+        named = set(inputs)
+        inputs.extend(
+            match for match in expand_glob(file_glob, path_validator.list_allowed())
+            if match not in named
+        )
+    return inputs
+
+
+def _check_input_files(validated_paths: List[Path], file_paths: List[str]) -> List[int]:
+    """Check that the inputs are existing regular files within admission limits.
+    
+    The admission limit applies to the combined size of the inputs, since
+    one awk run reads them all. Inputs above max_file_size and up to
+    max_stream_file_size are admitted in streaming mode (see awk_transform).
+    
+    Args:
+        validated_paths: Canonical paths returned by PathValidator
+        file_paths: Paths as supplied by the caller (for error messages)
+        
+    Returns:
+        Size of each input in bytes
+        
+    Raises:
+        FileNotFoundError: If an input does not exist
+        ValueError: If an input is not a regular file
+        ResourceError: If the inputs exceed the awk admission limit
+    """
+    sizes = []
+    for validated_path, file_path in zip(validated_paths, file_paths):
+        if not validated_path.exists():
+            raise FileNotFoundError(f"File not found: {file_path}")
+        
+        if not validated_path.is_file():
+            raise ValueError(f"Path is not a file: {file_path}")
+        
+        sizes.append(validated_path.stat().st_size)
+    
+    admission_limit = binary_executor.limits.for_tool('awk').admission_limit
+    total_size = sum(sizes)
+    if total_size > admission_limit:
+        what = "File size" if len(sizes) == 1 else "Combined input size"
+        raise ResourceError(
+            f"{what} {total_size} bytes exceeds limit of {admission_limit} bytes"
+        )
+    
+    return sizes
+
+
+def _argv_budget() -> int:
+    """Bytes of command line available to one awk process.
+    
+    Half of what ARG_MAX leaves after the server's environment, which the
+    child inherits, so that the kernel's own accounting never comes close.
+    
+    Returns:
+        Byte budget for the arguments, counted as by _argv_size()
+    """
+    try:
+        arg_max = os.sysconf('SC_ARG_MAX')
+    except (AttributeError, ValueError, OSError):
+        arg_max = -1
+    if arg_max <= 0:
+        arg_max = DEFAULT_ARG_MAX
+    environ_size = _argv_size(f"{key}={value}" for key, value in os.environ.items())
+    return max(arg_max - environ_size, 0) // 2
+
+
+def _argv_size(args) -> int:
+    """Bytes a sequence of arguments occupies in a new process's argv."""
+    return sum(len(os.fsencode(arg)) + ARG_OVERHEAD for arg in args)
+
+
+def _chunk_inputs(fixed_args: List[str], inputs: List[str]) -> List[List[str]]:
+    """Split the input paths into groups that each fit one awk command line.
+    
+    Args:
+        fixed_args: Arguments before the inputs (options and program)
+        inputs: Input paths in order
+    
+    Returns:
+        Consecutive groups of inputs; a path too long to share a command
+        line gets a group of its own
+    """
+    budget = _argv_budget() - _argv_size(['awk'] + fixed_args)
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    used = 0
+    for path in inputs:
+        size = _argv_size([path])
+        if current and used + size > budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(path)
+        used += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def _run_binary(
+    fixed_args: List[str],
+    chunks: List[List[str]],
+    chunk_sizes: List[int],
+    stdout_fd: Optional[int] = None
+) -> Tuple[ExecutionResult, float]:
+    """Run the awk binary over the input groups in turn, one process each.
+    
+    Output of the runs is concatenated, into stdout_fd or under one shared
+    output cap. A run that fails, hits the cap or times out ends the
+    sequence.
+    
+    Args:
+        fixed_args: Normalized arguments before the inputs
+        chunks: Groups of input paths from _chunk_inputs()
+        chunk_sizes: Combined input size of each group in bytes
+        stdout_fd: Open file descriptor awk writes its output to (optional)
+    
+    Returns:
+        Tuple of the combined result and the timeout of the last run
+    """
+    awk_limits = binary_executor.limits.for_tool('awk')
+    results: List[ExecutionResult] = []
+    remaining = BinaryExecutor.MAX_OUTPUT_BYTES
+    timeout = 0.0
+    for chunk, size in zip(chunks, chunk_sizes):
+        # Seconds the awk binary may run, scaled with its share of the input
+        timeout = awk_limits.timeout_for(size)
+        result = await binary_executor.execute_async(
+            ['awk'] + fixed_args + chunk,
+            timeout=timeout,
+            input_size=size,
+            stdout_fd=stdout_fd,
+            max_output_bytes=remaining
+        )
+        results.append(result)
+        if not result.success or result.truncated or result.timed_out:
+            break
+        remaining -= len(result.stdout_bytes)
+    
+    if len(results) == 1:
+        return results[0], timeout
+    
+    last = results[-1]
+    usages = [r.usage for r in results if r.usage is not None]
+    return ExecutionResult(
+        b''.join(r.stdout_bytes for r in results),
+        b''.join(r.stderr_bytes for r in results),
+        last.returncode,
+        sum(r.duration for r in results),
+        timed_out=last.timed_out,
+        truncated=last.truncated,
+        usage=ResourceUsage.combined(usages) if usages else None
+    ), timeout
+
+
+def _run_in_process(
+    validated_path: Path,
+    program: str,
+    field_separator: Optional[str]
+) -> Optional[bytes]:
+    """Run an AWK program with the in-process engine when it supports it.
+    
+    Args:
+        validated_path: Canonical path of the input file
+        program: AWK program text
+        field_separator: Value for awk's -F option, if any
+        
+    Returns:
+        Program output, or None if the program, the file content or the
+        output size requires the awk binary
+    """
+    compiled = compile_program(program, field_separator or None)
+    if compiled is None:
+        return None
+    
+    try:
+        return compiled.run_file(validated_path, max_output=BinaryExecutor.MAX_OUTPUT_BYTES)
+    except UnsupportedAwkError as e:
+        logger.debug("awk engine fallback for %s: %s", validated_path, e.message)
+        return None
+
+
+def _default_shard_count(total_size: int) -> int:
+    """Shards for a parallel run: one per awk execution slot, at least MIN_SHARD_SIZE each."""
+    scheduler = binary_executor.scheduler
+    if scheduler is not None:
+        slots = scheduler.per_tool_limits.get('awk', scheduler.max_concurrency)
+    else:
+        slots = os.cpu_count() or 1
+    return max(1, min(slots, MAX_SHARDS, total_size // MIN_SHARD_SIZE))
+
+
+def _join_parts(parts: List[Path]) -> Path:
+    """Append staged shard outputs to the first one and return it.
+    
+    Args:
+        parts: Staging files in shard order
+    
+    Returns:
+        First staging file, now holding all outputs
+    """
+    first = parts[0]
+    with open(first, 'ab') as dst:
+        for part in parts[1:]:
+            with open(part, 'rb') as src:
+                copy_range(src.fileno(), dst.fileno(), 0, os.fstat(src.fileno()).st_size)
+            part.unlink()
+    return first
+
+
+async def _run_sharded(
+    fixed_args: List[str],
+    validated_inputs: List[Path],
+    shards: List[Shard],
+    combiner: str,
+    staging_target: Optional[Path] = None
+) -> Tuple[ExecutionResult, float, Optional[Path]]:
+    """Run one awk process per shard, all at once, and combine their outputs.
+    
+    Each shard is written to its process's standard input by a thread of
+    a pool private to the call, so no feeder waits for a thread held by
+    another feeder whose process is still queued by the scheduler. With
+    staging_target (the concat combiner with an output file), each process
+    writes to a staging file of its own and the files are joined in shard
+    order; otherwise outputs are captured, each under the output cap.
+    
+    Args:
+        fixed_args: Normalized arguments (options and program)
+        validated_inputs: Input files the shards refer to
+        shards: Shards from plan_shards()
+        combiner: One of COMBINERS
+        staging_target: Output file beside which to stage concat output
+    
+    Returns:
+        Tuple of the combined result, the longest shard timeout, and the
+        staging file holding the output, if any
+    
+    Raises:
+        ExecutionError: If an aggregation's shard timed out or hit the cap
+        CombineError: If the outputs do not have the shape the combiner needs
+        OSError: If an input could not be read to the end of its shard
+    """
+    awk_limits = binary_executor.limits.for_tool('awk')
+    loop = asyncio.get_running_loop()
+    parts: List[Optional[Path]] = [None] * len(shards)
+    start = time.perf_counter()
+    
+    async def run_shard(index: int, shard: Shard) -> ExecutionResult:
+        out_fd = None
+        if staging_target is not None:
+            out_fd, parts[index] = await asyncio.to_thread(sibling_temp, staging_target)
+        read_fd, write_fd = os.pipe()
+        feeder = loop.run_in_executor(pool, feed_shard, validated_inputs, shard, write_fd)
+        try:
+            return await binary_executor.execute_async(
+                ['awk'] + fixed_args,
+                timeout=awk_limits.timeout_for(shard.size),
+                input_size=shard.size,
+                stdout_fd=out_fd,
+                stdin_fd=read_fd
+            )
+        finally:
+            # Closing the read end stops a feeder blocked on a process that
+            # exited early or never started
+            os.close(read_fd)
+            if out_fd is not None:
+                os.close(out_fd)
+            await feeder
+    
+    pool = ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix='awk-shard')
+    try:
+        outcomes = await asyncio.gather(
+            *(run_shard(i, shard) for i, shard in enumerate(shards)), return_exceptions=True
+        )
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
+        results: List[ExecutionResult] = outcomes
+        
+        timeout = max(awk_limits.timeout_for(shard.size) for shard in shards)
+        usages = [r.usage for r in results if r.usage is not None]
+        usage = ResourceUsage.combined(usages) if usages else None
+        duration = time.perf_counter() - start
+        
+        # A failed shard fails the run
+        failed = next(
+            (r for r in results if not r.success and not r.timed_out and not r.truncated), None
+        )
+        if failed is not None:
+            return ExecutionResult(
+                b'', failed.stderr_bytes, failed.returncode, duration, usage=usage
+            ), timeout, None
+        
+        cut_short = [i for i, r in enumerate(results) if r.truncated or r.timed_out]
+        if combiner != 'concat' and cut_short:
+            raise ExecutionError(
+                f"AWK shard {cut_short[0] + 1} of {len(shards)} "
+                f"{'timed out' if results[cut_short[0]].timed_out else 'exceeded the output cap'}; "
+                f"partial results cannot be combined"
+            )
+        
+        if staging_target is not None:
+            timed_out = bool(cut_short)
+            staged = None if timed_out else await asyncio.to_thread(_join_parts, parts)
+            if staged is not None:
+                parts.clear()
+            return ExecutionResult(
+                b'', b'', 0, duration, timed_out=timed_out, usage=usage
+            ), timeout, staged
+        
+        # Output in shard order, up to the first shard that was cut short
+        kept = results[:cut_short[0] + 1] if cut_short else results
+        output = await asyncio.to_thread(combine, combiner, [r.stdout_bytes for r in kept])
+        truncated = any(r.truncated for r in kept)
+        if len(output) > BinaryExecutor.MAX_OUTPUT_BYTES:
+            output = output[:BinaryExecutor.MAX_OUTPUT_BYTES]
+            truncated = True
+        return ExecutionResult(
+            output,
+            b''.join(r.stderr_bytes for r in results),
+            0,
+            duration,
+            timed_out=any(r.timed_out for r in kept),
+            truncated=truncated,
+            usage=usage
+        ), timeout, None
+    
+    finally:
+        pool.shutdown(wait=False)
+        for part in parts:
+            if part is not None:
+                await asyncio.to_thread(part.unlink, missing_ok=True)
+
+
 @mcp.tool()
 async def awk_transform(
-    file_path: str,
+    file_path: Union[str, List[str]],
     program: str,
     field_separator: Optional[str] = None,
-    output_file: Optional[str] = None
+    output_file: Optional[str] = None,
+    file_glob: Optional[str] = None,
+    combiner: Optional[str] = None,
+    shards: Optional[int] = None
 ) -> str:
-    """Apply AWK transformation to a file for field extraction and text processing.
+    """Apply AWK transformation to files for field extraction and text processing.
     
-    Executes an AWK program on the specified file with comprehensive security
+    Executes an AWK program on the specified files with comprehensive security
     validation and optional output to a file. Supports custom field separators
     and returns either the transformed text or a confirmation message.
     
+    Several inputs are read by one awk process in the order given, so FNR,
+    FILENAME and END-of-input aggregation work across them. The size limits
+    apply to the combined size of the inputs. If the paths do not fit one
+    command line, the inputs are split across consecutive awk processes and
+    BEGIN/END run once per process; the result then says so.
+    
+    With combiner, the inputs are taken as one stream and split at line
+    boundaries into shards, one awk process per shard running in
+    parallel, and the shard outputs are merged by the combiner:
+    'concat' (map-only programs; output in input order), 'count' (output
+    lines of filter or map programs, which must have no BEGIN or END),
+    'sum', 'min' or 'max' (numeric fields of END output, position by
+    position) or 'sum_by_key' ('key value' lines summed per key). Each
+    process reads its shard from standard input, so FILENAME is empty,
+    NR/FNR count within the shard, and BEGIN and END run in every shard:
+    with concat, their output appears once per shard.
+    
+    Inputs larger than max_file_size are streamed: with output_file, awk
+    writes straight to a staging file that replaces the output file when
+    awk succeeds, so output size is not capped; without it, returned output
+    is capped as usual.
+    
     Args:
-        file_path: Path to the input file
+        file_path: Path to the input file, or a list of input paths (may be
+            empty when file_glob is given)
         program: AWK program to execute (e.g., '{print $1}', '{sum += $1} END {print sum}')
         field_separator: Optional field separator character/string (default: whitespace)
         output_file: Optional path to write output (if not specified, returns output)
+        file_glob: Optional glob pattern for more inputs (e.g., 'logs/*.log');
+            a relative pattern is expanded under every allowed directory,
+            '**' matches across directory levels, and matches are read in
+            sorted order after the explicit paths
+        combiner: Optional combiner for a sharded parallel run (see above)
+        shards: Optional number of shards, 1 to MAX_SHARDS (default: one
+            per awk execution slot, at least 1MB of input each); needs
+            combiner
         
     Returns:
         If output_file specified: confirmation message with file path
@@ -93,44 +518,66 @@ async def awk_transform(
     Raises:
         ValidationError: If AWK program contains forbidden functions
         SecurityError: If file paths are outside allowed directories
-        ResourceError: If input file exceeds size limits
+        ResourceError: If the inputs exceed size or count limits
         ExecutionError: If AWK execution fails
+        CombineError: If shard outputs do not have the shape the combiner needs
     """
     if not all([security_validator, path_validator, audit_logger, platform_config, binary_executor]):
         raise RuntimeError("Tools not initialized - call initialize_components() first")
     
+    staged = None
     try:
         # Step 1: Validate AWK program for security
         security_validator.validate_awk_program(program)
         logger.debug("awk_transform: program validation passed")
         
-        # Step 2: Validate and resolve input file path
-        validated_input = path_validator.validate_path(file_path)
-        logger.debug("awk_transform: input path validation passed: %s", validated_input)
-        
-        # Step 3: Check input file exists and size limits
-        if not validated_input.exists():
-            raise FileNotFoundError(f"File not found: {file_path}")
-        
-        if not validated_input.is_file():
-            raise ValueError(f"Path is not a file: {file_path}")
+        if combiner is not None and combiner not in COMBINERS:
+            raise ValueError(f"Unknown combiner {combiner!r}; use one of {', '.join(COMBINERS)}")
+        if shards is not None:
+            if combiner is None:
+                raise ValueError("shards needs a combiner")
+            if not 1 <= shards <= MAX_SHARDS:
+                raise ValueError(f"shards must be between 1 and {MAX_SHARDS}")
+        if combiner == 'count':
+            patterns = special_patterns(program)
+            if patterns is None:
+                patterns = _SPECIAL_PATTERN.findall(_STRING_LITERAL.sub('""', program))
+            if patterns:
+                # Every shard's BEGIN and END output would be counted again
+                raise ValueError(
+                    "The count combiner counts output lines of filter or map programs "
+                    "without BEGIN or END; use sum for an END aggregation"
+                )
         
-        file_size = validated_input.stat().st_size
-        if file_size > MAX_FILE_SIZE:
+        # Step 2: Collect, validate and resolve the input file paths
+        inputs = await asyncio.to_thread(_collect_inputs, file_path, file_glob)
+        if not inputs:
+            raise ValueError("No input files: give file_path or a file_glob that matches files")
+        if len(inputs) > MAX_INPUT_FILES:
             raise ResourceError(
-                f"File size {file_size} bytes exceeds limit of {MAX_FILE_SIZE} bytes"
+                f"{len(inputs)} input files selected; at most {MAX_INPUT_FILES} per call"
             )
+        validated_inputs = await asyncio.to_thread(
+            list, map(path_validator.validate_path, inputs)
+        )
+        validated_input = validated_inputs[0]
+        logger.debug("awk_transform: input path validation passed: %d files", len(inputs))
         
+        # Step 3: Check input files exist and the combined size limit
+        input_sizes = await asyncio.to_thread(_check_input_files, validated_inputs, inputs)
+        file_size = sum(input_sizes)
         logger.debug("awk_transform: file checks passed, size=%d bytes", file_size)
         
         # Step 4: Validate output file path if provided
         validated_output = None
         if output_file:
-            validated_output = path_validator.validate_path(output_file)
+            validated_output = await asyncio.to_thread(path_validator.validate_path, output_file)
             logger.debug("awk_transform: output path validation passed: %s", validated_output)
             
             # Ensure output directory exists
-            validated_output.parent.mkdir(parents=True, exist_ok=True)
+            await asyncio.to_thread(
+                validated_output.parent.mkdir, parents=True, exist_ok=True
+            )
         
         # Step 5: Build AWK command arguments
         args = []
@@ -143,23 +590,131 @@ async def awk_transform(
         # Add the AWK program
         args.append(program)
         
-        # Add input file
-        args.append(str(validated_input))
-        
         logger.debug("awk_transform: built args: %s", args)
         
-        # Step 6: Normalize arguments for platform
+        # Step 6: Normalize arguments for platform, then split the inputs
+        # into groups that each fit one command line; a parallel run pipes
+        # them to awk instead
         normalized_args = platform_config.normalize_awk_args(args)
         logger.debug("awk_transform: normalized args: %s", normalized_args)
         
-        # Step 7: Execute AWK command
-        result = binary_executor.execute(
-            ['awk'] + normalized_args,
-            timeout=60  # AWK might take longer for complex processing
+        input_args = [str(path) for path in validated_inputs]
+        size_of = dict(zip(input_args, input_sizes))
+        if combiner is None:
+            chunks = _chunk_inputs(normalized_args, input_args)
+        else:
+            chunks = [input_args]
+            if shards is None:
+                shards = _default_shard_count(file_size)
+        chunk_sizes = [sum(size_of[path] for path in chunk) for chunk in chunks]
+        if len(chunks) > 1:
+            logger.info(
+                "awk_transform: %d inputs split across %d awk processes",
+                len(inputs), len(chunks)
+            )
+        
+        # Seconds the awk binary may run, scaled with the input size
+        awk_limits = binary_executor.limits.for_tool('awk')
+        timeout = awk_limits.timeout_for(file_size)
+        streamed = awk_limits.streams(file_size)
+        
+        # Output that goes straight to a staging file beside the output file:
+        # streamed runs, and concatenated shards of a parallel run
+        direct_to_file = validated_output is not None and (
+            combiner == 'concat' if combiner is not None else streamed
         )
         
+        # Step 7: Serve an unchanged input from the result cache, else run
+        # sharded when a combiner is given, in-process when the engine
+        # supports the program, otherwise execute the AWK binary
+        cache = binary_executor.result_cache
+        cache_key = None
+        output_size = None
+        plan = None
+        if cache is not None and not _NON_DETERMINISTIC.search(program) and not direct_to_file:
+            mode = [f'combiner={combiner}', f'shards={shards}'] if combiner is not None else []
+            cache_key = await asyncio.to_thread(
+                cache.make_key, ['awk'] + mode + normalized_args + input_args, validated_inputs
+            )
+        
+        result = cache.get(cache_key) if cache_key is not None else None
+        if combiner is not None and result is None:
+            # Shards of the input run in parallel, one awk process each
+            engine = "parallel"
+            plan = await asyncio.to_thread(plan_shards, validated_inputs, input_sizes, shards)
+            logger.debug("awk_transform: %d shards, combiner %s", len(plan), combiner)
+            result, timeout, staged = await _run_sharded(
+                normalized_args, validated_inputs, plan, combiner,
+                validated_output if direct_to_file else None
+            )
+            if staged is not None:
+                output_size = await asyncio.to_thread(os.path.getsize, staged)
+            if cache is not None and result.success:
+                await asyncio.to_thread(cache.put, cache_key, result)
+        elif combiner is None and streamed and validated_output:
+            # Large input: awk writes straight to a staging file beside the
+            # output file, so its output never passes through memory
+            engine = "stream"
+            fd, staged = await asyncio.to_thread(sibling_temp, validated_output)
+            try:
+                result, timeout = await _run_binary(normalized_args, chunks, chunk_sizes, fd)
+                output_size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+        elif result is not None:
+            engine = "cache"
+            logger.debug("awk_transform: served from result cache")
+        else:
+            engine = "in-process"
+            start = time.perf_counter()
+            output_bytes = None
+            if len(validated_inputs) == 1 and file_size <= IN_PROCESS_MAX_SIZE:
+                output_bytes = await asyncio.to_thread(
+                    _run_in_process, validated_input, program, field_separator
+                )
+            if output_bytes is not None:
+                result = ExecutionResult(output_bytes, b'', 0, time.perf_counter() - start)
+                logger.debug(
+                    "awk_transform: in-process engine produced %d bytes", len(output_bytes)
+                )
+            else:
+                engine = "binary"
+                result, timeout = await _run_binary(normalized_args, chunks, chunk_sizes)
+            
+            if cache is not None and result.success:
+                await asyncio.to_thread(cache.put, cache_key, result)
+        
+        # Resource usage of the child process, when one ran for this call
+        usage = result.usage_details() if engine != "cache" else None
+        
+        # Audit path: the input, or the first of several
+        audit_path = str(validated_input)
+        if len(validated_inputs) > 1:
+            audit_path += f" (+{len(validated_inputs) - 1} more)"
+        
+        # Note for output of awk processes that each saw only some inputs
+        split_note = None
+        if len(chunks) > 1:
+            split_note = (
+                f"Inputs split across {len(chunks)} awk processes to fit the command "
+                f"line; BEGIN and END ran in each"
+            )
+        
         # Step 8: Check execution result
-        if not result.success:
+        # A run that hit the output cap or the deadline was killed, so check
+        # those first; their partial output is never written to a file
+        if result.truncated and validated_output:
+            raise ExecutionError(
+                f"AWK output exceeded {BinaryExecutor.MAX_OUTPUT_BYTES} bytes; "
+                f"output file not written"
+            )
+        
+        if result.timed_out and validated_output:
+            raise ExecutionError(
+                f"AWK execution exceeded {timeout:g}s timeout; output file not written"
+            )
+        
+        if not result.success and not result.truncated and not result.timed_out:
             error_msg = f"AWK execution failed (exit code {result.returncode}): {result.stderr}"
             logger.error("awk_transform: %s", error_msg)
             
@@ -167,13 +722,14 @@ async def awk_transform(
             audit_logger.log_execution(
                 tool="awk_transform",
                 operation="transform",
-                path=str(validated_input),
+                path=audit_path,
                 success=False,
                 details={
                     "error": result.stderr,
                     "program": program[:100],
                     "field_separator": field_separator,
-                    "output_file": output_file
+                    "output_file": output_file,
+                    "usage": usage
                 }
             )
             
@@ -183,25 +739,44 @@ async def awk_transform(
         if validated_output:
             # Write output to specified file
             try:
-                validated_output.write_text(result.stdout, encoding='utf-8')
+                if staged is not None:
+                    await asyncio.to_thread(replace_with, staged, validated_output)
+                    staged = None
+                else:
+                    # Raw bytes straight to disk - output is never decoded
+                    await asyncio.to_thread(
+                        validated_output.write_bytes, result.stdout_bytes
+                    )
+                    output_size = len(result.stdout_bytes)
                 logger.info("awk_transform: output written to %s", validated_output)
+                if cache is not None:
+                    cache.invalidate(validated_output)
                 
                 # Log successful file output operation
                 audit_logger.log_execution(
                     tool="awk_transform",
                     operation=f"transform to file",
-                    path=str(validated_input),
+                    path=audit_path,
                     success=True,
                     details={
                         "program": program[:100],
                         "field_separator": field_separator,
                         "output_file": str(validated_output),
-                        "output_size": len(result.stdout),
-                        "file_size": file_size
+                        "output_size": output_size,
+                        "file_size": file_size,
+                        "input_files": len(inputs),
+                        "input_groups": len(chunks),
+                        "combiner": combiner,
+                        "shards": len(plan) if plan else None,
+                        "engine": engine,
+                        "usage": usage
                     }
                 )
                 
-                return f"AWK transformation completed. Output written to {output_file}"
+                msg = f"AWK transformation completed. Output written to {output_file}"
+                if split_note:
+                    msg += f" ({split_note})"
+                return msg
                 
             except Exception as write_error:
                 logger.error("awk_transform: failed to write output file: %s", write_error)
@@ -209,23 +784,38 @@ async def awk_transform(
         
         else:
             # Return stdout directly
-            logger.info("awk_transform: returning stdout output (%d chars)", len(result.stdout))
+            output = result.stdout
+            if result.truncated:
+                output += f"\n[Output truncated at {BinaryExecutor.MAX_OUTPUT_BYTES} bytes]"
+            if result.timed_out:
+                output += f"\n[Timed out after {timeout:g}s; output is partial]"
+            if split_note:
+                output += f"\n[{split_note}]"
+            logger.info("awk_transform: returning stdout output (%d chars)", len(output))
             
             # Log successful stdout operation
             audit_logger.log_execution(
                 tool="awk_transform",
                 operation="transform",
-                path=str(validated_input),
+                path=audit_path,
                 success=True,
                 details={
                     "program": program[:100],
                     "field_separator": field_separator,
-                    "output_size": len(result.stdout),
-                    "file_size": file_size
+                    "output_size": len(result.stdout_bytes),
+                    "file_size": file_size,
+                    "input_files": len(inputs),
+                    "input_groups": len(chunks),
+                    "combiner": combiner,
+                    "shards": len(plan) if plan else None,
+                    "truncated": result.truncated,
+                    "timed_out": result.timed_out,
+                    "engine": engine,
+                    "usage": usage
                 }
             )
             
-            return result.stdout
+            return output
             
     except (ValidationError, SecurityError) as e:
         # Log security/validation failures
@@ -234,6 +824,8 @@ async def awk_transform(
             reason=str(e),
             details={
                 "file_path": file_path,
+                "file_glob": file_glob,
+                "combiner": combiner,
                 "program": program[:100],
                 "field_separator": field_separator,
                 "output_file": output_file
@@ -243,12 +835,15 @@ async def awk_transform(
     
     except Exception as e:
         logger.error("awk_transform: unexpected error: %s", e)
+        if staged is not None:
+            # Streamed output of a failed run never replaces the output file
+            await asyncio.to_thread(staged.unlink, missing_ok=True)
         
         # Log execution failure
         audit_logger.log_execution(
             tool="awk_transform",
             operation="transform",
-            path=file_path,
+            path=str(file_path),
             success=False,
             details={
                 "error": str(e),
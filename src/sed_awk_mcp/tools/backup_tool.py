@@ -0,0 +1,216 @@
+"""Backup tools for MCP server - list and restore stored backups.
+
+This module implements the list_backups and restore_backup tools over the
+content-addressed backup store that sed_substitute, sed_substitute_many and
+apply_preview write their backups to.
+"""
+
+import asyncio
+import datetime
+import logging
+from typing import Optional
+
+from ..mcp_instance import mcp
+from ..security.path_validator import PathValidator, SecurityError
+from ..security.audit import AuditLogger
+from ..platform.backup_store import BackupRecord, BackupStore
+from ..platform.executor import BinaryExecutor
+from ..platform.preview_store import file_identity
+
+# Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
+
+logger = logging.getLogger(__name__)
+
+# Most backups list_backups reports
+MAX_LISTED_BACKUPS = 100
+
+
+# Component references (will be initialized by main server)
+path_validator: Optional[PathValidator] = None
+audit_logger: Optional[AuditLogger] = None
+binary_executor: Optional[BinaryExecutor] = None
+backup_store: Optional[BackupStore] = None
+
+
+def initialize_components(
+    allowed_directories: list[str],
+    audit_log: Optional[AuditLogger] = None,
+    binary_exec: Optional[BinaryExecutor] = None,
+    backups: Optional[BackupStore] = None
+) -> None:
+    """Initialize tool components.
+    
+    Args:
+        allowed_directories: List of allowed directory paths
+        audit_log: AuditLogger instance (optional)
+        binary_exec: BinaryExecutor whose result cache is invalidated (optional)
+        backups: BackupStore shared with the sed tools (optional)
+    """
+    global path_validator, audit_logger, binary_executor, backup_store
+    
+    # Initialize with provided instances or create new ones
+    path_validator = PathValidator(allowed_directories)
+    audit_logger = audit_log or AuditLogger()
+    binary_executor = binary_exec
+    backup_store = backups if backups is not None else BackupStore.from_env()
+    
+    logger.info(
+        "BackupTools initialized with %d allowed directories",
+        len(allowed_directories)
+    )
+
+
+def _accessible(path: str) -> bool:
+    """Whether a backed-up file lies within the allowed directories."""
+    try:
+        path_validator.validate_path(path)
+        return True
+    except SecurityError:
+        return False
+
+
+def _describe(record: BackupRecord) -> str:
+    """Render a backup as 'id  time  size  path'."""
+    created = datetime.datetime.fromtimestamp(record.created).strftime('%Y-%m-%d %H:%M:%S')
+    return f"{record.id}  {created}  {record.size} bytes  {record.path}"
+
+
+@mcp.tool()
+async def list_backups(file_path: Optional[str] = None) -> str:
+    """List the backups taken before edits, newest first.
+    
+    Args:
+        file_path: Only list backups of this file (default: all files in
+            the allowed directories)
+    
+    Returns:
+        One line per backup with its id, time, size and file, or a note
+        that there are none
+    
+    Raises:
+        SecurityError: If file path is outside allowed directories
+    """
+    if not all([path_validator, audit_logger]) or backup_store is None:
+        raise RuntimeError("Tool not initialized - call initialize_components() first")
+    
+    try:
+        # Step 1: Validate the path filter, if any
+        validated_path = None
+        if file_path is not None:
+            validated_path = await asyncio.to_thread(path_validator.validate_path, file_path)
+        
+        # Step 2: Collect the backups of files the caller may access
+        records = await asyncio.to_thread(backup_store.list, validated_path)
+        if validated_path is None:
+            records = [r for r in records if _accessible(r.path)]
+    
+    except SecurityError as e:
+        audit_logger.log_validation_failure(
+            tool="list_backups",
+            reason=str(e),
+            details={"file_path": file_path}
+        )
+        raise
+    
+    if not records:
+        return f"No backups of {file_path}" if file_path else "No backups"
+    lines = [_describe(r) for r in records[:MAX_LISTED_BACKUPS]]
+    if len(records) > MAX_LISTED_BACKUPS:
+        lines.append(f"[{len(records) - MAX_LISTED_BACKUPS} older backups not listed]")
+    return "\n".join(lines)
+
+
+@mcp.tool()
+async def restore_backup(file_path: str, backup_id: Optional[str] = None) -> str:
+    """Put a file back to the content of one of its backups.
+    
+    The file is replaced atomically. Its current content is backed up
+    first, so a restore can itself be undone.
+    
+    Args:
+        file_path: Path of the file to restore
+        backup_id: Backup to restore, as shown by list_backups or the
+            editing tools (default: the file's most recent backup)
+    
+    Returns:
+        Confirmation naming the restored backup and the backup of the
+        replaced content
+    
+    Raises:
+        SecurityError: If file path is outside allowed directories
+        ValueError: If there is no such backup of the file
+        OSError: If the backup is corrupt or the file cannot be written
+    """
+    if not all([path_validator, audit_logger]) or backup_store is None:
+        raise RuntimeError("Tool not initialized - call initialize_components() first")
+    
+    validated_path = None
+    try:
+        # Step 1: Validate the path
+        validated_path = await asyncio.to_thread(path_validator.validate_path, file_path)
+        
+        # Step 2: Find the backup
+        if backup_id is None:
+            record = await asyncio.to_thread(backup_store.latest, validated_path)
+            if record is None:
+                raise ValueError(f"No backups of {file_path}")
+        else:
+            record = await asyncio.to_thread(backup_store.find, backup_id)
+            if record is None:
+                raise ValueError(f"Unknown backup: {backup_id}")
+            if record.path != str(validated_path):
+                raise ValueError(f"Backup {backup_id} is of {record.path}, not {file_path}")
+        
+        # Step 3: Back up the current content unless it is the backup's
+        previous = None
+        if validated_path.is_file():
+            current = await asyncio.to_thread(file_identity, validated_path)
+            if current != record.identity:
+                previous, _ = await asyncio.to_thread(backup_store.backup, validated_path)
+                if previous.digest == record.digest:
+                    await asyncio.to_thread(backup_store.remove, previous.id)
+                    previous = None
+        
+        # Step 4: Replace the file with the backed-up content
+        await asyncio.to_thread(backup_store.restore, record, validated_path)
+        cache = binary_executor.result_cache if binary_executor is not None else None
+        if cache is not None:
+            cache.invalidate(validated_path)
+        
+        # Step 5: Log successful restore
+        audit_logger.log_execution(
+            tool="restore_backup",
+            operation="restore backup",
+            path=str(validated_path),
+            success=True,
+            details={
+                "backup_id": record.id,
+                "size": record.size,
+                "previous_backup_id": previous.id if previous else None
+            }
+        )
+        
+        msg = f"Restored {file_path} from backup {record.id} ({record.size} bytes)"
+        if previous is not None:
+            msg += f"; replaced content saved as backup {previous.id}"
+        logger.info("restore_backup: %s", msg)
+        return msg
+    
+    except SecurityError as e:
+        audit_logger.log_validation_failure(
+            tool="restore_backup",
+            reason=str(e),
+            details={"file_path": file_path, "backup_id": backup_id}
+        )
+        raise
+    
+    except Exception as e:
+        logger.error("restore_backup: failed: %s", e)
+        audit_logger.log_execution(
+            tool="restore_backup",
+            operation="restore backup",
+            path=str(validated_path or file_path),
+            success=False,
+            details={"error": str(e), "backup_id": backup_id}
+        )
+        raise
@@ -2,24 +2,29 @@
 
 This module implements the diff_files tool for generating unified diffs
 between two files with comprehensive path validation and audit logging.
+
+Helpers that read or stat files block; the async tools call them through
+asyncio.to_thread() so the event loop keeps serving other requests.
 """
 
+import asyncio
 import logging
-from typing import Optional
+import time
+from pathlib import Path
+from typing import Optional, Tuple
 
 from ..mcp_instance import mcp
 from ..security.path_validator import PathValidator, SecurityError
 from ..security.audit import AuditLogger
 from ..platform.config import PlatformConfig, BinaryNotFoundError
-from ..platform.executor import BinaryExecutor, TimeoutError, ExecutionError
+from ..platform.executor import BinaryExecutor, ExecutionResult, TimeoutError, ExecutionError
+from ..platform import diff_engine
+from ..platform.diff_engine import UnsupportedDiffError
 
 # Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
 
 logger = logging.getLogger(__name__)
 
-# Resource limits
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
-
 
 class ResourceError(Exception):
     """Raised when resource limits are exceeded."""
@@ -61,6 +66,126 @@ def initialize_components(
     )
 
 
+def _check_input_files(
+    validated_file1: Path,
+    validated_file2: Path,
+    file1_path: str,
+    file2_path: str
+) -> Tuple[int, int]:
+    """Check that both inputs are existing regular files within admission limits.
+    
+    Files above max_file_size and up to max_stream_file_size are admitted
+    in streaming mode (see _run_streamed()).
+    
+    Args:
+        validated_file1: Canonical path of the first file
+        validated_file2: Canonical path of the second file
+        file1_path: First path as supplied by the caller (for error messages)
+        file2_path: Second path as supplied by the caller (for error messages)
+        
+    Returns:
+        Tuple of (first file size, second file size) in bytes
+        
+    Raises:
+        FileNotFoundError: If either file does not exist
+        ValueError: If either path is not a regular file
+        ResourceError: If either file exceeds the diff admission limit
+    """
+    if not validated_file1.exists():
+        raise FileNotFoundError(f"First file not found: {file1_path}")
+    
+    if not validated_file2.exists():
+        raise FileNotFoundError(f"Second file not found: {file2_path}")
+    
+    if not validated_file1.is_file():
+        raise ValueError(f"First path is not a file: {file1_path}")
+    
+    if not validated_file2.is_file():
+        raise ValueError(f"Second path is not a file: {file2_path}")
+    
+    admission_limit = binary_executor.limits.for_tool('diff').admission_limit
+    file1_size = validated_file1.stat().st_size
+    file2_size = validated_file2.stat().st_size
+    
+    if file1_size > admission_limit:
+        raise ResourceError(
+            f"First file size {file1_size} bytes exceeds limit of {admission_limit} bytes"
+        )
+    
+    if file2_size > admission_limit:
+        raise ResourceError(
+            f"Second file size {file2_size} bytes exceeds limit of {admission_limit} bytes"
+        )
+    
+    return file1_size, file2_size
+
+
+def _run_in_process(
+    validated_file1: Path,
+    validated_file2: Path,
+    context_lines: int,
+    ignore_whitespace: bool
+) -> Optional[bytes]:
+    """Compare two files with the in-process diff engine when it can.
+    
+    Args:
+        validated_file1: Canonical path of the first file
+        validated_file2: Canonical path of the second file
+        context_lines: Number of context lines
+        ignore_whitespace: Whether to ignore whitespace differences
+        
+    Returns:
+        Unified diff output (empty if the files do not differ), or None if
+        the comparison requires the diff binary
+    """
+    try:
+        return diff_engine.diff_files(
+            validated_file1, validated_file2, context_lines, ignore_whitespace
+        )
+    except UnsupportedDiffError as e:
+        logger.debug(
+            "diff engine fallback for %s vs %s: %s",
+            validated_file1, validated_file2, e.message
+        )
+        return None
+
+
+def _run_streamed(
+    validated_file1: Path,
+    validated_file2: Path,
+    context_lines: int
+) -> Optional[Tuple[bytes, bool]]:
+    """Compare two large files line by line without loading them.
+    
+    Covers files with the same number of lines, such as a file and its
+    sed-edited copy; the diff binary would hold both files in memory.
+    
+    Args:
+        validated_file1: Canonical path of the first file
+        validated_file2: Canonical path of the second file
+        context_lines: Number of context lines
+    
+    Returns:
+        Tuple of (unified diff output, whether it was truncated at the
+        output cap), or None if the comparison requires the diff binary
+    """
+    try:
+        return diff_engine.stream_line_diff(
+            validated_file1,
+            validated_file2,
+            diff_engine.file_label(str(validated_file1), validated_file1.stat().st_mtime_ns),
+            diff_engine.file_label(str(validated_file2), validated_file2.stat().st_mtime_ns),
+            context_lines,
+            max_output=BinaryExecutor.MAX_OUTPUT_BYTES
+        )
+    except UnsupportedDiffError as e:
+        logger.debug(
+            "streamed diff fallback for %s vs %s: %s",
+            validated_file1, validated_file2, e.message
+        )
+        return None
+
+
 @mcp.tool()
 async def diff_files(
     file1_path: str,
@@ -93,40 +218,20 @@ async def diff_files(
     
     try:
         # Step 1: Validate and resolve both file paths
-        validated_file1 = path_validator.validate_path(file1_path)
-        validated_file2 = path_validator.validate_path(file2_path)
+        validated_file1 = await asyncio.to_thread(path_validator.validate_path, file1_path)
+        validated_file2 = await asyncio.to_thread(path_validator.validate_path, file2_path)
         
         logger.debug(
             "diff_files: path validation passed: %s vs %s",
             validated_file1, validated_file2
         )
         
-        # Step 2: Check both files exist and are actually files
-        if not validated_file1.exists():
-            raise FileNotFoundError(f"First file not found: {file1_path}")
-        
-        if not validated_file2.exists():
-            raise FileNotFoundError(f"Second file not found: {file2_path}")
-        
-        if not validated_file1.is_file():
-            raise ValueError(f"First path is not a file: {file1_path}")
-        
-        if not validated_file2.is_file():
-            raise ValueError(f"Second path is not a file: {file2_path}")
-        
-        # Step 3: Check file size limits
-        file1_size = validated_file1.stat().st_size
-        file2_size = validated_file2.stat().st_size
-        
-        if file1_size > MAX_FILE_SIZE:
-            raise ResourceError(
-                f"First file size {file1_size} bytes exceeds limit of {MAX_FILE_SIZE} bytes"
-            )
-        
-        if file2_size > MAX_FILE_SIZE:
-            raise ResourceError(
-                f"Second file size {file2_size} bytes exceeds limit of {MAX_FILE_SIZE} bytes"
-            )
+        # Step 2-3: Check both files exist, are files, and are within size limits
+        file1_size, file2_size = await asyncio.to_thread(
+            _check_input_files,
+            validated_file1, validated_file2,
+            file1_path, file2_path
+        )
         
         logger.debug(
             "diff_files: file checks passed, sizes=%d and %d bytes",
@@ -136,15 +241,16 @@ async def diff_files(
         # Step 4: Build diff command arguments
         args = []
         
-        # Use unified format
-        args.append('-u')
-        
         # Set context lines (validate it's reasonable)
         if context_lines < 0 or context_lines > 100:
             raise ValueError(f"Invalid context_lines value: {context_lines} (must be 0-100)")
         
-        if context_lines != 3:  # 3 is the default, no need to specify
+        # Use unified format; diff keeps the larger of -u and -U contexts,
+        # so a non-default context is passed on its own
+        if context_lines != 3:
             args.append(f'-U{context_lines}')
+        else:
+            args.append('-u')
         
         # Add whitespace ignoring flag if requested
         if ignore_whitespace:
@@ -160,19 +266,101 @@ async def diff_files(
         normalized_args = platform_config.normalize_diff_args(args)
         logger.debug("diff_files: normalized args: %s", normalized_args)
         
-        # Step 6: Execute diff command
-        result = binary_executor.execute(
-            ['diff'] + normalized_args,
-            timeout=30
-        )
+        # Step 6: Serve unchanged inputs from the result cache, else compare
+        # in-process when the engine supports the inputs, otherwise execute
+        # the diff binary
+        cache = binary_executor.result_cache
+        cache_key = None
+        if cache is not None:
+            cache_key = await asyncio.to_thread(
+                cache.make_key, ['diff'] + normalized_args, [validated_file1, validated_file2]
+            )
+        
+        result = cache.get(cache_key) if cache is not None else None
+        if result is not None:
+            engine = "cache"
+            logger.debug("diff_files: served from result cache")
+        else:
+            engine = "in-process"
+            start = time.perf_counter()
+            output_bytes = None
+            truncated = False
+            diff_limits = binary_executor.limits.for_tool('diff')
+            if diff_limits.streams(max(file1_size, file2_size)):
+                # Large files: compare in one streaming pass when the line
+                # counts allow, instead of loading both into the binary
+                streamed = None
+                if not ignore_whitespace:
+                    streamed = await asyncio.to_thread(
+                        _run_streamed, validated_file1, validated_file2, context_lines
+                    )
+                if streamed is not None:
+                    engine = "stream"
+                    output_bytes, truncated = streamed
+            else:
+                output_bytes = await asyncio.to_thread(
+                    _run_in_process, validated_file1, validated_file2,
+                    context_lines, ignore_whitespace
+                )
+            if output_bytes is not None:
+                result = ExecutionResult(
+                    output_bytes, b'', 1 if output_bytes else 0, time.perf_counter() - start,
+                    truncated=truncated
+                )
+                logger.debug(
+                    "diff_files: in-process engine produced %d bytes", len(output_bytes)
+                )
+            else:
+                engine = "binary"
+                result = await binary_executor.execute_async(
+                    ['diff'] + normalized_args,
+                    input_size=file1_size + file2_size
+                )
+            
+            if cache is not None and result.returncode in (0, 1):
+                await asyncio.to_thread(cache.put, cache_key, result)
+        
+        # Resource usage of the child process, when one ran for this call
+        usage = result.usage_details() if engine != "cache" else None
         
         # Step 7: Process diff result based on return code
         # diff returns:
         # 0: files are identical
         # 1: files differ
         # 2+: error occurred
+        # A truncated run was killed at the output cap
+        
+        if result.truncated:
+            # Output cap reached - diff was killed, return what was captured
+            logger.warning(
+                "diff_files: diff output truncated at %d bytes",
+                BinaryExecutor.MAX_OUTPUT_BYTES
+            )
+            
+            audit_logger.log_execution(
+                tool="diff_files",
+                operation="compare (different)",
+                path=f"{file1_path} vs {file2_path}",
+                success=True,
+                details={
+                    "file1_size": file1_size,
+                    "file2_size": file2_size,
+                    "context_lines": context_lines,
+                    "ignore_whitespace": ignore_whitespace,
+                    "result": "different",
+                    "diff_size": len(result.stdout_bytes),
+                    "truncated": True,
+                    "engine": engine,
+                    "usage": usage
+                }
+            )
+            
+            return (
+                f"{result.stdout}\n"
+                f"[Output truncated at {BinaryExecutor.MAX_OUTPUT_BYTES} bytes]"
+            )
         
-        if result.returncode == 0:
+        elif result.returncode == 0:
             # Files are identical
             logger.info("diff_files: files are identical")
             
@@ -187,7 +375,9 @@ async def diff_files(
                     "file2_size": file2_size,
                     "context_lines": context_lines,
                     "ignore_whitespace": ignore_whitespace,
-                    "result": "identical"
+                    "result": "identical",
+                    "engine": engine,
+                    "usage": usage
                 }
             )
             
@@ -196,8 +386,8 @@ async def diff_files(
         elif result.returncode == 1:
             # Files differ - return the diff output
             logger.info(
-                "diff_files: files differ, diff output length=%d chars",
-                len(result.stdout)
+                "diff_files: files differ, diff output length=%d bytes",
+                len(result.stdout_bytes)
             )
             
             # Log successful comparison
@@ -212,7 +402,9 @@ async def diff_files(
                     "context_lines": context_lines,
                     "ignore_whitespace": ignore_whitespace,
                     "result": "different",
-                    "diff_size": len(result.stdout)
+                    "diff_size": len(result.stdout_bytes),
+                    "engine": engine,
+                    "usage": usage
                 }
             )
             
@@ -233,7 +425,8 @@ async def diff_files(
                     "error": result.stderr,
                     "exit_code": result.returncode,
                     "file1_size": file1_size,
-                    "file2_size": file2_size
+                    "file2_size": file2_size,
+                    "usage": usage
                 }
             )
             
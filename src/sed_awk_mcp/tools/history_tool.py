@@ -0,0 +1,218 @@
+"""Version history tools for MCP server - list and check out earlier versions.
+
+This module implements the file_history and checkout_version tools over the
+per-file version history that sed_substitute, sed_substitute_many and
+apply_preview record before every edit.
+"""
+
+import asyncio
+import datetime
+import logging
+from typing import Optional
+
+from ..mcp_instance import mcp
+from ..security.path_validator import PathValidator, SecurityError
+from ..security.audit import AuditLogger
+from ..platform.executor import BinaryExecutor
+from ..platform.fileops import files_equal, replace_with
+from ..platform.version_history import Version, VersionHistory
+
+# Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
+
+logger = logging.getLogger(__name__)
+
+# Longest edit description file_history shows
+MAX_OPERATION_CHARS = 80
+
+
+# Component references (will be initialized by main server)
+path_validator: Optional[PathValidator] = None
+audit_logger: Optional[AuditLogger] = None
+binary_executor: Optional[BinaryExecutor] = None
+version_history: Optional[VersionHistory] = None
+
+
+def initialize_components(
+    allowed_directories: list[str],
+    audit_log: Optional[AuditLogger] = None,
+    binary_exec: Optional[BinaryExecutor] = None,
+    history: Optional[VersionHistory] = None
+) -> None:
+    """Initialize tool components.
+    
+    Args:
+        allowed_directories: List of allowed directory paths
+        audit_log: AuditLogger instance (optional)
+        binary_exec: BinaryExecutor whose result cache is invalidated (optional)
+        history: VersionHistory shared with the sed tools (optional)
+    """
+    global path_validator, audit_logger, binary_executor, version_history
+    
+    # Initialize with provided instances or create new ones
+    path_validator = PathValidator(allowed_directories)
+    audit_logger = audit_log or AuditLogger()
+    binary_executor = binary_exec
+    version_history = history if history is not None else VersionHistory.from_env()
+    
+    logger.info(
+        "HistoryTools initialized with %d allowed directories",
+        len(allowed_directories)
+    )
+
+
+def _describe(version: Version) -> str:
+    """Render a version as 'vN  time  size  storage  operation'."""
+    created = datetime.datetime.fromtimestamp(version.created).strftime('%Y-%m-%d %H:%M:%S')
+    operation = version.operation.replace('\n', '; ')
+    if len(operation) > MAX_OPERATION_CHARS:
+        operation = operation[:MAX_OPERATION_CHARS - 3] + '...'
+    storage = "full" if version.keyframe else "patch"
+    return f"v{version.number}  {created}  {version.size} bytes  {storage}  {operation}"
+
+
+@mcp.tool()
+async def file_history(file_path: str) -> str:
+    """List the recorded versions of a file, newest first.
+    
+    Each version is the content the file had before one edit by
+    sed_substitute, sed_substitute_many, apply_preview or checkout_version.
+    
+    Args:
+        file_path: Path of the file
+    
+    Returns:
+        One line per version with its number, time, size, storage (full
+        copy or patch) and the edit that replaced it, or a note that there
+        are none
+    
+    Raises:
+        SecurityError: If file path is outside allowed directories
+    """
+    if not all([path_validator, audit_logger]) or version_history is None:
+        raise RuntimeError("Tool not initialized - call initialize_components() first")
+    
+    try:
+        validated_path = await asyncio.to_thread(path_validator.validate_path, file_path)
+    except SecurityError as e:
+        audit_logger.log_validation_failure(
+            tool="file_history",
+            reason=str(e),
+            details={"file_path": file_path}
+        )
+        raise
+    
+    versions = await asyncio.to_thread(version_history.versions, validated_path)
+    if not versions:
+        return f"No recorded versions of {file_path}"
+    return "\n".join(_describe(v) for v in reversed(versions))
+
+
+@mcp.tool()
+async def checkout_version(
+    file_path: str,
+    version: int,
+    output_file: Optional[str] = None
+) -> str:
+    """Rebuild an earlier version of a file.
+    
+    The version is rebuilt in one streaming pass from the nearest full copy
+    or the current file and checked against its recorded digest. Without
+    output_file the file itself is replaced atomically, and its current
+    content is recorded as a new version so the checkout can be undone.
+    
+    Args:
+        file_path: Path of the file whose version to rebuild
+        version: Version number, as shown by file_history
+        output_file: Write the version here instead of replacing the file
+    
+    Returns:
+        Confirmation naming the version, its size and where it was written
+    
+    Raises:
+        SecurityError: If a path is outside allowed directories
+        HistoryError: If the version is unknown or cannot be rebuilt
+    """
+    if not all([path_validator, audit_logger]) or version_history is None:
+        raise RuntimeError("Tool not initialized - call initialize_components() first")
+    
+    validated_path = None
+    staged = None
+    try:
+        # Step 1: Validate the paths
+        validated_path = await asyncio.to_thread(path_validator.validate_path, file_path)
+        target = validated_path
+        if output_file:
+            target = await asyncio.to_thread(path_validator.validate_path, output_file)
+        
+        # Step 2: Rebuild the version next to the target
+        staged, recorded = await asyncio.to_thread(
+            version_history.stage_version, validated_path, version, target
+        )
+        
+        # Step 3: Record the content being replaced, unless it is the version's
+        replaced = None
+        if target == validated_path:
+            if await asyncio.to_thread(files_equal, staged, target):
+                await asyncio.to_thread(staged.unlink)
+                return f"No changes: {file_path} already has the content of version {version}"
+            replaced = await asyncio.to_thread(
+                version_history.record, validated_path, staged, f"checkout_version {version}"
+            )
+        
+        # Step 4: Replace the target with the rebuilt version
+        try:
+            await asyncio.to_thread(replace_with, staged, target)
+        except BaseException:
+            if replaced is not None:
+                await asyncio.to_thread(version_history.discard, validated_path, replaced)
+            raise
+        staged = None
+        cache = binary_executor.result_cache if binary_executor is not None else None
+        if cache is not None:
+            cache.invalidate(target)
+        
+        # Step 5: Log successful checkout
+        audit_logger.log_execution(
+            tool="checkout_version",
+            operation="checkout version",
+            path=str(validated_path),
+            success=True,
+            details={
+                "version": version,
+                "size": recorded.size,
+                "output_file": str(target) if output_file else None,
+                "history_version": replaced.number if replaced else None
+            }
+        )
+        
+        msg = (
+            f"Checked out version {version} of {file_path} into "
+            f"{output_file or file_path} ({recorded.size} bytes)"
+        )
+        if replaced is not None:
+            msg += f"; replaced content recorded as version {replaced.number}"
+        logger.info("checkout_version: %s", msg)
+        return msg
+    
+    except SecurityError as e:
+        audit_logger.log_validation_failure(
+            tool="checkout_version",
+            reason=str(e),
+            details={"file_path": file_path, "output_file": output_file}
+        )
+        raise
+    
+    except Exception as e:
+        logger.error("checkout_version: failed: %s", e)
+        audit_logger.log_execution(
+            tool="checkout_version",
+            operation="checkout version",
+            path=str(validated_path or file_path),
+            success=False,
+            details={"error": str(e), "version": version}
+        )
+        raise
+    
+    finally:
+        if staged is not None:
+            await asyncio.to_thread(staged.unlink, missing_ok=True)
@@ -0,0 +1,206 @@
+"""Read tool for MCP server - return numbered lines of a file.
+
+This module implements the read_lines tool, which returns a range of lines
+without reading the rest of the file. Line offsets come from the line
+index shared with the sed tools, so repeated reads of a large file seek
+straight to the requested lines.
+
+Helpers that read or stat files block; the async tools call them through
+asyncio.to_thread() so the event loop keeps serving other requests.
+"""
+
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+from ..mcp_instance import mcp
+from ..security.path_validator import PathValidator, SecurityError
+from ..security.audit import AuditLogger
+from ..platform.executor import BinaryExecutor
+from ..platform.line_index import LineIndexCache
+
+# Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceError(Exception):
+    """Raised when resource limits are exceeded."""
+    pass
+
+
+# Component references (will be initialized by main server)
+path_validator: Optional[PathValidator] = None
+audit_logger: Optional[AuditLogger] = None
+binary_executor: Optional[BinaryExecutor] = None
+line_indexes: Optional[LineIndexCache] = None
+
+
+def initialize_components(
+    allowed_directories: list[str],
+    audit_log: Optional[AuditLogger] = None,
+    binary_exec: Optional[BinaryExecutor] = None,
+    line_index_cache: Optional[LineIndexCache] = None
+) -> None:
+    """Initialize tool components.
+    
+    Args:
+        allowed_directories: List of allowed directory paths
+        audit_log: AuditLogger instance (optional)
+        binary_exec: BinaryExecutor instance whose limits apply (optional)
+        line_index_cache: LineIndexCache shared with the sed tools (optional)
+    """
+    global path_validator, audit_logger, binary_executor, line_indexes
+    
+    # Initialize with provided instances or create new ones
+    path_validator = PathValidator(allowed_directories)
+    audit_logger = audit_log or AuditLogger()
+    binary_executor = binary_exec or BinaryExecutor()
+    line_indexes = line_index_cache if line_index_cache is not None else LineIndexCache.from_env()
+    
+    logger.info(
+        "ReadTool initialized with %d allowed directories",
+        len(allowed_directories)
+    )
+
+
+def _read_range(
+    validated_path: Path,
+    file_path: str,
+    start: int,
+    end: Optional[int]
+) -> Tuple[bytes, int, int, bool]:
+    """Read a range of lines through the file's line index.
+    
+    Args:
+        validated_path: Canonical path returned by PathValidator
+        file_path: Path as supplied by the caller (for error messages)
+        start: 1-based number of the first line
+        end: 1-based number of the last line (inclusive), or None for the
+            end of the file
+    
+    Returns:
+        Tuple of (line data, file size, number of lines in the file,
+        whether the data was cut at the output cap)
+    
+    Raises:
+        FileNotFoundError: If the file does not exist
+        ValueError: If the path is not a regular file
+        ResourceError: If the file exceeds the admission limit
+    """
+    if not validated_path.exists():
+        raise FileNotFoundError(f"File not found: {file_path}")
+    
+    if not validated_path.is_file():
+        raise ValueError(f"Path is not a file: {file_path}")
+    
+    # Files are admitted as far as sed_substitute admits them for editing
+    admission_limit = binary_executor.limits.for_tool('sed').admission_limit
+    with open(validated_path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        if file_size > admission_limit:
+            raise ResourceError(
+                f"File size {file_size} bytes exceeds limit of {admission_limit} bytes"
+            )
+        
+        index = line_indexes.index_for(f)
+        offset, stop = index.span(f, start, end)
+        length = min(stop - offset, BinaryExecutor.MAX_OUTPUT_BYTES)
+        data = os.pread(f.fileno(), length, offset) if length > 0 else b''
+        return data, index.size, index.lines, stop - offset > length
+
+
+@mcp.tool()
+async def read_lines(file_path: str, start: int = 1, end: Optional[int] = None) -> str:
+    """Return a range of lines from a file.
+    
+    Only the requested lines are read: their position is looked up in a
+    line index that is built on first use and kept while the file is
+    unchanged (or extended when it only grew). Use it to inspect the lines
+    a line_range will address before editing them.
+    
+    Args:
+        file_path: Path to the file
+        start: 1-based number of the first line (default: 1)
+        end: 1-based number of the last line, inclusive (default: end of file)
+    
+    Returns:
+        The lines as text, including their newlines; a note if the file has
+        fewer than start lines or the output was truncated
+    
+    Raises:
+        SecurityError: If file path is outside allowed directories
+        ResourceError: If file exceeds size limits
+        FileNotFoundError: If the file does not exist
+        ValueError: If the line numbers are invalid
+    """
+    if not all([path_validator, audit_logger, binary_executor]) or line_indexes is None:
+        raise RuntimeError("Tool not initialized - call initialize_components() first")
+    
+    try:
+        # Step 1: Validate the line numbers
+        if start < 1:
+            raise ValueError(f"Invalid start line: {start} (must be >= 1)")
+        if end is not None and end < start:
+            raise ValueError(f"Invalid end line: {end} (must be >= start line {start})")
+        
+        # Step 2: Validate and resolve the file path
+        validated_path = await asyncio.to_thread(path_validator.validate_path, file_path)
+        logger.debug("read_lines: path validation passed: %s", validated_path)
+        
+        # Step 3: Look up the lines in the index and read them
+        data, file_size, line_count, truncated = await asyncio.to_thread(
+            _read_range, validated_path, file_path, start, end
+        )
+        
+        logger.info(
+            "read_lines: read %d bytes of %s (lines %d-%s of %d)",
+            len(data), validated_path, start, end if end is not None else "end", line_count
+        )
+        
+        # Step 4: Log successful read
+        audit_logger.log_execution(
+            tool="read_lines",
+            operation="read",
+            path=str(validated_path),
+            success=True,
+            details={
+                "start": start,
+                "end": end,
+                "file_size": file_size,
+                "lines": line_count,
+                "bytes": len(data),
+                "truncated": truncated
+            }
+        )
+        
+        if start > line_count:
+            return f"No lines: {file_path} has {line_count} lines"
+        
+        text = data.decode('utf-8', errors='replace')
+        if truncated:
+            return f"{text}\n[Output truncated at {BinaryExecutor.MAX_OUTPUT_BYTES} bytes]"
+        return text
+    
+    except SecurityError as e:
+        # Log security failures
+        audit_logger.log_validation_failure(
+            tool="read_lines",
+            reason=str(e),
+            details={"file_path": file_path}
+        )
+        raise
+    
+    except Exception as e:
+        logger.error("read_lines: failed: %s", e)
+        # Log execution failure
+        audit_logger.log_execution(
+            tool="read_lines",
+            operation="read",
+            path=file_path,
+            success=False,
+            details={"error": str(e)}
+        )
+        raise
@@ -1,28 +1,68 @@
 """Sed tools for MCP server - pattern substitution and preview functionality.
 
-This module implements sed_substitute and preview_sed tools with comprehensive
-security validation, backup/rollback, and safe execution.
+This module implements the sed_substitute, sed_substitute_many, preview_sed,
+apply_preview and count_matches tools, and the edit session tools that
+commit edits of several files together, with comprehensive security
+validation, backup/rollback, and safe execution.
+
+Helpers that read or stat files block; the async tools call them through
+asyncio.to_thread() so the event loop keeps serving other requests.
 """
 
+import asyncio
+import itertools
 import logging
-import shutil
+import mmap
+import os
+import re
 import tempfile
+import time
 from pathlib import Path
-from typing import Optional
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
 
 from ..mcp_instance import mcp
 from ..security.validator import SecurityValidator, ValidationError
 from ..security.path_validator import PathValidator, SecurityError
 from ..security.audit import AuditLogger
 from ..platform.config import PlatformConfig, BinaryNotFoundError
-from ..platform.executor import BinaryExecutor, TimeoutError, ExecutionError
+from ..platform.executor import BinaryExecutor, ExecutionResult, TimeoutError, ExecutionError
+from ..platform.sed_engine import (
+    MatchStats, UnsupportedSedError, compile_program, match_listing_commands, may_match,
+    parse_match_listing
+)
+from ..platform.diff_engine import (
+    MAX_STREAM_LINE, UnsupportedDiffError, diff_line_streams, file_label, stream_line_diff,
+    unified_diff
+)
+from ..platform.backup_store import BackupRecord, BackupStore
+from ..platform.fileops import (
+    copy_range, expand_glob, files_equal, regions_equal, replace_with, sibling_temp,
+    write_atomic
+)
+from ..platform.edit_journal import EditJournal
+from ..platform.line_index import LineIndexCache, iter_lines
+from ..platform.preview_store import PreviewStore, file_identity
+from ..platform.version_history import Version, VersionHistory
 
 # Copyright (c) 2025 William Watson. This work is licensed under the MIT License.
 
 logger = logging.getLogger(__name__)
 
-# Resource limits
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+# Most files a single sed_substitute_many call may edit
+MAX_BATCH_FILES = 1000
+
+# Substitution with a numeric line address: 'N', 'N,M' or 'N,$'
+_LINE_ADDRESS = re.compile(r'(\d+)(?:,(\d+|\$))?(s.*)', re.DOTALL)
+
+# Context lines around the changes in preview diffs (diff -u)
+PREVIEW_CONTEXT = 3
+
+# Most line numbers count_matches may report
+MAX_REPORTED_LINES = 10000
+
+# A numeric line range: (first line, last line or None for the end of the
+# file, commands without the address)
+LineWindow = Tuple[int, Optional[int], Tuple[str, ...]]
 
 
 class ResourceError(Exception):
@@ -30,69 +70,1768 @@ class ResourceError(Exception):
     pass
 
 
-# Initialize components (will be configured by main server)
-security_validator: Optional[SecurityValidator] = None
-path_validator: Optional[PathValidator] = None
-audit_logger: Optional[AuditLogger] = None
-platform_config: Optional[PlatformConfig] = None
-binary_executor: Optional[BinaryExecutor] = None
+class StalePreviewError(Exception):
+    """Raised when a previewed file changed before the preview was applied."""
+    pass
+
+
+# Initialize components (will be configured by main server)
+security_validator: Optional[SecurityValidator] = None
+path_validator: Optional[PathValidator] = None
+audit_logger: Optional[AuditLogger] = None
+platform_config: Optional[PlatformConfig] = None
+binary_executor: Optional[BinaryExecutor] = None
+preview_store: Optional[PreviewStore] = None
+line_indexes: Optional[LineIndexCache] = None
+edit_journal: Optional[EditJournal] = None
+backup_store: Optional[BackupStore] = None
+version_history: Optional[VersionHistory] = None
+
+
+def initialize_components(
+    allowed_directories: list[str],
+    security_val: Optional[SecurityValidator] = None,
+    audit_log: Optional[AuditLogger] = None,
+    platform_conf: Optional[PlatformConfig] = None,
+    binary_exec: Optional[BinaryExecutor] = None,
+    previews: Optional[PreviewStore] = None,
+    line_index_cache: Optional[LineIndexCache] = None,
+    journal: Optional[EditJournal] = None,
+    backups: Optional[BackupStore] = None,
+    history: Optional[VersionHistory] = None
+) -> None:
+    """Initialize tool components.
+    
+    Args:
+        allowed_directories: List of allowed directory paths
+        security_val: SecurityValidator instance (optional)
+        audit_log: AuditLogger instance (optional)
+        platform_conf: PlatformConfig instance (optional)
+        binary_exec: BinaryExecutor instance (optional)
+        previews: PreviewStore holding change tokens (optional)
+        line_index_cache: LineIndexCache shared with read_lines (optional)
+        journal: EditJournal holding the edit sessions (optional)
+        backups: BackupStore receiving the backups taken before edits (optional)
+        history: VersionHistory recording the versions of edited files (optional)
+    """
+    global security_validator, path_validator, audit_logger, platform_config, binary_executor
+    global preview_store, line_indexes, edit_journal, backup_store, version_history
+    
+    # Initialize with provided instances or create new ones
+    security_validator = security_val or SecurityValidator()
+    path_validator = PathValidator(allowed_directories)
+    audit_logger = audit_log or AuditLogger()
+    platform_config = platform_conf or PlatformConfig()
+    binary_executor = binary_exec or BinaryExecutor()
+    preview_store = previews or PreviewStore.from_env()
+    line_indexes = line_index_cache if line_index_cache is not None else LineIndexCache.from_env()
+    edit_journal = journal if journal is not None else EditJournal.from_env()
+    backup_store = backups if backups is not None else BackupStore.from_env()
+    version_history = history if history is not None else VersionHistory.from_env()
+    
+    logger.info(
+        "SedTools initialized with %d allowed directories",
+        len(allowed_directories)
+    )
+
+
+def _check_input_file(validated_path: Path, file_path: str) -> int:
+    """Check that the target is an existing regular file within admission limits.
+    
+    Files up to max_file_size are edited in memory; larger files up to
+    max_stream_file_size are admitted for streaming (see _streams()).
+    
+    Args:
+        validated_path: Canonical path returned by PathValidator
+        file_path: Path as supplied by the caller (for error messages)
+    
+    Returns:
+        File size in bytes
+    
+    Raises:
+        FileNotFoundError: If the file does not exist
+        ValueError: If the path is not a regular file
+        ResourceError: If the file exceeds the sed admission limit
+    """
+    if not validated_path.exists():
+        raise FileNotFoundError(f"File not found: {file_path}")
+    
+    if not validated_path.is_file():
+        raise ValueError(f"Path is not a file: {file_path}")
+    
+    admission_limit = binary_executor.limits.for_tool('sed').admission_limit
+    file_size = validated_path.stat().st_size
+    if file_size > admission_limit:
+        raise ResourceError(
+            f"File size {file_size} bytes exceeds limit of {admission_limit} bytes"
+        )
+    
+    return file_size
+
+
+def _streams(file_size: int) -> bool:
+    """Whether a file is too large to edit in memory and is streamed instead.
+    
+    Streamed files are never read into memory: sed writes its output to a
+    staging file, which is compared and diffed in chunks and renamed over
+    the original.
+    """
+    return binary_executor.limits.for_tool('sed').streams(file_size)
+
+
+def _write_preview_copy(content: bytes) -> Path:
+    """Write proposed file content to a temporary file for the diff binary.
+    
+    Args:
+        content: Content after the substitution
+    
+    Returns:
+        Path of the temporary file (caller is responsible for cleanup)
+    """
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.sed_preview') as tmp:
+        tmp_path = Path(tmp.name)
+        tmp.write(content)
+    
+    return tmp_path
+
+
+def _parse_sed_commands(pattern: str, line_range: Optional[str]) -> Tuple[str, ...]:
+    """Validate a sed pattern or multi-line program and split it into commands.
+    
+    A pattern with newlines is a program of one command per line, validated
+    with validate_sed_program(); the line range, if any, is applied to every
+    command.
+    
+    Args:
+        pattern: Sed pattern, or program with one command per line
+        line_range: Optional line range (e.g., '1,10' or '5,$')
+    
+    Returns:
+        Sed commands in program order, each including the line range
+    
+    Raises:
+        ValidationError: If the pattern or program fails validation
+    """
+    if '\n' in pattern:
+        security_validator.validate_sed_program(pattern)
+        commands = [line.strip() for line in pattern.split('\n') if line.strip()]
+        if not commands:
+            raise ValidationError("Sed program contains no commands", "EMPTY_PROGRAM")
+    else:
+        security_validator.validate_sed_pattern(pattern)
+        commands = [pattern]
+    
+    return tuple(f"{line_range}{command}" if line_range else command for command in commands)
+
+
+def _expression_args(sed_commands: Tuple[str, ...]) -> List[str]:
+    """Build '-e command' arguments so sed runs all commands in one pass."""
+    return [arg for command in sed_commands for arg in ('-e', command)]
+
+
+def _run_in_process(
+    validated_path: Path,
+    sed_commands: Tuple[str, ...]
+) -> Optional[Tuple[bytes, int]]:
+    """Apply sed commands with the in-process engine when it supports them.
+    
+    Args:
+        validated_path: Canonical path of the input file
+        sed_commands: Sed commands including any line address
+    
+    Returns:
+        Tuple of (new content, substitution count), or None if the commands
+        or the file content require the sed binary
+    """
+    program = compile_program(sed_commands)
+    if program is None:
+        return None
+    
+    try:
+        return program.apply_file(validated_path)
+    except UnsupportedSedError as e:
+        logger.debug("sed engine fallback for %s: %s", validated_path, e.message)
+        return None
+
+
+def _diff_in_process(validated_path: Path, new_content: bytes) -> Optional[str]:
+    """Diff a file against proposed content with the in-process diff engine.
+    
+    Both sides are labelled with the file's path; the proposed side carries
+    the current time.
+    
+    Args:
+        validated_path: Canonical path of the original file
+        new_content: Content after the substitution
+    
+    Returns:
+        Unified diff text (empty if nothing changed), or None if the
+        comparison requires the diff binary
+    """
+    try:
+        mtime_ns = validated_path.stat().st_mtime_ns
+        old_content = validated_path.read_bytes()
+        output = unified_diff(
+            old_content,
+            new_content,
+            file_label(str(validated_path), mtime_ns),
+            file_label(str(validated_path), time.time_ns())
+        )
+    except UnsupportedDiffError as e:
+        logger.debug("diff engine fallback for %s: %s", validated_path, e.message)
+        return None
+    return output.decode('utf-8', errors='replace')
+
+
+def _diff_streamed(validated_path: Path, staged: Path) -> Optional[Tuple[str, bool]]:
+    """Diff a streamed file against its staged edit, reading both in chunks.
+    
+    Labels follow _diff_in_process().
+    
+    Args:
+        validated_path: Canonical path of the original file
+        staged: File holding the content after the substitution
+    
+    Returns:
+        Tuple of (unified diff text, whether it was truncated at the output
+        cap), or None if the comparison requires the diff binary
+    """
+    try:
+        mtime_ns = validated_path.stat().st_mtime_ns
+        output, truncated = stream_line_diff(
+            validated_path,
+            staged,
+            file_label(str(validated_path), mtime_ns),
+            file_label(str(validated_path), time.time_ns()),
+            max_output=BinaryExecutor.MAX_OUTPUT_BYTES
+        )
+    except UnsupportedDiffError as e:
+        logger.debug("streamed diff fallback for %s: %s", validated_path, e.message)
+        return None
+    return output.decode('utf-8', errors='replace'), truncated
+
+
+def _invalidate_cached(*paths: Path) -> None:
+    """Drop cached tool results that read any of the given files.
+    
+    Called after every write: copy2 preserves mtimes, so a rewritten file
+    can keep the identity the result cache keys on.
+    
+    Args:
+        paths: Files that were written
+    """
+    cache = binary_executor.result_cache
+    if cache is not None:
+        for path in paths:
+            cache.invalidate(path)
+
+
+def _take_preview(
+    validated_path: Path,
+    sed_commands: Tuple[str, ...]
+) -> Optional[Tuple[bytes, Optional[int]]]:
+    """Claim previewed content for the same commands on an unchanged file.
+    
+    Args:
+        validated_path: Canonical path of the target file
+        sed_commands: Sed commands including any line address
+    
+    Returns:
+        Tuple of (new content, substitution count or None), or None if no
+        matching preview is stored
+    """
+    if preview_store is None:
+        return None
+    try:
+        identity = file_identity(validated_path)
+    except OSError:
+        return None
+    
+    entry = preview_store.find(validated_path, sed_commands, identity)
+    if entry is None or not entry.matches_source():
+        return None
+    entry = preview_store.take(entry.token)
+    if entry is None:
+        return None
+    try:
+        return entry.read_content(), entry.substitutions
+    except OSError as e:
+        logger.warning("cannot read stored preview of %s: %s", validated_path, e)
+        return None
+    finally:
+        preview_store.release(entry)
+
+
+async def _create_backup(validated_path: Path) -> Tuple[BackupRecord, bool]:
+    """Back up a file into the backup store before it is edited.
+    
+    Content already in the store (the same file backed up again unchanged,
+    or an identical file) is not stored twice.
+    
+    Args:
+        validated_path: Canonical path of the file to back up
+    
+    Returns:
+        Tuple of (backup record, whether the content was already stored)
+    """
+    record, deduplicated = await asyncio.to_thread(backup_store.backup, validated_path)
+    logger.debug(
+        "backup of %s stored as %s%s",
+        validated_path, record.id, " (deduplicated)" if deduplicated else ""
+    )
+    return record, deduplicated
+
+
+async def _run_sed_binary(
+    validated_path: Path,
+    sed_commands: Tuple[str, ...],
+    file_size: int,
+    stdout_fd: Optional[int] = None,
+    stdin_fd: Optional[int] = None
+) -> ExecutionResult:
+    """Run sed over a file and capture the edited content from stdout.
+    
+    sed never writes the file itself; callers replace it atomically.
+    
+    Args:
+        validated_path: Canonical path of the input file
+        sed_commands: Sed commands including any line address
+        file_size: Size of the input file, which scales the sed limits
+        stdout_fd: File descriptor to write the edited content to instead
+            of capturing it (streaming mode)
+        stdin_fd: File descriptor sed reads its input from, from its
+            current offset, instead of opening validated_path
+    
+    Returns:
+        Successful, complete execution result
+    
+    Raises:
+        ExecutionError: If sed fails or its output exceeds the output cap
+    """
+    args = _expression_args(sed_commands)
+    if stdin_fd is None:
+        args.append(str(validated_path))
+    normalized_args = platform_config.normalize_sed_args(args)
+    logger.debug("sed normalized args: %s", normalized_args)
+    
+    result = await binary_executor.execute_async(
+        ['sed'] + normalized_args,
+        input_size=file_size,
+        stdout_fd=stdout_fd,
+        stdin_fd=stdin_fd
+    )
+    
+    if result.truncated:
+        raise ExecutionError(
+            f"Sed output exceeded {BinaryExecutor.MAX_OUTPUT_BYTES} bytes; file not modified"
+        )
+    if not result.success:
+        error_msg = f"Sed execution failed (exit code {result.returncode}): {result.stderr}"
+        logger.error("%s: %s", validated_path, error_msg)
+        raise ExecutionError(error_msg)
+    
+    return result
+
+
+def _staging_file(validated_path: Path, beside: bool) -> Tuple[int, Path]:
+    """Create an empty file for streamed sed output (blocking).
+    
+    Output meant to replace the file is staged beside it so it can be
+    renamed into place; preview output goes to the temporary directory.
+    """
+    if beside:
+        return sibling_temp(validated_path)
+    fd, tmp_name = tempfile.mkstemp(suffix='.sed_preview')
+    return fd, Path(tmp_name)
+
+
+async def _stage_sed_output(
+    validated_path: Path,
+    sed_commands: Tuple[str, ...],
+    file_size: int,
+    beside: bool
+) -> Tuple[Path, ExecutionResult]:
+    """Run sed with its output written straight to a staging file.
+    
+    Memory use does not depend on the file size: sed reads the file itself
+    and its stdout is a file rather than a pipe.
+    
+    Args:
+        validated_path: Canonical path of the input file
+        sed_commands: Sed commands including any line address
+        file_size: Size of the input file, which scales the sed limits
+        beside: Stage next to the file (for replacement) rather than in the
+            temporary directory (for previews)
+    
+    Returns:
+        Tuple of (staging file, execution result); the caller owns the file
+    
+    Raises:
+        ExecutionError: If sed fails; the staging file is removed
+    """
+    fd, staged = await asyncio.to_thread(_staging_file, validated_path, beside)
+    try:
+        try:
+            result = await _run_sed_binary(validated_path, sed_commands, file_size, stdout_fd=fd)
+        finally:
+            os.close(fd)
+    except BaseException:
+        staged.unlink(missing_ok=True)
+        raise
+    return staged, result
+
+
+def _discard_staged(content: Optional[Union[bytes, Path]]) -> None:
+    """Remove a staging file that was not renamed into place."""
+    if isinstance(content, Path):
+        content.unlink(missing_ok=True)
+
+
+def _line_window(sed_commands: Tuple[str, ...]) -> Optional[LineWindow]:
+    """Split the numeric line address shared by all commands from them.
+    
+    Only substitutions qualify: they act on each addressed line on its own,
+    so running them without the address over just those lines gives the
+    same result as running them with it over the whole file.
+    
+    Args:
+        sed_commands: Sed commands including any line address
+    
+    Returns:
+        Tuple of (first line, last line or None for the end of the file,
+        commands without the address), or None if the commands do not all
+        carry the same 'N', 'N,M' or 'N,$' address
+    """
+    addresses = set()
+    bare = []
+    for command in sed_commands:
+        match = _LINE_ADDRESS.fullmatch(command)
+        if match is None or int(match.group(1)) == 0:
+            return None
+        addresses.add(match.group(1, 2))
+        bare.append(match.group(3))
+    if len(addresses) != 1:
+        return None
+    
+    first, last = addresses.pop()
+    first = int(first)
+    # sed addresses only line N when M < N
+    last = None if last == '$' else max(first, int(last or first))
+    return first, last, tuple(bare)
+
+
+def _window_span(src: BinaryIO, window: LineWindow) -> Tuple[int, int, int]:
+    """Locate the lines of a window in an open file through its line index.
+    
+    The index is built on first use.
+    
+    Returns:
+        Tuple of (start offset, end offset, file size)
+    """
+    index = line_indexes.index_for(src)
+    start, end = index.span(src, window[0], window[1])
+    return start, end, index.size
+
+
+async def _run_sed_window(
+    src: BinaryIO,
+    validated_path: Path,
+    window: LineWindow,
+    start: int,
+    end: int,
+    stdout_fd: int
+) -> ExecutionResult:
+    """Run sed over the lines of a window only, writing them to a file.
+    
+    sed reads the open file from the window's first byte and quits after
+    its last line, so the rest of the file is never read.
+    
+    Args:
+        src: Input file opened in binary mode; its offset is moved
+        validated_path: Canonical path of the input file
+        window: Line window with the commands to run
+        start: Offset of the window's first line
+        end: Offset just past the window's last line
+        stdout_fd: File descriptor to write the edited lines to
+    
+    Returns:
+        Successful, complete execution result
+    
+    Raises:
+        ExecutionError: If sed fails
+    """
+    first, last, bare = window
+    if last is not None:
+        bare += (f"{last - first + 1}q",)
+    os.lseek(src.fileno(), start, os.SEEK_SET)
+    return await _run_sed_binary(
+        validated_path, bare, end - start, stdout_fd=stdout_fd, stdin_fd=src.fileno()
+    )
+
+
+async def _compute_window_substitution(
+    validated_path: Path,
+    window: LineWindow
+) -> Tuple[str, Optional[Path], Optional[int], Optional[Dict[str, Any]]]:
+    """Edit a line range of a streamed file, reading only those lines with sed.
+    
+    The staging file is assembled from the bytes before the range, sed's
+    output for the range and the bytes after it; the copies are made by
+    the kernel with copy_file_range(2) where available. Only the range is
+    scanned and compared to detect an edit that changes nothing.
+    
+    Args:
+        validated_path: Canonical path of the target file
+        window: Line window with the commands to run
+    
+    Returns:
+        Tuple as returned by _compute_substitution()
+    
+    Raises:
+        ExecutionError: If sed execution fails
+    """
+    src = await asyncio.to_thread(open, validated_path, 'rb')
+    try:
+        start, end, size = await asyncio.to_thread(_window_span, src, window)
+        if not await asyncio.to_thread(may_match, validated_path, window[2], False, start, end):
+            logger.debug("pre-scan: no command can match in lines of %s", validated_path)
+            return "pre-scan", None, 0, None
+        
+        fd, staged = await asyncio.to_thread(_staging_file, validated_path, True)
+        try:
+            try:
+                await asyncio.to_thread(copy_range, src.fileno(), fd, 0, start)
+                result = await _run_sed_window(src, validated_path, window, start, end, fd)
+                length = os.lseek(fd, 0, os.SEEK_CUR) - start
+                unchanged = length == end - start and await asyncio.to_thread(
+                    regions_equal, src.fileno(), fd, start, length
+                )
+                if not unchanged:
+                    await asyncio.to_thread(copy_range, src.fileno(), fd, end, size - end)
+            finally:
+                os.close(fd)
+        except BaseException:
+            staged.unlink(missing_ok=True)
+            raise
+    finally:
+        src.close()
+    
+    if unchanged:
+        staged.unlink(missing_ok=True)
+        return "stream", None, None, result.usage_details()
+    return "stream", staged, None, result.usage_details()
+
+
+def _diff_window(
+    validated_path: Path,
+    window: LineWindow,
+    start: int,
+    end: int,
+    edited: Path
+) -> Optional[Tuple[str, bool]]:
+    """Diff the lines of a window against sed's output for them.
+    
+    The context lines around the window are read from the file through the
+    line index; nothing else is read. Labels follow _diff_in_process().
+    
+    Args:
+        validated_path: Canonical path of the original file
+        window: Line window the edit applies to
+        start: Offset of the window's first line
+        end: Offset just past the window's last line
+        edited: File holding sed's output for the window
+    
+    Returns:
+        Tuple of (unified diff text, whether it was truncated at the output
+        cap), or None if sed added or removed lines or the lines are too
+        long to diff this way
+    """
+    first, last, _ = window
+    before = max(1, first - PREVIEW_CONTEXT)
+    try:
+        with open(validated_path, 'rb') as old, open(validated_path, 'rb') as new, \
+                open(edited, 'rb') as lines:
+            index = line_indexes.index_for(old)
+            view_start = index.line_offset(old, before)
+            view_end = index.size if last is None else index.line_offset(old, last + 1 + PREVIEW_CONTEXT)
+            new_lines = itertools.chain(
+                iter_lines(new, view_start, start, MAX_STREAM_LINE),
+                iter_lines(lines, 0, os.fstat(lines.fileno()).st_size, MAX_STREAM_LINE),
+                iter_lines(new, end, view_end, MAX_STREAM_LINE)
+            )
+            output, truncated = diff_line_streams(
+                iter_lines(old, view_start, view_end, MAX_STREAM_LINE),
+                new_lines,
+                file_label(str(validated_path), index.mtime_ns),
+                file_label(str(validated_path), time.time_ns()),
+                PREVIEW_CONTEXT,
+                max_output=BinaryExecutor.MAX_OUTPUT_BYTES,
+                skipped=before - 1
+            )
+    except UnsupportedDiffError as e:
+        logger.debug("windowed diff fallback for %s: %s", validated_path, e.message)
+        return None
+    return output.decode('utf-8', errors='replace'), truncated
+
+
+async def _preview_window(
+    validated_path: Path,
+    window: LineWindow
+) -> Optional[Tuple[ExecutionResult, str]]:
+    """Preview an edit of a line range of a streamed file.
+    
+    sed runs over the range only, and the diff reads just the range and its
+    context lines, so the cost depends on the range rather than the file.
+    
+    Args:
+        validated_path: Canonical path of the target file
+        window: Line window with the commands to run
+    
+    Returns:
+        Tuple of (result whose stdout is the preview text, engine used), or
+        None if the preview requires the whole file (see _diff_window())
+    
+    Raises:
+        ExecutionError: If sed execution fails
+    """
+    start_time = time.perf_counter()
+    src = await asyncio.to_thread(open, validated_path, 'rb')
+    try:
+        start, end, _ = await asyncio.to_thread(_window_span, src, window)
+        if not await asyncio.to_thread(may_match, validated_path, window[2], False, start, end):
+            logger.debug("preview_sed: pre-scan found no possible match in the line range")
+            return (
+                ExecutionResult("No changes", b'', 0, time.perf_counter() - start_time),
+                "pre-scan"
+            )
+        
+        fd, edited = await asyncio.to_thread(_staging_file, validated_path, False)
+        try:
+            try:
+                await _run_sed_window(src, validated_path, window, start, end, fd)
+            finally:
+                os.close(fd)
+            streamed = await asyncio.to_thread(
+                _diff_window, validated_path, window, start, end, edited
+            )
+        finally:
+            await asyncio.to_thread(edited.unlink, missing_ok=True)
+    finally:
+        src.close()
+    
+    if streamed is None:
+        return None
+    text, truncated = streamed
+    if truncated:
+        text = f"{text}\n[Output truncated at {BinaryExecutor.MAX_OUTPUT_BYTES} bytes]"
+    return (
+        ExecutionResult(text or "No changes", b'', 0, time.perf_counter() - start_time,
+                        truncated=truncated),
+        "stream"
+    )
+
+
+def _same_content(validated_path: Path, content: bytes) -> bool:
+    """Check whether a file already holds the given content (blocking read)."""
+    if validated_path.stat().st_size != len(content):
+        return False
+    return validated_path.read_bytes() == content
+
+
+def _unchanged_reason(file_path: str, substitutions: Optional[int]) -> str:
+    """Say why sed commands leave a file as it is.
+    
+    Only a count of zero proves the pattern did not match; substitutions
+    may also reproduce the text they replace.
+    """
+    if substitutions == 0:
+        return f"pattern does not match in {file_path}"
+    return f"the substitutions leave {file_path} unchanged"
+
+
+async def _compute_substitution(
+    validated_path: Path,
+    sed_commands: Tuple[str, ...],
+    file_size: int
+) -> Tuple[str, Optional[Union[bytes, Path]], Optional[int], Optional[Dict[str, Any]]]:
+    """Compute a file's content after sed commands, without writing it.
+    
+    A literal pre-scan first proves most non-matching commands cannot
+    change the file, without running any regex or starting sed. Otherwise
+    the content comes from a stored preview of the same commands on the
+    unchanged file, from the in-process engine when it supports the
+    commands and file, or from a single sed run with one -e per command.
+    Files above max_file_size are streamed: sed's output is staged in a
+    file beside the original and returned as its path. When the commands
+    share a numeric line range, sed reads only the lines in it (see
+    _compute_window_substitution()).
+    
+    Args:
+        validated_path: Canonical path of the target file
+        sed_commands: Sed commands including any line address
+        file_size: Size of the target file, which scales the sed limits
+    
+    Returns:
+        Tuple of (engine used, new content or staging file path,
+        substitution count, child resource usage). The content is None
+        when the file would not change; the count is None when the sed
+        binary ran, as sed does not report it; usage is None unless the
+        sed binary ran.
+    
+    Raises:
+        ExecutionError: If sed execution fails
+    """
+    previewed = await asyncio.to_thread(_take_preview, validated_path, sed_commands)
+    if previewed is not None:
+        logger.debug("reusing stored preview for %s", validated_path)
+        return "preview", previewed[0], previewed[1], None
+    
+    window = _line_window(sed_commands) if _streams(file_size) else None
+    if window is not None:
+        return await _compute_window_substitution(validated_path, window)
+    
+    if not await asyncio.to_thread(may_match, validated_path, sed_commands):
+        logger.debug("pre-scan: no command can match in %s", validated_path)
+        return "pre-scan", None, 0, None
+    
+    if _streams(file_size):
+        staged, result = await _stage_sed_output(validated_path, sed_commands, file_size, beside=True)
+        if await asyncio.to_thread(files_equal, validated_path, staged):
+            staged.unlink(missing_ok=True)
+            return "stream", None, None, result.usage_details()
+        return "stream", staged, None, result.usage_details()
+    
+    applied = await asyncio.to_thread(_run_in_process, validated_path, sed_commands)
+    if applied is not None:
+        new_content, substitutions = applied
+        logger.debug("in-process engine made %d substitutions in %s", substitutions, validated_path)
+        # A substitution can reproduce the text it matched (s/a/a/)
+        if not substitutions or await asyncio.to_thread(_same_content, validated_path, new_content):
+            return "in-process", None, substitutions, None
+        return "in-process", new_content, substitutions, None
+    
+    result = await _run_sed_binary(validated_path, sed_commands, file_size)
+    if await asyncio.to_thread(_same_content, validated_path, result.stdout_bytes):
+        return "binary", None, None, result.usage_details()
+    return "binary", result.stdout_bytes, None, result.usage_details()
+
+
+async def _record_version(
+    validated_path: Path,
+    content: Union[bytes, Path],
+    operation: str
+) -> Optional[Version]:
+    """Record a file's content in its version history before it is replaced.
+    
+    The history is an aid, not a safeguard like the backup: an edit goes
+    ahead when its version cannot be recorded.
+    """
+    if version_history is None or not version_history.enabled:
+        return None
+    try:
+        return await asyncio.to_thread(version_history.record, validated_path, content, operation)
+    except Exception as e:
+        logger.warning("cannot record version of %s: %s", validated_path, e)
+        return None
+
+
+async def _write_content(
+    validated_path: Path,
+    content: Union[bytes, Path],
+    operation: str
+) -> Optional[Version]:
+    """Replace a file atomically and drop cached results that read it.
+    
+    content is either the new bytes or a staging file holding them, which
+    is renamed over the file. The replaced content is recorded in the
+    file's version history first.
+    
+    Returns:
+        The recorded version, if any
+    """
+    version = await _record_version(validated_path, content, operation)
+    try:
+        if isinstance(content, Path):
+            await asyncio.to_thread(replace_with, content, validated_path)
+        else:
+            await asyncio.to_thread(write_atomic, validated_path, content)
+    except BaseException:
+        if version is not None:
+            await asyncio.to_thread(version_history.discard, validated_path, version)
+        raise
+    _invalidate_cached(validated_path)
+    return version
+
+
+async def _restore_backup(backup: Optional[BackupRecord], validated_path: Path) -> bool:
+    """Restore a file from its backup after a failed edit.
+    
+    Edits replace files atomically, so a file that still has the identity
+    it had when backed up was never modified and is left alone.
+    
+    Args:
+        backup: Backup taken before the edit, if any
+        validated_path: File to restore
+    
+    Returns:
+        True if the backup was put back
+    """
+    if backup is None:
+        return False
+    
+    try:
+        if await asyncio.to_thread(file_identity, validated_path) == backup.identity:
+            return False
+    except OSError:
+        pass
+    
+    try:
+        await asyncio.to_thread(backup_store.restore, backup, validated_path)
+        _invalidate_cached(validated_path)
+        logger.info("restored %s from backup %s after failure", validated_path, backup.id)
+        return True
+    except Exception as restore_error:
+        logger.error("failed to restore backup of %s: %s", validated_path, restore_error)
+        return False
+
+
+async def _generate_preview(
+    validated_path: Path,
+    sed_commands: Tuple[str, ...],
+    file_size: int
+) -> Tuple[ExecutionResult, str, Optional[bytes], Optional[int]]:
+    """Apply sed commands to a copy of a file and diff it against the original.
+    
+    The edited copy is produced in memory by the in-process engine or from
+    sed's output, and diffed in-process when the diff engine can; otherwise
+    it is written to a temporary file and compared with the diff binary.
+    Files above max_file_size are streamed: sed writes the copy straight to
+    a temporary file, which is diffed line by line against the original
+    without loading either, and no new content is returned. For a numeric
+    line range only the lines in and around it are read (see
+    _preview_window()).
+    
+    Args:
+        validated_path: Canonical path of the target file
+        sed_commands: Sed commands including any line address
+        file_size: Size of the target file, which scales the binaries' limits
+    
+    Returns:
+        Tuple of (result whose stdout is the preview text, engine used,
+        new content, substitution count). The result is unsuccessful if the
+        diff binary failed; the content is None when nothing changes, and
+        the count is None when the sed binary ran.
+    
+    Raises:
+        ExecutionError: If sed execution fails
+    """
+    start = time.perf_counter()
+    
+    window = _line_window(sed_commands) if _streams(file_size) else None
+    if window is not None:
+        windowed = await _preview_window(validated_path, window)
+        if windowed is not None:
+            return windowed[0], windowed[1], None, None
+    
+    # Commands whose literal text does not occur cannot change anything
+    if not await asyncio.to_thread(may_match, validated_path, sed_commands):
+        logger.debug("preview_sed: pre-scan found no possible match")
+        return (
+            ExecutionResult("No changes", b'', 0, time.perf_counter() - start),
+            "pre-scan", None, 0
+        )
+    
+    if _streams(file_size):
+        new_content, substitutions = None, None
+        tmp_path, _ = await _stage_sed_output(validated_path, sed_commands, file_size, beside=False)
+    else:
+        # Try the in-process engine; unchanged content needs no diff
+        applied = await asyncio.to_thread(_run_in_process, validated_path, sed_commands)
+        if applied is not None and applied[1] == 0:
+            logger.debug("preview_sed: in-process engine found no matches")
+            return (
+                ExecutionResult("No changes", b'', 0, time.perf_counter() - start),
+                "in-process", None, 0
+            )
+        
+        if applied is not None:
+            engine = "in-process"
+            new_content, substitutions = applied
+        else:
+            engine = "binary"
+            result = await _run_sed_binary(validated_path, sed_commands, file_size)
+            new_content, substitutions = result.stdout_bytes, None
+        
+        # Diff the new content in memory when the diff engine can
+        diff_text = await asyncio.to_thread(_diff_in_process, validated_path, new_content)
+        if diff_text is not None:
+            return (
+                ExecutionResult(diff_text or "No changes", b'', 0, time.perf_counter() - start),
+                engine, new_content if diff_text else None, substitutions
+            )
+        
+        tmp_path = await asyncio.to_thread(_write_preview_copy, new_content)
+    
+    try:
+        logger.debug("preview_sed: wrote proposed content to %s", tmp_path)
+        
+        # Streamed files are diffed in one pass when no lines were added or removed
+        if new_content is None:
+            streamed = await asyncio.to_thread(_diff_streamed, validated_path, tmp_path)
+            if streamed is not None:
+                text, truncated = streamed
+                if truncated:
+                    text = f"{text}\n[Output truncated at {BinaryExecutor.MAX_OUTPUT_BYTES} bytes]"
+                return (
+                    ExecutionResult(text or "No changes", b'', 0, time.perf_counter() - start,
+                                    truncated=truncated),
+                    "stream", None, None
+                )
+        
+        # Generate unified diff; diff reads both the original and the copy
+        diff_args = ['-u', str(validated_path), str(tmp_path)]
+        diff_result = await binary_executor.execute_async(
+            ['diff'] + diff_args,
+            input_size=2 * file_size
+        )
+        duration = time.perf_counter() - start
+        
+        # diff returns non-zero when files differ, which is expected
+        if diff_result.truncated:
+            text = (
+                f"{diff_result.stdout}\n"
+                f"[Output truncated at {BinaryExecutor.MAX_OUTPUT_BYTES} bytes]"
+            )
+            return (
+                ExecutionResult(text, b'', 0, duration, truncated=True),
+                "binary", new_content, substitutions
+            )
+        elif diff_result.returncode in (0, 1):
+            # Identical files (0) or an empty diff mean no changes
+            if not diff_result.stdout_bytes:
+                return ExecutionResult("No changes", b'', 0, duration), "binary", None, substitutions
+            return (
+                ExecutionResult(diff_result.stdout, b'', 0, duration),
+                "binary", new_content, substitutions
+            )
+        else:
+            # diff error
+            logger.warning("preview_sed: diff command failed: %s", diff_result.stderr)
+            text = f"Diff generation failed: {diff_result.stderr}"
+            return (
+                ExecutionResult(text, b'', diff_result.returncode, duration),
+                "binary", None, substitutions
+            )
+    
+    finally:
+        # Always cleanup temp file
+        try:
+            await asyncio.to_thread(tmp_path.unlink, missing_ok=True)
+            logger.debug("preview_sed: cleaned up temp file %s", tmp_path)
+        except Exception as cleanup_error:
+            logger.warning(
+                "preview_sed: failed to cleanup temp file %s: %s",
+                tmp_path, cleanup_error
+            )
+
+
+@mcp.tool()
+async def sed_substitute(
+    file_path: str,
+    pattern: str,
+    replacement: str,
+    line_range: Optional[str] = None,
+    create_backup: bool = True
+) -> str:
+    """Perform in-place sed substitution with backup and rollback capability.
+    
+    Safely applies sed pattern substitution to a file with comprehensive validation,
+    automatic backup creation, and rollback on failure. Only operates on files
+    within the configured whitelist of allowed directories. When the pattern
+    matches nothing, the file is not rewritten and no backup is created.
+    Backups go to the backup store, not beside the file; restore_backup puts
+    one back. The replaced content is also recorded in the file's version
+    history (see file_history and checkout_version).
+    
+    Args:
+        file_path: Path to the target file
+        pattern: Sed substitution pattern (e.g., 's/find/replace/g'), or a
+            program of several commands, one per line, applied in one pass
+        replacement: Replacement string (for documentation/validation)
+        line_range: Optional line range (e.g., '1,10' or '5,$')
+        create_backup: Whether to back the file up first (default: True)
+    
+    Returns:
+        Confirmation message with operation details, or a "No changes"
+        message if the pattern does not match
+    
+    Raises:
+        ValidationError: If pattern contains forbidden commands
+        SecurityError: If file path is outside allowed directories
+        ResourceError: If file exceeds size limits
+        ExecutionError: If sed execution fails
+    """
+    if not all([security_validator, path_validator, audit_logger, platform_config, binary_executor]):
+        raise RuntimeError("Tools not initialized - call initialize_components() first")
+    
+    try:
+        # Step 1: Validate sed pattern or program for security
+        sed_commands = _parse_sed_commands(pattern, line_range)
+        logger.debug("sed_substitute: pattern validation passed (%d commands)", len(sed_commands))
+        
+        # Step 2: Validate and resolve file path (filesystem access off the loop)
+        validated_path = await asyncio.to_thread(path_validator.validate_path, file_path)
+        logger.debug("sed_substitute: path validation passed: %s", validated_path)
+        
+        # Step 3: Check file exists and size limits
+        file_size = await asyncio.to_thread(_check_input_file, validated_path, file_path)
+        logger.debug("sed_substitute: file checks passed, size=%d bytes", file_size)
+        
+        backup = None
+        new_content = None
+        try:
+            # Step 4: Compute the new content: pre-scan, stored preview,
+            # in-process engine, one sed command for all commands, or sed
+            # streaming into a staging file for large files
+            engine, new_content, substitutions, usage = await _compute_substitution(
+                validated_path, sed_commands, file_size
+            )
+            
+            # Step 5: Leave an unchanged file, its mtime and backup alone
+            if new_content is None:
+                audit_logger.log_execution(
+                    tool="sed_substitute",
+                    operation="in-place substitution",
+                    path=str(validated_path),
+                    success=True,
+                    details={
+                        "pattern": pattern[:100],
+                        "line_range": line_range,
+                        "changed": False,
+                        "file_size": file_size,
+                        "engine": engine,
+                        "usage": usage
+                    }
+                )
+                no_change_msg = (
+                    f"No changes: {_unchanged_reason(file_path, substitutions)}; file not modified"
+                )
+                logger.info("sed_substitute: %s", no_change_msg)
+                return no_change_msg
+            
+            # Step 6: Create backup if requested
+            backup_deduplicated = None
+            if create_backup:
+                backup, backup_deduplicated = await _create_backup(validated_path)
+            
+            # Step 7-8: Record the version and replace the file atomically
+            version = await _write_content(
+                validated_path, new_content, f"sed_substitute {pattern}"
+            )
+            
+            # Step 9: Log successful operation
+            audit_logger.log_execution(
+                tool="sed_substitute",
+                operation="in-place substitution",
+                path=str(validated_path),
+                success=True,
+                details={
+                    "pattern": pattern[:100],  # Truncate for logging
+                    "line_range": line_range,
+                    "changed": True,
+                    "backup_created": create_backup,
+                    "backup_id": backup.id if backup else None,
+                    "backup_deduplicated": backup_deduplicated,
+                    "history_version": version.number if version else None,
+                    "file_size": file_size,
+                    "engine": engine,
+                    "usage": usage
+                }
+            )
+            
+            success_msg = (
+                f"Successfully applied sed substitution to {file_path}"
+                f"{f' (lines {line_range})' if line_range else ''}"
+                f"{f', backup {backup.id} stored' if backup else ''}"
+            )
+            logger.info("sed_substitute: %s", success_msg)
+            return success_msg
+        
+        except Exception as e:
+            # Step 10: Rollback on any execution error
+            await asyncio.to_thread(_discard_staged, new_content)
+            restored = await _restore_backup(backup, validated_path)
+            
+            # Log the failure
+            audit_logger.log_execution(
+                tool="sed_substitute",
+                operation="in-place substitution",
+                path=str(validated_path),
+                success=False,
+                details={
+                    "error": str(e),
+                    "pattern": pattern[:100],
+                    "backup_restored": restored
+                }
+            )
+            
+            raise
+    
+    except (ValidationError, SecurityError) as e:
+        # Log security/validation failures
+        audit_logger.log_validation_failure(
+            tool="sed_substitute",
+            reason=str(e),
+            details={
+                "file_path": file_path,
+                "pattern": pattern[:100]
+            }
+        )
+        raise
+    
+    except Exception as e:
+        logger.error("sed_substitute: unexpected error: %s", e)
+        raise
+
+
+def _expand_targets(file_paths: Optional[List[str]], file_glob: Optional[str]) -> List[str]:
+    """Collect the target paths of a batch substitution.
+    
+    A relative glob is expanded under every allowed directory; '**' matches
+    across directory levels. Only regular files are taken from glob matches.
+    
+    Args:
+        file_paths: Explicit target paths
+        file_glob: Glob pattern for additional targets
+    
+    Returns:
+        Target paths in input order followed by sorted glob matches,
+        without duplicates
+    """
+    targets = list(file_paths or [])
+    if file_glob:
+        targets.extend(expand_glob(file_glob, path_validator.list_allowed()))
+    return list(dict.fromkeys(targets))
+
+
+async def _substitute_one(
+    file_path: str,
+    sed_commands: Tuple[str, ...],
+    create_backup: bool,
+    claimed: set
+) -> Dict[str, Any]:
+    """Apply a validated sed script to one file of a batch.
+    
+    Failures are recorded in the result instead of raised, so one file
+    cannot abort the rest of the batch. A failed edit is rolled back from
+    the backup as in sed_substitute.
+    
+    Args:
+        file_path: Target path as supplied by the caller
+        sed_commands: Validated sed commands including any line address
+        create_backup: Whether to back the file up first
+        claimed: Canonical paths already taken by other targets of the
+            batch; a path reached twice (e.g. through a symlink) is edited once
+    
+    Returns:
+        Dict with 'file', 'success' and either 'changed', 'engine',
+        'substitutions' and 'backup', or 'error'
+    """
+    validated_path = None
+    backup = None
+    new_content = None
+    try:
+        validated_path = await asyncio.to_thread(path_validator.validate_path, file_path)
+        if validated_path in claimed:
+            return {
+                "file": file_path,
+                "success": False,
+                "error": f"Skipped: same file as another target ({validated_path})"
+            }
+        claimed.add(validated_path)
+        file_size = await asyncio.to_thread(_check_input_file, validated_path, file_path)
+        
+        engine, new_content, substitutions, usage = await _compute_substitution(
+            validated_path, sed_commands, file_size
+        )
+        
+        backup_deduplicated = None
+        version = None
+        if new_content is not None:
+            if create_backup:
+                backup, backup_deduplicated = await _create_backup(validated_path)
+            version = await _write_content(
+                validated_path, new_content, "sed_substitute_many " + "\n".join(sed_commands)
+            )
+        
+        audit_logger.log_execution(
+            tool="sed_substitute_many",
+            operation="in-place substitution",
+            path=str(validated_path),
+            success=True,
+            details={
+                "pattern": "\n".join(sed_commands)[:100],
+                "changed": new_content is not None,
+                "backup_created": backup is not None,
+                "backup_id": backup.id if backup else None,
+                "backup_deduplicated": backup_deduplicated,
+                "history_version": version.number if version else None,
+                "file_size": file_size,
+                "engine": engine,
+                "substitutions": substitutions,
+                "usage": usage
+            }
+        )
+        return {
+            "file": file_path,
+            "success": True,
+            "changed": new_content is not None,
+            "engine": engine,
+            "substitutions": substitutions,
+            "backup": backup.id if backup else None
+        }
+    
+    except Exception as e:
+        await asyncio.to_thread(_discard_staged, new_content)
+        restored = False
+        if validated_path is not None:
+            restored = await _restore_backup(backup, validated_path)
+        
+        if isinstance(e, SecurityError):
+            audit_logger.log_validation_failure(
+                tool="sed_substitute_many",
+                reason=str(e),
+                details={"file_path": file_path, "pattern": "\n".join(sed_commands)[:100]}
+            )
+        else:
+            audit_logger.log_execution(
+                tool="sed_substitute_many",
+                operation="in-place substitution",
+                path=str(validated_path or file_path),
+                success=False,
+                details={
+                    "error": str(e),
+                    "pattern": "\n".join(sed_commands)[:100],
+                    "backup_restored": restored
+                }
+            )
+        return {"file": file_path, "success": False, "error": str(e)}
+
+
+def _format_batch_report(results: List[Dict[str, Any]]) -> str:
+    """Render per-file batch results as a summary line and one line per file."""
+    succeeded = [r for r in results if r["success"]]
+    changed = [r for r in succeeded if r["changed"]]
+    counted = [r["substitutions"] for r in changed if r["substitutions"] is not None]
+    unchanged = len(succeeded) - len(changed)
+    failed = len(results) - len(succeeded)
+    
+    summary = f"Applied sed substitution to {len(changed)} of {len(results)} files"
+    if counted:
+        summary += f" ({sum(counted)} substitutions"
+        if len(counted) < len(changed):
+            summary += f" in {len(counted)} counted files"
+        summary += ")"
+    if unchanged:
+        summary += f", {unchanged} unchanged"
+    if failed:
+        summary += f", {failed} failed"
+    
+    lines = [summary]
+    for r in results:
+        if not r["success"]:
+            lines.append(f"- {r['file']}: FAILED: {r['error']}")
+            continue
+        if not r["changed"]:
+            lines.append(f"- {r['file']}: no changes")
+            continue
+        if r["substitutions"] is None:
+            status = "applied (sed binary; count not available)"
+        else:
+            status = f"{r['substitutions']} substitutions"
+        if r["backup"]:
+            status += f", backup {r['backup']}"
+        lines.append(f"- {r['file']}: {status}")
+    return "\n".join(lines)
+
+
+@mcp.tool()
+async def sed_substitute_many(
+    pattern: str,
+    replacement: str,
+    file_paths: Optional[List[str]] = None,
+    file_glob: Optional[str] = None,
+    line_range: Optional[str] = None,
+    create_backup: bool = True,
+    max_parallel: Optional[int] = None
+) -> str:
+    """Apply one sed substitution to many files in a single call.
+    
+    The pattern is validated once; each file is then path-checked, backed up,
+    edited and, on failure, rolled back exactly as sed_substitute does. Files
+    are processed concurrently on a bounded pool, and a failure in one file
+    does not stop the others.
+    
+    Args:
+        pattern: Sed substitution pattern (e.g., 's/find/replace/g'), or a
+            program of several commands, one per line, applied in one pass
+        replacement: Replacement string (for documentation/validation)
+        file_paths: Paths of the target files
+        file_glob: Glob selecting target files (e.g., 'src/**/*.py'); a
+            relative glob is expanded under every allowed directory
+        line_range: Optional line range (e.g., '1,10' or '5,$')
+        create_backup: Whether to create a backup of each file (default: True)
+        max_parallel: Files processed at once (default: the server's
+            execution concurrency limit)
+    
+    Returns:
+        Summary line followed by one line per file with its substitution
+        count or error
+    
+    Raises:
+        ValidationError: If pattern contains forbidden commands
+        ValueError: If no target files are given or matched
+        ResourceError: If more than MAX_BATCH_FILES files are selected
+    """
+    if not all([security_validator, path_validator, audit_logger, platform_config, binary_executor]):
+        raise RuntimeError("Tools not initialized - call initialize_components() first")
+    
+    try:
+        # Step 1: Validate sed pattern or program once for the whole batch
+        sed_commands = _parse_sed_commands(pattern, line_range)
+        
+        # Step 2: Collect the target files
+        targets = await asyncio.to_thread(_expand_targets, file_paths, file_glob)
+        if not targets:
+            raise ValueError("No target files: give file_paths or a file_glob that matches files")
+        if len(targets) > MAX_BATCH_FILES:
+            raise ResourceError(
+                f"{len(targets)} files selected; at most {MAX_BATCH_FILES} per call"
+            )
+        
+        # Step 3: Edit the files on a bounded pool; the scheduler still
+        # admits each sed process
+        if max_parallel is None:
+            scheduler = binary_executor.scheduler
+            max_parallel = scheduler.max_concurrency if scheduler else (os.cpu_count() or 1)
+        if max_parallel < 1:
+            raise ValueError("max_parallel must be at least 1")
+        pool = asyncio.Semaphore(max_parallel)
+        claimed: set = set()
+        
+        async def _bounded(target: str) -> Dict[str, Any]:
+            async with pool:
+                return await _substitute_one(target, sed_commands, create_backup, claimed)
+        
+        results = await asyncio.gather(*(_bounded(target) for target in targets))
+        
+        # Step 4: Report per-file outcomes
+        report = _format_batch_report(results)
+        logger.info("sed_substitute_many: %s", report.split("\n", 1)[0])
+        return report
+    
+    except ValidationError as e:
+        audit_logger.log_validation_failure(
+            tool="sed_substitute_many",
+            reason=str(e),
+            details={
+                "file_paths": (file_paths or [])[:10],
+                "file_glob": file_glob,
+                "pattern": pattern[:100]
+            }
+        )
+        raise
+    
+    except Exception as e:
+        logger.error("sed_substitute_many: unexpected error: %s", e)
+        raise
+
+
+@mcp.tool()
+async def preview_sed(
+    file_path: str,
+    pattern: str,
+    replacement: str,
+    line_range: Optional[str] = None
+) -> str:
+    """Preview sed substitution without modifying the original file.
+    
+    Applies the sed pattern to a copy of the content (in memory when the
+    in-process engines support the pattern and file, otherwise a temporary
+    file) and returns a unified diff showing the proposed changes. The
+    original file is never modified.
+    
+    When there are changes, the diff is followed by a change token. Passing
+    it to apply_preview writes exactly the previewed content without running
+    sed again, as long as the file has not changed in the meantime.
+    
+    Args:
+        file_path: Path to the target file
+        pattern: Sed substitution pattern (e.g., 's/find/replace/g'), or a
+            program of several commands, one per line, applied in one pass
+        replacement: Replacement string (for documentation/validation)
+        line_range: Optional line range (e.g., '1,10' or '5,$')
+    
+    Returns:
+        Unified diff showing proposed changes followed by a change token, or
+        "No changes" if pattern doesn't match
+    
+    Raises:
+        ValidationError: If pattern contains forbidden commands
+        SecurityError: If file path is outside allowed directories
+        ResourceError: If file exceeds size limits
+        ExecutionError: If sed execution fails
+    """
+    if not all([security_validator, path_validator, audit_logger, platform_config, binary_executor]):
+        raise RuntimeError("Tools not initialized - call initialize_components() first")
+    
+    try:
+        # Step 1-3: Same validation as sed_substitute
+        sed_commands = _parse_sed_commands(pattern, line_range)
+        validated_path = await asyncio.to_thread(path_validator.validate_path, file_path)
+        file_size = await asyncio.to_thread(_check_input_file, validated_path, file_path)
+        
+        logger.debug("preview_sed: validation passed for %s", validated_path)
+        
+        # Step 4: Serve an unchanged file from the result cache; a diff is
+        # only served with the change token of its stored content
+        identity = await asyncio.to_thread(file_identity, validated_path)
+        cache = binary_executor.result_cache
+        cache_key = None
+        if cache is not None:
+            cache_key = await asyncio.to_thread(
+                cache.make_key, ['preview_sed', *sed_commands], [validated_path]
+            )
+        
+        token = None
+        streamed = _streams(file_size)
+        result = cache.get(cache_key) if cache is not None else None
+        if result is not None and result.stdout != "No changes" and not streamed:
+            entry = preview_store.find(validated_path, sed_commands, identity)
+            token = entry.token if entry is not None else None
+            if token is None:
+                result = None
+        if result is not None:
+            engine = "cache"
+            logger.debug("preview_sed: served from result cache")
+        else:
+            # Step 5: Apply the substitution to a copy, diff it and keep the
+            # new content for apply_preview
+            result, engine, new_content, substitutions = await _generate_preview(
+                validated_path, sed_commands, file_size
+            )
+            if cache is not None and result.success:
+                await asyncio.to_thread(cache.put, cache_key, result)
+            if new_content is not None and result.success:
+                token = await asyncio.to_thread(
+                    preview_store.put, validated_path, identity, sed_commands,
+                    new_content, substitutions
+                )
+        
+        # Step 6: Log successful preview
+        audit_logger.log_execution(
+            tool="preview_sed",
+            operation="preview substitution",
+            path=str(validated_path),
+            success=True,
+            details={
+                "pattern": pattern[:100],
+                "line_range": line_range,
+                "file_size": file_size,
+                "engine": engine,
+                "change_token": token is not None
+            }
+        )
+        
+        if token is None and not (streamed and result.success and result.stdout != "No changes"):
+            return result.stdout
+        diff_text = result.stdout.rstrip('\n')
+        if token is None:
+            # Streamed content is not kept, so there is nothing to apply later
+            return (
+                f"{diff_text}\n\nNo change token: {file_path} is processed in streaming "
+                f"mode; apply the edit with sed_substitute"
+            )
+        return f"{diff_text}\n\nChange token: {token} (pass to apply_preview to write these changes)"
+    
+    except (ValidationError, SecurityError) as e:
+        # Log security/validation failures
+        audit_logger.log_validation_failure(
+            tool="preview_sed",
+            reason=str(e),
+            details={
+                "file_path": file_path,
+                "pattern": pattern[:100]
+            }
+        )
+        raise
+    
+    except Exception as e:
+        logger.error("preview_sed: unexpected error: %s", e)
+        # Log execution failure
+        audit_logger.log_execution(
+            tool="preview_sed",
+            operation="preview substitution",
+            path=file_path,
+            success=False,
+            details={
+                "error": str(e),
+                "pattern": pattern[:100]
+            }
+        )
+        raise
+
+
+@mcp.tool()
+async def apply_preview(token: str, create_backup: bool = True) -> str:
+    """Write the changes shown by an earlier preview_sed call.
+    
+    Commits exactly the content that was previewed, without running sed
+    again. The file is replaced atomically, and only if it is unchanged
+    since the preview; a token can be applied once.
+    
+    Args:
+        token: Change token returned by preview_sed
+        create_backup: Whether to back the file up first (default: True)
+    
+    Returns:
+        Confirmation message with operation details
+    
+    Raises:
+        ValueError: If the token is unknown, expired or already used
+        SecurityError: If the file is no longer within allowed directories
+        StalePreviewError: If the file changed after the preview
+    """
+    if not all([security_validator, path_validator, audit_logger, platform_config, binary_executor]):
+        raise RuntimeError("Tools not initialized - call initialize_components() first")
+    
+    # Step 1: Claim the stored preview
+    entry = preview_store.take(token) if preview_store is not None else None
+    if entry is None:
+        raise ValueError("Unknown or expired change token; run preview_sed again")
+    
+    validated_path = None
+    backup = None
+    try:
+        # Step 2: Re-validate the path and check the file is unchanged
+        validated_path = await asyncio.to_thread(path_validator.validate_path, entry.path)
+        if not await asyncio.to_thread(entry.matches_source):
+            raise StalePreviewError(
+                f"{entry.path} changed after it was previewed; run preview_sed again"
+            )
+        
+        # Step 3: Create backup if requested
+        backup_deduplicated = None
+        if create_backup:
+            backup, backup_deduplicated = await _create_backup(validated_path)
+        
+        # Step 4: Replace the file with the previewed content
+        new_content = await asyncio.to_thread(entry.read_content)
+        version = await _write_content(
+            validated_path, new_content, "apply_preview " + "\n".join(entry.sed_commands)
+        )
+        
+        # Step 5: Log successful operation
+        audit_logger.log_execution(
+            tool="apply_preview",
+            operation="apply previewed substitution",
+            path=str(validated_path),
+            success=True,
+            details={
+                "pattern": "\n".join(entry.sed_commands)[:100],
+                "backup_created": create_backup,
+                "backup_id": backup.id if backup else None,
+                "backup_deduplicated": backup_deduplicated,
+                "history_version": version.number if version else None,
+                "size": entry.size,
+                "substitutions": entry.substitutions
+            }
+        )
+        
+        success_msg = (
+            f"Successfully applied previewed changes to {entry.path}"
+            f"{f' ({entry.substitutions} substitutions)' if entry.substitutions is not None else ''}"
+            f"{f', backup {backup.id} stored' if backup else ''}"
+        )
+        logger.info("apply_preview: %s", success_msg)
+        return success_msg
+    
+    except SecurityError as e:
+        audit_logger.log_validation_failure(
+            tool="apply_preview",
+            reason=str(e),
+            details={"file_path": entry.path}
+        )
+        raise
+    
+    except Exception as e:
+        # Roll back a partially applied change
+        restored = False
+        if validated_path is not None and not isinstance(e, StalePreviewError):
+            restored = await _restore_backup(backup, validated_path)
+        
+        audit_logger.log_execution(
+            tool="apply_preview",
+            operation="apply previewed substitution",
+            path=str(validated_path or entry.path),
+            success=False,
+            details={
+                "error": str(e),
+                "pattern": "\n".join(entry.sed_commands)[:100],
+                "backup_restored": restored
+            }
+        )
+        raise
+    
+    finally:
+        await asyncio.to_thread(preview_store.release, entry)
+
+
+def _measure_in_process(
+    validated_path: Path,
+    sed_commands: Tuple[str, ...],
+    streamed: bool,
+    max_lines: int
+) -> Optional[MatchStats]:
+    """Measure sed commands with the in-process engine when it supports them.
+    
+    A numeric line range shared by all commands is located through the
+    line index, so only the lines in it are scanned.
+    
+    Args:
+        validated_path: Canonical path of the target file
+        sed_commands: Sed commands including any line address
+        streamed: Whether the file is too large to hold in memory
+        max_lines: Most line numbers to report
+    
+    Returns:
+        MatchStats, or None if the commands or the file content require
+        the sed binary
+    """
+    window = _line_window(sed_commands)
+    program = compile_program(window[2] if window is not None else sed_commands)
+    if program is None:
+        return None
+    # Several commands are measured on the output of the earlier ones,
+    # which is built in memory
+    in_memory_limit = None if len(program.scripts) == 1 else (
+        binary_executor.limits.for_tool('sed').max_file_size
+    )
+    
+    try:
+        with open(validated_path, 'rb') as f:
+            if window is not None:
+                start, end, _ = _window_span(f, window)
+            else:
+                start, end = 0, os.fstat(f.fileno()).st_size
+            if start >= end:
+                return MatchStats(0, 0, [], 0)
+            if in_memory_limit is not None and streamed and end - start > in_memory_limit:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if window is None:
+                    return program.measure(mm, max_lines)
+                if len(program.scripts) == 1:
+                    return program.measure(mm, max_lines, (start, end, window[0]))
+                return program.measure(mm[start:end], max_lines, (0, end - start, window[0]))
+    except UnsupportedSedError as e:
+        logger.debug("sed engine fallback for %s: %s", validated_path, e.message)
+        return None
 
 
-def initialize_components(
-    allowed_directories: list[str],
-    security_val: Optional[SecurityValidator] = None,
-    audit_log: Optional[AuditLogger] = None,
-    platform_conf: Optional[PlatformConfig] = None,
-    binary_exec: Optional[BinaryExecutor] = None
-) -> None:
-    """Initialize tool components.
+async def _measure_with_binary(
+    validated_path: Path,
+    sed_commands: Tuple[str, ...],
+    file_size: int,
+    max_lines: int
+) -> Tuple[MatchStats, ExecutionResult]:
+    """Measure sed commands with one sed run that lists the changed lines.
+    
+    sed prints only the number, new and original text of each changed line
+    (see match_listing_commands()), so its output does not include the
+    rest of the file. Output beyond the output cap is dropped and the
+    statistics are marked incomplete.
     
     Args:
-        allowed_directories: List of allowed directory paths
-        security_val: SecurityValidator instance (optional)
-        audit_log: AuditLogger instance (optional)
-        platform_conf: PlatformConfig instance (optional)
-        binary_exec: BinaryExecutor instance (optional)
-    """
-    global security_validator, path_validator, audit_logger, platform_config, binary_executor
+        validated_path: Canonical path of the target file
+        sed_commands: Sed commands including any line address
+        file_size: Size of the target file, which scales the sed limits
+        max_lines: Most line numbers to report
     
-    # Initialize with provided instances or create new ones
-    security_validator = security_val or SecurityValidator()
-    path_validator = PathValidator(allowed_directories)
-    audit_logger = audit_log or AuditLogger()
-    platform_config = platform_conf or PlatformConfig()
-    binary_executor = binary_exec or BinaryExecutor()
+    Returns:
+        Tuple of (MatchStats without a substitution count, execution result)
     
-    logger.info(
-        "SedTools initialized with %d allowed directories",
-        len(allowed_directories)
+    Raises:
+        ExecutionError: If sed fails
+    """
+    before, *after = match_listing_commands(platform_config.is_gnu_sed)
+    args = ['-n'] + _expression_args((before, *sed_commands, *after)) + [str(validated_path)]
+    result = await binary_executor.execute_async(
+        ['sed'] + platform_config.normalize_sed_args(args),
+        input_size=file_size
     )
+    if not result.success and not result.truncated:
+        error_msg = f"Sed execution failed (exit code {result.returncode}): {result.stderr}"
+        logger.error("%s: %s", validated_path, error_msg)
+        raise ExecutionError(error_msg)
+    
+    stats = await asyncio.to_thread(
+        parse_match_listing, result.stdout_bytes, max_lines, not result.truncated
+    )
+    return stats, result
+
+
+def _format_match_stats(stats: MatchStats, max_lines: int) -> str:
+    """Format MatchStats as the text returned by count_matches."""
+    if stats.lines == 0:
+        return "No matches" if stats.complete else "No matches in the part of the file read"
+    
+    prefix = "" if stats.complete else "At least "
+    counts = [f"{prefix}{stats.lines} matching line{'s' if stats.lines != 1 else ''}"]
+    if stats.substitutions is not None:
+        counts.append(f"{stats.substitutions} substitution{'s' if stats.substitutions != 1 else ''}")
+    counts.append(f"byte delta {stats.byte_delta:+d}")
+    text = ", ".join(counts)
+    if stats.substitutions is None:
+        text += " (substitution count not reported by the sed binary)"
+    
+    if stats.line_numbers:
+        numbers = ", ".join(map(str, stats.line_numbers))
+        if len(stats.line_numbers) < stats.lines:
+            numbers += f" (first {len(stats.line_numbers)} of {stats.lines})"
+        text += f"\nLines: {numbers}"
+    elif max_lines == 0:
+        text += "\nLines: not listed (max_lines=0)"
+    return text
 
 
 @mcp.tool()
-async def sed_substitute(
+async def count_matches(
     file_path: str,
     pattern: str,
-    replacement: str,
     line_range: Optional[str] = None,
-    create_backup: bool = True
+    max_lines: int = 100
 ) -> str:
-    """Perform in-place sed substitution with backup and rollback capability.
+    """Report what a sed substitution would change, without a diff.
     
-    Safely applies sed pattern substitution to a file with comprehensive validation,
-    automatic backup creation, and rollback on failure. Only operates on files
-    within the configured whitelist of allowed directories.
+    A dry run for deciding whether to edit: returns the number of lines
+    with a substitution, the substitution count, the first line numbers
+    and the change in file size, computed in one pass over the file. No
+    new content, diff or temporary copy is produced, and the file is never
+    modified.
     
     Args:
         file_path: Path to the target file
-        pattern: Sed substitution pattern (e.g., 's/find/replace/g')
-        replacement: Replacement string (for documentation/validation)
+        pattern: Sed substitution pattern (e.g., 's/find/replace/g'), or a
+            program of several commands, one per line, applied in one pass
         line_range: Optional line range (e.g., '1,10' or '5,$')
-        create_backup: Whether to create a backup file (default: True)
-        
+        max_lines: Most affected line numbers to list (default: 100,
+            at most 10000)
+    
     Returns:
-        Confirmation message with operation details
-        
+        Summary of matching lines, substitutions and byte delta followed by
+        the affected line numbers, or "No matches"
+    
     Raises:
         ValidationError: If pattern contains forbidden commands
         SecurityError: If file path is outside allowed directories
@@ -103,119 +1842,77 @@ async def sed_substitute(
         raise RuntimeError("Tools not initialized - call initialize_components() first")
     
     try:
-        # Step 1: Validate sed pattern for security
-        security_validator.validate_sed_pattern(pattern)
-        logger.debug("sed_substitute: pattern validation passed")
-        
-        # Step 2: Validate and resolve file path
-        validated_path = path_validator.validate_path(file_path)
-        logger.debug("sed_substitute: path validation passed: %s", validated_path)
-        
-        # Step 3: Check file exists and size limits
-        if not validated_path.exists():
-            raise FileNotFoundError(f"File not found: {file_path}")
+        # Step 1-3: Same validation as sed_substitute
+        if max_lines < 0 or max_lines > MAX_REPORTED_LINES:
+            raise ValueError(f"Invalid max_lines value: {max_lines} (must be 0-{MAX_REPORTED_LINES})")
+        sed_commands = _parse_sed_commands(pattern, line_range)
+        validated_path = await asyncio.to_thread(path_validator.validate_path, file_path)
+        file_size = await asyncio.to_thread(_check_input_file, validated_path, file_path)
         
-        if not validated_path.is_file():
-            raise ValueError(f"Path is not a file: {file_path}")
+        logger.debug("count_matches: validation passed for %s", validated_path)
         
-        file_size = validated_path.stat().st_size
-        if file_size > MAX_FILE_SIZE:
-            raise ResourceError(
-                f"File size {file_size} bytes exceeds limit of {MAX_FILE_SIZE} bytes"
+        # Step 4: Serve an unchanged file from the result cache
+        cache = binary_executor.result_cache
+        cache_key = None
+        if cache is not None:
+            cache_key = await asyncio.to_thread(
+                cache.make_key, ['count_matches', str(max_lines), *sed_commands], [validated_path]
             )
         
-        logger.debug("sed_substitute: file checks passed, size=%d bytes", file_size)
-        
-        # Step 4: Create backup if requested
-        backup_path = None
-        if create_backup:
-            backup_path = Path(f"{validated_path}.bak")
-            shutil.copy2(validated_path, backup_path)
-            logger.debug("sed_substitute: backup created at %s", backup_path)
-        
-        try:
-            # Step 5: Build sed command
-            if line_range:
-                # Validate line range format (basic check)
-                if not line_range.replace(',', '').replace('$', '').replace('-', '').isdigit():
-                    # More sophisticated validation could be added here
-                    pass
-                sed_pattern = f"{line_range}{pattern}"
+        result = cache.get(cache_key) if cache is not None else None
+        usage = None
+        if result is not None:
+            engine = "cache"
+            logger.debug("count_matches: served from result cache")
+        else:
+            # Step 5: Measure with the pre-scan, the in-process engine or a
+            # listing sed run, in that order
+            start = time.perf_counter()
+            if _line_window(sed_commands) is None and not await asyncio.to_thread(
+                may_match, validated_path, sed_commands
+            ):
+                engine = "pre-scan"
+                stats = MatchStats(0, 0, [], 0)
             else:
-                sed_pattern = pattern
-            
-            args = ['-i', sed_pattern, str(validated_path)]
-            logger.debug("sed_substitute: built args: %s", args)
-            
-            # Step 6: Normalize arguments for platform
-            normalized_args = platform_config.normalize_sed_args(args)
-            logger.debug("sed_substitute: normalized args: %s", normalized_args)
-            
-            # Step 7: Execute sed command
-            result = binary_executor.execute(
-                ['sed'] + normalized_args,
-                timeout=30
-            )
-            
-            # Step 8: Check execution result
-            if not result.success:
-                error_msg = f"Sed execution failed (exit code {result.returncode}): {result.stderr}"
-                logger.error("sed_substitute: %s", error_msg)
-                raise ExecutionError(error_msg)
-            
-            # Step 9: Log successful operation
-            audit_logger.log_execution(
-                tool="sed_substitute",
-                operation="in-place substitution",
-                path=str(validated_path),
-                success=True,
-                details={
-                    "pattern": pattern[:100],  # Truncate for logging
-                    "line_range": line_range,
-                    "backup_created": create_backup,
-                    "file_size": file_size
-                }
-            )
-            
-            success_msg = (
-                f"Successfully applied sed substitution to {file_path}"
-                f"{f' (lines {line_range})' if line_range else ''}"
-                f"{f', backup created at {backup_path.name}' if create_backup else ''}"
-            )
-            logger.info("sed_substitute: %s", success_msg)
-            return success_msg
-            
-        except Exception as e:
-            # Step 10: Rollback on any execution error
-            if backup_path and backup_path.exists():
-                try:
-                    shutil.copy2(backup_path, validated_path)
-                    logger.info("sed_substitute: restored backup after failure")
-                except Exception as restore_error:
-                    logger.error(
-                        "sed_substitute: failed to restore backup: %s", 
-                        restore_error
+                engine = "in-process"
+                stats = await asyncio.to_thread(
+                    _measure_in_process, validated_path, sed_commands,
+                    _streams(file_size), max_lines
+                )
+                if stats is None:
+                    engine = "binary"
+                    stats, sed_result = await _measure_with_binary(
+                        validated_path, sed_commands, file_size, max_lines
                     )
+                    usage = sed_result.usage_details()
             
-            # Log the failure
-            audit_logger.log_execution(
-                tool="sed_substitute",
-                operation="in-place substitution",
-                path=str(validated_path),
-                success=False,
-                details={
-                    "error": str(e),
-                    "pattern": pattern[:100],
-                    "backup_restored": backup_path and backup_path.exists()
-                }
+            result = ExecutionResult(
+                _format_match_stats(stats, max_lines), b'', 0, time.perf_counter() - start
             )
-            
-            raise
-            
+            if cache is not None and stats.complete:
+                await asyncio.to_thread(cache.put, cache_key, result)
+        
+        # Step 6: Log successful dry run
+        audit_logger.log_execution(
+            tool="count_matches",
+            operation="count matches",
+            path=str(validated_path),
+            success=True,
+            details={
+                "pattern": pattern[:100],
+                "line_range": line_range,
+                "file_size": file_size,
+                "engine": engine,
+                "usage": usage
+            }
+        )
+        
+        return result.stdout
+    
     except (ValidationError, SecurityError) as e:
         # Log security/validation failures
         audit_logger.log_validation_failure(
-            tool="sed_substitute",
+            tool="count_matches",
             reason=str(e),
             details={
                 "file_path": file_path,
@@ -225,33 +1922,111 @@ async def sed_substitute(
         raise
     
     except Exception as e:
-        logger.error("sed_substitute: unexpected error: %s", e)
+        logger.error("count_matches: unexpected error: %s", e)
+        audit_logger.log_execution(
+            tool="count_matches",
+            operation="count matches",
+            path=file_path,
+            success=False,
+            details={
+                "error": str(e),
+                "pattern": pattern[:100]
+            }
+        )
+        raise
+
+
+def _stage_content(validated_path: Path, content: Union[bytes, Path]) -> Path:
+    """Put new content for a file in a staging file beside it (blocking).
+    
+    Content that sed already streamed into a staging file is used as is.
+    """
+    if isinstance(content, Path):
+        return content
+    fd, staged = sibling_temp(validated_path)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+    except BaseException:
+        staged.unlink(missing_ok=True)
         raise
+    return staged
+
+
+def _session_unchanged_msg(session_id: str, file_path: str, substitutions: Optional[int]) -> str:
+    """Report a session edit that would leave its file as it is.
+    
+    Args:
+        session_id: Id of the session
+        file_path: Path as supplied by the caller
+        substitutions: Count from _compute_substitution(), None if unknown
+    """
+    return (
+        f"No changes: {_unchanged_reason(file_path, substitutions)}; "
+        f"nothing staged in session {session_id}"
+    )
 
 
 @mcp.tool()
-async def preview_sed(
+async def begin_edit_session() -> str:
+    """Start a transaction for edits that must land in several files together.
+    
+    Edits added with session_substitute are staged, not written. Commit the
+    session with commit_edit_session to replace all edited files at once,
+    or discard it with rollback_edit_session. No backups are needed:
+    if the commit fails or the server stops part way through, every file
+    keeps its original content.
+    
+    Returns:
+        Message with the session id to pass to the other session tools
+    
+    Raises:
+        EditSessionError: If too many sessions are open
+    """
+    if not all([security_validator, path_validator, audit_logger, platform_config, binary_executor]):
+        raise RuntimeError("Tools not initialized - call initialize_components() first")
+    
+    session = await asyncio.to_thread(edit_journal.begin)
+    audit_logger.log_execution(
+        tool="begin_edit_session",
+        operation="begin session",
+        success=True,
+        details={"session": session.id}
+    )
+    return (
+        f"Edit session {session.id} started; add edits with session_substitute, "
+        f"then commit_edit_session or rollback_edit_session"
+    )
+
+
+@mcp.tool()
+async def session_substitute(
+    session_id: str,
     file_path: str,
     pattern: str,
     replacement: str,
     line_range: Optional[str] = None
 ) -> str:
-    """Preview sed substitution without modifying the original file.
+    """Stage a sed substitution of one file in an edit session.
     
-    Creates a temporary copy of the file, applies the sed pattern, and returns
-    a unified diff showing the proposed changes. The original file is never
-    modified.
+    The file itself is not modified. The first edit of a file in the
+    session stages its new content beside it; later edits of the same file
+    apply to the staged content, in the order they are added.
     
     Args:
+        session_id: Id returned by begin_edit_session
         file_path: Path to the target file
-        pattern: Sed substitution pattern (e.g., 's/find/replace/g')
+        pattern: Sed substitution pattern (e.g., 's/find/replace/g'), or a
+            program of several commands, one per line, applied in one pass
         replacement: Replacement string (for documentation/validation)
         line_range: Optional line range (e.g., '1,10' or '5,$')
-        
+    
     Returns:
-        Unified diff showing proposed changes, or "No changes" if pattern doesn't match
-        
+        Confirmation with the substitution count and the number of files
+        staged in the session, or a "No changes" message
+    
     Raises:
+        EditSessionError: If the session is unknown, expired or in use
         ValidationError: If pattern contains forbidden commands
         SecurityError: If file path is outside allowed directories
         ResourceError: If file exceeds size limits
@@ -262,117 +2037,223 @@ async def preview_sed(
     
     try:
         # Step 1-3: Same validation as sed_substitute
-        security_validator.validate_sed_pattern(pattern)
-        validated_path = path_validator.validate_path(file_path)
-        
-        if not validated_path.exists():
-            raise FileNotFoundError(f"File not found: {file_path}")
-        
-        if not validated_path.is_file():
-            raise ValueError(f"Path is not a file: {file_path}")
-        
-        file_size = validated_path.stat().st_size
-        if file_size > MAX_FILE_SIZE:
-            raise ResourceError(
-                f"File size {file_size} bytes exceeds limit of {MAX_FILE_SIZE} bytes"
-            )
-        
-        logger.debug("preview_sed: validation passed for %s", validated_path)
-        
-        # Step 4: Create temporary copy
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.sed_preview') as tmp:
-            tmp_path = Path(tmp.name)
+        sed_commands = _parse_sed_commands(pattern, line_range)
+        validated_path = await asyncio.to_thread(path_validator.validate_path, file_path)
+        await asyncio.to_thread(_check_input_file, validated_path, file_path)
         
+        # Step 4: Claim the session for this call
+        session = await asyncio.to_thread(edit_journal.checkout, session_id)
+        new_content = None
         try:
-            # Copy original file to temp location
-            shutil.copy2(validated_path, tmp_path)
-            logger.debug("preview_sed: created temp copy at %s", tmp_path)
-            
-            # Step 5: Apply sed to temporary file
-            if line_range:
-                sed_pattern = f"{line_range}{pattern}"
+            # Step 5: Edit the staged copy if the session has one, else the file
+            staged_entry = session.files.get(str(validated_path))
+            if staged_entry is not None:
+                source, identity = staged_entry.staged, staged_entry.identity
             else:
-                sed_pattern = pattern
+                source = validated_path
+                identity = await asyncio.to_thread(file_identity, validated_path)
+            source_size = await asyncio.to_thread(lambda: source.stat().st_size)
             
-            args = ['-i', sed_pattern, str(tmp_path)]
-            normalized_args = platform_config.normalize_sed_args(args)
-
-            result = binary_executor.execute(
-                ['sed'] + normalized_args,
-                timeout=30
+            engine, new_content, substitutions, usage = await _compute_substitution(
+                source, sed_commands, source_size
             )
+            if new_content is None:
+                audit_logger.log_execution(
+                    tool="session_substitute",
+                    operation="stage substitution",
+                    path=str(validated_path),
+                    success=True,
+                    details={
+                        "session": session_id,
+                        "pattern": pattern[:100],
+                        "changed": False,
+                        "engine": engine,
+                        "usage": usage
+                    }
+                )
+                return _session_unchanged_msg(session_id, file_path, substitutions)
             
-            if not result.success:
-                error_msg = f"Sed preview failed (exit code {result.returncode}): {result.stderr}"
-                logger.error("preview_sed: %s", error_msg)
-                raise ExecutionError(error_msg)
-            
-            # Step 6: Generate unified diff
-            diff_args = ['-u', str(validated_path), str(tmp_path)]
-            diff_result = binary_executor.execute(
-                ['diff'] + diff_args,
-                timeout=10
+            # Step 6: Stage the new content and record it in the journal
+            staged = await asyncio.to_thread(_stage_content, validated_path, new_content)
+            new_content = staged
+            entry = await asyncio.to_thread(
+                edit_journal.record, session, validated_path, identity, staged,
+                sed_commands, substitutions
             )
-            
-            # diff returns non-zero when files differ, which is expected
-            if diff_result.returncode == 0:
-                # Files are identical - no changes
-                return "No changes"
-            elif diff_result.returncode == 1:
-                # Files differ - return the diff
-                return diff_result.stdout if diff_result.stdout else "No changes"
-            else:
-                # diff error
-                logger.warning("preview_sed: diff command failed: %s", diff_result.stderr)
-                return f"Diff generation failed: {diff_result.stderr}"
-            
+            new_content = None
+        except BaseException:
+            await asyncio.to_thread(_discard_staged, new_content)
+            raise
         finally:
-            # Step 7: Always cleanup temp file
-            try:
-                tmp_path.unlink(missing_ok=True)
-                logger.debug("preview_sed: cleaned up temp file %s", tmp_path)
-            except Exception as cleanup_error:
-                logger.warning(
-                    "preview_sed: failed to cleanup temp file %s: %s",
-                    tmp_path, cleanup_error
-                )
+            edit_journal.release(session)
         
-        # Log successful preview
+        # Step 7: Log the staged edit
         audit_logger.log_execution(
-            tool="preview_sed",
-            operation="preview substitution",
+            tool="session_substitute",
+            operation="stage substitution",
             path=str(validated_path),
             success=True,
             details={
+                "session": session_id,
                 "pattern": pattern[:100],
                 "line_range": line_range,
-                "file_size": file_size
+                "changed": True,
+                "engine": engine,
+                "substitutions": substitutions,
+                "edits": len(entry.operations),
+                "usage": usage
             }
         )
         
+        count = f"{substitutions} substitutions" if substitutions is not None else "sed binary; count not available"
+        msg = (
+            f"Staged sed substitution of {file_path} in session {session_id} ({count}); "
+            f"{len(session.files)} files staged"
+        )
+        logger.info("session_substitute: %s", msg)
+        return msg
+    
     except (ValidationError, SecurityError) as e:
-        # Log security/validation failures
         audit_logger.log_validation_failure(
-            tool="preview_sed",
+            tool="session_substitute",
             reason=str(e),
-            details={
-                "file_path": file_path,
-                "pattern": pattern[:100]
-            }
+            details={"session": session_id, "file_path": file_path, "pattern": pattern[:100]}
         )
         raise
     
     except Exception as e:
-        logger.error("preview_sed: unexpected error: %s", e)
-        # Log execution failure
+        logger.error("session_substitute: failed: %s", e)
         audit_logger.log_execution(
-            tool="preview_sed",
-            operation="preview substitution",
+            tool="session_substitute",
+            operation="stage substitution",
             path=file_path,
             success=False,
-            details={
-                "error": str(e),
-                "pattern": pattern[:100]
-            }
+            details={"session": session_id, "error": str(e), "pattern": pattern[:100]}
         )
-        raise
\ No newline at end of file
+        raise
+
+
+@mcp.tool()
+async def commit_edit_session(session_id: str) -> str:
+    """Write every edit staged in a session, all files or none.
+    
+    The staged files are flushed to disk, a single journal naming them is
+    synced, and all of them are renamed over their originals. The replaced
+    contents are recorded in the files' version histories. If any file
+    changed since it was staged, or the commit fails part way, no file is
+    left modified and no version is kept. The session ends either way.
+    
+    Args:
+        session_id: Id returned by begin_edit_session
+    
+    Returns:
+        Summary line followed by one line per committed file
+    
+    Raises:
+        EditSessionError: If the session is unknown, or a file changed
+            since it was staged
+        SecurityError: If a file is no longer within allowed directories
+        OSError: If the files cannot be replaced
+    """
+    if not all([security_validator, path_validator, audit_logger, platform_config, binary_executor]):
+        raise RuntimeError("Tools not initialized - call initialize_components() first")
+    
+    # Step 1: Claim the session
+    session = await asyncio.to_thread(edit_journal.checkout, session_id)
+    try:
+        # Step 2: Re-validate every target path; a failure ends the session
+        try:
+            for key in session.files:
+                await asyncio.to_thread(path_validator.validate_path, key)
+        except SecurityError as e:
+            await asyncio.to_thread(edit_journal.rollback, session)
+            audit_logger.log_validation_failure(
+                tool="commit_edit_session",
+                reason=str(e),
+                details={"session": session_id}
+            )
+            raise
+        
+        # Step 3: Record the replaced contents, then rename all staged files
+        # into place under the journal
+        staged_bytes = await asyncio.to_thread(lambda: session.staged_bytes)
+        versions = []
+        for entry in list(session.files.values()):
+            operation = "commit_edit_session " + "\n".join(
+                command for commands in entry.operations for command in commands
+            )
+            version = await _record_version(entry.target, entry.staged, operation)
+            if version is not None:
+                versions.append((entry.target, version))
+        try:
+            committed = await asyncio.to_thread(edit_journal.commit, session)
+        except Exception as e:
+            for target, version in versions:
+                await asyncio.to_thread(version_history.discard, target, version)
+            audit_logger.log_execution(
+                tool="commit_edit_session",
+                operation="commit session",
+                success=False,
+                details={"session": session_id, "error": str(e), "files": len(session.files)}
+            )
+            raise
+        _invalidate_cached(*(entry.target for entry in committed))
+    
+    finally:
+        edit_journal.release(session)
+    
+    # Step 4: Log and report the committed files
+    audit_logger.log_execution(
+        tool="commit_edit_session",
+        operation="commit session",
+        success=True,
+        details={
+            "session": session_id,
+            "files": [str(entry.target) for entry in committed][:100],
+            "staged_bytes": staged_bytes
+        }
+    )
+    
+    if not committed:
+        return f"Edit session {session_id} had no staged changes; no file modified"
+    lines = [f"Committed edit session {session_id}: {len(committed)} files replaced"]
+    for entry in committed:
+        edits = f"{len(entry.operations)} edit{'s' if len(entry.operations) != 1 else ''}"
+        if entry.substitutions is not None:
+            edits += f", {entry.substitutions} substitutions"
+        lines.append(f"- {entry.target}: {edits}")
+    logger.info("commit_edit_session: %s", lines[0])
+    return "\n".join(lines)
+
+
+@mcp.tool()
+async def rollback_edit_session(session_id: str) -> str:
+    """Discard an edit session and everything staged in it.
+    
+    No file is modified; the staged copies are deleted.
+    
+    Args:
+        session_id: Id returned by begin_edit_session
+    
+    Returns:
+        Confirmation with the number of staged files discarded
+    
+    Raises:
+        EditSessionError: If the session is unknown, expired or in use
+    """
+    if not all([security_validator, path_validator, audit_logger, platform_config, binary_executor]):
+        raise RuntimeError("Tools not initialized - call initialize_components() first")
+    
+    session = await asyncio.to_thread(edit_journal.checkout, session_id)
+    try:
+        discarded = await asyncio.to_thread(edit_journal.rollback, session)
+    finally:
+        edit_journal.release(session)
+    
+    audit_logger.log_execution(
+        tool="rollback_edit_session",
+        operation="roll back session",
+        success=True,
+        details={"session": session_id, "files": discarded}
+    )
+    return f"Rolled back edit session {session_id}: {discarded} staged files discarded; no file modified"
@@ -58,17 +58,27 @@ async def test_server_default_current_directory():
 
 @pytest.mark.asyncio
 async def test_all_tools_registered(temp_allowed_dir):
-    """TC-037: Verify all five tools are registered with server."""
+    """TC-037: Verify every tool module exposes its tools."""
     server = create_server([temp_allowed_dir])
     
     # Import tool modules to verify they exist
-    from sed_awk_mcp.tools import sed_tool, awk_tool, diff_tool, list_tool
+    from sed_awk_mcp.tools import (
+        sed_tool, awk_tool, diff_tool, list_tool, read_tool, backup_tool, history_tool
+    )
     
     assert hasattr(sed_tool, 'sed_substitute')
+    assert hasattr(sed_tool, 'sed_substitute_many')
     assert hasattr(sed_tool, 'preview_sed')
+    assert hasattr(sed_tool, 'apply_preview')
+    assert hasattr(sed_tool, 'count_matches')
+    assert hasattr(sed_tool, 'begin_edit_session')
+    assert hasattr(sed_tool, 'commit_edit_session')
     assert hasattr(awk_tool, 'awk_transform')
     assert hasattr(diff_tool, 'diff_files')
     assert hasattr(list_tool, 'list_allowed_directories')
+    assert hasattr(read_tool, 'read_lines')
+    assert hasattr(backup_tool, 'restore_backup')
+    assert hasattr(history_tool, 'checkout_version')
 
 
 # --- TC-038: Component initialization fails fast on missing binaries ---
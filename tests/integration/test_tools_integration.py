@@ -4,8 +4,10 @@ Tests TC-026 through TC-033 from test-0005.
 Validates tool functions with proper component initialization and validation chain.
 """
 
+import os
 import pytest
 import tempfile
+import time
 import shutil
 from pathlib import Path
 from unittest.mock import Mock, patch
@@ -17,11 +19,20 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
 from sed_awk_mcp.security.validator import SecurityValidator, ValidationError
 from sed_awk_mcp.security.path_validator import PathValidator, SecurityError
 from sed_awk_mcp.platform.config import PlatformConfig
-from sed_awk_mcp.platform.executor import BinaryExecutor, ExecutionResult
+from sed_awk_mcp.platform.executor import (
+    BinaryExecutor, ExecutionError, ExecutionResult, ResultCache
+)
+from sed_awk_mcp.platform.backup_store import BackupStore
+from sed_awk_mcp.platform.edit_journal import EditJournal, EditSessionError
+from sed_awk_mcp.platform.version_history import HistoryError, VersionHistory
+from sed_awk_mcp.platform.limits import LimitsConfig, ToolLimits
+from sed_awk_mcp.platform.line_index import LineIndexCache
 from sed_awk_mcp.security.audit import AuditLogger
 
 # Import tool modules to access underlying functions
-from sed_awk_mcp.tools import sed_tool, awk_tool, diff_tool, list_tool
+from sed_awk_mcp.tools import (
+    sed_tool, awk_tool, diff_tool, list_tool, read_tool, backup_tool, history_tool
+)
 
 
 @pytest.fixture
@@ -41,13 +52,16 @@ def test_file(temp_workspace):
 
 
 @pytest.fixture
-def initialized_tools(temp_workspace):
+def initialized_tools(temp_workspace, tmp_path):
     """Initialize tools with required components."""
     # Initialize components
     security_validator = SecurityValidator()
     audit_logger = AuditLogger()
     platform_config = PlatformConfig()
     binary_executor = BinaryExecutor(platform_config)
+    line_indexes = LineIndexCache()
+    backup_store = BackupStore(tmp_path / "backups")
+    version_history = VersionHistory(tmp_path / "history")
     
     # Initialize tool modules
     sed_tool.initialize_components(
@@ -55,7 +69,11 @@ def initialized_tools(temp_workspace):
         security_validator,
         audit_logger,
         platform_config,
-        binary_executor
+        binary_executor,
+        line_index_cache=line_indexes,
+        journal=EditJournal(temp_workspace / ".journal"),
+        backups=backup_store,
+        history=version_history
     )
     
     awk_tool.initialize_components(
@@ -78,14 +96,45 @@ def initialized_tools(temp_workspace):
         audit_logger
     )
     
+    read_tool.initialize_components(
+        [str(temp_workspace)],
+        audit_logger,
+        binary_executor,
+        line_indexes
+    )
+    
+    backup_tool.initialize_components(
+        [str(temp_workspace)],
+        audit_logger,
+        binary_executor,
+        backup_store
+    )
+    
+    history_tool.initialize_components(
+        [str(temp_workspace)],
+        audit_logger,
+        binary_executor,
+        version_history
+    )
+    
     return {
         'security': security_validator,
         'audit': audit_logger,
         'platform': platform_config,
-        'executor': binary_executor
+        'executor': binary_executor,
+        'line_indexes': line_indexes,
+        'backups': backup_store,
+        'history': version_history
     }
 
 
+def _backup_content(path) -> bytes:
+    """Content of the most recent stored backup of a file."""
+    record = sed_tool.backup_store.latest(Path(path).resolve())
+    assert record is not None, f"no backup of {path}"
+    return sed_tool.backup_store.read(record)
+
+
 # --- TC-026: sed_substitute creates backup and edits file ---
 
 @pytest.mark.asyncio
@@ -100,9 +149,10 @@ async def test_sed_substitute_backup_and_edit(test_file, initialized_tools):
         "universe"
     )
     
-    assert "Successfully" in result
+    assert "Successfully" in result and "backup " in result
     assert "universe" in test_file.read_text()
-    assert Path(f"{test_file}.bak").exists()
+    assert _backup_content(test_file) == b"hello world\nfoo bar\nbaz qux\n"
+    assert not Path(f"{test_file}.bak").exists()
 
 
 # --- TC-027: sed_substitute rollback on failure ---
@@ -120,6 +170,216 @@ async def test_sed_substitute_rollback_on_failure(test_file, initialized_tools):
     assert test_file.read_text() == original
 
 
+@pytest.mark.asyncio
+async def test_sed_program_single_pass(temp_workspace, initialized_tools):
+    """A multi-line program is applied in one pass with one backup."""
+    program = "s/foo/bar/g\ns/bar baz/qux/\n"
+    engine_file = temp_workspace / "engine.txt"
+    binary_file = temp_workspace / "binary.txt"
+    engine_file.write_text("foo baz\nfoo\n")
+    binary_file.write_text("foo baz\nfoo\n")
+    
+    preview = await sed_tool.preview_sed.fn(str(engine_file), program, "", line_range="1")
+    assert "+qux" in preview and "-foo baz" in preview
+    
+    await sed_tool.sed_substitute.fn(str(engine_file), program, "")
+    # A quantified group sends the whole program to one sed -e ... -e ... run
+    await sed_tool.sed_substitute.fn(str(binary_file), program + "s/\\(x\\)\\{2\\}/y/", "")
+    
+    assert engine_file.read_text() == "qux\nbar\n"
+    assert binary_file.read_text() == engine_file.read_text()
+    assert _backup_content(engine_file) == b"foo baz\nfoo\n"
+    
+    with pytest.raises(ValidationError, match="Line 2.*Forbidden"):
+        await sed_tool.sed_substitute.fn(str(engine_file), "s/a/b/\ns/c/d/w out", "")
+    with pytest.raises(ValidationError, match="no commands"):
+        await sed_tool.sed_substitute.fn(str(engine_file), "\n \n", "")
+
+
+@pytest.mark.asyncio
+async def test_sed_substitute_many_reports_per_file(temp_workspace, initialized_tools):
+    """A batch edits listed and globbed files and reports each outcome."""
+    func = sed_tool.sed_substitute_many.fn
+    (temp_workspace / "pkg").mkdir()
+    for name in ("a.py", "b.py", "pkg/c.py"):
+        (temp_workspace / name).write_text("old = old\n")
+    listed = temp_workspace / "notes.txt"
+    listed.write_text("old\n")
+    (temp_workspace / "pkg" / "link.py").symlink_to(temp_workspace / "a.py")
+    
+    result = await func(
+        "s/old/new/g", "new",
+        file_paths=[str(listed), str(temp_workspace / "missing.txt")],
+        file_glob="**/*.py",
+        max_parallel=2
+    )
+    
+    lines = result.splitlines()
+    assert lines[0] == "Applied sed substitution to 4 of 6 files (7 substitutions), 2 failed"
+    backup_id = sed_tool.backup_store.latest(listed.resolve()).id
+    assert f"- {listed}: 1 substitutions, backup {backup_id}" in lines
+    assert "missing.txt: FAILED: File not found" in result
+    assert "Skipped: same file as another target" in result
+    for name in ("a.py", "b.py", "pkg/c.py"):
+        assert (temp_workspace / name).read_text() == "new = new\n"
+        assert _backup_content(temp_workspace / name) == b"old = old\n"
+    
+    # Scripts that need the sed binary are applied without a count
+    result = await func(r"s/\(n\)\{1\}ew/old/", "old", file_paths=[str(listed)], create_backup=False)
+    assert "applied (sed binary; count not available)" in result
+    assert listed.read_text() == "old\n"
+
+
+@pytest.mark.asyncio
+async def test_sed_substitute_many_validates_once(temp_workspace, initialized_tools):
+    """Forbidden patterns and empty selections fail before any file is touched."""
+    func = sed_tool.sed_substitute_many.fn
+    
+    with pytest.raises(ValidationError):
+        await func("s/a/b/e", "b", file_glob="*")
+    with pytest.raises(ValueError, match="No target files"):
+        await func("s/a/b/", "b", file_glob="*.none")
+
+
+@pytest.mark.asyncio
+async def test_sed_substitute_failed_write_keeps_file(test_file, initialized_tools, monkeypatch):
+    """A failed write leaves the file as it was; nothing needs restoring."""
+    original = test_file.read_bytes()
+    inode = test_file.stat().st_ino
+    
+    def failing_write(target, data):
+        raise OSError("disk full")
+    
+    monkeypatch.setattr(sed_tool, "write_atomic", failing_write)
+    
+    async def no_restore(*args, **kwargs):
+        raise AssertionError("an unmodified file must not be restored")
+    monkeypatch.setattr(sed_tool.backup_store, "restore", no_restore)
+    
+    with pytest.raises(OSError, match="disk full"):
+        await sed_tool.sed_substitute.fn(str(test_file), "s/world/universe/", "universe")
+    
+    assert test_file.read_bytes() == original
+    assert test_file.stat().st_ino == inode
+    assert sorted(p.name for p in test_file.parent.iterdir()) == ["test.txt"]
+
+
+@pytest.mark.asyncio
+async def test_backups_are_deduplicated_and_restorable(test_file, initialized_tools):
+    """Backups of identical content share one object; restore_backup puts one back."""
+    store = sed_tool.backup_store
+    original = test_file.read_bytes()
+    
+    await sed_tool.sed_substitute.fn(str(test_file), "s/world/universe/", "universe")
+    first = store.latest(test_file.resolve())
+    await sed_tool.sed_substitute.fn(str(test_file), "s/universe/world/", "world")
+    await sed_tool.sed_substitute.fn(str(test_file), "s/world/universe/", "universe")
+    assert test_file.read_text() == "hello universe\nfoo bar\nbaz qux\n"
+    assert store.stats()["backups"] == 3
+    assert store.stats()["objects"] == 2
+    
+    listing = await backup_tool.list_backups.fn(str(test_file))
+    assert len(listing.splitlines()) == 3 and first.id in listing.splitlines()[-1]
+    
+    result = await backup_tool.restore_backup.fn(str(test_file), first.id)
+    assert result.startswith(f"Restored {test_file} from backup {first.id}")
+    assert "replaced content saved as backup" in result
+    assert test_file.read_bytes() == original
+    assert store.stats()["objects"] == 2
+    assert sorted(p.name for p in test_file.parent.iterdir()) == ["test.txt"]
+    
+    with pytest.raises(ValueError, match="Unknown backup"):
+        await backup_tool.restore_backup.fn(str(test_file), "missing")
+    other = test_file.parent / "other.txt"
+    with pytest.raises(ValueError, match="No backups"):
+        await backup_tool.restore_backup.fn(str(other))
+    with pytest.raises(SecurityError):
+        await backup_tool.restore_backup.fn("/etc/passwd")
+
+
+@pytest.mark.asyncio
+async def test_version_history_checkout(test_file, temp_workspace, initialized_tools):
+    """Every edit records a version; checkout_version rebuilds any of them."""
+    contents = [test_file.read_bytes()]
+    for old, new in (("world", "universe"), ("foo", "food"), ("universe", "cosmos")):
+        await sed_tool.sed_substitute.fn(str(test_file), f"s/{old}/{new}/", new, create_backup=False)
+        contents.append(test_file.read_bytes())
+    
+    history = await history_tool.file_history.fn(str(test_file))
+    lines = history.splitlines()
+    assert len(lines) == 3
+    assert lines[0].startswith("v3 ") and "patch" in lines[0] and "s/universe/cosmos/" in lines[0]
+    assert lines[-1].startswith("v1 ") and "full" in lines[-1]
+    
+    copy = temp_workspace / "v2.txt"
+    result = await history_tool.checkout_version.fn(str(test_file), 2, str(copy))
+    assert result.startswith(f"Checked out version 2 of {test_file} into {copy}")
+    assert copy.read_bytes() == contents[1]
+    assert test_file.read_bytes() == contents[3]
+    
+    result = await history_tool.checkout_version.fn(str(test_file), 1)
+    assert "replaced content recorded as version 4" in result
+    assert test_file.read_bytes() == contents[0]
+    assert "No changes" in await history_tool.checkout_version.fn(str(test_file), 1)
+    await history_tool.checkout_version.fn(str(test_file), 4)
+    assert test_file.read_bytes() == contents[3]
+    assert sorted(p.name for p in temp_workspace.iterdir()) == ["test.txt", "v2.txt"]
+    
+    with pytest.raises(HistoryError, match="No version 9"):
+        await history_tool.checkout_version.fn(str(test_file), 9)
+    with pytest.raises(SecurityError):
+        await history_tool.checkout_version.fn(str(test_file), 1, "/etc/passwd")
+    assert "No recorded versions" in await history_tool.file_history.fn(str(copy))
+
+
+@pytest.mark.asyncio
+async def test_sed_binary_edit_without_backup(test_file, initialized_tools):
+    """The sed binary path writes atomically and leaves no .bak when none is requested."""
+    inode = test_file.stat().st_ino
+    
+    await sed_tool.sed_substitute.fn(
+        str(test_file), "s/\\(o\\)\\{2\\}/0/", "0", create_backup=False
+    )
+    
+    assert test_file.read_text() == "hello world\nf0 bar\nbaz qux\n"
+    assert test_file.stat().st_ino != inode
+    assert len(sed_tool.backup_store) == 0
+
+
+@pytest.mark.asyncio
+async def test_sed_substitute_no_match_leaves_file_untouched(test_file, initialized_tools, monkeypatch):
+    """A pattern that matches nothing creates no backup and keeps the file as is."""
+    before = test_file.stat()
+    
+    async def no_sed(*args, **kwargs):
+        raise AssertionError("sed must not run when the pre-scan rules the pattern out")
+    monkeypatch.setattr(sed_tool, "_run_sed_binary", no_sed)
+    
+    # The quantified group would need the sed binary; the pre-scan avoids it
+    result = await sed_tool.sed_substitute.fn(str(test_file), "s/absent\\(x\\)\\{2\\}/y/", "y")
+    assert result.startswith("No changes")
+    # The literal occurs but the regex does not match: decided in-process
+    result = await sed_tool.sed_substitute.fn(str(test_file), "s/^world/y/", "y")
+    assert result.startswith("No changes")
+    # The regex matches, but the replacement reproduces the matched text
+    result = await sed_tool.sed_substitute.fn(str(test_file), "s/\\(wor\\)ld/\\1ld/g", "y")
+    assert result.startswith("No changes: the substitutions leave")
+    
+    after = test_file.stat()
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+    assert len(sed_tool.backup_store) == 0
+    
+    result = await sed_tool.sed_substitute_many.fn(
+        "s/foo/FOO/", "FOO", file_paths=[str(test_file)], file_glob="none*"
+    )
+    assert result.splitlines()[0] == "Applied sed substitution to 1 of 1 files (1 substitutions)"
+    (test_file.parent / "other.txt").write_text("nothing here\n")
+    result = await sed_tool.sed_substitute_many.fn("s/FOO/foo/", "foo", file_glob="*.txt")
+    assert "1 unchanged" in result.splitlines()[0]
+    assert "other.txt: no changes" in result
+    assert sed_tool.backup_store.latest((test_file.parent / "other.txt").resolve()) is None
+
+
 # --- TC-028: preview_sed generates diff without modifying file ---
 
 @pytest.mark.asyncio
@@ -132,7 +392,170 @@ async def test_preview_sed_no_modification(test_file, initialized_tools):
     
     assert "world" in diff_output or "universe" in diff_output
     assert test_file.read_text() == original
-    assert not Path(f"{test_file}.bak").exists()
+    assert len(sed_tool.backup_store) == 0
+
+
+def _change_token(preview: str) -> str:
+    """Extract the change token from preview_sed output."""
+    return preview.rsplit("Change token: ", 1)[1].split()[0]
+
+
+@pytest.mark.asyncio
+async def test_apply_preview_commits_previewed_content(test_file, initialized_tools, monkeypatch):
+    """apply_preview writes the previewed content without running sed again."""
+    preview = await sed_tool.preview_sed.fn(str(test_file), "s/world/universe/", "universe")
+    token = _change_token(preview)
+    repeated = await sed_tool.preview_sed.fn(str(test_file), "s/world/universe/", "universe")
+    assert _change_token(repeated) == token
+    
+    def no_sed(*args, **kwargs):
+        raise AssertionError("sed must not run again")
+    monkeypatch.setattr(sed_tool, "_run_in_process", no_sed)
+    monkeypatch.setattr(sed_tool, "_run_sed_binary", no_sed)
+    
+    result = await sed_tool.apply_preview.fn(token)
+    assert "1 substitutions" in result and "backup " in result
+    assert test_file.read_text() == "hello universe\nfoo bar\nbaz qux\n"
+    assert _backup_content(test_file) == b"hello world\nfoo bar\nbaz qux\n"
+    
+    with pytest.raises(ValueError, match="Unknown or expired"):
+        await sed_tool.apply_preview.fn(token)
+
+
+@pytest.mark.asyncio
+async def test_apply_preview_refuses_changed_file(test_file, initialized_tools):
+    """A file edited after the preview is left alone."""
+    preview = await sed_tool.preview_sed.fn(str(test_file), "s/world/universe/", "universe")
+    test_file.write_text("hello world\nedited\n")
+    
+    with pytest.raises(sed_tool.StalePreviewError, match="changed after it was previewed"):
+        await sed_tool.apply_preview.fn(_change_token(preview))
+    assert test_file.read_text() == "hello world\nedited\n"
+    assert len(sed_tool.backup_store) == 0
+
+
+@pytest.mark.asyncio
+async def test_sed_substitute_reuses_preview(temp_workspace, initialized_tools, monkeypatch):
+    """sed_substitute with the previewed arguments commits the stored content."""
+    data = temp_workspace / "data.txt"
+    data.write_text("foo\nfoo\n")
+    # A quantified group needs the sed binary, which must run only once
+    pattern = "s/\\(o\\)\\{2\\}/0/"
+    preview = await sed_tool.preview_sed.fn(str(data), pattern, "0")
+    assert "Change token: " in preview
+    
+    async def no_sed(*args, **kwargs):
+        raise AssertionError("sed must not run again")
+    monkeypatch.setattr(sed_tool, "_run_sed_binary", no_sed)
+    
+    await sed_tool.sed_substitute.fn(str(data), pattern, "0", create_backup=False)
+    assert data.read_text() == "f0\nf0\n"
+    assert len(sed_tool.preview_store) == 0
+
+
+@pytest.mark.asyncio
+async def test_count_matches_reports_without_writing(temp_workspace, initialized_tools, monkeypatch):
+    """count_matches summarises a substitution; the engine and sed agree."""
+    data = temp_workspace / "data.txt"
+    data.write_bytes(b"".join(b"row %d foo\n" % i if i % 3 == 0 else b"row %d\n" % i
+                              for i in range(1, 31)))
+    before = data.read_bytes()
+    func = sed_tool.count_matches.fn
+    
+    in_process = await func(str(data), "s/foo/quux/", max_lines=4)
+    assert in_process == (
+        "10 matching lines, 10 substitutions, byte delta +10\n"
+        "Lines: 3, 6, 9, 12 (first 4 of 10)"
+    )
+    assert await func(str(data), "s/foo/quux/", line_range="10,20") == (
+        "3 matching lines, 3 substitutions, byte delta +3\nLines: 12, 15, 18"
+    )
+    assert await func(str(data), "s/bar/x/") == "No matches"
+    
+    monkeypatch.setattr(sed_tool, "_measure_in_process", lambda *args: None)
+    binary = await func(str(data), "s/foo/quux/", max_lines=4)
+    assert binary == (
+        "10 matching lines, byte delta +10 (substitution count not reported by the sed binary)\n"
+        "Lines: 3, 6, 9, 12 (first 4 of 10)"
+    )
+    assert data.read_bytes() == before
+    assert sorted(p.name for p in temp_workspace.iterdir()) == ["data.txt"]
+    
+    with pytest.raises(ValueError, match="max_lines"):
+        await func(str(data), "s/foo/x/", max_lines=-1)
+
+
+@pytest.mark.asyncio
+async def test_edit_session_commits_files_together(temp_workspace, initialized_tools):
+    """Edits staged in a session land together on commit, or not at all."""
+    first = temp_workspace / "first.txt"
+    second = temp_workspace / "second.txt"
+    first.write_text("alpha beta\n")
+    second.write_text("alpha\n")
+    
+    started = await sed_tool.begin_edit_session.fn()
+    session_id = started.split()[2]
+    staged = await sed_tool.session_substitute.fn(session_id, str(first), "s/alpha/one/", "one")
+    assert "1 substitutions" in staged and "1 files staged" in staged
+    await sed_tool.session_substitute.fn(session_id, str(first), "s/beta/two/", "two")
+    await sed_tool.session_substitute.fn(session_id, str(second), "s/alpha/three/", "three")
+    assert "No changes: pattern does not match" in await sed_tool.session_substitute.fn(
+        session_id, str(second), "s/zzz/y/", "y"
+    )
+    assert "No changes: the substitutions leave" in await sed_tool.session_substitute.fn(
+        session_id, str(second), "s/three/three/", "three"
+    )
+    assert first.read_text() == "alpha beta\n"
+    
+    result = await sed_tool.commit_edit_session.fn(session_id)
+    assert result.startswith(f"Committed edit session {session_id}: 2 files replaced")
+    assert "2 edits, 2 substitutions" in result
+    assert first.read_text() == "one two\n" and second.read_text() == "three\n"
+    assert sorted(p.name for p in temp_workspace.iterdir() if p.is_file()) == [
+        "first.txt", "second.txt"
+    ]
+    # The replaced contents are in the version histories
+    history = await history_tool.file_history.fn(str(first))
+    assert history.startswith("v1 ") and "s/alpha/one/" in history and "s/beta/two/" in history
+    assert len(sed_tool.version_history.versions(second)) == 1
+    
+    # A file changed after staging stops the whole session
+    session_id = (await sed_tool.begin_edit_session.fn()).split()[2]
+    await sed_tool.session_substitute.fn(session_id, str(first), "s/one/1/", "1")
+    await sed_tool.session_substitute.fn(session_id, str(second), "s/three/3/", "3")
+    second.write_text("edited\n")
+    with pytest.raises(EditSessionError, match="changed since they were staged"):
+        await sed_tool.commit_edit_session.fn(session_id)
+    assert first.read_text() == "one two\n"
+    assert len(sed_tool.version_history.versions(first)) == 1
+    assert len(sed_tool.version_history.versions(second)) == 1
+    
+    session_id = (await sed_tool.begin_edit_session.fn()).split()[2]
+    await sed_tool.session_substitute.fn(session_id, str(first), "s/one/1/", "1")
+    assert "1 staged files discarded" in await sed_tool.rollback_edit_session.fn(session_id)
+    assert first.read_text() == "one two\n"
+    with pytest.raises(EditSessionError, match="Unknown or expired"):
+        await sed_tool.commit_edit_session.fn(session_id)
+
+
+@pytest.mark.asyncio
+async def test_sed_substitute_engine_and_binary_agree(temp_workspace, initialized_tools):
+    """In-process engine and sed binary fallback produce the same edit."""
+    func = sed_tool.sed_substitute.fn
+    engine_file = temp_workspace / "engine.txt"
+    binary_file = temp_workspace / "binary.txt"
+    engine_file.write_text("foo bar\nbar foo\n")
+    binary_file.write_text("foo bar\nbar foo\n")
+    
+    # 's/o\{2\}/0/g' is handled in-process; a quantified group falls back to sed
+    await func(str(engine_file), "s/o\\{2\\}/0/g", "0")
+    await func(str(binary_file), "s/\\(o\\)\\{2\\}/0/g", "0")
+    
+    assert engine_file.read_text() == "f0 bar\nbar f0\n"
+    assert binary_file.read_text() == engine_file.read_text()
+    
+    # Identical content with no matches still reports no changes in preview
+    assert await sed_tool.preview_sed.fn(str(engine_file), "s/zzz/y/", "y") == "No changes"
 
 
 # --- TC-029: awk_transform extracts fields correctly ---
@@ -152,6 +575,158 @@ async def test_awk_transform_field_extraction(test_file, initialized_tools):
     assert "25" in result
 
 
+@pytest.mark.asyncio
+async def test_awk_engine_and_binary_agree(temp_workspace, initialized_tools):
+    """In-process engine and awk binary fallback produce the same output."""
+    func = awk_tool.awk_transform.fn
+    
+    small_file = temp_workspace / "small.txt"
+    large_file = temp_workspace / "large.txt"
+    small_file.write_text("a 1\nb 2\nc 3\n")
+    large_file.write_text("a 1\nb 2\nc 3\n" * (awk_tool.IN_PROCESS_MAX_SIZE // 12 + 1))
+    
+    # Small input runs in-process; larger input and arrays use the binary
+    assert await func(str(small_file), "{s += $2} END {print s}") == "6\n"
+    expected_large = f"{6 * (awk_tool.IN_PROCESS_MAX_SIZE // 12 + 1)}\n"
+    assert await func(str(large_file), "{s += $2} END {print s}") == expected_large
+    assert await func(str(small_file), "{a[NR] = $1} END {print a[2]}") == "b\n"
+
+
+@pytest.mark.asyncio
+async def test_awk_timeout_returns_partial_output(temp_workspace, initialized_tools, monkeypatch):
+    """A timed-out awk run returns the output it flushed, marked partial."""
+    limits = LimitsConfig(per_tool={'awk': ToolLimits(timeout=1, timeout_per_mb=0, max_timeout=1)})
+    monkeypatch.setattr(awk_tool.binary_executor, "limits", limits)
+    func = awk_tool.awk_transform.fn
+    data = temp_workspace / "data.txt"
+    data.write_text("".join(f"line {i}\n" for i in range(20000)))
+    
+    # Output well past awk's stdio buffer reaches the pipe before the loop
+    result = await func(str(data), '{print $2} END {while (1) {}}')
+    
+    assert result.startswith("0\n1\n2\n")
+    assert result.endswith("[Timed out after 1s; output is partial]")
+    with pytest.raises(ExecutionError, match="timeout"):
+        await func(
+            str(data), '{print $2} END {while (1) {}}',
+            output_file=str(temp_workspace / "out.txt")
+        )
+
+
+@pytest.mark.asyncio
+async def test_awk_output_file_preserves_bytes(temp_workspace, initialized_tools):
+    """Verify awk output written to a file is not re-encoded."""
+    func = awk_tool.awk_transform.fn
+    
+    latin1_file = temp_workspace / "latin1.txt"
+    latin1_file.write_bytes(b"caf\xe9 1\nna\xefve 2\n")
+    output_file = temp_workspace / "out.txt"
+    
+    result = await func(str(latin1_file), "{print $1}", output_file=str(output_file))
+    
+    assert "Output written" in result
+    assert output_file.read_bytes() == b"caf\xe9\nna\xefve\n"
+
+
+@pytest.mark.asyncio
+async def test_awk_reads_several_inputs_in_one_process(temp_workspace, initialized_tools):
+    """Listed and globbed inputs reach one awk run, so FNR and FILENAME work."""
+    func = awk_tool.awk_transform.fn
+    logs = temp_workspace / "logs"
+    logs.mkdir()
+    for day in (1, 2, 3):
+        (logs / f"day{day}.log").write_text("ok\n" * day)
+    first = str(logs / "day3.log")
+    
+    result = await func([first], 'FNR == 1 {print FILENAME} {n++} END {print n}',
+                        file_glob="logs/*.log")
+    assert result == "\n".join([first, str(logs / "day1.log"), str(logs / "day2.log"), "6\n"])
+    
+    # A file named twice is read twice (the NR == FNR idiom)
+    assert await func([first, first], "NR != FNR") == "ok\n" * 3
+    with pytest.raises(ValueError, match="No input files"):
+        await func([], "{print}", file_glob="logs/*.csv")
+
+
+@pytest.mark.asyncio
+async def test_awk_combined_input_size_limit(temp_workspace, initialized_tools, monkeypatch):
+    """The admission limit applies to the inputs together."""
+    limits = LimitsConfig(per_tool={'awk': ToolLimits(max_file_size=1024, max_stream_file_size=0)})
+    monkeypatch.setattr(awk_tool.binary_executor, "limits", limits)
+    first = temp_workspace / "a.txt"
+    second = temp_workspace / "b.txt"
+    first.write_bytes(b"x\n" * 300)
+    second.write_bytes(b"y\n" * 300)
+    
+    assert await awk_tool.awk_transform.fn(str(first), "END {print NR}") == "300\n"
+    with pytest.raises(awk_tool.ResourceError, match="Combined input size 1200 bytes"):
+        await awk_tool.awk_transform.fn([str(first), str(second)], "END {print NR}")
+
+
+@pytest.mark.asyncio
+async def test_awk_inputs_split_to_fit_command_line(temp_workspace, initialized_tools, monkeypatch):
+    """Inputs beyond the argv budget run in consecutive processes, in order."""
+    monkeypatch.setattr(awk_tool, "_argv_budget", lambda: 1)
+    paths = []
+    for i in range(3):
+        path = temp_workspace / f"part{i}.txt"
+        path.write_text(f"{i}\n")
+        paths.append(str(path))
+    
+    result = await awk_tool.awk_transform.fn(paths, "{print} END {print \"end\"}")
+    assert result == (
+        "0\nend\n1\nend\n2\nend\n\n"
+        "[Inputs split across 3 awk processes to fit the command line; BEGIN and END ran in each]"
+    )
+    
+    out = temp_workspace / "out.txt"
+    result = await awk_tool.awk_transform.fn(paths, "{print}", output_file=str(out))
+    assert "split across 3 awk processes" in result
+    assert out.read_text() == "0\n1\n2\n"
+
+
+@pytest.mark.asyncio
+async def test_awk_parallel_shards_and_combiners(temp_workspace, initialized_tools):
+    """Sharded runs match a single awk process once their outputs are combined."""
+    func = awk_tool.awk_transform.fn
+    data = temp_workspace / "requests.log"
+    data.write_text("".join(f"/p{i % 7} {i}\n" for i in range(5000)))
+    grouped = '{s[$1] += $2} END {for (k in s) print k, s[k]}'
+    
+    single = await func(str(data), grouped)
+    sharded = await func(str(data), grouped, combiner="sum_by_key", shards=4)
+    assert sorted(sharded.splitlines()) == sorted(single.splitlines())
+    assert await func(str(data), '{s += $2} END {print "total", s}', combiner="sum", shards=3) == (
+        f"total {sum(range(5000))}\n"
+    )
+    assert await func(str(data), "$2 % 2", combiner="count", shards=5) == "2500\n"
+    
+    # Map-only output keeps input order, returned or written to a file
+    out = temp_workspace / "paths.txt"
+    assert await func(str(data), "{print $1}", combiner="concat", shards=6) == (
+        await func(str(data), "{print $1}")
+    )
+    await func(str(data), "{print $2}", output_file=str(out), combiner="concat", shards=6)
+    assert out.read_text() == "".join(f"{i}\n" for i in range(5000))
+    assert sorted(p.name for p in temp_workspace.iterdir()) == ["paths.txt", "requests.log"]
+    
+    # Every match in one shard: the others print only the label
+    labeled = '$2 < 100 {s += $2} END {print "total", s}'
+    assert await func(str(data), labeled, combiner="sum", shards=4) == (
+        await func(str(data), labeled)
+    ) == "total 4950\n"
+    
+    for program in ("END {print NR}", 'BEGIN {print "header"} {print}', "{print 0x1} END {}"):
+        with pytest.raises(ValueError, match="count combiner"):
+            await func(str(data), program, combiner="count", shards=2)
+    assert await func(str(data), '$1 == "END"', combiner="count", shards=2) == "0\n"
+    assert await func(str(data), "/^END$/", combiner="count", shards=2) == "0\n"
+    with pytest.raises(ValueError, match="Unknown combiner"):
+        await func(str(data), "{print}", combiner="avg")
+    with pytest.raises(ValueError, match="needs a combiner"):
+        await func(str(data), "{print}", shards=2)
+
+
 # --- TC-030: diff_files generates unified diff ---
 
 @pytest.mark.asyncio
@@ -170,6 +745,49 @@ async def test_diff_files_unified_format(temp_workspace, initialized_tools):
     assert "+++" in diff_output
 
 
+@pytest.mark.asyncio
+async def test_diff_engine_and_binary_agree(temp_workspace, initialized_tools):
+    """In-process diff and the diff binary fallback produce the same output."""
+    func = diff_tool.diff_files.fn
+    
+    small1 = temp_workspace / "small1.txt"
+    small2 = temp_workspace / "small2.txt"
+    small1.write_text("".join(f"line {i}\n" for i in range(20)))
+    small2.write_text("".join(f"line {i}\n" for i in range(20)).replace("line 9\n", "nine\n"))
+    
+    # Small files are compared in-process; context_lines below 3 is honoured
+    small_diff = await func(str(small1), str(small2), context_lines=1)
+    assert "@@ -9,3 +9,3 @@\n line 8\n-line 9\n+nine\n line 10\n" in small_diff
+    
+    # Large files go to the binary, which must agree with the engine's format
+    large1 = temp_workspace / "large1.txt"
+    large2 = temp_workspace / "large2.txt"
+    large1.write_bytes(small1.read_bytes() * 2000)
+    large2.write_bytes(small2.read_bytes() + small1.read_bytes() * 1999)
+    large_diff = await func(str(large1), str(large2), context_lines=1)
+    assert large_diff.split("\n", 2)[2] == small_diff.split("\n", 2)[2]
+
+
+@pytest.mark.asyncio
+async def test_result_cache_serves_repeats_and_invalidates(temp_workspace, initialized_tools):
+    """Repeated read-only calls hit the cache until sed_substitute writes."""
+    cache = ResultCache(racy_window=0)
+    initialized_tools['executor'].result_cache = cache
+    data = temp_workspace / "data.txt"
+    data.write_text("a 1\nb 2\n")
+    
+    assert await awk_tool.awk_transform.fn(str(data), "{print $2}") == "1\n2\n"
+    assert await awk_tool.awk_transform.fn(str(data), "{print $2}") == "1\n2\n"
+    preview = await sed_tool.preview_sed.fn(str(data), "s/a/x/", "x")
+    assert await sed_tool.preview_sed.fn(str(data), "s/a/x/", "x") == preview
+    assert cache.stats()["hits"] == 2
+    
+    await sed_tool.sed_substitute.fn(str(data), "s/1/9/", "9", create_backup=False)
+    assert await awk_tool.awk_transform.fn(str(data), "{print $2}") == "9\n2\n"
+    assert cache.stats()["invalidations"] >= 2
+    assert cache.stats()["hits"] == 2
+
+
 # --- TC-031: list_allowed_directories returns sorted list ---
 
 @pytest.mark.asyncio
@@ -182,20 +800,139 @@ async def test_list_allowed_directories_sorted(initialized_tools):
     assert "Allowed directories" in result or "/" in result
 
 
-# --- TC-032: File size >10MB rejected ---
+# --- TC-032: File size over the admission limit rejected ---
 
 @pytest.mark.asyncio
 async def test_large_file_rejection(temp_workspace, initialized_tools):
     """TC-032: Verify files exceeding size limit are rejected."""
     func = sed_tool.sed_substitute.fn
     
+    # Sparse file just over the streaming admission limit
     large_file = temp_workspace / "large.txt"
-    large_file.write_bytes(b"x" * (10 * 1024 * 1024 + 1))
+    with open(large_file, 'wb') as f:
+        f.truncate(sed_tool.binary_executor.limits.for_tool('sed').admission_limit + 1)
     
     with pytest.raises(Exception, match="exceeds|size"):
         await func(str(large_file), "s/x/y/", "y")
 
 
+@pytest.mark.asyncio
+async def test_configured_file_size_limit(temp_workspace, initialized_tools, monkeypatch):
+    """Per-tool max_file_size from the limits config is enforced."""
+    limits = LimitsConfig(per_tool={'sed': ToolLimits(max_file_size=1024, max_stream_file_size=0)})
+    monkeypatch.setattr(sed_tool.binary_executor, "limits", limits)
+    
+    data = temp_workspace / "data.txt"
+    data.write_bytes(b"x\n" * 1024)
+    
+    with pytest.raises(sed_tool.ResourceError, match="limit of 1024 bytes"):
+        await sed_tool.sed_substitute.fn(str(data), "s/x/y/", "y")
+    assert "x" in await awk_tool.awk_transform.fn(str(data), "NR == 1")
+
+
+@pytest.fixture
+def streaming_limits(initialized_tools, monkeypatch):
+    """Stream every input over 1KB so small files exercise the streaming tier."""
+    limits = LimitsConfig(ToolLimits(max_file_size=1024, max_stream_file_size=1024 * 1024))
+    monkeypatch.setattr(sed_tool.binary_executor, "limits", limits)
+    return limits
+
+
+@pytest.mark.asyncio
+async def test_streamed_sed_edit(temp_workspace, streaming_limits, monkeypatch):
+    """Files above max_file_size are edited through a staging file, not in memory."""
+    monkeypatch.setattr(sed_tool, "_run_in_process", lambda *args: pytest.fail("loaded in memory"))
+    data = temp_workspace / "big.txt"
+    data.write_bytes(b"".join(b"line %d.\n" % i for i in range(1000)))
+    os.chmod(data, 0o640)
+    
+    preview = await sed_tool.preview_sed.fn(str(data), "s/^line 5[.]/LINE 5./", "LINE 5.")
+    assert "-line 5.\n+LINE 5.\n" in preview
+    assert "No change token" in preview
+    
+    assert "No changes" in await sed_tool.sed_substitute.fn(str(data), "s/line 5[x]/y/", "y")
+    assert len(sed_tool.backup_store) == 0
+    
+    result = await sed_tool.sed_substitute.fn(str(data), "s/^line 5[.]/LINE 5./", "LINE 5.")
+    assert "Successfully" in result
+    assert data.read_bytes().split(b"\n")[5] == b"LINE 5."
+    assert _backup_content(data).split(b"\n")[5] == b"line 5."
+    assert data.stat().st_mode & 0o777 == 0o640
+    assert sorted(p.name for p in temp_workspace.iterdir()) == ["big.txt"]
+
+
+@pytest.mark.asyncio
+async def test_streamed_awk_and_diff(temp_workspace, streaming_limits):
+    """awk streams large inputs to the output file; diff compares them in one pass."""
+    data = temp_workspace / "big.txt"
+    data.write_bytes(b"".join(b"%d value\n" % i for i in range(1000)))
+    out = temp_workspace / "out.txt"
+    
+    result = await awk_tool.awk_transform.fn(str(data), '{print ($1 == 7 ? "seven" : $1), $2}',
+                                             output_file=str(out))
+    assert "Output written" in result
+    assert out.read_bytes().count(b"\n") == 1000
+    
+    diff = await diff_tool.diff_files.fn(str(data), str(out), context_lines=1)
+    assert "@@ -7,3 +7,3 @@\n 6 value\n-7 value\n+seven value\n 8 value\n" in diff
+
+
+@pytest.mark.asyncio
+async def test_streamed_line_range_reads_only_the_range(temp_workspace, streaming_limits, monkeypatch):
+    """A numeric line_range on a streamed file runs sed over just those lines."""
+    data = temp_workspace / "big.txt"
+    original = b"".join(b"line %d.\n" % i for i in range(1000))
+    data.write_bytes(original)
+    
+    windowed = await sed_tool.preview_sed.fn(str(data), "s/line/LINE/", "LINE", line_range="100,102")
+    line_window = sed_tool._line_window
+    monkeypatch.setattr(sed_tool, "_line_window", lambda commands: None)
+    whole = await sed_tool.preview_sed.fn(str(data), "s/line/LINE/", "LINE", line_range="100,102")
+    monkeypatch.setattr(sed_tool, "_line_window", line_window)
+    assert windowed.split("@@", 1)[1] == whole.split("@@", 1)[1]
+    assert "@@ -97,9 +97,9 @@\n line 96.\n" in windowed
+    
+    real_run = sed_tool._run_sed_binary
+    
+    async def run_on_stdin(validated_path, sed_commands, file_size, **kwargs):
+        assert kwargs.get("stdin_fd") is not None and file_size < 100
+        return await real_run(validated_path, sed_commands, file_size, **kwargs)
+    
+    monkeypatch.setattr(sed_tool, "_run_sed_binary", run_on_stdin)
+    result = await sed_tool.sed_substitute.fn(
+        str(data), "s/line/LINE/", "LINE", line_range="100,102", create_backup=False
+    )
+    assert "Successfully" in result
+    expected = original.replace(b"line 99.", b"LINE 99.").replace(b"line 100.", b"LINE 100.")
+    assert data.read_bytes() == expected.replace(b"line 101.", b"LINE 101.")
+    
+    assert "No changes" in await sed_tool.sed_substitute.fn(
+        str(data), "s/line 5[x]/y/", "y", line_range="2000,$"
+    )
+    await sed_tool.sed_substitute.fn(str(data), "s/line/LINE/", "LINE", line_range="999,$",
+                                     create_backup=False)
+    assert data.read_bytes().endswith(b"line 997.\nLINE 998.\nLINE 999.\n")
+
+
+@pytest.mark.asyncio
+async def test_read_lines(temp_workspace, initialized_tools):
+    """read_lines returns the requested lines through the shared line index."""
+    data = temp_workspace / "lines.txt"
+    data.write_bytes(b"".join(b"row %d\n" % i for i in range(1, 201)) + b"last")
+    os.utime(data, ns=(time.time_ns() - 10**10,) * 2)
+    func = read_tool.read_lines.fn
+    
+    assert await func(str(data), 2, 3) == "row 2\nrow 3\n"
+    assert await func(str(data), 200) == "row 200\nlast"
+    assert await func(str(data), 500) == f"No lines: {data} has 201 lines"
+    assert initialized_tools['line_indexes'].stats()["hits"] == 2
+    
+    with pytest.raises(ValueError, match="Invalid end line"):
+        await func(str(data), 5, 4)
+    with pytest.raises(SecurityError):
+        await func("/etc/passwd", 1, 1)
+
+
 # --- TC-033: Line range restriction works ---
 
 @pytest.mark.asyncio
@@ -222,7 +959,7 @@ async def test_full_validation_chain(test_file, initialized_tools):
     result = await func(str(test_file), "s/world/universe/", "universe")
     
     assert "Successfully" in result
-    assert test_file.read_text() != Path(f"{test_file}.bak").read_text()
+    assert test_file.read_bytes() != _backup_content(test_file)
 
 
 # --- Error propagation tests ---
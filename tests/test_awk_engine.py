@@ -0,0 +1,173 @@
+"""Unit tests for the in-process AWK engine, with parity checks against awk."""
+
+import shutil
+import subprocess
+
+import pytest
+from sed_awk_mcp.platform.awk_engine import (
+    AwkProgram, UnsupportedAwkError, compile_program, special_patterns
+)
+
+
+AWK = shutil.which('awk')
+
+requires_awk = pytest.mark.skipif(not AWK, reason="parity tests need an awk binary")
+
+SAMPLE = (
+    "name age city\n"
+    "alice 30 NYC\n"
+    "bob 25 LA\n"
+    "\n"
+    "  carol\t41   Paris  \n"
+    "dave 3.5e1 Rome\n"
+    "eve -7 x\n"
+).encode('utf-8')
+
+CSV = b"id,score,tag\n1,10,a\n2,,b\n3,7.25,a\n4,abc,\n"
+
+PARITY_PROGRAMS = [
+    ('{print}', None), ('{print $1}', None), ('{print $2, $1}', None),
+    ('{print NF, NR, $NF}', None), ('NR > 1 {print $2 + 1}', None),
+    ('NF && $2 > 26', None), ('$2 >= "3"', None), ('/o/', None), ('!/a/ {print NR}', None),
+    ('$1 ~ /^[a-c]/ {print $1}', None), ('$3 !~ "A" {print $3}', None),
+    ('{s += $2} END {print s, s / NR}', None), ('{print length($1), length}', None),
+    ('{print toupper(substr($1, 2, 3))}', None), ('{print index($0, "o")}', None),
+    ('{printf "%-6s|%5.1f|%d\\n", $1, $2, $2}', None), ('{print $1 "-" $3}', None),
+    ('BEGIN {OFS = ":"} {print $1, $2}', None), ('END {print NR, $0}', None),
+    ('{n++} $2 == 25 {exit} END {print n}', None), ('NR % 2 {next} {print NR}', None),
+    ('NF {x = $2 > 20 ? "old" : "young"; print x}', None), ('NF {print -$2, !$2, $2 ^ 2}', None),
+    ('NF {print int($2 / 7), $2 % 7}', None), ('{print sprintf("%05.1f", $2)}', None),
+    ('BEGIN {print 1 / 3, 100000 * 3, 0.1 + 0.2}', None),
+    ('{print $1, $2}', ','), ('$2 > 5 {print $1}', ','), ('{t += $2} END {print t}', ','),
+    ('{print NF}', ','), ('{print $2 == 0, $2 == ""}', ','),
+    ('BEGIN {FS = ","} {print $3}', None), ('{print $2}', '\\t'), ('{print $1}', 'a'),
+]
+
+
+def _awk(program: str, field_separator, data: bytes) -> bytes:
+    args = [AWK] + (['-F', field_separator] if field_separator else []) + [program]
+    return subprocess.run(args, input=data, capture_output=True, check=True).stdout
+
+
+class TestAwkEngineParity:
+    """Output of the engine must match the awk binary byte for byte."""
+
+    @requires_awk
+    @pytest.mark.parametrize("program, field_separator", PARITY_PROGRAMS)
+    def test_program_parity(self, program, field_separator):
+        """Supported programs produce the same output as awk."""
+        compiled = compile_program(program, field_separator)
+        if compiled is None:
+            pytest.skip("program needs the awk binary")
+        data = CSV if field_separator == ',' or 'FS' in program else SAMPLE
+        try:
+            output = compiled.run(data)
+        except UnsupportedAwkError:
+            pytest.skip("input needs the awk binary")
+        assert output == _awk(program, field_separator, data)
+
+    @requires_awk
+    def test_randomized_parity(self):
+        """Randomly composed expressions agree with awk whenever supported."""
+        import random
+        rng = random.Random(4321)
+        operands = ['$1', '$2', '$3', 'NR', 'NF', 'x', '"10"', '"abc"', '3', '0.5', '""']
+        operators = [' + ', ' - ', ' * ', ' ', ' < ', ' == ', ' != ', ' && ', ' || ', ' % ']
+        data = b"3 abc 10\n-2 7 x\n0 0.5 1e2\n 12 12.0 b\n\nq 5 5\n"
+
+        compared = 0
+        for _ in range(200):
+            expr = rng.choice(operands)
+            for _ in range(rng.randint(1, 3)):
+                expr = f"({expr}{rng.choice(operators)}{rng.choice(operands)})"
+            program = f"{{x = x + NR; print {expr}}}"
+            compiled = compile_program(program)
+            if compiled is None:
+                continue
+            try:
+                output = compiled.run(data)
+            except UnsupportedAwkError:
+                continue
+            assert output == _awk(program, None, data), program
+            compared += 1
+        assert compared > 100
+
+
+class TestAwkEngine:
+    """Behaviour of the engine independent of the awk binary."""
+
+    def test_field_extraction(self):
+        """Fields are split on runs of blanks by default."""
+        assert compile_program('{print $2}').run(b"a  b\tc\n d e\n") == b"b\ne\n"
+
+    def test_field_separator_option(self):
+        """A field separator passed like -F is honoured."""
+        assert compile_program('{print $2}', ',').run(b"a,b,c\n") == b"b\n"
+
+    def test_begin_and_end_without_input(self):
+        """BEGIN and END run even for empty input."""
+        program = compile_program('BEGIN {print "start"} END {print NR}')
+        assert program.run(b"") == b"start\n0\n"
+
+    def test_bytes_pass_through(self):
+        """Non-UTF-8 input is carried through unchanged."""
+        assert compile_program('{print $1}').run(b"caf\xe9 1\n") == b"caf\xe9\n"
+
+    def test_run_file(self, tmp_path):
+        """run_file() reads the file content."""
+        target = tmp_path / "input.txt"
+        target.write_bytes(b"1\n2\n3\n")
+        assert compile_program('{s += $1} END {print s}').run_file(target) == b"6\n"
+
+    def test_output_limit(self):
+        """Output past max_output is reported as needing the binary."""
+        with pytest.raises(UnsupportedAwkError):
+            compile_program('{print}').run(b"x" * 100 + b"\n", max_output=10)
+
+    @pytest.mark.parametrize("program", [
+        '{for (i = 1; i <= NF; i++) print $i}',   # loops
+        '{a[$1]++}',                               # arrays
+        '{print > "out.txt"}',                     # redirection
+        '{system("ls")}',                          # unsupported function
+        '{getline line}',                          # getline
+        'function f(x) {return x} {print f($1)}',  # user functions
+        '{print $1 | "sort"}',                     # pipes
+        '{print FILENAME}',                        # unsupported variable
+        '/a/,/b/ {print}',                         # range patterns
+        '{$1 = "x"; print}',                       # field assignment
+        '{print',                                  # syntax error
+    ])
+    def test_unsupported_programs_fall_back(self, program):
+        """Programs outside the supported subset compile to None."""
+        assert compile_program(program) is None
+
+    @pytest.mark.parametrize("program, data", [
+        ('{print $1 + 0}', b"0x1A\n"),            # hex strings convert differently
+        ('{print $1 * 1}', b"3000000000\n"),      # large integer formatting
+        ('{print substr($1, 0)}', b"abc\n"),      # implementation-defined start
+        ('{exit 2}', b"x\n"),                     # non-zero exit status
+    ])
+    def test_divergent_input_is_unsupported(self, program, data):
+        """Runs whose result differs across awk implementations raise."""
+        with pytest.raises(UnsupportedAwkError):
+            compile_program(program).run(data)
+
+    def test_compiled_programs_are_cached(self):
+        """compile_program() returns the cached instance for a repeated program."""
+        assert compile_program('{print "cache"}') is compile_program('{print "cache"}')
+
+    def test_constructor_raises_for_unsupported(self):
+        """AwkProgram raises UnsupportedAwkError with a message."""
+        with pytest.raises(UnsupportedAwkError) as exc_info:
+            AwkProgram('{while (1) x++}')
+        assert exc_info.value.message
+
+    @pytest.mark.parametrize("program,patterns", [
+        ('BEGIN {FS = ","} {n++} END {print n}', {'BEGIN', 'END'}),
+        ('/^END$/ {print "BEGIN"}', set()),
+        ('{s[$1] += $2} END {for (k in s) print k, s[k]}', {'END'}),
+        ('{print 0x1}', None),
+    ])
+    def test_special_patterns(self, program, patterns):
+        """BEGIN and END are found as patterns, not inside strings or regexes."""
+        assert special_patterns(program) == patterns
@@ -0,0 +1,113 @@
+"""Unit tests for sharded awk runs: shard planning, feeding and combiners."""
+
+import os
+import threading
+
+import pytest
+from sed_awk_mcp.platform import awk_shards
+from sed_awk_mcp.platform.awk_shards import CombineError, combine, feed_shard, plan_shards
+
+
+def _inputs(tmp_path, *contents):
+    """Write input files and return their paths and sizes."""
+    paths = []
+    for i, content in enumerate(contents):
+        path = tmp_path / f"in{i}.txt"
+        path.write_bytes(content)
+        paths.append(path)
+    return paths, [len(c) for c in contents]
+
+
+def _fed(paths, shard):
+    """Bytes a shard writes to its pipe."""
+    read_fd, write_fd = os.pipe()
+    feeder = threading.Thread(target=feed_shard, args=(paths, shard, write_fd))
+    feeder.start()
+    with os.fdopen(read_fd, 'rb') as reader:
+        data = reader.read()
+    feeder.join()
+    return data
+
+
+class TestPlanShards:
+    """Shards cover the input stream exactly and end at line boundaries."""
+    
+    @pytest.mark.parametrize("count", [1, 2, 3, 7, 50])
+    def test_shards_are_line_aligned(self, tmp_path, monkeypatch, count):
+        """Every shard holds whole lines, and together they hold the input."""
+        monkeypatch.setattr(awk_shards, "SCAN_BYTES", 5)
+        content = b"".join(b"line %d %s\n" % (i, b"x" * (i % 13)) for i in range(40))
+        paths, sizes = _inputs(tmp_path, content)
+        
+        shards = plan_shards(paths, sizes, count)
+        fed = [_fed(paths, shard) for shard in shards]
+        assert 1 <= len(shards) <= count
+        assert b"".join(fed) == content
+        assert all(part.endswith(b"\n") for part in fed)
+    
+    def test_inputs_join_on_line_breaks(self, tmp_path):
+        """An input without a final newline gets one before the next input."""
+        paths, sizes = _inputs(tmp_path, b"a\nb", b"", b"c\nd")
+        shards = plan_shards(paths, sizes, 2)
+        assert b"".join(_fed(paths, shard) for shard in shards) == b"a\nb\nc\nd"
+    
+    def test_long_line_and_empty_input(self, tmp_path):
+        """Cut points inside one line collapse; empty input is one empty shard."""
+        paths, sizes = _inputs(tmp_path, b"x" * 100 + b"\n")
+        assert len(plan_shards(paths, sizes, 8)) == 1
+        
+        paths, sizes = _inputs(tmp_path, b"")
+        shards = plan_shards(paths, sizes, 4)
+        assert len(shards) == 1 and shards[0].size == 0
+    
+    def test_early_reader_exit_is_not_an_error(self, tmp_path):
+        """A reader that closes the pipe stops the feeder quietly."""
+        paths, sizes = _inputs(tmp_path, b"line\n" * 100000)
+        read_fd, write_fd = os.pipe()
+        os.close(read_fd)
+        feed_shard(paths, plan_shards(paths, sizes, 1)[0], write_fd)
+
+
+class TestCombine:
+    """Combiners merge shard outputs in shard order."""
+    
+    def test_concat_and_count(self):
+        outputs = [b"a\nb\n", b"", b"c"]
+        assert combine("concat", outputs) == b"a\nb\nc"
+        assert combine("count", outputs) == b"3\n"
+    
+    def test_fieldwise_aggregates(self):
+        """Numbers combine by position; labels and blank shards pass through."""
+        outputs = [b"total 3 1.5\nmax 9\n", b"", b"total 4 2\nmax 12\n"]
+        assert combine("sum", outputs) == b"total 7 3.5\nmax 21\n"
+        assert combine("min", outputs) == b"total 3 1.5\nmax 9\n"
+        assert combine("max", [b"\n", b"5\n"]) == b"5\n"
+        assert combine("sum", [b"%d\n" % 2 ** 60] * 3) == b"%d\n" % (3 * 2 ** 60)
+    
+    @pytest.mark.parametrize("combiner,expected", [
+        ("sum", b"total 4950 7\n"), ("min", b"total 450 2\n"), ("max", b"total 4500 5\n"),
+    ])
+    def test_labels_with_missing_values(self, combiner, expected):
+        """A shard without matches prints only the label; its values are left out."""
+        outputs = [b"total \n", b"total 450 2\n", b"total\n", b"total 4500 5\n"]
+        assert combine(combiner, outputs) == expected
+    
+    def test_sum_by_key(self):
+        """Values are summed per key; keys keep their first order and spacing."""
+        outputs = [b"GET /a 2\nPOST 1\n", b"POST 4\nGET /a\t3\nPUT 0.5\n"]
+        assert combine("sum_by_key", outputs) == b"GET /a 5\nPOST 5\nPUT 0.5\n"
+    
+    @pytest.mark.parametrize("combiner,outputs,match", [
+        ("sum", [b"1\n2\n", b"3\n"], "numbers of lines"),
+        ("sum", [b"a 1\n", b"b 2\n"], "neither numeric"),
+        ("max", [b"1 2\n", b"3\n"], "numbers of fields"),
+        ("sum", [b"total 1\n", b"count\n"], "numbers of fields"),
+        ("sum_by_key", [b"key value\n"], "numeric value"),
+    ])
+    def test_mismatched_outputs_raise(self, combiner, outputs, match):
+        with pytest.raises(CombineError, match=match):
+            combine(combiner, outputs)
+    
+    def test_unknown_combiner(self):
+        with pytest.raises(ValueError, match="Unknown combiner"):
+            combine("avg", [b"1\n"])
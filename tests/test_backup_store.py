@@ -0,0 +1,150 @@
+"""Unit tests for the content-addressed backup store."""
+
+import os
+import stat
+import time
+
+import pytest
+from sed_awk_mcp.platform.backup_store import BackupStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Store in a private directory."""
+    return BackupStore(tmp_path / "backups")
+
+
+@pytest.fixture
+def target(tmp_path):
+    """File with restrictive permissions and an old modification time."""
+    path = tmp_path / "notes.txt"
+    path.write_bytes(b"first\n" * 100)
+    path.chmod(0o640)
+    os.utime(path, (time.time() - 60, time.time() - 60))
+    return path
+
+
+def _objects(store):
+    """Object files currently stored."""
+    return sorted(p for p in store.objects_dir.glob('*/*'))
+
+
+class TestBackupStore:
+    """BackupStore keeps one compressed object per distinct content."""
+    
+    def test_backup_and_restore(self, store, target):
+        """A restore brings back content and permission bits atomically."""
+        record, deduplicated = store.backup(target)
+        assert not deduplicated
+        assert record.path == str(target) and record.size == 600
+        assert store.read(record) == b"first\n" * 100
+        assert _objects(store)[0].stat().st_size < 600
+        
+        target.write_bytes(b"second\n")
+        target.chmod(0o600)
+        store.restore(record)
+        assert target.read_bytes() == b"first\n" * 100
+        assert stat.S_IMODE(target.stat().st_mode) == 0o640
+        assert sorted(p.name for p in target.parent.iterdir()) == ["backups", "notes.txt"]
+    
+    def test_identical_content_is_stored_once(self, store, target, tmp_path):
+        """Backups of the same content, in any file, share one object."""
+        first, _ = store.backup(target)
+        copy = tmp_path / "copy.txt"
+        copy.write_bytes(target.read_bytes())
+        second, deduplicated = store.backup(copy)
+        
+        assert deduplicated and second.digest == first.digest
+        assert len(_objects(store)) == 1
+        assert store.stats()["deduplicated"] == 1
+        assert store.latest(copy) is second and store.latest(target) is first
+    
+    def test_unchanged_file_is_not_reread(self, store, target, monkeypatch):
+        """A file whose identity matches its last backup is not hashed again."""
+        store.backup(target)
+        
+        def no_write(f):
+            raise AssertionError("unchanged file was read")
+        monkeypatch.setattr(store, "_write_object", no_write)
+        
+        _, deduplicated = store.backup(target)
+        assert deduplicated and len(store) == 2
+    
+    def test_object_outlives_all_but_last_backup(self, store, target):
+        """Removing a backup deletes its object only when no other uses it."""
+        first, _ = store.backup(target)
+        second, _ = store.backup(target)
+        
+        assert store.remove(first.id)
+        assert len(_objects(store)) == 1 and store.read(second) == b"first\n" * 100
+        assert store.remove(second.id)
+        assert _objects(store) == [] and not store.remove(second.id)
+    
+    def test_collection_by_age_and_size(self, tmp_path, target):
+        """Old backups expire; the oldest go first beyond max_bytes."""
+        store = BackupStore(tmp_path / "backups", max_age=3600)
+        old, _ = store.backup(target)
+        old.created -= 3601
+        assert store.collect() == 1 and store.find(old.id) is None
+        
+        store = BackupStore(tmp_path / "bounded", max_bytes=1)
+        first, _ = store.backup(target)
+        target.write_bytes(b"other\n")
+        second, _ = store.backup(target)
+        assert store.find(first.id) is None
+        assert store.find(second.id) is second
+        assert store.stats()["collected"] == 1
+    
+    def test_reload_keeps_backups_and_drops_orphans(self, store, target):
+        """A new store reads the catalog and deletes unreferenced objects."""
+        record, _ = store.backup(target)
+        orphan = store.objects_dir / "ff" / "orphan.z"
+        orphan.parent.mkdir()
+        orphan.write_bytes(b"")
+        (store.objects_dir / ".partial.tmp").write_bytes(b"")
+        
+        reloaded = BackupStore(store.directory)
+        assert reloaded.find(record.id).digest == record.digest
+        assert reloaded.read(reloaded.find(record.id)) == b"first\n" * 100
+        assert _objects(reloaded) == _objects(store)[:1]
+        assert not orphan.exists()
+        assert not (store.objects_dir / ".partial.tmp").exists()
+    
+    @pytest.mark.parametrize("content", [b"{not json", b'[{"id": "x"}]'])
+    def test_unreadable_catalog_keeps_objects(self, store, target, content):
+        """An unreadable catalog is set aside with the objects, not collected."""
+        store.backup(target)
+        objects = [p.read_bytes() for p in _objects(store)]
+        (store.directory / "catalog.json").write_bytes(content)
+        
+        reloaded = BackupStore(store.directory)
+        assert len(reloaded) == 0
+        aside, = store.directory.glob("unreadable-*")
+        assert (aside / "catalog.json").read_bytes() == content
+        assert [p.read_bytes() for p in sorted(aside.glob("objects/*/*"))] == objects
+        
+        record, _ = reloaded.backup(target)
+        assert BackupStore(store.directory).find(record.id).digest == record.digest
+        assert [p.read_bytes() for p in sorted(aside.glob("objects/*/*"))] == objects
+    
+    def test_corrupt_object_is_not_restored(self, store, target):
+        """A damaged object raises instead of overwriting the file."""
+        record, _ = store.backup(target)
+        _objects(store)[0].write_bytes(b"not zlib")
+        target.write_bytes(b"current\n")
+        
+        with pytest.raises(OSError, match="corrupt"):
+            store.restore(record)
+        assert target.read_bytes() == b"current\n"
+        assert sorted(p.name for p in target.parent.iterdir()) == ["backups", "notes.txt"]
+    
+    def test_from_env(self, tmp_path):
+        """Store settings are read from the environment."""
+        store = BackupStore.from_env({
+            "SED_AWK_BACKUP_DIR": str(tmp_path),
+            "SED_AWK_BACKUP_COMPRESSION": "9",
+        })
+        assert store.directory == tmp_path and store.level == 9
+        assert store.max_bytes == BackupStore.DEFAULT_MAX_BYTES
+        with pytest.raises(ValueError, match="SED_AWK_BACKUP_MAX_AGE"):
+            BackupStore.from_env({"SED_AWK_BACKUP_MAX_AGE": "week"})
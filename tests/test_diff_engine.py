@@ -0,0 +1,187 @@
+"""Unit tests for the in-process diff engine, with parity checks against GNU diff."""
+
+import random
+import shutil
+import subprocess
+
+import pytest
+from sed_awk_mcp.platform.diff_engine import (
+    UnsupportedDiffError, diff_files, file_label, stream_line_diff, unified_diff
+)
+
+
+DIFF = shutil.which('diff')
+
+
+def _is_gnu_diff() -> bool:
+    if not DIFF:
+        return False
+    result = subprocess.run([DIFF, '--version'], capture_output=True, text=True)
+    return 'GNU diffutils' in result.stdout
+
+
+requires_gnu_diff = pytest.mark.skipif(
+    not _is_gnu_diff(), reason="parity tests need GNU diff"
+)
+
+PARITY_CASES = [
+    ("a\nb\nc\n", "a\nB\nc\n"),
+    ("a\nb\nc\n", "a\nb\nc\nd\n"),
+    ("a\nb\nc\n", "b\nc\n"),
+    ("", "new\n"),
+    ("old\n", ""),
+    ("a\nb", "a\nb\n"),
+    ("a\nb", "a\nc"),
+    ("a\n", "a"),
+    ("x\n" * 20 + "a\n" + "x\n" * 20, "x\n" * 20 + "b\n" + "x\n" * 20),
+    ("a\nb\na\nb\na\n", "b\na\nb\na\nb\n"),
+    ("1\n2\n3\n4\n5\n6\n7\n8\n9\n10\n", "1\n2\nX\n4\n5\n6\n7\n8\nY\n10\n"),
+    ("a b\n c\nd\t\n", "a  b\nc\nd\n"),
+]
+
+
+def _gnu_diff(tmp_path, old: str, new: str, context: int = 3, ignore_whitespace: bool = False):
+    (tmp_path / "old").write_text(old)
+    (tmp_path / "new").write_text(new)
+    args = [DIFF, '-u' if context == 3 else f'-U{context}']
+    if ignore_whitespace:
+        args.append('-w')
+    args += ['old', 'new']
+    expected = subprocess.run(args, capture_output=True, cwd=tmp_path).stdout
+    return expected
+
+
+class TestDiffEngineParity:
+    """Output of the engine must match GNU diff byte for byte."""
+
+    @requires_gnu_diff
+    @pytest.mark.parametrize("old, new", PARITY_CASES)
+    @pytest.mark.parametrize("context, ignore_whitespace", [(3, False), (0, False), (1, True)])
+    def test_case_parity(self, tmp_path, monkeypatch, old, new, context, ignore_whitespace):
+        """Known edge cases produce the same output as diff."""
+        expected = _gnu_diff(tmp_path, old, new, context, ignore_whitespace)
+        monkeypatch.chdir(tmp_path)
+        assert diff_files('old', 'new', context, ignore_whitespace) == expected
+
+    @requires_gnu_diff
+    def test_randomized_parity(self, tmp_path, monkeypatch):
+        """Random edits of small-alphabet files agree with diff."""
+        rng = random.Random(2024)
+        alphabet = ['a', 'b', 'c', '', ' a', 'a b', '1', '2']
+        monkeypatch.chdir(tmp_path)
+
+        for _ in range(150):
+            old = [rng.choice(alphabet) + '\n' for _ in range(rng.choice([0, 5, 40, 300]))]
+            new = list(old)
+            for _ in range(rng.randint(1, 6)):
+                pos = rng.randint(0, len(new))
+                if rng.random() < 0.5:
+                    new[pos:pos] = [rng.choice(alphabet) + '\n' for _ in range(rng.randint(1, 4))]
+                else:
+                    del new[pos:pos + rng.randint(1, 4)]
+            context = rng.choice([0, 2, 3])
+            ignore_whitespace = rng.random() < 0.3
+            expected = _gnu_diff(tmp_path, ''.join(old), ''.join(new), context, ignore_whitespace)
+            got = diff_files('old', 'new', context, ignore_whitespace)
+            assert got == expected, (old, new, context, ignore_whitespace)
+
+
+class TestDiffEngine:
+    """Behaviour of the engine independent of the diff binary."""
+
+    def test_identical_content(self):
+        """Equal inputs produce no output."""
+        assert unified_diff(b"a\n", b"a\n", b"x", b"y") == b""
+
+    def test_hunk_format(self):
+        """Changes are reported as a unified hunk with context."""
+        output = unified_diff(b"a\nb\nc\n", b"a\nB\nc\n", b"old", b"new")
+        assert output == b"--- old\n+++ new\n@@ -1,3 +1,3 @@\n a\n-b\n+B\n c\n"
+
+    def test_missing_newline_marker(self):
+        """A last line without newline is flagged as in diff."""
+        output = unified_diff(b"a\n", b"a", b"old", b"new")
+        assert output.endswith(b"+a\n\\ No newline at end of file\n")
+
+    def test_whitespace_only_changes_ignored(self):
+        """With ignore_whitespace, whitespace-only edits are not differences."""
+        assert unified_diff(b"a b\n", b"a  b \n", b"x", b"y", ignore_whitespace=True) == b""
+
+    def test_file_label(self):
+        """Labels hold the name and a full-precision local timestamp."""
+        label = file_label('dir/file.txt', 1_700_000_000_123_456_789)
+        name, stamp = label.split(b'\t')
+        assert name == b'dir/file.txt'
+        assert stamp.split(b' ')[1].endswith(b'.123456789')
+
+    def test_file_label_quotes_special_names(self):
+        """Names with blanks or quotes are C-quoted like diff does."""
+        assert file_label('a b"c', 0).split(b'\t')[0] == b'"a b\\"c"'
+        with pytest.raises(UnsupportedDiffError):
+            file_label('café', 0)
+
+    def test_binary_input_is_unsupported(self):
+        """NUL bytes are left to the diff binary."""
+        with pytest.raises(UnsupportedDiffError):
+            unified_diff(b"a\0b\n", b"a\n", b"x", b"y")
+
+    def test_size_limit(self, tmp_path):
+        """Inputs above max_size are handed back to the binary unread."""
+        old = tmp_path / "old"
+        new = tmp_path / "new"
+        old.write_bytes(b"a\n" * 100)
+        new.write_bytes(b"b\n" * 100)
+        with pytest.raises(UnsupportedDiffError):
+            diff_files(old, new, max_size=100)
+        assert diff_files(old, new, max_size=None)
+
+    def test_work_budget(self):
+        """Comparisons exceeding the work budget are abandoned."""
+        rng = random.Random(7)
+        old = b"".join(rng.choice([b"a\n", b"b\n"]) for _ in range(2000))
+        new = b"".join(rng.choice([b"a\n", b"b\n"]) for _ in range(2000))
+        with pytest.raises(UnsupportedDiffError):
+            unified_diff(old, new, b"x", b"y", max_size=None, max_work=1000)
+
+
+class TestStreamLineDiff:
+    """Line-by-line streaming comparison of files with equal line counts."""
+
+    @requires_gnu_diff
+    @pytest.mark.parametrize("context", [0, 1, 3])
+    def test_parity_for_substitutions(self, tmp_path, context):
+        """Substituted distinct lines are reported exactly as GNU diff does."""
+        rng = random.Random(context)
+        for _ in range(30):
+            old = [f"line {i}\n" for i in range(rng.randint(0, 80))]
+            new = [line.upper() if rng.random() < 0.15 else line for line in old]
+            if old and rng.random() < 0.3:
+                new[-1] = new[-1].rstrip("\n")
+            expected = _gnu_diff(tmp_path, "".join(old), "".join(new), context)
+            output, truncated = stream_line_diff(
+                tmp_path / "old", tmp_path / "new", b"old", b"new", context
+            )
+            assert not truncated
+            assert output.split(b"\n", 2)[2:] == expected.split(b"\n", 2)[2:]
+
+    def test_output_cap(self, tmp_path):
+        """Hunks beyond max_output are dropped and flagged."""
+        (tmp_path / "old").write_bytes(b"a\n" * 1000)
+        (tmp_path / "new").write_bytes(b"b\n" * 1000)
+        output, truncated = stream_line_diff(
+            tmp_path / "old", tmp_path / "new", b"x", b"y", max_output=100
+        )
+        assert truncated
+        assert len(output) <= 100
+
+    @pytest.mark.parametrize("old, new", [
+        (b"a\nb\n", b"a\n"),
+        (b"a\n", b"a\0\n"),
+    ])
+    def test_unsupported_inputs(self, tmp_path, old, new):
+        """Line insertions or deletions and binary data need the diff binary."""
+        (tmp_path / "old").write_bytes(old)
+        (tmp_path / "new").write_bytes(new)
+        with pytest.raises(UnsupportedDiffError):
+            stream_line_diff(tmp_path / "old", tmp_path / "new", b"x", b"y")
+
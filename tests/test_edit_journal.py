@@ -0,0 +1,205 @@
+"""Unit tests for transactional edit sessions and their journal."""
+
+import json
+import os
+import stat
+
+import pytest
+from sed_awk_mcp.platform import edit_journal as journal_module
+from sed_awk_mcp.platform.edit_journal import EditJournal, EditSessionError
+from sed_awk_mcp.platform.fileops import sibling_temp
+from sed_awk_mcp.platform.preview_store import file_identity
+
+COMMANDS = ('s/a/b/',)
+
+
+@pytest.fixture
+def journal(tmp_path):
+    """Journal in a private directory."""
+    return EditJournal(tmp_path / "journal")
+
+
+@pytest.fixture
+def targets(tmp_path):
+    """Two files in different directories."""
+    (tmp_path / "one").mkdir()
+    (tmp_path / "two").mkdir()
+    first = tmp_path / "one" / "first.txt"
+    second = tmp_path / "two" / "second.txt"
+    first.write_bytes(b"a1\n")
+    second.write_bytes(b"a2\n")
+    first.chmod(0o640)
+    return first, second
+
+
+def _stage(journal, session, target, content):
+    """Stage content for target the way session_substitute does."""
+    identity = file_identity(target)
+    entry = session.files.get(str(target))
+    if entry is not None:
+        identity = entry.identity
+    fd, staged = sibling_temp(target)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+    return journal.record(session, target, identity, staged, COMMANDS, 1)
+
+
+def _leftovers(*directories):
+    """Hidden files (staged copies, undo links) left in the directories."""
+    return sorted(p.name for d in directories for p in d.iterdir() if p.name.startswith('.'))
+
+
+class TestEditJournal:
+    """EditJournal commits staged files together or not at all."""
+    
+    def test_commit_replaces_all_files(self, journal, targets):
+        """All targets are replaced; no staged file, undo link or journal remains."""
+        first, second = targets
+        session = journal.begin()
+        _stage(journal, session, first, b"b1\n")
+        entry = _stage(journal, session, first, b"c1\n")
+        _stage(journal, session, second, b"b2\n")
+        assert len(entry.operations) == 2 and entry.substitutions == 2
+        assert first.read_bytes() == b"a1\n"
+        assert len(list(journal.directory.iterdir())) == 1
+        
+        committed = journal.commit(session)
+        assert [e.target for e in committed] == [first, second]
+        assert first.read_bytes() == b"c1\n" and second.read_bytes() == b"b2\n"
+        assert stat.S_IMODE(first.stat().st_mode) == 0o640
+        assert _leftovers(first.parent, second.parent) == []
+        assert list(journal.directory.iterdir()) == []
+        assert len(journal) == 0 and journal.stats()["commits"] == 1
+    
+    def test_changed_target_aborts_commit(self, journal, targets):
+        """A file edited after staging stops the whole commit."""
+        first, second = targets
+        session = journal.begin()
+        _stage(journal, session, first, b"b1\n")
+        _stage(journal, session, second, b"b2\n")
+        second.write_bytes(b"edited\n")
+        
+        with pytest.raises(EditSessionError, match="second.txt"):
+            journal.commit(session)
+        assert first.read_bytes() == b"a1\n" and second.read_bytes() == b"edited\n"
+        assert _leftovers(first.parent, second.parent) == []
+        assert len(journal) == 0
+    
+    def test_failed_rename_restores_earlier_files(self, journal, targets, monkeypatch):
+        """A commit failing part way puts back the files already replaced."""
+        first, second = targets
+        session = journal.begin()
+        _stage(journal, session, first, b"b1\n")
+        _stage(journal, session, second, b"b2\n")
+        
+        real_replace = os.replace
+        
+        def failing_replace(src, dst):
+            if str(dst) == str(second) and str(src).endswith('.tmp'):
+                raise OSError("disk full")
+            return real_replace(src, dst)
+        monkeypatch.setattr(journal_module.os, "replace", failing_replace)
+        
+        with pytest.raises(OSError, match="disk full"):
+            journal.commit(session)
+        monkeypatch.setattr(journal_module.os, "replace", real_replace)
+        assert first.read_bytes() == b"a1\n" and second.read_bytes() == b"a2\n"
+        assert _leftovers(first.parent, second.parent) == []
+        assert list(journal.directory.iterdir()) == []
+    
+    def test_rollback_discards_staged_files(self, journal, targets):
+        """Rolling back deletes the staged copies and ends the session."""
+        first, second = targets
+        session = journal.begin()
+        _stage(journal, session, first, b"b1\n")
+        
+        assert journal.rollback(session) == 1
+        assert first.read_bytes() == b"a1\n"
+        assert _leftovers(first.parent) == []
+        with pytest.raises(EditSessionError, match="Unknown or expired"):
+            journal.checkout(session.id)
+    
+    def test_checkout_is_exclusive_and_sessions_are_bounded(self, tmp_path, targets):
+        """One call at a time may use a session; open sessions are capped."""
+        journal = EditJournal(tmp_path / "journal", max_sessions=1)
+        session = journal.begin()
+        with pytest.raises(EditSessionError, match="sessions are open"):
+            journal.begin()
+        
+        journal.checkout(session.id)
+        with pytest.raises(EditSessionError, match="in use"):
+            journal.checkout(session.id)
+        journal.release(session)
+        assert journal.checkout(session.id) is session
+    
+    def test_expired_session_is_rolled_back(self, tmp_path, targets):
+        """Sessions past their TTL are discarded on the next begin()."""
+        journal = EditJournal(tmp_path / "journal", ttl=60)
+        first, _ = targets
+        session = journal.begin()
+        _stage(journal, session, first, b"b1\n")
+        session.created -= 61
+        
+        journal.begin()
+        assert session.id not in journal._sessions
+        assert _leftovers(first.parent) == []
+        assert journal.stats()["expirations"] == 1
+
+
+class TestRecovery:
+    """recover() completes or undoes sessions left behind by a stopped server."""
+    
+    def _crash(self, journal, targets, state, renamed):
+        """Leave the on-disk state of a commit interrupted after some renames."""
+        session = journal.begin()
+        entries = [_stage(journal, session, t, b"new " + t.read_bytes()) for t in targets]
+        for entry in entries:
+            os.link(entry.target, entry.undo)
+        journal._write_journal(session.id, state, entries, sync=True)
+        for entry in entries[:renamed]:
+            os.replace(entry.staged, entry.target)
+        return session.id
+    
+    def test_prepared_commit_is_undone(self, tmp_path, journal, targets):
+        """A commit stopped before its commit point leaves every original in place."""
+        first, second = targets
+        session_id = self._crash(journal, targets, journal_module.STATE_PREPARED, renamed=1)
+        assert first.read_bytes() == b"new a1\n"
+        
+        restarted = EditJournal(journal.directory)
+        assert restarted.recover() == [(session_id, "prepared")]
+        assert first.read_bytes() == b"a1\n" and second.read_bytes() == b"a2\n"
+        assert _leftovers(first.parent, second.parent) == []
+        assert list(journal.directory.iterdir()) == []
+    
+    def test_committed_session_is_completed(self, journal, targets):
+        """A commit past its commit point keeps the new content and drops the links."""
+        first, second = targets
+        self._crash(journal, targets, journal_module.STATE_COMMITTED, renamed=2)
+        
+        EditJournal(journal.directory).recover()
+        assert first.read_bytes() == b"new a1\n" and second.read_bytes() == b"new a2\n"
+        assert _leftovers(first.parent, second.parent) == []
+    
+    def test_open_session_staged_files_are_removed(self, journal, targets):
+        """Staged files of a session that never committed are deleted."""
+        first, _ = targets
+        session = journal.begin()
+        _stage(journal, session, first, b"b1\n")
+        record = json.loads((journal.directory / f"{session.id}.journal").read_text())
+        assert record["state"] == "open"
+        
+        assert EditJournal(journal.directory).recover() == [(session.id, "open")]
+        assert first.read_bytes() == b"a1\n"
+        assert _leftovers(first.parent) == []
+    
+    def test_from_env(self, tmp_path):
+        """Journal settings are read from the environment."""
+        journal = EditJournal.from_env({
+            "SED_AWK_JOURNAL_DIR": str(tmp_path),
+            "SED_AWK_MAX_EDIT_SESSIONS": "3",
+        })
+        assert journal.directory == tmp_path and journal.max_sessions == 3
+        assert journal.ttl == EditJournal.DEFAULT_TTL
+        with pytest.raises(ValueError, match="SED_AWK_EDIT_SESSION_TTL"):
+            EditJournal.from_env({"SED_AWK_EDIT_SESSION_TTL": "soon"})
@@ -0,0 +1,120 @@
+"""Unit tests for atomic replacement and backup copies."""
+
+import errno
+import os
+
+import pytest
+from sed_awk_mcp.platform import fileops
+from sed_awk_mcp.platform.fileops import (
+    copy_file, expand_glob, files_equal, replace_with, restore_file, sibling_temp, write_atomic
+)
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "data.txt"
+    path.write_bytes(b"line\n" * 1000)
+    os.chmod(path, 0o640)
+    os.utime(path, ns=(1_600_000_000_000_000_000, 1_600_000_000_123_456_789))
+    return path
+
+
+class TestCopyFile:
+    """copy_file() produces a full copy with metadata by any method."""
+    
+    def test_copy_preserves_content_and_metadata(self, source, tmp_path):
+        """Content, permission bits and modification time are copied."""
+        backup = tmp_path / "data.txt.bak"
+        method = copy_file(source, backup)
+        
+        assert method in (fileops.COPY_REFLINK, fileops.COPY_FILE_RANGE, fileops.COPY_STREAM)
+        assert backup.read_bytes() == source.read_bytes()
+        assert backup.stat().st_mode == source.stat().st_mode
+        assert backup.stat().st_mtime_ns == source.stat().st_mtime_ns
+        assert os.stat(backup).st_ino != os.stat(source).st_ino
+    
+    def test_falls_back_to_streamed_copy(self, source, tmp_path, monkeypatch):
+        """Without reflink or copy_file_range support the data is streamed."""
+        def unsupported(*args):
+            raise OSError(errno.EXDEV, "not supported")
+        
+        monkeypatch.setattr(fileops.fcntl, "ioctl", unsupported)
+        monkeypatch.setattr(os, "copy_file_range", unsupported, raising=False)
+        backup = tmp_path / "data.txt.bak"
+        backup.write_bytes(b"stale")
+        
+        assert copy_file(source, backup) == fileops.COPY_STREAM
+        assert backup.read_bytes() == source.read_bytes()
+    
+    def test_real_errors_propagate(self, source, tmp_path, monkeypatch):
+        """I/O errors are raised and leave no temporary file behind."""
+        def failing(*args):
+            raise OSError(errno.EIO, "I/O error")
+        
+        monkeypatch.setattr(fileops.fcntl, "ioctl", failing)
+        with pytest.raises(OSError):
+            copy_file(source, tmp_path / "data.txt.bak")
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["data.txt"]
+
+
+class TestReplace:
+    """write_atomic(), replace_with() and restore_file() swap files by rename."""
+    
+    def test_write_atomic_keeps_mode(self, source):
+        """The new content takes over the original's permission bits."""
+        write_atomic(source, b"new\n")
+        assert source.read_bytes() == b"new\n"
+        assert source.stat().st_mode & 0o777 == 0o640
+    
+    def test_restore_is_a_rename(self, source, tmp_path):
+        """Restoring moves the backup's inode into place."""
+        backup = tmp_path / "data.txt.bak"
+        copy_file(source, backup)
+        backup_inode = backup.stat().st_ino
+        write_atomic(source, b"edited\n")
+        
+        restore_file(backup, source)
+        
+        assert source.read_bytes() == b"line\n" * 1000
+        assert source.stat().st_ino == backup_inode
+        assert not backup.exists()
+    
+    def test_staged_file_replaces_target(self, source, tmp_path):
+        """A staging file is renamed over its target with the target's mode."""
+        fd, staged = sibling_temp(source)
+        with os.fdopen(fd, 'wb') as out:
+            out.write(b"line\n" * 999 + b"LINE\n")
+        assert staged.parent == source.parent
+        assert not files_equal(source, staged)
+        
+        replace_with(staged, source)
+        assert source.read_bytes().endswith(b"LINE\n")
+        assert source.stat().st_mode & 0o777 == 0o640
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["data.txt"]
+    
+    def test_files_equal(self, source, tmp_path, monkeypatch):
+        """Files are compared chunk by chunk."""
+        monkeypatch.setattr(fileops, "COMPARE_CHUNK_BYTES", 7)
+        copy = tmp_path / "copy.txt"
+        copy.write_bytes(source.read_bytes())
+        assert files_equal(source, copy)
+        copy.write_bytes(source.read_bytes()[:-2] + b"X\n")
+        assert not files_equal(source, copy)
+
+
+class TestExpandGlob:
+    """Glob expansion under several directories."""
+    
+    def test_relative_and_absolute_patterns(self, tmp_path):
+        """Matches are regular files, sorted and counted once."""
+        (tmp_path / "b.log").write_text("")
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "a.log").write_text("")
+        (tmp_path / "dir.log").mkdir()
+        
+        roots = [str(tmp_path), str(tmp_path)]
+        assert expand_glob("*.log", roots) == [str(tmp_path / "b.log")]
+        assert expand_glob("**/*.log", roots) == [
+            str(tmp_path / "b.log"), str(tmp_path / "sub" / "a.log")
+        ]
+        assert expand_glob(str(tmp_path / "sub" / "*"), []) == [str(tmp_path / "sub" / "a.log")]
@@ -0,0 +1,138 @@
+"""Unit tests for the line-offset index."""
+
+import os
+import time
+
+import pytest
+from sed_awk_mcp.platform import line_index
+from sed_awk_mcp.platform.line_index import LineIndex, LineIndexCache, iter_lines
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    """Use tiny blocks so short files span many of them."""
+    monkeypatch.setattr(line_index, "BLOCK_BYTES", 16)
+
+
+def _offsets(data):
+    """Start offset of every line, computed naively."""
+    offsets = [0]
+    for i, byte in enumerate(data):
+        if byte == ord("\n"):
+            offsets.append(i + 1)
+    return offsets
+
+
+def _age(path):
+    """Move a file's mtime out of the racy window."""
+    os.utime(path, ns=(time.time_ns() - 10**10,) * 2)
+
+
+class TestLineIndex:
+    """LineIndex finds the start of any line with one block read."""
+    
+    def test_offsets_match_naive_scan(self, tmp_path):
+        """Line offsets agree with a scan for lines of varied lengths."""
+        data = b"".join(b"x" * (i % 37) + b"\n" for i in range(300)) + b"tail"
+        path = tmp_path / "data.txt"
+        path.write_bytes(data)
+        offsets = _offsets(data)
+        
+        with open(path, "rb") as f:
+            index = LineIndex.build(f)
+            assert index.newlines == 300 and index.lines == 301
+            for line in range(1, 305):
+                expected = offsets[line - 1] if line <= len(offsets) else len(data)
+                assert index.line_offset(f, line) == expected
+            assert index.span(f, 10, 12) == (offsets[9], offsets[12])
+            assert index.span(f, 300) == (offsets[299], len(data))
+            assert index.span(f, 400, 500) == (len(data), len(data))
+    
+    def test_empty_file(self, tmp_path):
+        """An empty file has no lines."""
+        path = tmp_path / "empty.txt"
+        path.write_bytes(b"")
+        with open(path, "rb") as f:
+            index = LineIndex.build(f)
+            assert index.lines == 0 and index.span(f, 1, 3) == (0, 0)
+    
+    def test_extended_over_appended_data(self, tmp_path):
+        """Appends are indexed without rescanning; other rewrites are refused."""
+        path = tmp_path / "log.txt"
+        path.write_bytes(b"".join(b"entry %d\n" % i for i in range(50)))
+        with open(path, "rb") as f:
+            index = LineIndex.build(f)
+        
+        with open(path, "ab") as f:
+            f.write(b"".join(b"entry %d\n" % i for i in range(50, 80)))
+        data = path.read_bytes()
+        with open(path, "rb") as f:
+            grown = index.extended(f)
+            assert grown.newlines == 80 and index.newlines == 50
+            assert grown.line_offset(f, 70) == _offsets(data)[69]
+        
+        path.write_bytes(b"rewritten\n" + data)
+        with open(path, "rb") as f:
+            assert grown.extended(f) is None
+    
+    def test_iter_lines_splits_long_lines(self, tmp_path):
+        """iter_lines stops at the range end and caps each piece."""
+        path = tmp_path / "data.txt"
+        path.write_bytes(b"ab\n" + b"c" * 10 + b"\nd\n")
+        with open(path, "rb") as f:
+            assert list(iter_lines(f, 0, 14, 4)) == [b"ab\n", b"cccc", b"cccc", b"cc\n"]
+
+
+class TestLineIndexCache:
+    """LineIndexCache reuses, extends and rebuilds indexes as files change."""
+    
+    def test_hit_extension_and_rebuild(self, tmp_path):
+        """Unchanged files hit, appended files extend, rewritten files rebuild."""
+        path = tmp_path / "data.txt"
+        path.write_bytes(b"a\n" * 40)
+        _age(path)
+        cache = LineIndexCache()
+        
+        with open(path, "rb") as f:
+            first = cache.index_for(f)
+            assert cache.index_for(f) is first
+        
+        with open(path, "ab") as f:
+            f.write(b"b\n" * 10)
+        _age(path)
+        with open(path, "rb") as f:
+            assert cache.index_for(f).newlines == 50
+        
+        path.write_bytes(b"c\n" * 5)
+        with open(path, "rb") as f:
+            assert cache.index_for(f).newlines == 5
+        assert cache.stats() == {"entries": 1, "hits": 1, "extensions": 1, "builds": 2}
+    
+    def test_racy_index_is_rebuilt(self, tmp_path):
+        """An index built right after a write is not trusted on the next lookup."""
+        path = tmp_path / "data.txt"
+        path.write_bytes(b"a\n" * 4)
+        cache = LineIndexCache(racy_window=3600)
+        
+        with open(path, "rb") as f:
+            cache.index_for(f)
+            cache.index_for(f)
+        assert cache.stats()["builds"] == 2 and cache.stats()["hits"] == 0
+    
+    def test_evicts_least_recently_used(self, tmp_path):
+        """The number of cached indexes is bounded."""
+        cache = LineIndexCache(max_entries=2)
+        for name in ("one", "two", "three"):
+            path = tmp_path / name
+            path.write_bytes(b"x\n")
+            with open(path, "rb") as f:
+                cache.index_for(f)
+        assert len(cache) == 2
+    
+    def test_from_env(self):
+        """The entry limit is configurable; 0 disables caching."""
+        cache = LineIndexCache.from_env({"SED_AWK_LINE_INDEX_MAX_ENTRIES": "0"})
+        assert not cache.enabled
+        
+        with pytest.raises(ValueError, match="SED_AWK_LINE_INDEX_MAX_ENTRIES"):
+            LineIndexCache.from_env({"SED_AWK_LINE_INDEX_MAX_ENTRIES": "lots"})
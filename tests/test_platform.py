@@ -1,9 +1,21 @@
 """Unit tests for PlatformConfig and BinaryExecutor."""
 
+import asyncio
+import math
+import os
+import subprocess
+import sys
+import time
+
 import pytest
 from unittest.mock import patch, MagicMock
-from sed_awk_mcp.platform.config import PlatformConfig, BinaryNotFoundError
-from sed_awk_mcp.platform.executor import BinaryExecutor, ExecutionResult
+from sed_awk_mcp.platform.config import (
+    PlatformConfig, BinaryNotFoundError, read_env, state_directory
+)
+from sed_awk_mcp.platform.executor import (
+    BinaryExecutor, ExecutionResult, ExecutionScheduler, ResultCache, ServerBusyError
+)
+from sed_awk_mcp.platform.limits import LimitsConfig, ToolLimits
 
 
 class TestPlatformConfig:
@@ -44,6 +56,23 @@ class TestPlatformConfig:
         """TC-022: Missing binary raises BinaryNotFoundError."""
         with pytest.raises(BinaryNotFoundError, match="not found"):
             PlatformConfig()
+    
+    def test_state_directory(self, monkeypatch, tmp_path):
+        """State directories live under $XDG_STATE_HOME, else ~/.local/state."""
+        monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path))
+        assert state_directory("backups") == tmp_path / "sed-awk-mcp" / "backups"
+        monkeypatch.setenv("XDG_STATE_HOME", "")
+        monkeypatch.setenv("HOME", str(tmp_path))
+        assert state_directory("journal") == tmp_path / ".local" / "state" / "sed-awk-mcp" / "journal"
+    
+    def test_read_env(self):
+        """Blank variables keep the default; invalid values name the variable."""
+        environ = {"A": " 12 ", "B": "  ", "C": "x"}
+        assert read_env(environ, "A", 1, int) == 12
+        assert read_env(environ, "B", 1, int) == 1
+        assert read_env(environ, "MISSING", None, int) is None
+        with pytest.raises(ValueError, match="Invalid value for C: 'x'"):
+            read_env(environ, "C", 1, int)
 
 
 class TestBinaryExecutor:
@@ -77,3 +106,481 @@ class TestBinaryExecutor:
         assert hasattr(result, 'stdout')
         assert hasattr(result, 'stderr')
         assert hasattr(result, 'timed_out')
+
+    def test_execution_result_decodes_lazily(self):
+        """ExecutionResult keeps bytes and decodes only on str access."""
+        result = ExecutionResult(b"caf\xc3\xa9\n", b"", 0, 0.01)
+        
+        assert result._stdout is None
+        assert result.stdout_bytes == b"caf\xc3\xa9\n"
+        assert result.stdout == "caf\u00e9\n"
+        assert result.stdout is result.stdout
+        assert not hasattr(result, '__dict__')
+    
+    def test_non_utf8_output_does_not_crash(self):
+        """Invalid UTF-8 output is preserved as bytes and replaced in str."""
+        executor = BinaryExecutor(PlatformConfig())
+        
+        result = executor.execute(['printf', '\\377abc'])
+        assert result.success
+        assert result.stdout_bytes == b"\xffabc"
+        assert result.stdout == "\ufffdabc"
+    
+    @pytest.mark.asyncio
+    async def test_execute_async_captures_output(self):
+        """execute_async returns the same structured result as execute."""
+        config = PlatformConfig()
+        executor = BinaryExecutor(config)
+        
+        result = await executor.execute_async(['echo', 'test'])
+        assert result.success
+        assert result.stdout == "test\n"
+        assert not result.timed_out
+    
+    @pytest.mark.asyncio
+    async def test_execute_async_timeout_enforced(self):
+        """execute_async kills the child when the timeout expires."""
+        config = PlatformConfig()
+        executor = BinaryExecutor(config)
+        
+        result = await executor.execute_async(['sleep', '35'], timeout=1)
+        assert result.timed_out
+        assert result.returncode == -1
+    
+    @pytest.mark.asyncio
+    async def test_resource_usage_recorded(self):
+        """Both execution paths reap with wait4 and report child rusage."""
+        executor = BinaryExecutor(PlatformConfig())
+        program = 'BEGIN {for (i = 0; i < 300000; i++) s += i}'
+        
+        for result in (
+            executor.execute(['awk', program]),
+            await executor.execute_async(['awk', program]),
+        ):
+            assert result.success
+            assert result.usage is not None
+            assert result.usage.cpu_time > 0
+            assert result.usage.max_rss_kb > 0
+            assert 0 < result.usage.spawn_time < result.duration
+            assert set(result.usage_details()) >= {
+                "user_ms", "system_ms", "max_rss_kb", "major_faults",
+                "voluntary_switches", "involuntary_switches"
+            }
+        
+        assert ExecutionResult(b"", b"", 0, 0.0).usage_details() is None
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_execution_is_killed_and_reaped(self):
+        """Cancelling execute_async leaves no running or zombie child."""
+        executor = BinaryExecutor(PlatformConfig())
+        spawned = []
+        original_popen = subprocess.Popen
+        
+        def _tracking_popen(*args, **kwargs):
+            process = original_popen(*args, **kwargs)
+            spawned.append(process)
+            return process
+        
+        with patch('sed_awk_mcp.platform.executor.subprocess.Popen', _tracking_popen):
+            task = asyncio.ensure_future(executor.execute_async(['sleep', '30']))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        
+        for _ in range(50):
+            if spawned[0].returncode is not None:
+                break
+            await asyncio.sleep(0.02)
+        assert spawned[0].returncode == -9
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("mode", ["sync", "async"])
+    async def test_timeout_escalates_across_process_group(self, mode):
+        """A group ignoring SIGTERM is killed after the grace period, output kept."""
+        executor = BinaryExecutor(PlatformConfig())
+        cmd = ['sh', '-c', "trap '' TERM; sleep 30 & echo $!; wait"]
+        
+        start = time.monotonic()
+        if mode == "sync":
+            result = executor.execute(cmd, timeout=1)
+        else:
+            result = await executor.execute_async(cmd, timeout=1)
+        elapsed = time.monotonic() - start
+        
+        assert result.timed_out
+        assert elapsed < 1 + BinaryExecutor.TERM_GRACE_PERIOD + 0.5
+        grandchild = int(result.stdout.split()[0])
+        await asyncio.sleep(0.05)
+        try:
+            with open(f'/proc/{grandchild}/stat') as f:
+                assert f.read().split()[2] == 'Z'
+        except FileNotFoundError:
+            pass
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("mode", ["sync", "async"])
+    async def test_timeout_salvages_partial_output(self, mode):
+        """Output written before the deadline is returned; SIGTERM suffices."""
+        executor = BinaryExecutor(PlatformConfig())
+        cmd = ['sh', '-c', 'echo partial; exec sleep 30']
+        
+        start = time.monotonic()
+        if mode == "sync":
+            result = executor.execute(cmd, timeout=1)
+        else:
+            result = await executor.execute_async(cmd, timeout=1)
+        
+        assert result.timed_out
+        assert result.stdout == "partial\n"
+        assert time.monotonic() - start < 1 + BinaryExecutor.TERM_GRACE_PERIOD
+    
+    @pytest.mark.asyncio
+    async def test_execute_async_runs_concurrently(self):
+        """Independent executions overlap instead of serializing on the loop."""
+        config = PlatformConfig()
+        executor = BinaryExecutor(config)
+        
+        start = time.monotonic()
+        results = await asyncio.gather(
+            *(executor.execute_async(['sleep', '0.5']) for _ in range(4))
+        )
+        elapsed = time.monotonic() - start
+        
+        assert all(r.success for r in results)
+        assert elapsed < 1.5
+
+    def test_output_cap_truncates_and_kills(self):
+        """Output beyond max_output_bytes is cut off and the child killed."""
+        executor = BinaryExecutor(PlatformConfig())
+        
+        start = time.monotonic()
+        result = executor.execute(['yes'], timeout=10, max_output_bytes=4096)
+        
+        assert result.truncated
+        assert not result.timed_out
+        assert len(result.stdout) == 4096
+        assert time.monotonic() - start < 5
+    
+    @pytest.mark.asyncio
+    async def test_output_cap_truncates_async(self):
+        """execute_async enforces the same output cap."""
+        executor = BinaryExecutor(PlatformConfig())
+        
+        result = await executor.execute_async(
+            ['sh', '-c', 'yes | cat'], timeout=10, max_output_bytes=4096
+        )
+        
+        assert result.truncated
+        assert len(result.stdout) == 4096
+    
+    @pytest.mark.asyncio
+    async def test_stdout_fd_bypasses_capture_and_cap(self, tmp_path):
+        """Output redirected to a file descriptor is written in full, uncaptured."""
+        executor = BinaryExecutor(PlatformConfig())
+        target = tmp_path / "out.txt"
+        
+        with open(target, 'wb') as out:
+            result = await executor.execute_async(
+                ['sh', '-c', 'yes | head -c 100000; echo oops >&2'],
+                timeout=10, max_output_bytes=4096, stdout_fd=out.fileno()
+            )
+        
+        assert result.success and not result.truncated
+        assert result.stdout_bytes == b''
+        assert result.stderr == "oops\n"
+        assert target.stat().st_size == 100000
+    
+    def test_output_under_cap_not_truncated(self):
+        """Output within the cap is returned in full."""
+        executor = BinaryExecutor(PlatformConfig())
+        
+        result = executor.execute(['echo', 'test'], max_output_bytes=5)
+        assert result.success
+        assert not result.truncated
+        assert result.stdout == "test\n"
+    
+    @pytest.mark.parametrize("backend", ["posix_spawn", "prlimit", "preexec"])
+    def test_spawn_backends_apply_memory_limit(self, backend):
+        """Every spawn backend applies RLIMIT_AS to the child."""
+        config = PlatformConfig()
+        if backend == "prlimit" and not config.prlimit_path:
+            pytest.skip("prlimit binary not available")
+        executor = BinaryExecutor(config, spawn_backend=backend)
+        if not executor._has_resource_limits:
+            pytest.skip("resource limits not supported on this platform")
+        
+        # Brief sleep so the posix_spawn backend's prlimit(2) lands first
+        result = executor.execute(['sh', '-c', 'sleep 0.2; ulimit -v'])
+        assert result.success
+        assert int(result.stdout.strip()) == executor.limits.defaults.memory_limit_mb * 1024
+    
+    def test_limits_scale_with_input_size(self):
+        """Larger inputs get a larger address space and a longer timeout."""
+        limits = LimitsConfig(ToolLimits(memory_limit_mb=64, memory_per_mb=4.0, max_memory_mb=256,
+                                         max_stream_file_size=0))
+        executor = BinaryExecutor(PlatformConfig(), limits=limits)
+        if not executor._has_resource_limits:
+            pytest.skip("resource limits not supported on this platform")
+        
+        result = executor.execute(['sh', '-c', 'sleep 0.2; ulimit -v'], input_size=16 * 1024 * 1024)
+        assert int(result.stdout.strip()) == (64 + 4 * 16) * 1024
+        
+        timeout, (memory, cpu) = executor._limits_for(['awk'], None, 100 * 1024 * 1024)
+        assert memory == 256 * 1024 * 1024
+        assert timeout == limits.for_tool('awk').max_timeout
+        assert cpu == math.ceil(timeout)
+    
+    def test_auto_backend_avoids_preexec(self):
+        """The default backend limits the child before exec without preexec_fn."""
+        executor = BinaryExecutor(PlatformConfig())
+        if not executor._has_resource_limits:
+            pytest.skip("resource limits not supported on this platform")
+        
+        # The prlimit(1) shim sets limits before exec; prlimit(2) is the fallback
+        expected = (
+            BinaryExecutor.SPAWN_PRLIMIT_SHIM if executor.config.prlimit_path
+            else BinaryExecutor.SPAWN_POSIX
+        )
+        assert executor.spawn_backend == expected
+        kwargs = executor._popen_kwargs(apply_limits=True)
+        assert 'preexec_fn' not in kwargs
+        assert kwargs.get('close_fds', True) or sys.version_info < (3, 10)
+    
+    def test_unknown_spawn_backend_rejected(self):
+        """Unknown spawn backend names raise ValueError."""
+        with pytest.raises(ValueError, match="Unknown spawn backend"):
+            BinaryExecutor(PlatformConfig(), spawn_backend='fork')
+
+
+class TestExecutionScheduler:
+    """Test suite for ExecutionScheduler."""
+    
+    @pytest.mark.asyncio
+    async def test_global_limit_serializes_executions(self):
+        """Executions beyond the global limit wait for a free slot."""
+        scheduler = ExecutionScheduler(max_concurrency=1)
+        executor = BinaryExecutor(PlatformConfig(), scheduler)
+        
+        start = time.monotonic()
+        results = await asyncio.gather(
+            *(executor.execute_async(['sleep', '0.3']) for _ in range(2))
+        )
+        elapsed = time.monotonic() - start
+        
+        assert all(r.success for r in results)
+        assert elapsed >= 0.6
+        assert scheduler.running == 0
+        assert scheduler.queue_depth == 0
+    
+    @pytest.mark.asyncio
+    async def test_full_queue_raises_server_busy(self):
+        """A full wait queue rejects new executions immediately."""
+        scheduler = ExecutionScheduler(max_concurrency=1, max_queue=0)
+        
+        async with scheduler.slot('awk'):
+            with pytest.raises(ServerBusyError, match="Server busy"):
+                await scheduler.acquire('awk')
+    
+    @pytest.mark.asyncio
+    async def test_queue_deadline_raises_server_busy(self):
+        """Waiting longer than the queue deadline raises ServerBusyError."""
+        scheduler = ExecutionScheduler(max_concurrency=1, queue_timeout=0.1)
+        
+        async with scheduler.slot('sed'):
+            with pytest.raises(ServerBusyError):
+                await scheduler.acquire('sed')
+            assert scheduler.queue_depth == 0
+    
+    @pytest.mark.asyncio
+    async def test_per_tool_limit_does_not_block_other_tools(self):
+        """A tool at its own limit does not hold back other tools."""
+        scheduler = ExecutionScheduler(
+            max_concurrency=4, per_tool_limits={'awk': 1}, queue_timeout=0.2
+        )
+        
+        async with scheduler.slot('awk'):
+            waiter = asyncio.ensure_future(scheduler.acquire('awk'))
+            await asyncio.sleep(0)
+            waited = await scheduler.acquire('diff')
+            assert waited == 0.0
+            scheduler.release('diff')
+        
+        assert await waiter >= 0.0
+        scheduler.release('awk')
+        assert scheduler.running == 0
+    
+    def test_from_env(self):
+        """Limits are read from environment variables."""
+        scheduler = ExecutionScheduler.from_env({
+            'SED_AWK_MAX_CONCURRENCY': '3',
+            'SED_AWK_MAX_CONCURRENCY_AWK': '1',
+            'SED_AWK_MAX_QUEUE': '5',
+            'SED_AWK_QUEUE_TIMEOUT': '2.5',
+        })
+        assert scheduler.max_concurrency == 3
+        assert scheduler.per_tool_limits == {'awk': 1}
+        assert scheduler.max_queue == 5
+        assert scheduler.queue_timeout == 2.5
+
+
+class TestResultCache:
+    """Test suite for ResultCache."""
+    
+    @pytest.fixture
+    def input_file(self, tmp_path):
+        """Input file whose mtime lies outside the racy window."""
+        path = tmp_path / "input.txt"
+        path.write_text("a\nb\n")
+        os.utime(path, ns=(time.time_ns() - 10**10,) * 2)
+        return path
+    
+    def test_hit_and_miss_counters(self, input_file):
+        """A stored result is served for the same command and input."""
+        cache = ResultCache()
+        key = cache.make_key(['awk', '{print}', str(input_file)], [input_file])
+        
+        assert cache.get(key) is None
+        assert cache.put(key, ExecutionResult(b"a\nb\n", b"", 0, 0.01))
+        assert cache.get(key).stdout == "a\nb\n"
+        assert cache.get(cache.make_key(['awk', '{print $1}', str(input_file)], [input_file])) is None
+        
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+    
+    def test_rewritten_input_changes_key(self, input_file):
+        """Modifying an input file means a miss for the old key."""
+        cache = ResultCache()
+        key = cache.make_key(['diff', str(input_file)], [input_file])
+        cache.put(key, ExecutionResult(b"", b"", 0, 0.01))
+        
+        input_file.write_text("a\nb\nc\n")
+        assert cache.make_key(['diff', str(input_file)], [input_file]) != key
+    
+    def test_invalidate_drops_entries_for_path(self, input_file):
+        """invalidate() removes every entry that read the file."""
+        cache = ResultCache()
+        for program in ('{print $1}', '{print $2}'):
+            key = cache.make_key(['awk', program], [input_file])
+            cache.put(key, ExecutionResult(b"x\n", b"", 0, 0.01))
+        
+        assert cache.invalidate(input_file) == 2
+        assert len(cache) == 0 and cache.size == 0
+        assert cache.get(key) is None
+    
+    def test_eviction_by_count_and_size(self, input_file):
+        """Least recently used entries are evicted beyond either bound."""
+        cache = ResultCache(max_bytes=10, max_entries=2)
+        keys = [cache.make_key(['awk', str(i)], [input_file]) for i in range(3)]
+        for key in keys:
+            cache.put(key, ExecutionResult(b"1234", b"", 0, 0.01))
+        assert cache.get(keys[0]) is None
+        assert cache.get(keys[2]) is not None
+        
+        cache.put(keys[0], ExecutionResult(b"12345678", b"", 0, 0.01))
+        assert len(cache) == 1 and cache.size == 8
+        assert cache.stats()["evictions"] == 3
+    
+    def test_uncacheable_results_not_stored(self, tmp_path, input_file):
+        """Timed-out results and freshly modified inputs are not stored."""
+        cache = ResultCache()
+        key = cache.make_key(['awk', '{print}'], [input_file])
+        assert not cache.put(key, ExecutionResult(b"", b"", -9, 1.0, timed_out=True))
+        
+        fresh = tmp_path / "fresh.txt"
+        fresh.write_text("new\n")
+        assert not cache.put(cache.make_key(['awk'], [fresh]), ExecutionResult(b"", b"", 0, 0.01))
+        assert cache.make_key(['awk'], [tmp_path / "missing"]) is None
+    
+    def test_from_env(self):
+        """Bounds are read from environment variables; 0 disables caching."""
+        cache = ResultCache.from_env({'SED_AWK_CACHE_MAX_ENTRIES': '8'})
+        assert cache.max_entries == 8
+        assert cache.max_bytes == ResultCache.DEFAULT_MAX_BYTES
+        
+        disabled = ResultCache.from_env({'SED_AWK_CACHE_MAX_BYTES': '0'})
+        assert not disabled.enabled
+        assert disabled.make_key(['awk'], []) is None
+
+
+class TestLimitsConfig:
+    """Test suite for LimitsConfig and ToolLimits."""
+    
+    def test_scaling_is_capped(self):
+        """Timeout and memory grow with input size up to their maximums."""
+        limits = ToolLimits(timeout=10, timeout_per_mb=2, max_timeout=30,
+                            memory_limit_mb=100, memory_per_mb=8, max_memory_mb=1024,
+                            max_stream_file_size=0)
+        mib = 1024 * 1024
+        assert limits.timeout_for(0) == 10
+        assert limits.timeout_for(5 * mib) == 20
+        assert limits.timeout_for(500 * mib) == 30
+        assert limits.memory_limit_for(10 * mib) == 180 * mib
+        assert limits.memory_limit_for(500 * mib) == 1024 * mib
+        assert limits.cpu_limit_for(mib // 2) == 11
+    
+    def test_streaming_tier(self):
+        """Inputs above max_file_size are streamed with a longer timeout ceiling."""
+        mib = 1024 * 1024
+        limits = ToolLimits(max_file_size=10 * mib, max_stream_file_size=100 * mib,
+                            timeout=10, timeout_per_mb=2, max_timeout=30,
+                            stream_max_timeout=120)
+        assert limits.admission_limit == 100 * mib
+        assert not limits.streams(10 * mib) and limits.streams(10 * mib + 1)
+        assert limits.timeout_for(10 * mib) == 30
+        assert limits.timeout_for(20 * mib) == 50
+        assert limits.timeout_for(100 * mib) == 120
+        
+        disabled = limits.replace(max_stream_file_size=0)
+        assert disabled.admission_limit == 10 * mib
+        assert not disabled.streams(20 * mib)
+        assert disabled.timeout_for(20 * mib) == 30
+    
+    def test_builtin_awk_override(self):
+        """awk gets a longer timeout than sed and diff by default."""
+        limits = LimitsConfig()
+        assert limits.for_tool('awk').max_timeout > limits.for_tool('sed').max_timeout
+        assert limits.for_tool('echo') == limits.defaults
+    
+    def test_toml_and_env_layers(self, tmp_path):
+        """TOML overrides built-ins and the environment overrides TOML."""
+        path = tmp_path / "limits.toml"
+        path.write_text(
+            "max_file_size = 1048576\n"
+            "timeout = 5\n"
+            "[awk]\n"
+            "max_timeout = 120\n"
+        )
+        environ = {
+            'SED_AWK_LIMITS_FILE': str(path),
+            'SED_AWK_SED_MAX_FILE_SIZE': '2048',
+            'SED_AWK_MEMORY_LIMIT_MB': '64',
+        }
+        limits = LimitsConfig.load(environ=environ)
+        
+        assert limits.for_tool('sed').max_file_size == 2048
+        assert limits.for_tool('diff').max_file_size == 1048576
+        assert limits.for_tool('awk').timeout == 5
+        assert limits.for_tool('awk').max_timeout == 120
+        assert limits.for_tool('diff').memory_limit_mb == 64
+    
+    @pytest.mark.parametrize("environ, match", [
+        ({'SED_AWK_TIMEOUT': 'soon'}, "Invalid value"),
+        ({'SED_AWK_TIMEOUT': '-1'}, "must be positive"),
+        ({'SED_AWK_TIMEOUT': '90'}, "must not exceed"),
+        ({'SED_AWK_LIMITS_FILE': '/nonexistent/limits.toml'}, "Cannot read limits file"),
+    ])
+    def test_invalid_configuration_rejected(self, environ, match):
+        """Unparseable or inconsistent limits raise ValueError."""
+        with pytest.raises(ValueError, match=match):
+            LimitsConfig.load(environ=environ)
+    
+    def test_unknown_keys_rejected(self, tmp_path):
+        """Unknown tools and fields in the TOML file are errors."""
+        path = tmp_path / "limits.toml"
+        path.write_text("[grep]\ntimeout = 1\n")
+        with pytest.raises(ValueError, match="Unknown tool"):
+            LimitsConfig.load(str(path), environ={})
+        path.write_text("timeuot = 1\n")
+        with pytest.raises(ValueError, match="Unknown limit"):
+            LimitsConfig.load(str(path), environ={})
@@ -0,0 +1,119 @@
+"""Unit tests for the preview store behind change tokens."""
+
+import os
+import time
+
+import pytest
+from sed_awk_mcp.platform.preview_store import PreviewStore, file_identity
+
+COMMANDS = ('s/a/b/',)
+
+
+@pytest.fixture
+def source(tmp_path):
+    """Source file whose mtime lies outside the racy window."""
+    path = tmp_path / "data.txt"
+    path.write_bytes(b"a\n" * 100)
+    os.utime(path, ns=(time.time_ns() - 10**10,) * 2)
+    return path
+
+
+class TestPreviewStore:
+    """PreviewStore keeps previewed content bounded and tied to its source."""
+    
+    def test_put_find_and_take(self, source):
+        """A stored preview is found by its key and claimed once by token."""
+        store = PreviewStore()
+        identity = file_identity(source)
+        token = store.put(source, identity, COMMANDS, b"b\n" * 100, 100)
+        
+        assert store.find(source, COMMANDS, identity).token == token
+        assert store.find(source, ('s/a/c/',), identity) is None
+        assert store.put(source, identity, COMMANDS, b"b\n" * 100, 100) == token
+        assert len(store) == 1
+        
+        entry = store.take(token)
+        assert entry.read_content() == b"b\n" * 100
+        assert entry.substitutions == 100
+        assert entry.matches_source()
+        store.release(entry)
+        assert store.take(token) is None
+        assert store.size == 0
+    
+    def test_changed_source_is_detected(self, source):
+        """Rewriting the source invalidates the stored identity."""
+        store = PreviewStore()
+        token = store.put(source, file_identity(source), COMMANDS, b"b\n")
+        
+        source.write_bytes(b"c\n")
+        assert not store.take(token).matches_source()
+    
+    def test_racy_source_is_verified_by_digest(self, source):
+        """A same-size rewrite in the racy window is caught by the digest."""
+        source.write_bytes(b"a\n")
+        identity = file_identity(source)
+        store = PreviewStore(racy_window=3600)
+        token = store.put(source, identity, COMMANDS, b"b\n")
+        
+        source.write_bytes(b"x\n")
+        os.utime(source, ns=(identity[3], identity[3]))
+        assert file_identity(source)[2:] == identity[2:]
+        assert not store.take(token).matches_source()
+    
+    def test_not_stored_when_source_changed_during_preview(self, source):
+        """put() refuses content computed from an outdated file."""
+        store = PreviewStore()
+        identity = file_identity(source)
+        source.write_bytes(b"changed\n")
+        
+        assert store.put(source, identity, COMMANDS, b"b\n") is None
+    
+    def test_spills_beyond_memory_budget(self, source):
+        """Content over the memory budget is kept in a spill file."""
+        store = PreviewStore(memory_bytes=10)
+        identity = file_identity(source)
+        small = store.put(source, identity, ('s/x/y/',), b"12345")
+        large = store.put(source, identity, COMMANDS, b"z" * 1000)
+        
+        assert store.stats()["memory_bytes"] == 5
+        entry = store.take(large)
+        assert entry.spilled and entry.read_content() == b"z" * 1000
+        spill_path = entry._spill_path
+        store.release(entry)
+        assert not spill_path.exists()
+        assert store.find(source, ('s/x/y/',), identity).token == small
+    
+    def test_evicts_least_recently_used(self, source):
+        """Entry count and total size are bounded."""
+        store = PreviewStore(max_bytes=25, max_entries=2)
+        identity = file_identity(source)
+        first = store.put(source, identity, ('s/1/x/',), b"1" * 10)
+        second = store.put(source, identity, ('s/2/x/',), b"2" * 10)
+        store.find(source, ('s/1/x/',), identity)
+        third = store.put(source, identity, ('s/3/x/',), b"3" * 10)
+        
+        assert store.take(second) is None
+        assert store.take(first) is not None and store.take(third) is not None
+        assert store.put(source, identity, COMMANDS, b"x" * 26) is None
+        assert store.stats()["evictions"] == 1
+    
+    def test_entries_expire(self, source, monkeypatch):
+        """Previews older than the TTL are dropped."""
+        store = PreviewStore(ttl=60)
+        token = store.put(source, file_identity(source), COMMANDS, b"b\n")
+        
+        real_monotonic = time.monotonic
+        monkeypatch.setattr(time, "monotonic", lambda: real_monotonic() + 61)
+        assert store.take(token) is None
+        assert store.stats()["expirations"] == 1
+    
+    def test_from_env(self):
+        """Environment variables configure the store; 0 disables it."""
+        store = PreviewStore.from_env({
+            "SED_AWK_PREVIEW_MAX_BYTES": "0",
+            "SED_AWK_PREVIEW_TTL": "30.5",
+        })
+        assert not store.enabled and store.ttl == 30.5
+        
+        with pytest.raises(ValueError, match="SED_AWK_PREVIEW_MAX_ENTRIES"):
+            PreviewStore.from_env({"SED_AWK_PREVIEW_MAX_ENTRIES": "many"})
@@ -0,0 +1,369 @@
+"""Unit tests for the in-process sed engine, with parity checks against GNU sed."""
+
+import os
+import shutil
+import subprocess
+
+import pytest
+from sed_awk_mcp.platform import sed_engine
+from sed_awk_mcp.platform.sed_engine import (
+    SedScript, UnsupportedSedError, compile_program, compile_script, LOCALE_IS_UTF8,
+    match_listing_commands, may_match, parse_match_listing, required_literal
+)
+
+
+SED = shutil.which('sed')
+
+
+def _is_gnu_sed() -> bool:
+    if not SED:
+        return False
+    result = subprocess.run([SED, '--version'], capture_output=True, text=True)
+    return 'GNU sed' in result.stdout
+
+
+requires_gnu_sed = pytest.mark.skipif(
+    not _is_gnu_sed() or not LOCALE_IS_UTF8,
+    reason="parity tests need GNU sed in a UTF-8 locale"
+)
+
+SAMPLE = (
+    "hello world\n"
+    "foo bar foo\n"
+    "\n"
+    "baaac abab\n"
+    "x.y*z [a] ^$ caret\n"
+    "café ÉTÉ naïve\n"
+    "last line without newline"
+).encode('utf-8')
+
+PARITY_SCRIPTS = [
+    's/foo/X/', 's/foo/X/g', 's/o/0/2', 's/o/0/2g',
+    's/a*/x/g', 's/b*$/X/g', 's/a*/x/2', 's/b*/X/3g',
+    's/\\(foo\\) \\(bar\\)/\\2 \\1/', 's/[aeiou]/<&>/g', 's/[^a-z]/_/g',
+    's/./#/3', 's/^/> /', 's/$/ </', 's#o#/#g', 's/\\//|/g',
+    '2,4s/o/O/g', '$s/l/L/g', '3,1s/^/N/', '2,$s/a/A/',
+    's/x\\.y\\*z/ok/', 's/\\[a\\]/B/', 's/^$/EMPTY/',
+    's/a\\{2,\\}/A/g', 's/ab\\+/Q/g', 's/é/E/g', 's/[[:digit:]]/D/g',
+    's/\\bfoo\\b/F/g', 's/\\<b/B/g', 's/o\\>/0/g', 's/\\w\\+/w/2',
+    's/\\s/_/g', 's/FOO/q/Ig', 's/caf./C/', 's/*/S/', 's/^*/S/',
+    's/a\\?c/?/g', 's/o/\\n/', 's/o/\\t/g', 's/x$/y/', 's/$x/y/',
+    's/a^b/y/', 's/[]]/R/g', 's/[a-]/M/g', 's/\\(a\\)\\1/D/g',
+    's/\\&/and/', 's/o/\\&/g', 's/^^/x/',
+]
+
+
+def _gnu_sed(script: str, data: bytes, extended: bool = False) -> bytes:
+    args = [SED] + (['-E'] if extended else []) + [script]
+    env = dict(os.environ, LC_ALL='C.UTF-8')
+    return subprocess.run(args, input=data, capture_output=True, env=env, check=True).stdout
+
+
+class TestSedEngineParity:
+    """Output of the engine must match GNU sed byte for byte."""
+
+    @requires_gnu_sed
+    @pytest.mark.parametrize("script", PARITY_SCRIPTS)
+    def test_bre_parity(self, script):
+        """Supported BRE scripts produce the same output as sed."""
+        compiled = compile_script(script)
+        assert compiled is not None, f"expected in-process support for {script!r}"
+        try:
+            output, _ = compiled.apply(SAMPLE)
+        except UnsupportedSedError:
+            pytest.skip("input needs the sed binary")
+        assert output == _gnu_sed(script, SAMPLE)
+
+    @requires_gnu_sed
+    @pytest.mark.parametrize("script", [
+        's/a+/X/g', 's/(o+)([0-9]+)/\\2\\1/', 's/a{2}/Y/', 's/\\(x\\)/P/',
+        's/\\+/plus/', 's/b?a/Q/g', 's/[0-9]{2,}/N/',
+    ])
+    def test_ere_parity(self, script):
+        """Supported ERE scripts produce the same output as sed -E."""
+        data = b"aa+b (x) {1} a?b\nfoo123 bar\n"
+        compiled = compile_script(script, extended=True)
+        assert compiled is not None
+        assert compiled.apply(data)[0] == _gnu_sed(script, data, extended=True)
+
+    @requires_gnu_sed
+    @pytest.mark.parametrize("scripts", [
+        ('s/o/0/g', 's/0/o/'),
+        ('2,4s/o/O/g', 's/O/Q/', '$s/l/L/'),
+        ('s/^/> /', 's/$/ </', 's/a\\{2,\\}/A/g'),
+        ('s/foo/bar/', 's/bar/baz/g', 's/o/\\n/'),
+    ])
+    def test_program_parity(self, scripts):
+        """Multi-command programs match a single sed -e ... -e ... run."""
+        args = [SED] + [arg for script in scripts for arg in ('-e', script)]
+        env = dict(os.environ, LC_ALL='C.UTF-8')
+        expected = subprocess.run(args, input=SAMPLE, capture_output=True, env=env, check=True).stdout
+        program = compile_program(scripts)
+        assert program is not None
+        assert program.apply(SAMPLE)[0] == expected
+
+    @requires_gnu_sed
+    def test_randomized_parity(self):
+        """Randomly composed scripts agree with sed whenever supported."""
+        import random
+        rng = random.Random(1234)
+        atoms = ['a', 'b', '.', '[ab]', '[^a]', '\\(a\\)', '^', '$', ' ',
+                 '\\w', '\\s', '\\<', '[[:digit:]]', '1', 'é', '\\.', '*']
+        quants = ['', '', '*', '\\+', '\\?', '\\{1,2\\}']
+        replacements = ['X', '&', '<&>', '', '-\\n-']
+        flags = ['', 'g', '2', '2g', 'I']
+        lines = ['ab ab aab b', '', 'aaa', 'x1 é 2x', 'ba b  a', 'b a. a*']
+
+        compared = 0
+        for _ in range(300):
+            regex = ''.join(rng.choice(atoms) + rng.choice(quants) for _ in range(rng.randint(1, 3)))
+            script = f"s/{regex}/{rng.choice(replacements)}/{rng.choice(flags)}"
+            data = '\n'.join(rng.sample(lines, 4)).encode('utf-8') + b'\n'
+            compiled = compile_script(script)
+            if compiled is None:
+                continue
+            try:
+                output, _ = compiled.apply(data)
+            except UnsupportedSedError:
+                continue
+            assert output == _gnu_sed(script, data), script
+            compared += 1
+        assert compared > 100
+
+
+class TestSedEngine:
+    """Behaviour of the engine independent of the sed binary."""
+
+    def test_substitution_count(self):
+        """apply() reports the number of substitutions made."""
+        output, count = compile_script('s/o/0/g').apply(b"foo\nboo\n")
+        assert output == b"f00\nb00\n"
+        assert count == 4
+
+    def test_no_match_returns_input(self):
+        """A script that matches nothing leaves content unchanged."""
+        output, count = compile_script('s/zzz/y/').apply(b"abc\n")
+        assert output == b"abc\n"
+        assert count == 0
+
+    def test_apply_file_uses_file_content(self, tmp_path):
+        """apply_file() reads the file, including empty files."""
+        target = tmp_path / "input.txt"
+        target.write_bytes(b"one two\n")
+        assert compile_script('s/two/2/').apply_file(target) == (b"one 2\n", 1)
+
+        empty = tmp_path / "empty.txt"
+        empty.write_bytes(b"")
+        assert compile_script('s/a/b/').apply_file(empty) == (b"", 0)
+
+    @pytest.mark.parametrize("script", [
+        's/a\\|b/x/',        # alternation: POSIX leftmost-longest
+        's/\\(ab\\)*/x/',    # quantified group
+        's/a/\\U&/',         # case conversion
+        's/a/b/w out',       # write flag
+        's/a/b/p',           # print flag
+        '/foo/s/a/b/',       # regex address
+        'y/abc/xyz/',        # not a substitution
+        's/a/b',             # unterminated
+        's/\\x41/b/',        # hex escape
+        's/a/\\3/',          # invalid back reference
+    ])
+    def test_unsupported_scripts_fall_back(self, script):
+        """Scripts outside the supported subset compile to None."""
+        assert compile_script(script) is None
+
+    def test_invalid_utf8_input_is_unsupported(self):
+        """Character-based patterns reject input that is not valid UTF-8."""
+        script = compile_script('s/./x/')
+        if not LOCALE_IS_UTF8:
+            pytest.skip("byte semantics in a non-UTF-8 locale")
+        with pytest.raises(UnsupportedSedError):
+            script.apply(b"\xff\xfe\n")
+
+    def test_byte_patterns_accept_any_bytes(self):
+        """ASCII-only patterns work directly on arbitrary bytes."""
+        output, count = compile_script('s/a/b/g').apply(b"\xffa\xfea\n")
+        assert output == b"\xffb\xfeb\n"
+        assert count == 2
+
+    def test_program_counts_all_substitutions(self):
+        """A program reports the substitutions of all its commands."""
+        program = compile_program(('s/a/b/g', 's/b/c/'))
+        assert program.apply(b"aa\nb\n") == (b"cb\nc\n", 4)
+
+    def test_program_after_newline_insertion_falls_back(self):
+        """Commands after a replacement that adds lines need the sed binary."""
+        assert compile_program(('s/a/\\n/', 's/^b/x/')) is None
+        assert compile_program(('s/a/b/', 's/b/\\n/')) is not None
+        assert compile_program(('s/a/b/', 's/a\\|b/x/')) is None
+
+    def test_compiled_scripts_are_cached(self):
+        """compile_script() returns the cached instance for a repeated script."""
+        assert compile_script('s/cache/hit/') is compile_script('s/cache/hit/')
+
+    def test_constructor_raises_for_unsupported(self):
+        """SedScript raises UnsupportedSedError with a message."""
+        with pytest.raises(UnsupportedSedError) as exc_info:
+            SedScript('s/a/b/e')
+        assert exc_info.value.message
+
+
+class TestPreScan:
+    """Literal pre-scan that proves a program cannot change a file."""
+
+    @pytest.mark.parametrize("script,literal", [
+        ('s/foo/bar/g', b'foo'),
+        ('3,$s/needle$/x/', b'needle'),
+        ('s/fo*bar/x/', b'bar'),
+        ('s/ab\\{0,2\\}cd/x/', b'cd'),
+        ('s/\\(key\\)=value/x/', b'=value'),
+        ('s/[abc]xyz.q/x/', b'xyz'),
+        ('s/a\\.b\\tc/x/', b'a.b\tc'),
+    ])
+    def test_required_literal(self, script, literal):
+        """The longest literal every match contains is extracted."""
+        assert required_literal(script) == (literal, False)
+
+    @pytest.mark.parametrize("script", ['s/a\\|b/x/', 's/x*/y/', 's/[0-9]/#/', 's//x/', '5d'])
+    def test_no_literal(self, script):
+        """Alternation, literal-free regexes and other commands are not analysed."""
+        assert required_literal(script) is None
+
+    @pytest.mark.parametrize("script", ['s/\\x41/b/', 's/a\\o101/b/', 's/\\d065/b/', 's/\\cA/b/'])
+    def test_escapes_with_arguments(self, script):
+        """Escapes that take an argument do not leave it behind as literal text."""
+        assert required_literal(script) is None
+
+    @pytest.mark.parametrize("script,extended,literal", [
+        ('s/\\.\\{1,2\\}\\?/b/', False, None),
+        ('s/\\+{2}*/b/', True, None),
+        ('s/\\(+*/b/', True, None),
+        ('s/ab\\{1,2\\}\\?c/x/', False, (b'a', False)),
+        ('s/ab+{2}/x/', True, (b'ab', False)),
+    ])
+    def test_stacked_quantifiers(self, script, extended, literal):
+        """A quantifier on a quantified atom makes the atom optional."""
+        assert required_literal(script, extended=extended) == literal
+
+    def test_ere_operators(self):
+        """ERE quantifiers and groups are honoured; escaped ones are literal."""
+        assert required_literal('s/ab+c?d/x/', extended=True) == (b'ab', False)
+        assert required_literal('s/\\(x\\)/y/', extended=True) == (b'(x)', False)
+        assert required_literal('s/a|b/x/', extended=True) is None
+
+    def test_may_match(self, tmp_path):
+        """A program is ruled out only if no command's literal occurs."""
+        path = tmp_path / "data.txt"
+        path.write_bytes(SAMPLE)
+        assert not may_match(path, ('s/hello/x/',), start=12)
+
+        assert not may_match(path, ('s/absent/x/', 's/missing\\(.\\)\\{2\\}/y/'))
+        assert may_match(path, ('s/absent/x/', 's/hello/x/'))
+        assert may_match(path, ('s/absent/x/', 's/[0-9]/x/'))
+        assert may_match(path, ('s/HELLO/x/I',))
+
+    @requires_gnu_sed
+    @pytest.mark.parametrize("script", ['s/zzz/x/g', 's/fx\\(o\\)\\{3\\}/x/', 's/caf\\.e/x/', 's/wor*ld!/x/'])
+    def test_ruled_out_scripts_change_nothing(self, script, tmp_path):
+        """Whenever the pre-scan rules a script out, sed leaves the file as is."""
+        path = tmp_path / "data.txt"
+        path.write_bytes(SAMPLE)
+
+        assert not may_match(path, (script,))
+        result = subprocess.run([SED, '-e', script, str(path)], capture_output=True, check=True)
+        assert result.stdout == SAMPLE
+
+    @requires_gnu_sed
+    def test_randomized_pre_scan_parity(self):
+        """sed changes nothing in input that lacks a script's required literal."""
+        import random
+        rng = random.Random(4321)
+        atoms = ['a', 'b', 'A', '.', '[ab]', '\\(a\\)', '(', ')', '+', '?', '{', '|',
+                 '\\.', '\\+', '\\x41', '\\o142', '\\d097', '\\cA', '\\n', '\\t', '\\w']
+        quants = ['', '', '*', '\\+', '\\?', '\\{1,2\\}', '\\{2\\}', '+', '?', '{0,1}', '{2}']
+        lines = ['ab ab aab b', 'AAA', 'x+y.z', 'b\ta(', 'a{2}', '', 'ba?b']
+
+        checked = 0
+        for _ in range(600):
+            extended = rng.random() < 0.5
+            regex = ''.join(rng.choice(atoms) + rng.choice(quants) + rng.choice(quants)
+                            for _ in range(rng.randint(1, 3)))
+            script = f"s/{regex}/Z/g"
+            prescan = required_literal(script, extended=extended)
+            if prescan is None:
+                continue
+            data = '\n'.join(rng.sample(lines, 3)).encode('utf-8') + b'\n'
+            if prescan[0] in data:
+                continue
+            result = subprocess.run([SED, *(['-E'] if extended else []), '-e', script],
+                                    input=data, capture_output=True)
+            if result.returncode != 0:
+                continue
+            assert result.stdout == data, (script, extended)
+            checked += 1
+        assert checked > 50
+
+
+def _changed_lines(old: bytes, new: bytes):
+    """Numbers of the lines that differ, for programs that keep line counts."""
+    return [i for i, (a, b) in enumerate(zip(old.split(b'\n'), new.split(b'\n')), 1) if a != b]
+
+
+class TestMeasure:
+    """SedProgram.measure() reports what apply() would change."""
+
+    @pytest.mark.parametrize("scripts", [
+        ('s/foo/X/g',), ('s/o/00/2',), ('2,5s/a/AA/g',), ('$s/line/LINE/',),
+        ('s/é/e/g',), ('s/[[:digit:]]/u/g',), ('s/foo/f/', 's/bar/BAR/g'),
+    ])
+    def test_agrees_with_apply(self, scripts):
+        """Substitutions, byte delta and changed lines match the applied result."""
+        program = compile_program(scripts)
+        new, count = program.apply(SAMPLE)
+        stats = program.measure(SAMPLE, max_lines=100)
+
+        assert stats.substitutions == count
+        assert stats.byte_delta == len(new) - len(SAMPLE)
+        assert stats.line_numbers == _changed_lines(SAMPLE, new)
+        assert stats.lines == len(stats.line_numbers) and stats.complete
+
+    def test_chunked_text_and_bounds(self, monkeypatch):
+        """Text-mode input is decoded in chunks; bounds restrict the lines measured."""
+        monkeypatch.setattr(sed_engine, "MEASURE_CHUNK_BYTES", 8)
+        data = "ü line\n".encode('utf-8') * 50
+        program = compile_program(('s/ü/u/',))
+
+        stats = program.measure(data, max_lines=3)
+        assert (stats.substitutions, stats.lines, stats.byte_delta) == (50, 50, -50)
+        assert stats.line_numbers == [1, 2, 3]
+
+        line = len("ü line\n".encode('utf-8'))
+        stats = program.measure(data, max_lines=100, bounds=(10 * line, 12 * line, 11))
+        assert stats.line_numbers == [11, 12] and stats.substitutions == 2
+
+    @requires_gnu_sed
+    @pytest.mark.parametrize("script", ['s/foo/X/g', 's/o/\\n/', 's/$/\t!/', '3,4s/a//g'])
+    def test_listing_matches_engine(self, script, tmp_path):
+        """The listing sed run yields the engine's statistics, bar the count."""
+        path = tmp_path / "data.txt"
+        path.write_bytes(SAMPLE)
+        before, *after = match_listing_commands(gnu=True)
+        args = [arg for command in (before, script, *after) for arg in ('-e', command)]
+        output = subprocess.run([SED, '-n', *args, str(path)], capture_output=True, check=True).stdout
+
+        listed = parse_match_listing(output, max_lines=100)
+        measured = compile_program((script,)).measure(SAMPLE, max_lines=100)
+        assert listed.substitutions is None
+        assert (listed.lines, listed.line_numbers, listed.byte_delta) == (
+            measured.lines, measured.line_numbers, measured.byte_delta
+        )
+
+    def test_parse_wrapped_and_cut_off_listing(self):
+        """BSD line wrapping is undone; a cut-off record ends an incomplete listing."""
+        output = b"2\nab\\\ncd\\t$\nabc$\n7\nx\\303\\251$\nx$\n9\nabc"
+        stats = parse_match_listing(output, max_lines=1, complete=False)
+        assert (stats.lines, stats.line_numbers, stats.byte_delta) == (2, [2], 4)
+        assert not stats.complete
+
+        with pytest.raises(ValueError):
+            parse_match_listing(output, max_lines=1)
@@ -61,6 +61,13 @@ class TestSecurityValidator:
         with pytest.raises(ValidationError, match="Line.*Forbidden"):
             validator.validate_sed_program(program)
     
+    def test_multiline_sed_checks_complexity(self):
+        """Each line of a sed program gets the single-pattern complexity checks."""
+        validator = SecurityValidator()
+        validator.validate_sed_program("s/a/b/\ns/c/d/g")  # Should not raise
+        with pytest.raises(ValidationError, match="Line 2.*nesting depth"):
+            validator.validate_sed_program("s/a/b/\ns/((((((a))))))/x/")
+    
     def test_deep_nesting_limit(self):
         """TC-010: Deep nesting exceeds limit."""
         validator = SecurityValidator()
@@ -0,0 +1,156 @@
+"""Unit tests for the reverse-delta version history."""
+
+import pytest
+from sed_awk_mcp.platform import version_history
+from sed_awk_mcp.platform.diff_engine import unified_diff
+from sed_awk_mcp.platform.version_history import (
+    HistoryError, VersionHistory, apply_patch, parse_patch
+)
+
+
+@pytest.fixture
+def history(tmp_path):
+    """History in a private directory."""
+    return VersionHistory(tmp_path / "history", keyframe_interval=4)
+
+
+@pytest.fixture
+def target(tmp_path):
+    """File of numbered lines."""
+    path = tmp_path / "data.txt"
+    path.write_bytes(b"".join(b"line %d\n" % i for i in range(50)))
+    return path
+
+
+def _edit(history, target, old, new, staged=None):
+    """Record and apply an edit the way the sed tools do."""
+    content = target.read_bytes().replace(old, new)
+    if staged is not None:
+        staged.write_bytes(content)
+    version = history.record(target, staged or content, f"s/{old.decode()}/{new.decode()}/")
+    target.write_bytes(content)
+    return version
+
+
+def _checkout(history, target, number):
+    """Rebuilt content of a version."""
+    staged, _ = history.stage_version(target, number, target)
+    try:
+        return staged.read_bytes()
+    finally:
+        staged.unlink()
+
+
+class TestPatches:
+    """Patches from the diff engine apply in both directions."""
+    
+    @pytest.mark.parametrize("old,new", [
+        (b"a\nb\nc\n", b"a\nB\nc\nd\n"),
+        (b"a\nb", b"a\nb\n"),
+        (b"", b"x\ny"),
+        (b"x\ny\nz\n", b"z\n"),
+    ])
+    def test_round_trip(self, old, new):
+        """A reverse patch turns new into old, and inverted old into new."""
+        hunks = parse_patch(unified_diff(new, old, b'new', b'old', context=0, max_size=None))
+        lines = lambda data: iter(data.splitlines(keepends=True))
+        assert b"".join(apply_patch(lines(new), hunks)) == old
+        assert b"".join(apply_patch(lines(old), hunks, inverse=True)) == new
+    
+    def test_mismatch_is_detected(self):
+        """A patch applied to the wrong content raises."""
+        hunks = parse_patch(unified_diff(b"a\n", b"b\n", b'new', b'old', context=0))
+        with pytest.raises(HistoryError, match="does not apply"):
+            list(apply_patch(iter([b"c\n"]), hunks))
+
+
+class TestVersionHistory:
+    """VersionHistory stores patches between keyframes and rebuilds any version."""
+    
+    @pytest.mark.parametrize("middle", [version_history.MAX_DIFF_MIDDLE, 0])
+    def test_every_version_is_rebuilt(self, history, target, tmp_path, monkeypatch, middle):
+        """Versions come back from keyframes, later keyframes or the current file."""
+        # Staged edits are diffed in memory, or line by line past MAX_DIFF_MIDDLE
+        monkeypatch.setattr(version_history, "MAX_DIFF_MIDDLE", middle)
+        contents = []
+        for i in range(10):
+            contents.append(target.read_bytes())
+            staged = tmp_path / "staged" if i % 2 else None
+            new = b"edit %d\n" % i if middle == 0 else b"edit %d\nextra\n" % i
+            _edit(history, target, b"line %d\n" % (i * 3), new, staged)
+        
+        versions = history.versions(target)
+        assert [v.keyframe for v in versions] == [
+            True, False, False, False, True, False, False, False, True, False
+        ]
+        assert all(v.patch for v in versions)
+        for version, content in zip(versions, contents):
+            assert _checkout(history, target, version.number) == content
+        
+        reloaded = VersionHistory(history.directory)
+        assert _checkout(reloaded, target, 2) == contents[1]
+    
+    def test_outside_change_starts_a_keyframe(self, history, target):
+        """A file modified between edits keeps its older versions reachable."""
+        first = target.read_bytes()
+        _edit(history, target, b"line 1\n", b"one\n")
+        second = target.read_bytes()
+        _edit(history, target, b"line 2\n", b"two\n")
+        target.write_bytes(b"rewritten\n")
+        _edit(history, target, b"rewritten", b"again")
+        
+        versions = history.versions(target)
+        assert [v.keyframe for v in versions] == [True, False, True]
+        assert _checkout(history, target, 1) == first
+        assert _checkout(history, target, 2) == second
+        assert _checkout(history, target, 3) == b"rewritten\n"
+    
+    def test_binary_content_is_stored_in_full(self, history, target):
+        """Without a patch a version is a keyframe, and so is the next one."""
+        target.write_bytes(b"a\0b\n")
+        _edit(history, target, b"a", b"c")
+        _edit(history, target, b"c", b"d")
+        assert [(v.keyframe, v.patch) for v in history.versions(target)] == [
+            (True, False), (True, False)
+        ]
+        assert _checkout(history, target, 1) == b"a\0b\n"
+    
+    def test_oldest_groups_are_pruned(self, tmp_path, target):
+        """Beyond max_versions, whole keyframe groups are deleted."""
+        history = VersionHistory(tmp_path / "history", max_versions=5, keyframe_interval=2)
+        for i in range(7):
+            _edit(history, target, b"line %d\n" % i, b"x\n")
+        
+        assert [v.number for v in history.versions(target)] == [3, 4, 5, 6, 7]
+        assert history.versions(target)[0].keyframe
+        folder = history._folder(str(target))
+        assert not any(p.name.startswith(("1.", "2.")) for p in folder.iterdir())
+        assert _checkout(history, target, 3).count(b"x\n") == 2
+    
+    def test_discard_and_unknown_version(self, history, target):
+        """A discarded version is gone; unknown versions raise."""
+        version = _edit(history, target, b"line 1\n", b"x\n")
+        history.discard(target, version)
+        assert history.versions(target) == []
+        with pytest.raises(HistoryError, match="No version 1"):
+            history.stage_version(target, 1, target)
+    
+    def test_corrupt_keyframe_is_detected(self, history, target):
+        """A damaged keyframe raises and leaves no staging file behind."""
+        _edit(history, target, b"line 1\n", b"x\n")
+        (history._folder(str(target)) / "1.full.z").write_bytes(b"not zlib")
+        
+        with pytest.raises(HistoryError, match="corrupt"):
+            history.stage_version(target, 1, target)
+        assert sorted(p.name for p in target.parent.iterdir()) == ["data.txt", "history"]
+    
+    def test_from_env(self, tmp_path):
+        """History settings are read from the environment."""
+        history = VersionHistory.from_env({
+            "SED_AWK_HISTORY_DIR": str(tmp_path),
+            "SED_AWK_HISTORY_MAX_VERSIONS": "0",
+        })
+        assert history.directory == tmp_path and not history.enabled
+        assert history.keyframe_interval == VersionHistory.DEFAULT_KEYFRAME_INTERVAL
+        with pytest.raises(ValueError, match="SED_AWK_HISTORY_KEYFRAME_INTERVAL"):
+            VersionHistory.from_env({"SED_AWK_HISTORY_KEYFRAME_INTERVAL": "often"})